@@ -29,6 +29,10 @@ LOG = logging.getLogger(__name__)
 ROOT_HELPER_OPTS = [
     cfg.StrOpt('root_helper', default='sudo',
                help=_('Root helper application.')),
+    cfg.StrOpt('root_helper_daemon',
+               help=_('Root helper daemon application, run once to execute '
+                      'all the commands needing root privileges which are '
+                      'not long-lived processes.')),
 ]
 
 AGENT_STATE_OPTS = [
@@ -15,6 +15,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import hashlib
 import os
 
 import eventlet
@@ -35,6 +36,7 @@ from neutron.common import utils
 from neutron import context
 from neutron import manager
 from neutron.openstack.common import importutils
+from neutron.openstack.common import jsonutils
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import loopingcall
 from neutron.openstack.common.rpc import common
@@ -60,6 +62,21 @@ class DhcpAgent(manager.Manager):
                            "enable_isolated_metadata = True")),
         cfg.IntOpt('num_sync_threads', default=4,
                    help=_('Number of threads to use during sync process.')),
+        cfg.IntOpt('sync_batch_size', default=100,
+                   help=_('Number of networks whose information is '
+                          'retrieved by each call to the server during the '
+                          'sync process.')),
+        cfg.FloatOpt('port_reload_delay', default=0,
+                     help=_('Delay in seconds before reloading the DHCP '
+                            'service of a network after a port is created, '
+                            'updated or deleted. The changes of the ports of '
+                            'a network received during this delay are '
+                            'applied with a single reload. 0 reloads the '
+                            'DHCP service on each change.')),
+        cfg.IntOpt('sync_rate_limit', default=0,
+                   help=_('Maximum number of networks whose DHCP service is '
+                          'configured per second during the sync process. '
+                          '0 means unlimited.')),
         cfg.StrOpt('metadata_proxy_socket',
                    default='$state_path/metadata_proxy',
                    help=_('Location of Metadata Proxy UNIX domain '
@@ -68,7 +85,11 @@ class DhcpAgent(manager.Manager):
 
     def __init__(self, host=None):
         super(DhcpAgent, self).__init__(host=host)
-        self.needs_resync = False
+        self.needs_full_resync = False
+        self.needs_resync_networks = set()
+        # ids of the ports changed since the last reload of each network,
+        # for which a delayed reload is pending
+        self.pending_port_reloads = {}
         self.conf = cfg.CONF
         self.cache = NetworkCache()
         self.root_helper = config.get_root_helper(self.conf)
@@ -113,6 +134,19 @@ class DhcpAgent(manager.Manager):
         self.sync_state()
         self.periodic_resync()
 
+    @property
+    def needs_resync(self):
+        return self.needs_full_resync or bool(self.needs_resync_networks)
+
+    def schedule_resync(self, network_id=None):
+        """Schedule a resync of a network, or of all the networks."""
+        if network_id is None:
+            self.needs_full_resync = True
+        else:
+            self.needs_resync_networks.add(network_id)
+            # Ensure a full resync does not skip the network
+            self.cache.mark_outdated(network_id)
+
     def call_driver(self, action, network, **action_kwargs):
         """Invoke an action on a DHCP driver instance."""
         try:
@@ -134,7 +168,7 @@ class DhcpAgent(manager.Manager):
                           'that the network and/or its subnet(s) still exist.')
                         % {'net_id': network.id, 'action': action})
         except Exception as e:
-            self.needs_resync = True
+            self.schedule_resync(network.id)
             if (isinstance(e, common.RemoteError)
                 and e.exc_type == 'NetworkNotFound'
                 or isinstance(e, exceptions.NetworkNotFound)):
@@ -144,39 +178,103 @@ class DhcpAgent(manager.Manager):
                               % {'net_id': network.id, 'action': action})
 
     @utils.synchronized('dhcp-agent')
-    def sync_state(self):
-        """Sync the local DHCP state with Neutron."""
+    def sync_state(self, network_ids=None):
+        """Sync the local DHCP state with Neutron.
+
+        :param network_ids: optional, the networks to sync, e.g. because
+               their configuration failed. When not given, all the networks
+               are synced but those which did not change since they were
+               configured are left untouched.
+        """
         LOG.info(_('Synchronizing state'))
         pool = eventlet.GreenPool(cfg.CONF.num_sync_threads)
         known_network_ids = set(self.cache.get_network_ids())
 
         try:
-            active_networks = self.plugin_rpc.get_active_networks_info()
-            active_network_ids = set(network.id for network in active_networks)
-            for deleted_id in known_network_ids - active_network_ids:
+            active_network_ids = set()
+            for network in self._get_active_networks_info(network_ids):
+                active_network_ids.add(network.id)
+                if (network_ids is None and
+                        self.cache.is_network_unchanged(network)):
+                    continue
+                if cfg.CONF.sync_rate_limit:
+                    eventlet.sleep(1.0 / cfg.CONF.sync_rate_limit)
+                self.cache.clear_outdated(network.id)
+                pool.spawn(self.safe_configure_dhcp_for_network, network)
+            # Networks to sync which are no longer active on this agent
+            deleted_ids = known_network_ids - active_network_ids
+            if network_ids is not None:
+                deleted_ids &= set(network_ids)
+            for deleted_id in deleted_ids:
                 try:
                     self.disable_dhcp_helper(deleted_id)
                 except Exception:
-                    self.needs_resync = True
+                    self.schedule_resync(deleted_id)
                     LOG.exception(_('Unable to sync network state on deleted '
                                     'network %s'), deleted_id)
-
-            for network in active_networks:
-                pool.spawn(self.safe_configure_dhcp_for_network, network)
             pool.waitall()
             LOG.info(_('Synchronizing state complete'))
 
         except Exception:
-            self.needs_resync = True
+            if network_ids is None:
+                self.schedule_resync()
+            else:
+                for network_id in network_ids:
+                    self.schedule_resync(network_id)
             LOG.exception(_('Unable to sync network state.'))
 
+    def _get_active_networks_info(self, network_ids=None):
+        """Retrieve the information of networks in batches.
+
+        When network_ids is not given, all the active networks are
+        retrieved, a page of sync_batch_size networks at a time. A server
+        not supporting the batches returns all the networks at once.
+        """
+        retrieved = False
+        try:
+            for network in self._get_active_networks_batches(network_ids):
+                retrieved = True
+                yield network
+        except (common.RemoteError, common.UnsupportedRpcVersion) as e:
+            if retrieved or not agent_rpc.is_unsupported_version(e):
+                raise
+            LOG.debug(_("Batches of networks not supported by the server, "
+                        "retrieving all the networks"))
+            for network in self.plugin_rpc.get_active_networks_info():
+                if network_ids is None or network.id in network_ids:
+                    yield network
+
+    def _get_active_networks_batches(self, network_ids):
+        batch_size = cfg.CONF.sync_batch_size
+        if network_ids is not None:
+            network_ids = sorted(network_ids)
+            for i in xrange(0, len(network_ids), batch_size):
+                for network in self.plugin_rpc.get_active_networks_info(
+                        network_ids[i:i + batch_size]):
+                    yield network
+            return
+        marker = None
+        while True:
+            networks = self.plugin_rpc.get_active_networks_info(
+                limit=batch_size, marker=marker)
+            for network in networks:
+                yield network
+            if len(networks) != batch_size:
+                return
+            marker = networks[-1].id
+
     def _periodic_resync_helper(self):
         """Resync the dhcp state at the configured interval."""
         while True:
             eventlet.sleep(self.conf.resync_interval)
-            if self.needs_resync:
-                self.needs_resync = False
+            if self.needs_full_resync:
+                self.needs_full_resync = False
+                self.needs_resync_networks = set()
                 self.sync_state()
+            elif self.needs_resync_networks:
+                network_ids = self.needs_resync_networks
+                self.needs_resync_networks = set()
+                self.sync_state(network_ids)
 
     def periodic_resync(self):
         """Spawn a thread to periodically resync the dhcp state."""
@@ -189,7 +287,7 @@ class DhcpAgent(manager.Manager):
                 LOG.warn(_('Network %s has been deleted.'), network_id)
             return network
         except Exception:
-            self.needs_resync = True
+            self.schedule_resync(network_id)
             LOG.exception(_('Network %s info call failed.'), network_id)
 
     def enable_dhcp_helper(self, network_id):
@@ -297,7 +395,7 @@ class DhcpAgent(manager.Manager):
         network = self.cache.get_network_by_id(updated_port.network_id)
         if network:
             self.cache.put_port(updated_port)
-            self.call_driver('reload_allocations', network)
+            self.reload_port_allocations(network, updated_port.id)
 
     # Use the update handler for the port create event.
     port_create_end = port_update_end
@@ -309,6 +407,37 @@ class DhcpAgent(manager.Manager):
         if port:
             network = self.cache.get_network_by_id(port.network_id)
             self.cache.remove_port(port)
+            self.reload_port_allocations(network, port.id)
+
+    def reload_port_allocations(self, network, port_id):
+        """Reload the DHCP service of a network after a port change."""
+        if not self.conf.port_reload_delay:
+            self._reload_allocations(network, [port_id])
+            return
+        port_ids = self.pending_port_reloads.get(network.id)
+        if port_ids is None:
+            self.pending_port_reloads[network.id] = set([port_id])
+            eventlet.spawn_after(self.conf.port_reload_delay,
+                                 self._reload_pending_port_allocations,
+                                 network.id)
+        else:
+            port_ids.add(port_id)
+
+    @utils.synchronized('dhcp-agent')
+    def _reload_pending_port_allocations(self, network_id):
+        port_ids = self.pending_port_reloads.pop(network_id, None)
+        # The network might have been disabled in the meantime
+        network = self.cache.get_network_by_id(network_id)
+        if port_ids and network:
+            LOG.debug(_('Reloading DHCP for network %(net_id)s after changes '
+                        'of %(count)d ports'),
+                      {'net_id': network_id, 'count': len(port_ids)})
+            self._reload_allocations(network, list(port_ids))
+
+    def _reload_allocations(self, network, port_ids):
+        if getattr(self.dhcp_driver_cls, 'RELOAD_PORT_IDS', False):
+            self.call_driver('reload_allocations', network, port_ids=port_ids)
+        else:
             self.call_driver('reload_allocations', network)
 
     def enable_isolated_metadata_proxy(self, network):
@@ -372,6 +501,8 @@ class DhcpPluginApi(proxy.RpcProxy):
         1.0 - Initial version.
         1.1 - Added get_active_networks_info, create_dhcp_port,
               and update_dhcp_port methods.
+        1.2 - Added the network_ids, limit and marker arguments of
+              get_active_networks_info.
 
     """
 
@@ -384,12 +515,27 @@ class DhcpPluginApi(proxy.RpcProxy):
         self.host = cfg.CONF.host
         self.use_namespaces = use_namespaces
 
-    def get_active_networks_info(self):
-        """Make a remote process call to retrieve all network info."""
+    def get_active_networks_info(self, network_ids=None, limit=None,
+                                 marker=None):
+        """Make a remote process call to retrieve all network info.
+
+        When network_ids is given, only the information of these networks
+        is retrieved. When limit is given, only the information of at most
+        limit networks, sorted by id and following the marker network id,
+        is retrieved. These arguments require version 1.2 of the API.
+        """
+        kwargs = {'host': self.host}
+        if network_ids is not None:
+            kwargs['network_ids'] = network_ids
+        if limit:
+            kwargs['limit'] = limit
+        if marker is not None:
+            kwargs['marker'] = marker
+        version = '1.2' if len(kwargs) > 1 else None
         networks = self.call(self.context,
                              self.make_msg('get_active_networks_info',
-                                           host=self.host),
-                             topic=self.topic)
+                                           **kwargs),
+                             topic=self.topic, version=version)
         return [dhcp.NetModel(self.use_namespaces, n) for n in networks]
 
     def get_network_info(self, network_id):
@@ -454,12 +600,54 @@ class DhcpPluginApi(proxy.RpcProxy):
                          topic=self.topic)
 
 
+def _network_digest(network):
+    """Return a digest of the content of a network model."""
+    def to_primitive(value):
+        if isinstance(value, dhcp.DictModel):
+            return dict((k, to_primitive(v))
+                        for k, v in vars(value).iteritems()
+                        if not k.startswith('_'))
+        if isinstance(value, list):
+            items = [to_primitive(item) for item in value]
+            # The order of the subnets and ports is not significant
+            if all(isinstance(item, dict) and 'id' in item for item in items):
+                items.sort(key=lambda item: item['id'])
+            return items
+        return value
+
+    data = jsonutils.dumps(to_primitive(network), sort_keys=True)
+    return hashlib.sha1(data).hexdigest()
+
+
 class NetworkCache(object):
     """Agent cache of the current network state."""
     def __init__(self):
         self.cache = {}
         self.subnet_lookup = {}
         self.port_lookup = {}
+        # digest of the content of each network, computed when needed
+        self.digests = {}
+        # ids of the networks whose DHCP service might not match the cache
+        self.outdated = set()
+
+    def is_network_unchanged(self, network):
+        """Return True if the cached network has the same content."""
+        if network.id not in self.cache or network.id in self.outdated:
+            return False
+        digest = self.digests.get(network.id)
+        if digest is None:
+            digest = self.digests[network.id] = _network_digest(
+                self.cache[network.id])
+        return digest == _network_digest(network)
+
+    def mark_outdated(self, network_id):
+        self.outdated.add(network_id)
+
+    def clear_outdated(self, network_id):
+        self.outdated.discard(network_id)
+
+    def clear_digest(self, network_id):
+        self.digests.pop(network_id, None)
 
     def get_network_ids(self):
         return self.cache.keys()
@@ -478,6 +666,7 @@ class NetworkCache(object):
             self.remove(self.cache[network.id])
 
         self.cache[network.id] = network
+        self.clear_digest(network.id)
 
         for subnet in network.subnets:
             self.subnet_lookup[subnet.id] = network.id
@@ -487,6 +676,7 @@ class NetworkCache(object):
 
     def remove(self, network):
         del self.cache[network.id]
+        self.clear_digest(network.id)
 
         for subnet in network.subnets:
             del self.subnet_lookup[subnet.id]
@@ -504,6 +694,7 @@ class NetworkCache(object):
             network.ports.append(port)
 
         self.port_lookup[port.id] = network.id
+        self.clear_digest(network.id)
 
     def remove_port(self, port):
         network = self.get_network_by_port_id(port.id)
@@ -512,6 +703,7 @@ class NetworkCache(object):
             if network.ports[index] == port:
                 del network.ports[index]
                 del self.port_lookup[port.id]
+                self.clear_digest(network.id)
                 break
 
     def get_port_by_id(self, port_id):
@@ -578,7 +770,7 @@ class DhcpAgentWithStateReport(DhcpAgent):
 
     def agent_updated(self, context, payload):
         """Handle the agent_updated notification event."""
-        self.needs_resync = True
+        self.schedule_resync()
         LOG.info(_("agent_updated by server side %s!"), payload)
 
     def after_start(self):
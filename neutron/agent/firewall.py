@@ -53,8 +53,14 @@ class FirewallDriver(object):
       if direction is egress:
         remote_group_id will be a list of dest_ip_prefix
       remote_group_id will also remaining membership update management
+      Drivers setting expand_remote_groups to False get remote_group_id
+      rules as they are, and the members of the remote groups through
+      update_security_group_members.
     """
 
+    # Whether remote_group_id rules are expanded by the server
+    expand_remote_groups = True
+
     def prepare_port_filter(self, port):
         """Prepare filters for the port.
 
@@ -85,6 +91,14 @@ class FirewallDriver(object):
         """Stop filtering port."""
         raise NotImplementedError()
 
+    def update_security_group_members(self, sg_id, member_ips):
+        """Update the members of a security group.
+
+        :param member_ips: dict of the IP addresses of the members, by
+        ethertype
+        """
+        pass
+
     def filter_defer_apply_on(self):
         """Defer application of filtering rule."""
         pass
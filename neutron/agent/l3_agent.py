@@ -13,7 +13,11 @@
 #    under the License.
 #
 
+import itertools
+import time
+
 import eventlet
+import eventlet.queue
 import netaddr
 from oslo.config import cfg
 
@@ -50,6 +54,11 @@ INTERNAL_DEV_PREFIX = 'qr-'
 EXTERNAL_DEV_PREFIX = 'qg-'
 RPC_LOOP_INTERVAL = 1
 FLOATING_IP_CIDR_SUFFIX = '/32'
+# Priorities of the router updates, lower values are processed first
+PRIORITY_RPC = 0
+PRIORITY_SYNC_ROUTERS_TASK = 1
+UPDATE_ROUTER = 'update'
+DELETE_ROUTER = 'delete'
 
 
 class L3PluginApi(proxy.RpcProxy):
@@ -75,6 +84,20 @@ class L3PluginApi(proxy.RpcProxy):
                                        router_ids=router_ids),
                          topic=self.topic)
 
+    def get_routers_page(self, context, page_size, marker=None,
+                         since_revision=None, router_ids=None):
+        """Make a remote process call to retrieve a page of sync data.
+
+        A server which does not support the pages returns the list of all
+        the routers instead.
+        """
+        return self.call(context,
+                         self.make_msg('sync_routers', host=self.host,
+                                       router_ids=router_ids,
+                                       page_size=page_size, marker=marker,
+                                       since_revision=since_revision),
+                         topic=self.topic)
+
     def get_external_network_id(self, context):
         """Make a remote process call to retrieve the external network id.
 
@@ -97,6 +120,76 @@ class L3PluginApi(proxy.RpcProxy):
                          version='1.1')
 
 
+class RouterUpdate(object):
+    """An update of a router, waiting to be processed."""
+
+    def __init__(self, router_id, priority, action=UPDATE_ROUTER,
+                 router=None):
+        self.router_id = router_id
+        self.priority = priority
+        self.action = action
+        self.router = router
+        self.timestamp = time.time()
+        self.seq = None
+
+
+class RouterUpdateQueue(object):
+    """Queue of the router updates, processed by priority.
+
+    A router has at most one update waiting in the queue: a new update
+    replaces the pending one, keeping the highest priority and the place in
+    the queue of both. A router is processed by a single worker at a time,
+    its updates received meanwhile wait until the worker is done.
+    """
+
+    def __init__(self):
+        self._updates = {}
+        self._busy = set()
+        # (priority, seq, router id) of the updates to hand out. Replaced
+        # updates leave stale entries, skipped when they come out.
+        self._queue = eventlet.queue.PriorityQueue()
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self._updates)
+
+    def router_ids(self):
+        """Return the ids of the routers pending or being processed."""
+        return set(self._updates) | self._busy
+
+    def add(self, update):
+        pending = self._updates.get(update.router_id)
+        self._updates[update.router_id] = update
+        if pending and pending.priority <= update.priority:
+            update.priority = pending.priority
+            update.timestamp = pending.timestamp
+            update.seq = pending.seq
+            return
+        update.seq = next(self._seq)
+        if update.router_id not in self._busy:
+            self._queue.put((update.priority, update.seq, update.router_id))
+
+    def get(self):
+        """Wait for the next update to process and return it.
+
+        done() must be called once the update has been processed.
+        """
+        while True:
+            priority, seq, router_id = self._queue.get()
+            update = self._updates.get(router_id)
+            if (update and update.seq == seq and
+                router_id not in self._busy):
+                del self._updates[router_id]
+                self._busy.add(router_id)
+                return update
+
+    def done(self, router_id):
+        self._busy.discard(router_id)
+        update = self._updates.get(router_id)
+        if update:
+            self._queue.put((update.priority, update.seq, router_id))
+
+
 class RouterInfo(object):
 
     def __init__(self, router_id, root_helper, use_namespaces, router):
@@ -191,6 +284,13 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
                    default='$state_path/metadata_proxy',
                    help=_('Location of Metadata Proxy UNIX domain '
                           'socket')),
+        cfg.IntOpt('router_workers', default=8,
+                   help=_('Number of routers processed concurrently.')),
+        cfg.IntOpt('sync_routers_page_size', default=64,
+                   help=_('Number of routers fetched per call by the '
+                          'periodic resync, which then only fetches the '
+                          'routers changed since the last one. 0 fetches '
+                          'all the routers in one call each time.')),
     ]
 
     def __init__(self, host, conf=None):
@@ -217,9 +317,14 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
         self.context = context.get_admin_context_without_session()
         self.plugin_rpc = L3PluginApi(topics.L3PLUGIN, host)
         self.fullsync = True
+        # revision of the routers at the last successful paged resync
+        self._sync_revision = None
         self.updated_routers = set()
         self.removed_routers = set()
         self.sync_progress = False
+        self._queue = RouterUpdateQueue()
+        self.router_processing_stats = {'count': 0, 'total': 0.0,
+                                         'max': 0.0}
 
         self._delete_stale_namespaces = (self.conf.use_namespaces and
                                          self.conf.router_delete_namespaces)
@@ -731,8 +836,9 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
         LOG.debug(_('Got router added to agent :%r'), payload)
         self.routers_updated(context, payload)
 
-    def _process_routers(self, routers, all_routers=False):
-        pool = eventlet.GreenPool()
+    def _process_routers(self, routers, all_routers=False,
+                         priority=PRIORITY_RPC):
+        """Queue the updates of routers for the router workers."""
         if (self.conf.external_network_bridge and
             not ip_lib.device_exists(self.conf.external_network_bridge)):
             LOG.error(_("The external network bridge '%s' does not exist"),
@@ -745,10 +851,13 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
         # routers which should be removed.
         # If routers are from server side notification, we seek them
         # from subset of incoming routers and ones we have now.
+        # The routers whose update is still queued are considered as
+        # ones we have.
+        known_router_ids = set(self.router_info) | self._queue.router_ids()
         if all_routers:
-            prev_router_ids = set(self.router_info)
+            prev_router_ids = known_router_ids
         else:
-            prev_router_ids = set(self.router_info) & set(
+            prev_router_ids = known_router_ids & set(
                 [router['id'] for router in routers])
         cur_router_ids = set()
         for r in routers:
@@ -767,15 +876,49 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
                 ex_net_id != target_ex_net_id):
                 continue
             cur_router_ids.add(r['id'])
-            if r['id'] not in self.router_info:
-                self._router_added(r['id'], r)
-            ri = self.router_info[r['id']]
-            ri.router = r
-            pool.spawn_n(self.process_router, ri)
+            self._queue.add(RouterUpdate(r['id'], priority, router=r))
         # identify and remove routers that no longer exist
         for router_id in prev_router_ids - cur_router_ids:
-            pool.spawn_n(self._router_removed, router_id)
-        pool.waitall()
+            self._queue.add(RouterUpdate(router_id, priority,
+                                         action=DELETE_ROUTER))
+
+    def _process_updated_router(self, router):
+        if router['id'] not in self.router_info:
+            self._router_added(router['id'], router)
+        ri = self.router_info[router['id']]
+        ri.router = router
+        self.process_router(ri)
+
+    def _process_router_update(self):
+        update = self._queue.get()
+        start = time.time()
+        try:
+            if update.action == DELETE_ROUTER:
+                self._router_removed(update.router_id)
+            else:
+                self._process_updated_router(update.router)
+        except Exception:
+            LOG.exception(_("Failed processing router %s"), update.router_id)
+            self.fullsync = True
+            # the router may not have changed, resync all of them
+            self._sync_revision = None
+        finally:
+            self._queue.done(update.router_id)
+        elapsed = time.time() - start
+        stats = self.router_processing_stats
+        stats['count'] += 1
+        stats['total'] += elapsed
+        stats['max'] = max(stats['max'], elapsed)
+        LOG.debug(_("Processed router %(router_id)s in %(elapsed).3f "
+                    "seconds, %(pending)d router updates pending"),
+                  {'router_id': update.router_id, 'elapsed': elapsed,
+                   'pending': len(self._queue)})
+
+    def _process_routers_loop(self):
+        pool = eventlet.GreenPool(size=self.conf.router_workers)
+        while True:
+            # Blocks while all the workers are busy
+            pool.spawn_n(self._process_router_update)
 
     @lockutils.synchronized('l3-agent', 'neutron-')
     def _rpc_loop(self):
@@ -801,7 +944,8 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
     def _process_router_delete(self):
         current_removed_routers = list(self.removed_routers)
         for router_id in current_removed_routers:
-            self._router_removed(router_id)
+            self._queue.add(RouterUpdate(router_id, PRIORITY_RPC,
+                                         action=DELETE_ROUTER))
             self.removed_routers.remove(router_id)
 
     def _router_ids(self):
@@ -817,15 +961,21 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
                   self.fullsync)
         if not self.fullsync:
             return
+        routers = None
         try:
             router_ids = self._router_ids()
             self.updated_routers.clear()
             self.removed_routers.clear()
-            routers = self.plugin_rpc.get_routers(
-                context, router_ids)
+            if self.conf.sync_routers_page_size:
+                routers = [{'id': router_id} for router_id in
+                           self._sync_routers_by_page(context, router_ids)]
+            else:
+                routers = self.plugin_rpc.get_routers(
+                    context, router_ids)
 
-            LOG.debug(_('Processing :%r'), routers)
-            self._process_routers(routers, all_routers=True)
+                LOG.debug(_('Processing :%r'), routers)
+                self._process_routers(routers, all_routers=True,
+                                      priority=PRIORITY_SYNC_ROUTERS_TASK)
             self.fullsync = False
             LOG.debug(_("_sync_routers_task successfully completed"))
         except rpc_common.RPCException:
@@ -838,10 +988,52 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
 
         # Resync is not necessary for the cleanup of stale
         # namespaces.
-        if self._delete_stale_namespaces:
+        if self._delete_stale_namespaces and routers is not None:
             self._cleanup_namespaces(routers)
 
+    def _sync_routers_by_page(self, context, router_ids):
+        """Fetch and queue the routers to sync, one page at a time.
+
+        Once a resync succeeded, only the routers changed since then are
+        fetched. The ids of all the routers hosted by the agent are
+        returned.
+        """
+        known_router_ids = set(self.router_info) | self._queue.router_ids()
+        marker = None
+        while True:
+            page = self.plugin_rpc.get_routers_page(
+                context, self.conf.sync_routers_page_size, marker=marker,
+                since_revision=self._sync_revision, router_ids=router_ids)
+            if isinstance(page, list):
+                # the server does not support the pages
+                self._process_routers(page, all_routers=True,
+                                      priority=PRIORITY_SYNC_ROUTERS_TASK)
+                return [router['id'] for router in page]
+            if marker is None:
+                revision = page['revision']
+                hosted_router_ids = page['hosted_router_ids']
+            LOG.debug(_('Processing :%r'), page['routers'])
+            self._process_routers(page['routers'],
+                                  priority=PRIORITY_SYNC_ROUTERS_TASK)
+            # the routers looked up but not returned are disabled
+            missing_router_ids = set(page['router_ids']) - set(
+                router['id'] for router in page['routers'])
+            for router_id in missing_router_ids & known_router_ids:
+                self._queue.add(RouterUpdate(router_id,
+                                             PRIORITY_SYNC_ROUTERS_TASK,
+                                             action=DELETE_ROUTER))
+            marker = page['next_marker']
+            if not marker:
+                break
+        for router_id in known_router_ids - set(hosted_router_ids):
+            self._queue.add(RouterUpdate(router_id,
+                                         PRIORITY_SYNC_ROUTERS_TASK,
+                                         action=DELETE_ROUTER))
+        self._sync_revision = revision
+        return hosted_router_ids
+
     def after_start(self):
+        eventlet.spawn_n(self._process_routers_loop)
         LOG.info(_("L3 agent started"))
 
     def _update_routing_table(self, ri, operation, route):
@@ -921,6 +1113,14 @@ class L3NATAgentWithStateReport(L3NATAgent):
         configurations['ex_gw_ports'] = num_ex_gw_ports
         configurations['interfaces'] = num_interfaces
         configurations['floating_ips'] = num_floating_ips
+        stats = self.router_processing_stats
+        self.router_processing_stats = {'count': 0, 'total': 0.0,
+                                        'max': 0.0}
+        configurations['router_updates_pending'] = len(self._queue)
+        configurations['routers_processed'] = stats['count']
+        configurations['router_processing_time_avg'] = round(
+            stats['count'] and stats['total'] / stats['count'], 3)
+        configurations['router_processing_time_max'] = round(stats['max'], 3)
         try:
             self.state_rpc.report_state(self.context, self.agent_state,
                                         self.use_call)
@@ -939,6 +1139,7 @@ class L3NATAgentWithStateReport(L3NATAgent):
     def agent_updated(self, context, payload):
         """Handle the agent_updated notification event."""
         self.fullsync = True
+        self._sync_revision = None
         LOG.info(_("agent_updated by server side %s!"), payload)
 
 
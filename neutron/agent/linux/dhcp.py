@@ -106,6 +106,11 @@ class NetModel(DictModel):
 @six.add_metaclass(abc.ABCMeta)
 class DhcpBase(object):
 
+    # Whether reload_allocations accepts port_ids. The agent only passes
+    # them to the drivers setting it, the others implementing
+    # reload_allocations(self) keep working.
+    RELOAD_PORT_IDS = False
+
     def __init__(self, conf, network, root_helper='sudo',
                  version=None, plugin=None):
         self.conf = conf
@@ -134,8 +139,13 @@ class DhcpBase(object):
         """Boolean representing the running state of the DHCP server."""
 
     @abc.abstractmethod
-    def reload_allocations(self):
-        """Force the DHCP server to reload the assignment database."""
+    def reload_allocations(self, port_ids=None):
+        """Force the DHCP server to reload the assignment database.
+
+        :param port_ids: optional, the ports created, updated or deleted
+               since the previous reload, when only ports changed. Only
+               given to the drivers setting RELOAD_PORT_IDS.
+        """
 
     @classmethod
     def existing_dhcp_networks(cls, conf, root_helper):
@@ -153,6 +163,44 @@ class DhcpBase(object):
 class DhcpLocalProcess(DhcpBase):
     PORTS = []
 
+    def __init__(self, conf, network, root_helper='sudo',
+                 version=None, plugin=None):
+        super(DhcpLocalProcess, self).__init__(conf, network, root_helper,
+                                               version, plugin)
+        # Entries of the config files written for the network, by kind and
+        # port id, so that only the entries of the changed ports are
+        # formatted when allocations are reloaded. The agent instantiates
+        # a driver for each action, so they are kept on the network model
+        # it caches, and dropped along with it.
+        self._port_entries_cache = vars(network).setdefault('_port_entries',
+                                                            {})
+
+    def _get_port_entries(self, kind, formatter, port_ids=None):
+        """Return the entries of a kind of config file for each port.
+
+        :param formatter: function returning the entries of a port
+        :param port_ids: optional, the ports which changed since the entries
+               were last returned. All the entries are formatted if not
+               given.
+        """
+        entries = self._port_entries_cache.get(kind)
+        if entries is None or port_ids is None:
+            entries = dict((port.id, formatter(port))
+                           for port in self.network.ports)
+        else:
+            entries = entries.copy()
+            ports = dict((port.id, port) for port in self.network.ports)
+            for port_id in port_ids:
+                if port_id in ports:
+                    entries[port_id] = formatter(ports[port_id])
+                else:
+                    entries.pop(port_id, None)
+        self._port_entries_cache[kind] = entries
+        return entries
+
+    def _get_cached_port_entries(self, kind):
+        return self._port_entries_cache.get(kind)
+
     def _enable_dhcp(self):
         """check if there is a subnet within the network with dhcp enabled."""
         for subnet in self.network.subnets:
@@ -202,6 +250,7 @@ class DhcpLocalProcess(DhcpBase):
         confs_dir = os.path.abspath(os.path.normpath(self.conf.dhcp_confs))
         conf_dir = os.path.join(confs_dir, self.network.id)
         shutil.rmtree(conf_dir, ignore_errors=True)
+        self._port_entries_cache.clear()
 
     def get_conf_file_name(self, kind, ensure_conf_dir=False):
         """Returns the file name for a given kind of config file."""
@@ -273,6 +322,8 @@ class Dnsmasq(DhcpLocalProcess):
 
     _TAG_PREFIX = 'tag%d'
 
+    RELOAD_PORT_IDS = True
+
     NEUTRON_NETWORK_ID_KEY = 'NEUTRON_NETWORK_ID'
     NEUTRON_RELAY_SOCKET_PATH_KEY = 'NEUTRON_RELAY_SOCKET_PATH'
     MINIMUM_VERSION = 2.59
@@ -386,7 +437,7 @@ class Dnsmasq(DhcpLocalProcess):
         else:
             utils.execute(cmd, self.root_helper)
 
-    def reload_allocations(self):
+    def reload_allocations(self, port_ids=None):
         """Rebuild the dnsmasq config and signal the dnsmasq to reload."""
 
         # If all subnets turn off dhcp, kill the process.
@@ -396,9 +447,9 @@ class Dnsmasq(DhcpLocalProcess):
                         'turned off DHCP: %s'), self.network.id)
             return
 
-        self._release_unused_leases()
-        self._output_hosts_file()
-        self._output_opts_file()
+        self._release_unused_leases(port_ids)
+        self._output_hosts_file(port_ids)
+        self._output_opts_file(port_ids)
         if self.active:
             cmd = ['kill', '-HUP', self.pid]
             utils.execute(cmd, self.root_helper)
@@ -407,61 +458,130 @@ class Dnsmasq(DhcpLocalProcess):
         LOG.debug(_('Reloading allocations for network: %s'), self.network.id)
         self.device_manager.update(self.network)
 
-    def _output_hosts_file(self):
-        """Writes a dnsmasq compatible hosts file."""
+    def _format_host_entries(self, port):
+        """Return the dnsmasq hosts file lines of a port."""
         r = re.compile('[:.]')
-        buf = six.StringIO()
+        lines = []
+        for alloc in port.fixed_ips:
+            name = 'host-%s.%s' % (r.sub('-', alloc.ip_address),
+                                   self.conf.dhcp_domain)
+            set_tag = ''
+            # (dzyu) Check if it is legal ipv6 address, if so, need wrap
+            # it with '[]' to let dnsmasq to distinguish MAC address from
+            # IPv6 address.
+            ip_address = alloc.ip_address
+            if netaddr.valid_ipv6(ip_address):
+                ip_address = '[%s]' % ip_address
+            if getattr(port, 'extra_dhcp_opts', False):
+                if self.version >= self.MINIMUM_VERSION:
+                    set_tag = 'set:'
 
-        for port in self.network.ports:
-            for alloc in port.fixed_ips:
-                name = 'host-%s.%s' % (r.sub('-', alloc.ip_address),
-                                       self.conf.dhcp_domain)
-                set_tag = ''
-                # (dzyu) Check if it is legal ipv6 address, if so, need wrap
-                # it with '[]' to let dnsmasq to distinguish MAC address from
-                # IPv6 address.
-                ip_address = alloc.ip_address
-                if netaddr.valid_ipv6(ip_address):
-                    ip_address = '[%s]' % ip_address
-                if getattr(port, 'extra_dhcp_opts', False):
-                    if self.version >= self.MINIMUM_VERSION:
-                        set_tag = 'set:'
-
-                    buf.write('%s,%s,%s,%s%s\n' %
-                              (port.mac_address, name, ip_address,
-                               set_tag, port.id))
-                else:
-                    buf.write('%s,%s,%s\n' %
-                              (port.mac_address, name, ip_address))
+                lines.append('%s,%s,%s,%s%s\n' %
+                             (port.mac_address, name, ip_address,
+                              set_tag, port.id))
+            else:
+                lines.append('%s,%s,%s\n' %
+                             (port.mac_address, name, ip_address))
+        return ''.join(lines)
+
+    def _output_hosts_file(self, port_ids=None):
+        """Writes a dnsmasq compatible hosts file.
 
+        When port_ids is given, only the lines of these ports are formatted
+        again.
+        """
+        entries = self._get_port_entries('host', self._format_host_entries,
+                                         port_ids)
         name = self.get_conf_file_name('host')
-        utils.replace_file(name, buf.getvalue())
+        utils.replace_file(name, ''.join(entries[port.id]
+                                         for port in self.network.ports))
         return name
 
     def _read_hosts_file_leases(self, filename):
         leases = set()
         if os.path.exists(filename):
             with open(filename) as f:
-                for l in f.readlines():
-                    host = l.strip().split(',')
-                    leases.add((host[2], host[0]))
+                leases = self._parse_hosts_leases(f.readlines())
+        return leases
+
+    def _parse_hosts_leases(self, lines):
+        leases = set()
+        for l in lines:
+            host = l.strip().split(',')
+            leases.add((host[2], host[0]))
         return leases
 
-    def _release_unused_leases(self):
-        filename = self.get_conf_file_name('host')
-        old_leases = self._read_hosts_file_leases(filename)
+    def _release_unused_leases(self, port_ids=None):
+        cached_entries = self._get_cached_port_entries('host')
+        if port_ids is None or cached_entries is None:
+            filename = self.get_conf_file_name('host')
+            old_leases = self._read_hosts_file_leases(filename)
+            ports = self.network.ports
+        else:
+            # Only the leases of the changed ports might be unused
+            old_leases = self._parse_hosts_leases(
+                ''.join(cached_entries.get(port_id, '')
+                        for port_id in port_ids).splitlines())
+            port_ids = set(port_ids)
+            ports = [port for port in self.network.ports
+                     if port.id in port_ids]
 
         new_leases = set()
-        for port in self.network.ports:
+        for port in ports:
             for alloc in port.fixed_ips:
                 new_leases.add((alloc.ip_address, port.mac_address))
 
         for ip, mac in old_leases - new_leases:
             self._release_lease(mac, ip)
 
-    def _output_opts_file(self):
-        """Write a dnsmasq compatible options file."""
+    def _output_opts_file(self, port_ids=None):
+        """Write a dnsmasq compatible options file.
+
+        When port_ids is given, only the options of these ports are
+        formatted again, and the options of the subnets are only generated
+        again if DHCP or router ports changed.
+        """
+        old_owners = self._get_cached_port_entries('owner') or {}
+        owners = self._get_port_entries('owner',
+                                        lambda port: port.device_owner,
+                                        port_ids)
+        subnet_options = self._get_cached_port_entries('subnet')
+        if port_ids is None or subnet_options is None or any(
+                self._owner_affects_subnet_options(o.get(port_id))
+                for port_id in port_ids for o in (old_owners, owners)):
+            subnet_options = self._get_subnet_options()
+            # Cached along with the port entries of the network
+            self._port_entries_cache['subnet'] = subnet_options
+        port_options = self._get_port_entries('opts',
+                                              self._format_port_options,
+                                              port_ids)
+
+        options = list(subnet_options[0])
+        for port in self.network.ports:
+            options.extend(port_options[port.id])
+        options.extend(subnet_options[1])
+
+        name = self.get_conf_file_name('opts')
+        utils.replace_file(name, '\n'.join(options))
+        return name
 
+    @staticmethod
+    def _owner_affects_subnet_options(device_owner):
+        return device_owner in (constants.DEVICE_OWNER_DHCP,
+                                constants.DEVICE_OWNER_ROUTER_INTF)
+
+    def _format_port_options(self, port):
+        if getattr(port, 'extra_dhcp_opts', False):
+            return [self._format_option(port.id, opt.opt_name, opt.opt_value)
+                    for opt in port.extra_dhcp_opts]
+        return []
+
+    def _get_subnet_options(self):
+        """Return the options of the subnets.
+
+        The options to be written before the options of the ports and the
+        ones to be written after are returned.
+        """
         if self.conf.enable_isolated_metadata:
             subnet_to_interface_ip = self._make_subnet_interface_ip_map()
 
@@ -512,11 +632,6 @@ class Dnsmasq(DhcpLocalProcess):
                     options.append(self._format_option(i, 'router'))
 
         for port in self.network.ports:
-            if getattr(port, 'extra_dhcp_opts', False):
-                options.extend(
-                    self._format_option(port.id, opt.opt_name, opt.opt_value)
-                    for opt in port.extra_dhcp_opts)
-
             # provides all dnsmasq ip as dns-server if there is more than
             # one dnsmasq for a subnet and there is no dns-server submitted
             # by the server
@@ -527,15 +642,13 @@ class Dnsmasq(DhcpLocalProcess):
                         continue
                     dhcp_ips[i].append(ip.ip_address)
 
+        dhcp_options = []
         for i, ips in dhcp_ips.items():
             if len(ips) > 1:
-                options.append(self._format_option(i,
-                                                   'dns-server',
-                                                   ','.join(ips)))
-
-        name = self.get_conf_file_name('opts')
-        utils.replace_file(name, '\n'.join(options))
-        return name
+                dhcp_options.append(self._format_option(i,
+                                                        'dns-server',
+                                                        ','.join(ips)))
+        return options, dhcp_options
 
     def _make_subnet_interface_ip_map(self):
         ip_dev = ip_lib.IPDevice(
@@ -0,0 +1,88 @@
+# Copyright (c) 2014 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import netaddr
+
+from neutron.agent.linux import utils as linux_utils
+from neutron.common import constants
+from neutron.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+# ipset refuses set names longer than 31 characters
+IPSET_NAME_MAX_LENGTH = 31
+IPSET_FAMILY = {constants.IPv4: 'inet',
+                constants.IPv6: 'inet6'}
+
+
+def get_set_name(id, ethertype):
+    """Return the name of the set holding the members of a group."""
+    return ('%s%s' % (ethertype, id))[:IPSET_NAME_MAX_LENGTH]
+
+
+class IpsetManager(object):
+    """Wrapper for ipset.
+
+    Keeps the members of each set it created in memory, so that updating
+    a set only sends the added and removed members to the kernel, in a
+    single ipset restore call.
+    """
+
+    def __init__(self, execute=None, root_helper=None):
+        self.execute = execute or linux_utils.execute
+        self.root_helper = root_helper
+        # set name -> set of members in the kernel
+        self.ipset_sets = {}
+
+    def set_exists(self, id, ethertype):
+        return get_set_name(id, ethertype) in self.ipset_sets
+
+    def set_names(self):
+        return set(self.ipset_sets)
+
+    def set_members(self, id, ethertype, member_ips):
+        """Create the set if needed and update its members.
+
+        Members are IP addresses or CIDRs, host addresses are stored as
+        host networks.
+        """
+        set_name = get_set_name(id, ethertype)
+        new_members = set(str(netaddr.IPNetwork(ip).cidr)
+                          for ip in member_ips)
+        lines = []
+        old_members = self.ipset_sets.get(set_name)
+        if old_members is None:
+            # The set might be left over from a previous run of the agent
+            lines.append('create %s hash:net family %s -exist' %
+                         (set_name, IPSET_FAMILY[ethertype]))
+            lines.append('flush %s' % set_name)
+            old_members = set()
+        lines += ['add %s %s -exist' % (set_name, ip)
+                  for ip in sorted(new_members - old_members)]
+        lines += ['del %s %s -exist' % (set_name, ip)
+                  for ip in sorted(old_members - new_members)]
+        if lines:
+            LOG.debug(_("Updating ipset %(set)s with %(count)d commands"),
+                      {'set': set_name, 'count': len(lines)})
+            self.execute(['ipset', 'restore', '-exist'],
+                         process_input='\n'.join(lines) + '\n',
+                         root_helper=self.root_helper)
+        self.ipset_sets[set_name] = new_members
+
+    def destroy(self, set_name):
+        """Destroy a set, which must not be referenced by iptables rules."""
+        self.execute(['ipset', 'destroy', set_name],
+                     root_helper=self.root_helper)
+        del self.ipset_sets[set_name]
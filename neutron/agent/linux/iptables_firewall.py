@@ -19,7 +19,9 @@ import netaddr
 from oslo.config import cfg
 
 from neutron.agent import firewall
+from neutron.agent.linux import ipset_manager
 from neutron.agent.linux import iptables_manager
+from neutron.agent import securitygroups_rpc as sg_rpc
 from neutron.common import constants
 from neutron.openstack.common import log as logging
 
@@ -28,6 +30,8 @@ LOG = logging.getLogger(__name__)
 SG_CHAIN = 'sg-chain'
 INGRESS_DIRECTION = 'ingress'
 EGRESS_DIRECTION = 'egress'
+IPSET_DIRECTION = {INGRESS_DIRECTION: 'src',
+                   EGRESS_DIRECTION: 'dst'}
 SPOOF_FILTER = 'spoof-filter'
 CHAIN_NAME_PREFIX = {INGRESS_DIRECTION: 'i',
                      EGRESS_DIRECTION: 'o',
@@ -44,6 +48,11 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
         self.iptables = iptables_manager.IptablesManager(
             root_helper=cfg.CONF.AGENT.root_helper,
             use_ipv6=True)
+        self.ipset = ipset_manager.IpsetManager(
+            root_helper=cfg.CONF.AGENT.root_helper)
+        self.expand_remote_groups = not sg_rpc.is_ipset_enabled()
+        # member ips by ethertype of each remote security group
+        self.sg_members = {}
         # list of port which has security group
         self.filtered_ports = {}
         self._add_fallback_chain_v4v6()
@@ -60,7 +69,7 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
         self.filtered_ports[port['device']] = port
         # each security group has it own chains
         self._setup_chains()
-        self.iptables.apply()
+        self._apply()
 
     def update_port_filter(self, port):
         LOG.debug(_("Updating device (%s) filter"), port['device'])
@@ -71,7 +80,7 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
         self._remove_chains()
         self.filtered_ports[port['device']] = port
         self._setup_chains()
-        self.iptables.apply()
+        self._apply()
 
     def remove_port_filter(self, port):
         LOG.debug(_("Removing device (%s) filter"), port['device'])
@@ -82,7 +91,37 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
         self._remove_chains()
         self.filtered_ports.pop(port['device'], None)
         self._setup_chains()
+        self._apply()
+
+    def update_security_group_members(self, sg_id, member_ips):
+        self.sg_members[sg_id] = member_ips
+        for ethertype in (constants.IPv4, constants.IPv6):
+            if self.ipset.set_exists(sg_id, ethertype):
+                self.ipset.set_members(sg_id, ethertype,
+                                       member_ips.get(ethertype, []))
+
+    def _apply(self):
         self.iptables.apply()
+        if not self._defer_apply:
+            self._remove_unused_ipsets()
+
+    def _remove_unused_ipsets(self):
+        """Destroy the sets no longer referenced by the applied rules."""
+        if self.expand_remote_groups:
+            return
+        used_groups = set()
+        used_sets = set()
+        for port in self.filtered_ports.values():
+            for rule in port.get('security_group_rules', []):
+                remote_group_id = rule.get('remote_group_id')
+                if remote_group_id:
+                    used_groups.add(remote_group_id)
+                    used_sets.add(ipset_manager.get_set_name(
+                        remote_group_id, rule['ethertype']))
+        for set_name in self.ipset.set_names() - used_sets:
+            self.ipset.destroy(set_name)
+        for sg_id in set(self.sg_members) - used_groups:
+            del self.sg_members[sg_id]
 
     def _setup_chains(self):
         """Setup ingress and egress chain for a port."""
@@ -297,6 +336,7 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
                                    rule.get('protocol'),
                                    rule.get('port_range_min'),
                                    rule.get('port_range_max'))
+            args += self._remote_group_arg(rule)
             args += ['-j RETURN']
             iptables_rules += [' '.join(args)]
 
@@ -335,6 +375,20 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
                     '--%ss' % direction,
                     '%s:%s' % (port_range_min, port_range_max)]
 
+    def _remote_group_arg(self, rule):
+        remote_group_id = rule.get('remote_group_id')
+        if self.expand_remote_groups or not remote_group_id:
+            return []
+        ethertype = rule['ethertype']
+        if not self.ipset.set_exists(remote_group_id, ethertype):
+            # iptables refuses rules matching a set that does not exist
+            members = self.sg_members.get(remote_group_id, {})
+            self.ipset.set_members(remote_group_id, ethertype,
+                                   members.get(ethertype, []))
+        return ['-m set --match-set',
+                ipset_manager.get_set_name(remote_group_id, ethertype),
+                IPSET_DIRECTION[rule['direction']]]
+
     def _ip_prefix_arg(self, direction, ip_prefix):
         #NOTE (nati) : source_group_id is converted to list of source_
         # ip_prefix in server side
@@ -359,6 +413,7 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
             self._pre_defer_filtered_ports = None
             self._setup_chains_apply(self.filtered_ports)
             self.iptables.defer_apply_off()
+            self._remove_unused_ipsets()
 
 
 class OVSHybridIptablesFirewallDriver(IptablesFirewallDriver):
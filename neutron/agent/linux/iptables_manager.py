@@ -23,6 +23,9 @@
 
 import inspect
 import os
+import time
+
+from oslo.config import cfg
 
 from neutron.agent.linux import utils as linux_utils
 from neutron.common import utils
@@ -31,6 +34,20 @@ from neutron.openstack.common import log as logging
 
 LOG = logging.getLogger(__name__)
 
+OPTS = [
+    cfg.BoolOpt('iptables_incremental_apply', default=False,
+                help=_("Only send the chains whose rules changed since the "
+                       "last apply to iptables-restore --noflush, instead "
+                       "of saving, rewriting and restoring the whole "
+                       "ruleset.")),
+    cfg.IntOpt('iptables_full_apply_interval', default=600,
+               help=_("When iptables_incremental_apply is enabled, the "
+                      "number of seconds after which the next apply is "
+                      "a full one, to recover from changes made outside "
+                      "of the agent. 0 disables periodic full applies.")),
+]
+cfg.CONF.register_opts(OPTS)
+
 
 # NOTE(vish): Iptables supports chain names of up to 28 characters,  and we
 #             add up to 12 characters to binary_name which is used as a prefix,
@@ -99,6 +116,47 @@ class IptablesTable(object):
         self.unwrapped_chains = set()
         self.remove_chains = set()
         self.wrap_name = binary_name[:16]
+        # Whether unwrapped chains changed since the last apply
+        self.unwrapped_dirty = False
+        # Rules of the wrapped chains in the kernel by chain, None when
+        # unknown, used by incremental applies
+        self.applied_rules = None
+
+    def _mark_dirty(self, chain, wrap):
+        if not wrap:
+            self.unwrapped_dirty = True
+
+    def get_wrapped_chain_rules(self):
+        """Return the rules of each wrapped chain, as iptables-restore does.
+
+        The rules of a chain are in the order they are applied in, without
+        duplicates.
+        """
+        chain_rules = dict((name, ([], [])) for name in self.chains)
+        for rule in self.rules:
+            if rule.wrap and rule.chain in chain_rules:
+                chain_rules[rule.chain][0 if rule.top else 1].append(
+                    str(rule))
+        result = {}
+        for name, (top_rules, bottom_rules) in chain_rules.iteritems():
+            seen = set()
+            result[name] = []
+            for rule in top_rules + bottom_rules:
+                if rule not in seen:
+                    seen.add(rule)
+                    result[name].append(rule)
+        return result
+
+    def mark_applied(self, chain_rules=None):
+        """Record that the in-memory chains were applied to the kernel.
+
+        :param chain_rules: the result of get_wrapped_chain_rules(), if
+                            already computed
+        """
+        if chain_rules is None:
+            chain_rules = self.get_wrapped_chain_rules()
+        self.applied_rules = chain_rules
+        self.unwrapped_dirty = False
 
     def add_chain(self, name, wrap=True):
         """Adds a named chain to the table.
@@ -117,6 +175,7 @@ class IptablesTable(object):
             self.chains.add(name)
         else:
             self.unwrapped_chains.add(name)
+        self._mark_dirty(name, wrap)
 
     def _select_chain_set(self, wrap):
         if wrap:
@@ -155,6 +214,7 @@ class IptablesTable(object):
             return
 
         chain_set.remove(name)
+        self._mark_dirty(name, wrap)
 
         if not wrap:
             # non-wrapped chains and rules need to be dealt with specially,
@@ -176,6 +236,9 @@ class IptablesTable(object):
             jump_snippet = '-j %s-%s' % (self.wrap_name, name)
 
         # finally, remove rules from list that have a matching jump chain
+        for r in self.rules:
+            if jump_snippet in r.rule:
+                self._mark_dirty(r.chain, r.wrap)
         self.rules = [r for r in self.rules
                       if jump_snippet not in r.rule]
 
@@ -200,6 +263,7 @@ class IptablesTable(object):
 
         self.rules.append(IptablesRule(chain, rule, wrap, top, self.wrap_name,
                                        tag))
+        self._mark_dirty(chain, wrap)
 
     def _wrap_target_chain(self, s, wrap):
         if s.startswith('$'):
@@ -223,6 +287,7 @@ class IptablesTable(object):
 
             self.rules.remove(IptablesRule(chain, rule, wrap, top,
                                            self.wrap_name))
+            self._mark_dirty(chain, wrap)
             if not wrap:
                 self.remove_rules.append(IptablesRule(chain, rule, wrap, top,
                                                       self.wrap_name))
@@ -239,6 +304,7 @@ class IptablesTable(object):
                          if rule.chain == chain and rule.wrap == wrap]
         for rule in chained_rules:
             self.rules.remove(rule)
+        self._mark_dirty(chain, wrap)
 
     def clear_rules_by_tag(self, tag):
         if not tag:
@@ -246,6 +312,7 @@ class IptablesTable(object):
         rules = [rule for rule in self.rules if rule.tag == tag]
         for rule in rules:
             self.rules.remove(rule)
+            self._mark_dirty(rule.chain, rule.wrap)
 
 
 class IptablesManager(object):
@@ -284,6 +351,8 @@ class IptablesManager(object):
         self.namespace = namespace
         self.iptables_apply_deferred = False
         self.wrap_name = binary_name[:16]
+        self.incremental_apply = cfg.CONF.iptables_incremental_apply
+        self._last_full_apply = None
 
         self.ipv4 = {'filter': IptablesTable(binary_name=self.wrap_name)}
         self.ipv6 = {'filter': IptablesTable(binary_name=self.wrap_name)}
@@ -371,6 +440,85 @@ class IptablesManager(object):
             LOG.debug(_('Semaphore / lock released "%s"'), lock_name)
 
     def _apply_synchronized(self):
+        if self.incremental_apply and self._can_apply_incrementally():
+            try:
+                self._apply_incremental()
+                return
+            except RuntimeError:
+                # Our view of the kernel state is wrong, most likely
+                # because of a change made by someone else
+                LOG.warn(_("Incremental iptables apply failed, falling back "
+                           "to a full apply"))
+        self._apply_full()
+
+    def _all_tables(self):
+        s = [('iptables', self.ipv4)]
+        if self.use_ipv6:
+            s += [('ip6tables', self.ipv6)]
+        return s
+
+    def _can_apply_incrementally(self):
+        if self._last_full_apply is None:
+            return False
+        interval = cfg.CONF.iptables_full_apply_interval
+        if interval > 0 and time.time() - self._last_full_apply > interval:
+            return False
+        # Unwrapped chains are shared with other components and cannot be
+        # rewritten on their own
+        return not any(table.unwrapped_dirty or table.applied_rules is None
+                       for cmd, tables in self._all_tables()
+                       for table in tables.values())
+
+    def _apply_incremental(self):
+        """Apply the chains whose rules changed since the last apply.
+
+        Only wrapped chains, which belong exclusively to this manager, are
+        sent to iptables-restore --noflush. The rules of each chain are
+        compared with the ones last applied, so that a chain removed and
+        added back with the same rules, as the firewall does on each port
+        update, is left alone. Declaring an existing chain flushes it, so
+        each changed chain is fully rewritten; the packet and byte
+        counters of its rules are reset.
+        """
+        applied = []
+        for cmd, tables in self._all_tables():
+            lines = []
+            for table_name, table in tables.iteritems():
+                chain_rules = table.get_wrapped_chain_rules()
+                lines += self._incremental_table_lines(table_name, table,
+                                                       chain_rules)
+                applied.append((table, chain_rules))
+            if not lines:
+                continue
+            args = ['%s-restore' % (cmd,), '--noflush']
+            if self.namespace:
+                args = ['ip', 'netns', 'exec', self.namespace] + args
+            self.execute(args, process_input='\n'.join(lines) + '\n',
+                         root_helper=self.root_helper)
+        for table, chain_rules in applied:
+            table.remove_chains.clear()
+            table.mark_applied(chain_rules)
+        LOG.debug(_("IPTablesManager.apply completed incrementally with "
+                    "success"))
+
+    def _incremental_table_lines(self, table_name, table, chain_rules):
+        applied_rules = table.applied_rules
+        dirty = sorted(name for name, rules in chain_rules.iteritems()
+                       if applied_rules.get(name) != rules)
+        removed = sorted(set(applied_rules) - set(chain_rules))
+        if not dirty and not removed:
+            return []
+
+        lines = ['*%s' % table_name]
+        lines += [':%s-%s - [0:0]' % (self.wrap_name, name)
+                  for name in dirty + removed]
+        for name in dirty:
+            lines += chain_rules[name]
+        lines += ['-X %s-%s' % (self.wrap_name, name) for name in removed]
+        lines.append('COMMIT')
+        return lines
+
+    def _apply_full(self):
         """Apply the current in-memory set of iptables rules.
 
         This will blow away any rules left over from previous runs of the
@@ -378,11 +526,7 @@ class IptablesManager(object):
         rules. This happens atomically, thanks to iptables-restore.
 
         """
-        s = [('iptables', self.ipv4)]
-        if self.use_ipv6:
-            s += [('ip6tables', self.ipv6)]
-
-        for cmd, tables in s:
+        for cmd, tables in self._all_tables():
             args = ['%s-save' % (cmd,), '-c']
             if self.namespace:
                 args = ['ip', 'netns', 'exec', self.namespace] + args
@@ -398,6 +542,9 @@ class IptablesManager(object):
                 args = ['ip', 'netns', 'exec', self.namespace] + args
             self.execute(args, process_input='\n'.join(all_lines),
                          root_helper=self.root_helper)
+            for table in tables.values():
+                table.mark_applied()
+        self._last_full_apply = time.time()
         LOG.debug(_("IPTablesManager.apply completed with success"))
 
     def _find_table(self, lines, table_name):
@@ -14,11 +14,13 @@
 #    under the License.
 
 import distutils.version as dist_version
+import os
 import re
 
 from oslo.config import cfg
 
 from neutron.agent.linux import ip_lib
+from neutron.agent.linux import ovsdb_idl
 from neutron.agent.linux import utils
 from neutron.openstack.common import excutils
 from neutron.openstack.common import jsonutils
@@ -33,11 +35,44 @@ OPTS = [
     cfg.IntOpt('ovs_vsctl_timeout',
                default=DEFAULT_OVS_VSCTL_TIMEOUT,
                help=_('Timeout in seconds for ovs-vsctl commands')),
+    cfg.StrOpt('ovsdb_interface',
+               default='vsctl',
+               help=_("The interface to the OVS database: 'vsctl' runs "
+                      "ovs-vsctl commands, 'native' keeps a connection to "
+                      "ovsdb-server and answers the lookups from a local "
+                      "replica of the bridge tables")),
+    cfg.StrOpt('ovsdb_connection',
+               default='unix:/var/run/openvswitch/db.sock',
+               help=_("The connection to ovsdb-server used by the native "
+                      "interface, unix:<path> or tcp:<host>:<port>. The "
+                      "vsctl interface is used instead while the agent "
+                      "can't access a unix socket")),
 ]
 cfg.CONF.register_opts(OPTS)
 
 LOG = logging.getLogger(__name__)
 
+# unix socket connections found inaccessible, to only warn about them once
+_inaccessible_sockets = set()
+
+
+def _get_ovsdb():
+    if cfg.CONF.ovsdb_interface != 'native':
+        return
+    connection = cfg.CONF.ovsdb_connection
+    if connection.startswith('unix:'):
+        # The native client doesn't go through the root helper, and the
+        # socket of ovsdb-server is usually only accessible to root
+        path = connection[len('unix:'):]
+        if not os.access(path, os.R_OK | os.W_OK):
+            if path not in _inaccessible_sockets:
+                _inaccessible_sockets.add(path)
+                LOG.warn(_("Unable to access the ovsdb-server socket %s, "
+                           "using ovs-vsctl instead"), path)
+            return
+        _inaccessible_sockets.discard(path)
+    return ovsdb_idl.get_connection(connection, cfg.CONF.ovs_vsctl_timeout)
+
 
 class VifPort:
     def __init__(self, port_name, ofport, vif_id, vif_mac, switch):
@@ -54,11 +89,66 @@ class VifPort:
                 self.switch.br_name)
 
 
+class _DeferredFlow(object):
+    """A flow change queued while the flows of a bridge are deferred."""
+
+    def __init__(self, action, flow_str):
+        self.action = action
+        self.flow_str = flow_str
+        match, sep, _actions = flow_str.partition('actions=')
+        self.has_actions = bool(sep)
+        self.priority = None
+        self.table = None
+        fields = set()
+        for field in match.split(','):
+            name = field.split('=', 1)[0]
+            if name == 'priority':
+                self.priority = field
+            elif name == 'table':
+                self.table = field
+                fields.add(field)
+            elif field and name not in ('hard_timeout', 'idle_timeout'):
+                fields.add(field)
+        self.fields = frozenset(fields)
+        if self.table is None and action == 'add':
+            # mods and deletes without a table apply to all of them
+            self.table = 'table=0'
+
+    def removes_all(self):
+        return self.action == 'del' and not self.fields
+
+    def superseded_by(self, op):
+        """Return True if applying op after this change makes it useless."""
+        if op.action == 'del':
+            return (self.action != 'del' and not op.has_actions and
+                    op.fields <= self.fields)
+        return (self.action == op.action and
+                self.priority == op.priority and self.fields == op.fields)
+
+    def conflicts(self, op):
+        """Return True if this change and op may touch the same flows."""
+        return self.table is None or op.table is None or self.table == op.table
+
+
 class BaseOVS(object):
 
     def __init__(self, root_helper):
         self.root_helper = root_helper
         self.vsctl_timeout = cfg.CONF.ovs_vsctl_timeout
+        self.ovsdb = _get_ovsdb()
+
+    def run_ovsdb(self, func, check_error=False):
+        """Call func, handling ovsdb errors the way run_vsctl does."""
+        try:
+            return func()
+        except ovsdb_idl.OvsdbError as e:
+            with excutils.save_and_reraise_exception() as ctxt:
+                LOG.error(_("Unable to run %(func)s on ovsdb-server. "
+                            "Exception: %(exception)s"),
+                          {'func': getattr(func, '__name__', func),
+                           'exception': e})
+                if not check_error:
+                    ctxt.reraise = False
 
     def run_vsctl(self, args, check_error=False):
         full_args = ["ovs-vsctl", "--timeout=%d" % self.vsctl_timeout] + args
@@ -79,6 +169,9 @@ class BaseOVS(object):
         self.run_vsctl(["--", "--if-exists", "del-br", bridge_name])
 
     def bridge_exists(self, bridge_name):
+        if self.ovsdb:
+            return bridge_name in self.run_ovsdb(self.ovsdb.get_bridges,
+                                                 check_error=True)
         try:
             self.run_vsctl(['br-exists', bridge_name], check_error=True)
         except RuntimeError as e:
@@ -89,6 +182,10 @@ class BaseOVS(object):
         return True
 
     def get_bridge_name_for_port_name(self, port_name):
+        if self.ovsdb:
+            return self.run_ovsdb(
+                lambda: self.ovsdb.port_to_bridge(port_name),
+                check_error=True)
         try:
             return self.run_vsctl(['port-to-br', port_name], check_error=True)
         except RuntimeError as e:
@@ -105,7 +202,8 @@ class OVSBridge(BaseOVS):
         super(OVSBridge, self).__init__(root_helper)
         self.br_name = br_name
         self.defer_apply_flows = False
-        self.deferred_flows = {'add': '', 'mod': '', 'del': ''}
+        self.deferred_flows = []
+        self._defer_depth = 0
 
     def set_controller(self, controller_names):
         vsctl_command = ['--', 'set-controller', self.br_name]
@@ -138,20 +236,47 @@ class OVSBridge(BaseOVS):
         self.destroy()
         self.create()
 
+    def _add_native_port(self, port_name, **iface_columns):
+        txn = self.ovsdb.transaction()
+        txn.add_port(self.br_name, port_name, **iface_columns)
+        self.run_ovsdb(txn.commit)
+        # ovs-vsctl waits for ovs-vswitchd to assign the ofport
+        ofport = self.run_ovsdb(
+            lambda: self.ovsdb.wait_for_ofport(port_name))
+        if ofport is not None:
+            return ovsdb_idl.format_value(ofport)
+
     def add_port(self, port_name):
+        if self.ovsdb:
+            return self._add_native_port(port_name)
         self.run_vsctl(["--", "--may-exist", "add-port", self.br_name,
                         port_name])
         return self.get_port_ofport(port_name)
 
     def delete_port(self, port_name):
+        if self.ovsdb:
+            txn = self.ovsdb.transaction()
+            txn.del_port(self.br_name, port_name)
+            self.run_ovsdb(txn.commit)
+            return
         self.run_vsctl(["--", "--if-exists", "del-port", self.br_name,
                         port_name])
 
     def set_db_attribute(self, table_name, record, column, value):
+        if self.ovsdb and self.ovsdb.is_monitored(table_name, column):
+            txn = self.ovsdb.transaction()
+            txn.set_column(table_name, record, column, value)
+            self.run_ovsdb(txn.commit)
+            return
         args = ["set", table_name, record, "%s=%s" % (column, value)]
         self.run_vsctl(args)
 
     def clear_db_attribute(self, table_name, record, column):
+        if self.ovsdb and self.ovsdb.is_monitored(table_name, column):
+            txn = self.ovsdb.transaction()
+            txn.clear_column(table_name, record, column)
+            self.run_ovsdb(txn.commit)
+            return
         args = ["clear", table_name, record, column]
         self.run_vsctl(args)
 
@@ -169,7 +294,10 @@ class OVSBridge(BaseOVS):
         return len(flow_list) - 1
 
     def remove_all_flows(self):
-        self.run_ofctl("del-flows", [])
+        if self.defer_apply_flows:
+            self._defer_flow('del', '')
+        else:
+            self.run_ofctl("del-flows", [])
 
     def get_port_ofport(self, port_name):
         return self.db_get_val("Interface", port_name, "ofport")
@@ -226,14 +354,14 @@ class OVSBridge(BaseOVS):
     def add_flow(self, **kwargs):
         flow_str = self.add_or_mod_flow_str(**kwargs)
         if self.defer_apply_flows:
-            self.deferred_flows['add'] += flow_str + '\n'
+            self._defer_flow('add', flow_str)
         else:
             self.run_ofctl("add-flow", [flow_str])
 
     def mod_flow(self, **kwargs):
         flow_str = self.add_or_mod_flow_str(**kwargs)
         if self.defer_apply_flows:
-            self.deferred_flows['mod'] += flow_str + '\n'
+            self._defer_flow('mod', flow_str)
         else:
             self.run_ofctl("mod-flows", [flow_str])
 
@@ -244,30 +372,99 @@ class OVSBridge(BaseOVS):
             flow_expr_arr.append("actions=%s" % (kwargs["actions"]))
         flow_str = ",".join(flow_expr_arr)
         if self.defer_apply_flows:
-            self.deferred_flows['del'] += flow_str + '\n'
+            self._defer_flow('del', flow_str)
         else:
             self.run_ofctl("del-flows", [flow_str])
 
+    def _defer_flow(self, action, flow_str):
+        """Queue a flow change, dropping the pending ones it makes useless.
+
+        An add replaces a pending add of the same flow and a mod a pending
+        mod of the same priority and match. A delete drops the pending adds
+        and mods of flows it would remove, and a delete of all the flows
+        every pending change. The delete itself is always kept, as the
+        flows may already be on the bridge. The search for pending changes
+        stops at the first mod that is kept, since OpenFlow 1.0 mods add
+        the flow when nothing matches and so depend on the changes before
+        them.
+        """
+        op = _DeferredFlow(action, flow_str)
+        if op.removes_all():
+            del self.deferred_flows[:]
+        for index in xrange(len(self.deferred_flows) - 1, -1, -1):
+            pending = self.deferred_flows[index]
+            if pending.superseded_by(op):
+                del self.deferred_flows[index]
+            elif pending.action == 'mod':
+                break
+        self.deferred_flows.append(op)
+
+    def _deferred_flow_runs(self, flows):
+        """Group the deferred flows into runs of the same action.
+
+        A flow joins the last run of its action when the runs after that
+        one only change other tables, so applying the runs gives the same
+        flows as applying the changes one by one.
+        """
+        runs = []
+        for op in flows:
+            for run in reversed(runs):
+                if run[0].action == op.action and not (
+                        op.removes_all() or run[0].removes_all()):
+                    run.append(op)
+                    break
+                if any(op.conflicts(other) for other in run):
+                    runs.append([op])
+                    break
+            else:
+                runs.append([op])
+        return runs
+
     def defer_apply_on(self):
         LOG.debug(_('defer_apply_on'))
         self.defer_apply_flows = True
+        self._defer_depth += 1
 
     def defer_apply_off(self):
+        """Apply the deferred flows.
+
+        Deferral is turned off when all the callers which turned it on
+        are done, so that an RPC handler run while the agent loop defers
+        the flows applies its own changes without ending the loop's batch.
+        """
         LOG.debug(_('defer_apply_off'))
-        for action, flows in self.deferred_flows.items():
-            if flows:
-                LOG.debug(_('Applying following deferred flows '
-                            'to bridge %s'), self.br_name)
-                for line in flows.splitlines():
-                    LOG.debug(_('%(action)s: %(flow)s'),
-                              {'action': action, 'flow': line})
-                self.run_ofctl('%s-flows' % action, ['-'], flows)
-        self.defer_apply_flows = False
-        self.deferred_flows = {'add': '', 'mod': '', 'del': ''}
+        self._defer_depth = max(self._defer_depth - 1, 0)
+        if not self._defer_depth:
+            self.defer_apply_flows = False
+        self.apply_deferred_flows()
+
+    def apply_deferred_flows(self):
+        """Apply the flows deferred so far, without ending the deferral."""
+        flows, self.deferred_flows = self.deferred_flows, []
+        for run in self._deferred_flow_runs(flows):
+            action = run[0].action
+            if run[0].removes_all():
+                self.run_ofctl('del-flows', [])
+                continue
+            LOG.debug(_('Applying following deferred flows '
+                        'to bridge %s'), self.br_name)
+            for op in run:
+                LOG.debug(_('%(action)s: %(flow)s'),
+                          {'action': action, 'flow': op.flow_str})
+            self.run_ofctl('%s-flows' % action, ['-'],
+                           ''.join(op.flow_str + '\n' for op in run))
 
     def add_tunnel_port(self, port_name, remote_ip, local_ip,
                         tunnel_type=p_const.TYPE_GRE,
                         vxlan_udp_port=constants.VXLAN_UDP_PORT):
+        if self.ovsdb:
+            options = {'remote_ip': remote_ip, 'local_ip': local_ip,
+                       'in_key': 'flow', 'out_key': 'flow'}
+            if (tunnel_type == p_const.TYPE_VXLAN and
+                    vxlan_udp_port != constants.VXLAN_UDP_PORT):
+                options['dst_port'] = str(vxlan_udp_port)
+            return self._add_native_port(port_name, type=tunnel_type,
+                                         options=options)
         vsctl_command = ["--", "--may-exist", "add-port", self.br_name,
                          port_name]
         vsctl_command.extend(["--", "set", "Interface", port_name,
@@ -284,12 +481,20 @@ class OVSBridge(BaseOVS):
         return self.get_port_ofport(port_name)
 
     def add_patch_port(self, local_name, remote_name):
+        if self.ovsdb:
+            return self._add_native_port(local_name, type='patch',
+                                         options={'peer': remote_name})
         self.run_vsctl(["add-port", self.br_name, local_name,
                         "--", "set", "Interface", local_name,
                         "type=patch", "options:peer=%s" % remote_name])
         return self.get_port_ofport(local_name)
 
     def db_get_map(self, table, record, column, check_error=False):
+        if self.ovsdb and self.ovsdb.is_monitored(table, column):
+            value = self.run_ovsdb(
+                lambda: self.ovsdb.get_column(table, record, column),
+                check_error)
+            return value or {}
         output = self.run_vsctl(["get", table, record, column], check_error)
         if output:
             output_str = output.rstrip("\n\r")
@@ -297,6 +502,13 @@ class OVSBridge(BaseOVS):
         return {}
 
     def db_get_val(self, table, record, column, check_error=False):
+        if self.ovsdb and self.ovsdb.is_monitored(table, column):
+            value = self.run_ovsdb(
+                lambda: self.ovsdb.get_column(table, record, column),
+                check_error)
+            if value is not None:
+                return ovsdb_idl.format_value(value)
+            return
         output = self.run_vsctl(["get", table, record, column], check_error)
         if output:
             return output.rstrip("\n\r")
@@ -312,6 +524,10 @@ class OVSBridge(BaseOVS):
         return ret
 
     def get_port_name_list(self):
+        if self.ovsdb:
+            return self.run_ovsdb(
+                lambda: self.ovsdb.get_ports(self.br_name),
+                check_error=True)
         res = self.run_vsctl(["list-ports", self.br_name], check_error=True)
         if res:
             return res.strip().split("\n")
@@ -331,15 +547,47 @@ class OVSBridge(BaseOVS):
                             "Exception: %(exception)s"),
                           {'cmd': args, 'exception': e})
 
-    # returns a VIF object for each VIF port
-    def get_vif_ports(self):
-        edge_ports = []
-        port_names = self.get_port_name_list()
-        for name in port_names:
+    def _iter_port_details(self):
+        """Yield the name, external_ids and ofport of the bridge ports."""
+        if self.ovsdb:
+            rows = self.run_ovsdb(
+                lambda: self.ovsdb.get_interfaces(self.br_name),
+                check_error=True)
+            for row in rows:
+                yield (row['name'], row.get('external_ids', {}),
+                       ovsdb_idl.format_value(row.get('ofport', [])))
+            return
+        for name in self.get_port_name_list():
             external_ids = self.db_get_map("Interface", name, "external_ids",
                                            check_error=True)
             ofport = self.db_get_val("Interface", name, "ofport",
                                      check_error=True)
+            yield name, external_ids, ofport
+
+    def _list_interfaces(self):
+        """Return the name, external_ids and ofport of the interfaces.
+
+        ovs-vsctl lists the interfaces of all the bridges, the native
+        interface only those of this bridge.
+        """
+        if self.ovsdb:
+            rows = self.run_ovsdb(
+                lambda: self.ovsdb.get_interfaces(self.br_name),
+                check_error=True)
+            return [(row['name'], row.get('external_ids', {}),
+                     row.get('ofport', [])) for row in rows]
+        args = ['--format=json', '--', '--columns=name,external_ids,ofport',
+                'list', 'Interface']
+        result = self.run_vsctl(args, check_error=True)
+        if not result:
+            return []
+        return [(row[0], dict(row[1][1]), row[2])
+                for row in jsonutils.loads(result)['data']]
+
+    # returns a VIF object for each VIF port
+    def get_vif_ports(self):
+        edge_ports = []
+        for name, external_ids, ofport in self._iter_port_details():
             if "iface-id" in external_ids and "attached-mac" in external_ids:
                 p = VifPort(name, ofport, external_ids["iface-id"],
                             external_ids["attached-mac"], self)
@@ -358,20 +606,13 @@ class OVSBridge(BaseOVS):
     def get_vif_port_set(self):
         port_names = self.get_port_name_list()
         edge_ports = set()
-        args = ['--format=json', '--', '--columns=name,external_ids,ofport',
-                'list', 'Interface']
-        result = self.run_vsctl(args, check_error=True)
-        if not result:
-            return edge_ports
-        for row in jsonutils.loads(result)['data']:
-            name = row[0]
+        for row in self._list_interfaces():
+            name, external_ids, ofport = row
             if name not in port_names:
                 continue
-            external_ids = dict(row[1][1])
             # Do not consider VIFs which aren't yet ready
             # This can happen when ofport values are either [] or ["set", []]
             # We will therefore consider only integer values for ofport
-            ofport = row[2]
             try:
                 int_ofport = int(ofport)
             except (ValueError, TypeError):
@@ -394,6 +635,8 @@ class OVSBridge(BaseOVS):
         return edge_ports
 
     def get_vif_port_by_id(self, port_id):
+        if self.ovsdb:
+            return self._get_native_vif_port_by_id(port_id)
         args = ['--format=json', '--', '--columns=external_ids,name,ofport',
                 'find', 'Interface',
                 'external_ids:iface-id="%s"' % port_id]
@@ -436,12 +679,71 @@ class OVSBridge(BaseOVS):
             LOG.warn(_("Unable to parse interface details. Exception: %s"), e)
             return
 
+    def _get_native_vif_port_by_id(self, port_id):
+        row = self.run_ovsdb(
+            lambda: self.ovsdb.find_interface('iface-id', port_id))
+        if not row:
+            return
+        port_name = row['name']
+        switch = self.run_ovsdb(
+            lambda: self.ovsdb.iface_to_bridge(port_name))
+        if switch != self.br_name:
+            LOG.info(_("Port: %(port_name)s is on %(switch)s,"
+                       " not on %(br_name)s"), {'port_name': port_name,
+                                                'switch': switch,
+                                                'br_name': self.br_name})
+            return
+        ofport = row.get('ofport')
+        if not isinstance(ofport, int) or ofport == -1:
+            LOG.warn(_("ofport: %(ofport)s for VIF: %(vif)s is not a "
+                       "positive integer"), {'ofport': ofport,
+                                             'vif': port_id})
+            return
+        vif_mac = row['external_ids'].get('attached-mac')
+        if not vif_mac:
+            LOG.warn(_("No attached-mac for VIF: %s"), port_id)
+            return
+        return VifPort(port_name, ofport, port_id, vif_mac, self)
+
+    def get_vif_ports_by_ids(self, port_ids):
+        """Return a dict mapping iface-ids to VifPorts on this bridge.
+
+        Unlike get_vif_port_by_id, the number of ovs-vsctl invocations does
+        not depend on the number of requested ports.
+        """
+        vif_ports = {}
+        port_ids = set(port_ids)
+        if not port_ids:
+            return vif_ports
+        port_names = set(self.get_port_name_list())
+        for name, external_ids, ofport in self._list_interfaces():
+            vif_id = external_ids.get('iface-id')
+            if name not in port_names or vif_id not in port_ids:
+                continue
+            # ofport must be integer otherwise the port is not usable
+            if not isinstance(ofport, int) or ofport == -1:
+                LOG.warn(_("ofport: %(ofport)s for VIF: %(vif)s is not a "
+                           "positive integer"), {'ofport': ofport,
+                                                 'vif': vif_id})
+                continue
+            vif_ports[vif_id] = VifPort(name, ofport, vif_id,
+                                        external_ids.get('attached-mac'),
+                                        self)
+        return vif_ports
+
     def delete_ports(self, all_ports=False):
         if all_ports:
             port_names = self.get_port_name_list()
         else:
             port_names = (port.port_name for port in self.get_vif_ports())
 
+        if self.ovsdb:
+            # a single transaction removes all the ports
+            txn = self.ovsdb.transaction()
+            for port_name in port_names:
+                txn.del_port(self.br_name, port_name)
+            self.run_ovsdb(txn.commit)
+            return
         for port_name in port_names:
             self.delete_port(port_name)
 
@@ -456,6 +758,13 @@ class OVSBridge(BaseOVS):
 
 
 def get_bridge_for_iface(root_helper, iface):
+    ovsdb = _get_ovsdb()
+    if ovsdb:
+        try:
+            return ovsdb.iface_to_bridge(iface)
+        except ovsdb_idl.OvsdbError:
+            LOG.exception(_("Interface %s not found."), iface)
+            return None
     args = ["ovs-vsctl", "--timeout=%d" % cfg.CONF.ovs_vsctl_timeout,
             "iface-to-br", iface]
     try:
@@ -466,6 +775,14 @@ def get_bridge_for_iface(root_helper, iface):
 
 
 def get_bridges(root_helper):
+    ovsdb = _get_ovsdb()
+    if ovsdb:
+        try:
+            return ovsdb.get_bridges()
+        except ovsdb_idl.OvsdbError as e:
+            with excutils.save_and_reraise_exception():
+                LOG.exception(_("Unable to retrieve bridges. Exception: %s"),
+                              e)
     args = ["ovs-vsctl", "--timeout=%d" % cfg.CONF.ovs_vsctl_timeout,
             "list-br"]
     try:
@@ -0,0 +1,564 @@
+# Copyright 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Native client of ovsdb-server keeping a replica of the bridge tables.
+
+Each ovs-vsctl invocation connects to ovsdb-server, fetches the tables it
+needs and exits. The Connection below instead stays connected for the life
+of the process, monitors the Bridge, Port and Interface tables (RFC 7047)
+and applies the updates pushed by the server to a local replica, so that
+lookups are answered from memory and writes are sent as a single transact
+request.
+"""
+
+import contextlib
+import copy
+import itertools
+import re
+import select
+import socket
+import threading
+import time
+
+from neutron.openstack.common import jsonutils
+from neutron.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+OVS_DB = 'Open_vSwitch'
+
+# Columns of the tables kept in the replica
+MONITORED_COLUMNS = {
+    'Bridge': ['name', 'ports'],
+    'Port': ['name', 'interfaces', 'tag'],
+    'Interface': ['name', 'type', 'ofport', 'external_ids', 'options'],
+}
+
+# Monitored columns holding integers, whose values are given as strings to
+# set_column by the ovs-vsctl style callers
+INTEGER_COLUMNS = {
+    'Port': ['tag'],
+}
+
+# Strings printed by ovs-vsctl without quotes
+_BARE_STRING = re.compile(r'^[a-zA-Z_][a-zA-Z0-9_.-]*$')
+
+
+class OvsdbError(RuntimeError):
+    pass
+
+
+def _from_datum(datum):
+    """Convert an OVSDB datum: sets to lists, maps to dicts."""
+    if isinstance(datum, list):
+        kind, value = datum
+        if kind == 'set':
+            return [_from_datum(atom) for atom in value]
+        if kind == 'map':
+            return dict((_from_datum(key), _from_datum(atom))
+                        for key, atom in value)
+        # a uuid reference
+        return value
+    return datum
+
+
+def _to_datum(value):
+    if isinstance(value, dict):
+        return ['map', [[key, value[key]] for key in sorted(value)]]
+    if isinstance(value, (list, tuple, set)):
+        return ['set', list(value)]
+    return value
+
+
+def _as_list(value):
+    """Return the atoms of a set, sent as a bare atom when of size one."""
+    if isinstance(value, list):
+        return value
+    return [value]
+
+
+def _format_atom(atom):
+    if isinstance(atom, bool):
+        return atom and 'true' or 'false'
+    if isinstance(atom, basestring):
+        if _BARE_STRING.match(atom) and atom not in ('true', 'false'):
+            return atom
+        return jsonutils.dumps(atom)
+    return str(atom)
+
+
+def format_value(value):
+    """Format a column value the way 'ovs-vsctl get' prints it."""
+    if isinstance(value, dict):
+        return '{%s}' % ', '.join('%s=%s' % (_format_atom(key),
+                                             _format_atom(value[key]))
+                                  for key in sorted(value))
+    if isinstance(value, list):
+        return '[%s]' % ', '.join(_format_atom(atom)
+                                  for atom in sorted(value))
+    return _format_atom(value)
+
+
+class _MessageSplitter(object):
+    """Split the stream of JSON texts sent by ovsdb-server into messages.
+
+    The messages are not delimited, so the nesting of the JSON text is
+    tracked across the chunks received until an object is complete.
+    """
+
+    _TOKENS = re.compile(r'[\\"{}\[\]]')
+
+    def __init__(self):
+        self._parts = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, data):
+        messages = []
+        start = 0
+        # the position of the character escaped by a backslash
+        escaped_pos = -1
+        if self._escaped:
+            escaped_pos = 0
+        for match in self._TOKENS.finditer(data):
+            pos = match.start()
+            char = match.group()
+            if self._in_string:
+                if pos == escaped_pos:
+                    continue
+                if char == '\\':
+                    escaped_pos = pos + 1
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if not self._depth:
+                    self._parts.append(data[start:pos + 1])
+                    messages.append(jsonutils.loads(''.join(self._parts)))
+                    self._parts = []
+                    start = pos + 1
+        self._escaped = escaped_pos == len(data)
+        if start < len(data):
+            self._parts.append(data[start:])
+        return messages
+
+
+class Transaction(object):
+    """Changes to the database sent to ovsdb-server in one request.
+
+    The changes are recorded as commands, like the ones of ovs-vsctl, and
+    only turned into OVSDB operations by commit(), against the replica as
+    it is at that time.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.commands = []
+
+    def add_port(self, bridge, port, **iface_columns):
+        """Add a port to a bridge, unless it is already there.
+
+        The columns given are set on the interface of the port, whether
+        the port is created or not.
+        """
+        self.commands.append(('_add_port_ops', (bridge, port, iface_columns)))
+
+    def del_port(self, bridge, port):
+        """Remove a port from a bridge, if it exists."""
+        self.commands.append(('_del_port_ops', (bridge, port)))
+
+    def set_column(self, table, record, column, value):
+        self.commands.append(('_set_column_ops',
+                              (table, record, column, value)))
+
+    def clear_column(self, table, record, column):
+        self.commands.append(('_set_column_ops',
+                              (table, record, column, None)))
+
+    def commit(self):
+        if self.commands:
+            self.connection.transact(self)
+            self.commands = []
+
+
+class Connection(object):
+    """A connection to ovsdb-server and the replica of MONITORED_COLUMNS.
+
+    The messages pushed by the server are only read when the replica is
+    used, so that no thread needs to be spawned for the connection. The
+    connection is established on first use, and again on the next use
+    after it failed.
+    """
+
+    def __init__(self, connection, timeout):
+        self.connection = connection
+        self.timeout = timeout
+        self.tables = {}
+        self._names = {}
+        self._inserted = {}
+        self._sock = None
+        self._splitter = None
+        self._replies = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+
+    def _open_socket(self):
+        kind, _sep, address = self.connection.partition(':')
+        if kind == 'unix':
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(address)
+        elif kind == 'tcp':
+            host, _sep, port = address.rpartition(':')
+            sock = socket.create_connection((host, int(port)), self.timeout)
+        else:
+            raise OvsdbError(_("Unsupported ovsdb connection %s") %
+                             self.connection)
+        sock.settimeout(None)
+        return sock
+
+    def _connect(self):
+        try:
+            self._sock = self._open_socket()
+        except socket.error as e:
+            raise OvsdbError(_("Unable to connect to ovsdb-server at "
+                               "%(connection)s: %(error)s") %
+                             {'connection': self.connection, 'error': e})
+        self._splitter = _MessageSplitter()
+        self._replies = {}
+        self.tables = dict((table, {}) for table in MONITORED_COLUMNS)
+        self._names = dict((table, {}) for table in MONITORED_COLUMNS)
+        requests = dict((table, {'columns': columns})
+                        for table, columns in MONITORED_COLUMNS.iteritems())
+        self._apply_updates(self._call('monitor', [OVS_DB, None, requests]))
+        LOG.debug(_("Connected to ovsdb-server at %(connection)s, "
+                    "%(ports)d ports replicated"),
+                  {'connection': self.connection,
+                   'ports': len(self.tables['Port'])})
+
+    def _close(self):
+        if self._sock:
+            try:
+                self._sock.close()
+            except socket.error:
+                pass
+        self._sock = None
+
+    def _send(self, message):
+        try:
+            self._sock.sendall(jsonutils.dumps(message))
+        except socket.error as e:
+            self._close()
+            raise OvsdbError(_("Unable to send to ovsdb-server: %s") % e)
+
+    def _receive(self, timeout):
+        """Process the messages received within timeout seconds.
+
+        Return False if nothing was received.
+        """
+        try:
+            if not select.select([self._sock], [], [], timeout)[0]:
+                return False
+            data = self._sock.recv(65536)
+        except (socket.error, select.error) as e:
+            self._close()
+            raise OvsdbError(_("Unable to receive from ovsdb-server: %s") %
+                             e)
+        if not data:
+            self._close()
+            raise OvsdbError(_("Connection to ovsdb-server closed"))
+        for message in self._splitter.feed(data):
+            self._handle(message)
+        return True
+
+    def _handle(self, message):
+        method = message.get('method')
+        if method == 'update':
+            self._apply_updates(message['params'][1])
+        elif method == 'echo':
+            self._send({'id': message['id'], 'result': message['params'],
+                        'error': None})
+        elif method is None:
+            self._replies[message['id']] = message
+        else:
+            LOG.debug(_("Ignoring %s request from ovsdb-server"), method)
+
+    def _call(self, method, params):
+        request_id = next(self._ids)
+        self._send({'method': method, 'params': params, 'id': request_id})
+        deadline = time.time() + self.timeout
+        while request_id not in self._replies:
+            remaining = deadline - time.time()
+            if remaining <= 0 or not self._receive(remaining):
+                self._close()
+                raise OvsdbError(_("Timeout waiting for the reply of "
+                                   "ovsdb-server to %s") % method)
+        reply = self._replies.pop(request_id)
+        if reply.get('error'):
+            raise OvsdbError(_("ovsdb-server failed %(method)s: "
+                               "%(error)s") %
+                             {'method': method, 'error': reply['error']})
+        return reply['result']
+
+    def _apply_updates(self, updates):
+        for table, rows in updates.iteritems():
+            replica = self.tables.setdefault(table, {})
+            names = self._names.setdefault(table, {})
+            for uuid, row_update in rows.iteritems():
+                old = replica.pop(uuid, None)
+                if old and names.get(old.get('name')) == uuid:
+                    del names[old['name']]
+                new = row_update.get('new')
+                if new is None:
+                    continue
+                row = dict(old or {})
+                row.update((column, _from_datum(datum))
+                           for column, datum in new.iteritems())
+                replica[uuid] = row
+                names[row.get('name')] = uuid
+
+    def _sync(self):
+        """Connect if needed and apply the updates received so far."""
+        if self._sock is not None:
+            try:
+                while self._receive(0):
+                    pass
+                return
+            except OvsdbError as e:
+                LOG.warn(_("Reconnecting to ovsdb-server: %s"), e)
+        self._connect()
+
+    def _uuid(self, table, name):
+        return self._names[table].get(name)
+
+    def _row(self, table, name):
+        uuid = self._uuid(table, name)
+        if uuid:
+            return self.tables[table][uuid]
+
+    def _bridge_of_port(self, port_uuid):
+        for bridge in self.tables['Bridge'].itervalues():
+            if port_uuid in _as_list(bridge.get('ports', [])):
+                return bridge
+
+    def _port_of_interface(self, iface_uuid):
+        for port in self.tables['Port'].itervalues():
+            if iface_uuid in _as_list(port.get('interfaces', [])):
+                return port
+
+    def is_monitored(self, table, column):
+        return column in MONITORED_COLUMNS.get(table, ())
+
+    def get_bridges(self):
+        with self._lock:
+            self._sync()
+            return sorted(self._names['Bridge'])
+
+    def get_column(self, table, record, column):
+        """Return the value of a column, None if the record is missing."""
+        with self._lock:
+            self._sync()
+            row = self._row(table, record)
+            if row is not None:
+                return copy.copy(row.get(column, []))
+
+    def get_ports(self, bridge):
+        """Return the names of the ports of a bridge, like list-ports."""
+        with self._lock:
+            self._sync()
+            row = self._row('Bridge', bridge)
+            if row is None:
+                raise OvsdbError(_("No bridge named %s") % bridge)
+            ports = self.tables['Port']
+            return sorted(ports[uuid]['name']
+                          for uuid in _as_list(row.get('ports', []))
+                          if uuid in ports and ports[uuid]['name'] != bridge)
+
+    def get_interfaces(self, bridge):
+        """Return the interfaces of the ports listed by get_ports."""
+        with self._lock:
+            names = self.get_ports(bridge)
+            interfaces = self.tables['Interface']
+            result = []
+            for name in names:
+                port = self._row('Port', name)
+                for uuid in _as_list(port.get('interfaces', [])):
+                    if uuid in interfaces:
+                        result.append(interfaces[uuid])
+            return result
+
+    def find_interface(self, key, value):
+        """Return the interface with value as the key of its external_ids."""
+        with self._lock:
+            self._sync()
+            for row in self.tables['Interface'].itervalues():
+                if row.get('external_ids', {}).get(key) == value:
+                    return row
+
+    def port_to_bridge(self, port):
+        with self._lock:
+            self._sync()
+            uuid = self._uuid('Port', port)
+            bridge = uuid and self._bridge_of_port(uuid)
+            if bridge:
+                return bridge['name']
+
+    def iface_to_bridge(self, iface):
+        with self._lock:
+            self._sync()
+            uuid = self._uuid('Interface', iface)
+            port = uuid and self._port_of_interface(uuid)
+            if port:
+                return self.port_to_bridge(port['name'])
+
+    def wait_for_ofport(self, iface):
+        """Return the ofport of an interface once assigned by vswitchd.
+
+        The empty set is returned after the timeout, as ovs-vsctl would.
+        """
+        with self._lock:
+            self._sync()
+            deadline = time.time() + self.timeout
+            while True:
+                row = self._row('Interface', iface)
+                ofport = row and row.get('ofport')
+                if isinstance(ofport, int):
+                    return ofport
+                remaining = deadline - time.time()
+                if remaining <= 0 or not self._receive(remaining):
+                    return []
+
+    def transaction(self):
+        return Transaction(self)
+
+    @contextlib.contextmanager
+    def _transaction_ops(self):
+        ops = []
+        # rows inserted by the transaction, referred to by their uuid-name
+        self._inserted = {}
+        yield ops
+        if not ops:
+            return
+        results = self._call('transact', [OVS_DB] + ops)
+        # a failed operation is followed by the error of the transaction
+        errors = [result['error'] for result in results
+                  if result and result.get('error')]
+        if errors:
+            raise OvsdbError(_("ovsdb-server failed the transaction: %s") %
+                             ', '.join(errors))
+
+    def transact(self, txn):
+        """Send the commands of a transaction as a single request.
+
+        ovsdb-server sends the updates of a committed transaction before
+        replying to it, so that the replica includes the changes when this
+        returns.
+        """
+        with self._lock:
+            self._sync()
+            with self._transaction_ops() as ops:
+                for builder, args in txn.commands:
+                    getattr(self, builder)(ops, *args)
+
+    def _where(self, uuid):
+        return [['_uuid', '==', ['uuid', uuid]]]
+
+    def _where_record(self, table, record):
+        uuid_name = self._inserted.get((table, record))
+        if uuid_name:
+            return [['_uuid', '==', ['named-uuid', uuid_name]]]
+        return self._where(self._uuid(table, record))
+
+    def _add_port_ops(self, ops, bridge, port, iface_columns):
+        bridge_uuid = self._uuid('Bridge', bridge)
+        if bridge_uuid is None:
+            raise OvsdbError(_("No bridge named %s") % bridge)
+        port_uuid = self._uuid('Port', port)
+        if port_uuid is not None:
+            current = self._bridge_of_port(port_uuid)
+            if not current or current['name'] != bridge:
+                raise OvsdbError(
+                    _("Port %(port)s already exists on %(bridge)s") %
+                    {'port': port, 'bridge': current and current['name']})
+            for column, value in iface_columns.iteritems():
+                self._set_column_ops(ops, 'Interface', port, column, value)
+            return
+        iface_row = dict((column, _to_datum(value))
+                         for column, value in iface_columns.iteritems())
+        iface_row['name'] = port
+        iface_name = 'iface%d' % len(ops)
+        port_name = 'port%d' % len(ops)
+        self._inserted[('Interface', port)] = iface_name
+        self._inserted[('Port', port)] = port_name
+        ops.append({'op': 'insert', 'table': 'Interface', 'row': iface_row,
+                    'uuid-name': iface_name})
+        ops.append({'op': 'insert', 'table': 'Port',
+                    'row': {'name': port,
+                            'interfaces': ['named-uuid', iface_name]},
+                    'uuid-name': port_name})
+        ops.append({'op': 'mutate', 'table': 'Bridge',
+                    'where': self._where(bridge_uuid),
+                    'mutations': [['ports', 'insert',
+                                   ['set', [['named-uuid', port_name]]]]]})
+
+    def _del_port_ops(self, ops, bridge, port):
+        port_uuid = self._uuid('Port', port)
+        if port_uuid is None:
+            return
+        current = self._bridge_of_port(port_uuid)
+        if not current or current['name'] != bridge:
+            raise OvsdbError(_("Port %(port)s is not on %(bridge)s") %
+                             {'port': port, 'bridge': bridge})
+        # the port and its interfaces are garbage collected by ovsdb-server
+        # once no bridge refers to them
+        ops.append({'op': 'mutate', 'table': 'Bridge',
+                    'where': self._where(self._uuid('Bridge', bridge)),
+                    'mutations': [['ports', 'delete',
+                                   ['set', [['uuid', port_uuid]]]]]})
+
+    def _set_column_ops(self, ops, table, record, column, value):
+        row = self._row(table, record)
+        if row is None and (table, record) in self._inserted:
+            row = {}
+        if row is None:
+            raise OvsdbError(_("No row %(record)s in table %(table)s") %
+                             {'record': record, 'table': table})
+        if value is None:
+            # clear the column, keeping its kind of empty value
+            value = isinstance(row.get(column), dict) and {} or []
+        elif (column in INTEGER_COLUMNS.get(table, ()) and
+              isinstance(value, basestring)):
+            value = int(value)
+        elif isinstance(value, dict) and isinstance(row.get(column), dict):
+            # keys are set like 'column:key=value' does with ovs-vsctl
+            value = dict(row[column], **value)
+        ops.append({'op': 'update', 'table': table,
+                    'where': self._where_record(table, record),
+                    'row': {column: _to_datum(value)}})
+
+
+_connections = {}
+
+
+def get_connection(connection, timeout):
+    """Return the connection to ovsdb-server shared in the process."""
+    if connection not in _connections:
+        _connections[connection] = Connection(connection, timeout)
+    return _connections[connection]
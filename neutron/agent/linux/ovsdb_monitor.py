@@ -17,6 +17,7 @@
 import eventlet
 
 from neutron.agent.linux import async_process
+from neutron.openstack.common import jsonutils
 from neutron.openstack.common import log as logging
 
 
@@ -66,18 +67,23 @@ class SimpleInterfaceMonitor(OvsdbMonitor):
 
     The has_updates() method indicates whether changes to the ovsdb
     Interface table have been detected since the monitor started or
-    since the previous access.
+    since the previous access. The get_events() method returns the VIFs
+    added and removed since its previous call, parsed from the row deltas
+    output by the monitor.
     """
 
-    def __init__(self, root_helper=None, respawn_interval=None):
+    def __init__(self, root_helper=None, respawn_interval=None,
+                 on_update=None):
         super(SimpleInterfaceMonitor, self).__init__(
             'Interface',
-            columns=['name', 'ofport'],
+            columns=['name', 'ofport', 'external_ids'],
             format='json',
             root_helper=root_helper,
             respawn_interval=respawn_interval,
         )
         self.data_received = False
+        self.on_update = on_update
+        self._reset_events(reliable=False)
 
     @property
     def is_active(self):
@@ -105,10 +111,73 @@ class SimpleInterfaceMonitor(OvsdbMonitor):
 
     def _kill(self, *args, **kwargs):
         self.data_received = False
+        # Changes happening until the monitor is respawned are missed
+        self._reset_events(reliable=False)
         super(SimpleInterfaceMonitor, self)._kill(*args, **kwargs)
 
     def _read_stdout(self):
         data = super(SimpleInterfaceMonitor, self)._read_stdout()
         if data and not self.data_received:
             self.data_received = True
+        if data:
+            self._process_update(data)
+            if self.on_update:
+                self.on_update()
         return data
+
+    def _reset_events(self, reliable):
+        # iface-id -> name of the VIFs added since the last get_events()
+        self._added = {}
+        # iface-ids of the VIFs removed since the last get_events()
+        self._removed = set()
+        self._events_reliable = reliable
+
+    def get_events(self):
+        """Return the VIFs added and removed since the previous call.
+
+        The result is a dict with 'added', mapping the iface-id of the new
+        VIFs to their interface name, and 'removed', the set of the
+        iface-ids of the deleted VIFs. None is returned if some changes
+        might have been missed, e.g. because the monitor was respawned.
+        """
+        events = None
+        if self._events_reliable:
+            events = {'added': self._added, 'removed': self._removed}
+        # Changes are only tracked once the initial content of the table
+        # has been received
+        self._reset_events(reliable=self.data_received)
+        return events
+
+    def _process_update(self, data):
+        try:
+            update = jsonutils.loads(data)
+            headings = update['headings']
+            rows = update['data']
+        except (ValueError, KeyError, TypeError):
+            LOG.warn(_('Unable to parse ovsdb monitor output: %s'), data)
+            self._events_reliable = False
+            return
+        for values in rows:
+            row = dict(zip(headings, values))
+            action = row.get('action')
+            # 'old' rows only hold the previous values of modified columns
+            if action == 'old':
+                continue
+            external_ids = dict(row.get('external_ids', ['map', []])[1])
+            iface_id = external_ids.get('iface-id')
+            if not iface_id:
+                if 'xs-vif-uuid' in external_ids:
+                    # The iface-id of XenServer VIFs is looked up by the
+                    # agent, the full scan is required
+                    self._events_reliable = False
+                continue
+            if action == 'delete':
+                self._added.pop(iface_id, None)
+                self._removed.add(iface_id)
+                continue
+            ofport = row.get('ofport')
+            # Interfaces are only reported once they are ready to be used
+            if (isinstance(ofport, int) and ofport > 0 and
+                    'attached-mac' in external_ids):
+                self._added[iface_id] = row['name']
+                self._removed.discard(iface_id)
@@ -17,6 +17,7 @@
 import contextlib
 
 import eventlet
+import eventlet.event
 
 from neutron.agent.linux import ovsdb_monitor
 from neutron.plugins.openvswitch.common import constants
@@ -46,10 +47,32 @@ class BasePollingManager(object):
     def __init__(self):
         self._force_polling = False
         self._polling_completed = True
+        self._wakeup = eventlet.event.Event()
 
     def force_polling(self):
         self._force_polling = True
 
+    def notify(self):
+        """Interrupt the current or next call to wait()."""
+        if not self._wakeup.ready():
+            self._wakeup.send()
+
+    def wait(self, timeout):
+        """Wait until timeout seconds elapsed or notify() is called."""
+        with eventlet.timeout.Timeout(timeout, False):
+            self._wakeup.wait()
+        self._wakeup = eventlet.event.Event()
+
+    def get_events(self):
+        """Return the interfaces added and removed since the last call.
+
+        The result is a dict with 'added', mapping the iface-id of the new
+        interfaces to their name, and 'removed', the set of the iface-ids
+        of the deleted interfaces. None is returned when the changes are
+        not known and a full scan of the ports is required.
+        """
+        return None
+
     def polling_completed(self):
         self._polling_completed = True
 
@@ -99,7 +122,8 @@ class InterfacePollingMinimizer(BasePollingManager):
         super(InterfacePollingMinimizer, self).__init__()
         self._monitor = ovsdb_monitor.SimpleInterfaceMonitor(
             root_helper=root_helper,
-            respawn_interval=ovsdb_monitor_respawn_interval)
+            respawn_interval=ovsdb_monitor_respawn_interval,
+            on_update=self.notify)
 
     def start(self):
         self._monitor.start()
@@ -112,3 +136,6 @@ class InterfacePollingMinimizer(BasePollingManager):
         # collect output.
         eventlet.sleep()
         return self._monitor.has_updates
+
+    def get_events(self):
+        return self._monitor.get_events()
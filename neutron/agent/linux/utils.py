@@ -23,9 +23,12 @@ import shlex
 import socket
 import struct
 import tempfile
+import threading
 
 from eventlet.green import subprocess
 from eventlet import greenthread
+from oslo.config import cfg
+from oslo.rootwrap import client
 
 from neutron.common import utils
 from neutron.openstack.common import excutils
@@ -34,6 +37,9 @@ from neutron.openstack.common import log as logging
 
 LOG = logging.getLogger(__name__)
 
+_rootwrap_daemon_client = None
+_rootwrap_daemon_lock = threading.Lock()
+
 
 def create_process(cmd, root_helper=None, addl_env=None):
     """Create a process object for the given command.
@@ -59,20 +65,62 @@ def create_process(cmd, root_helper=None, addl_env=None):
     return obj, cmd
 
 
+def get_rootwrap_daemon_client():
+    """Return the client of the rootwrap daemon, None if not configured.
+
+    The daemon is started by the first command sent to it, and then runs
+    the commands of all the callers.
+    """
+    global _rootwrap_daemon_client
+    try:
+        root_helper_daemon = cfg.CONF.AGENT.root_helper_daemon
+    except cfg.NoSuchOptError:
+        return
+    if not root_helper_daemon:
+        return
+    with _rootwrap_daemon_lock:
+        if _rootwrap_daemon_client is None:
+            _rootwrap_daemon_client = client.Client(
+                shlex.split(root_helper_daemon))
+    return _rootwrap_daemon_client
+
+
+def execute_rootwrap_daemon(daemon_client, cmd, process_input=None,
+                            addl_env=None):
+    """Run a command as root through the rootwrap daemon.
+
+    The daemon runs the commands with the given environment only, so it is
+    given the environment of the agent as create_process does.
+    """
+    cmd = map(str, cmd)
+    LOG.debug(_("Running command (rootwrap daemon): %s"), cmd)
+    env = dict(os.environ, **(addl_env or {}))
+    returncode, _stdout, _stderr = daemon_client.execute(
+        cmd, env=env, stdin=process_input)
+    return cmd, returncode, _stdout, _stderr
+
+
 def execute(cmd, root_helper=None, process_input=None, addl_env=None,
             check_exit_code=True, return_stderr=False):
     try:
-        obj, cmd = create_process(cmd, root_helper=root_helper,
-                                  addl_env=addl_env)
-        _stdout, _stderr = (process_input and
-                            obj.communicate(process_input) or
-                            obj.communicate())
-        obj.stdin.close()
+        daemon_client = root_helper and get_rootwrap_daemon_client()
+        if daemon_client:
+            cmd, returncode, _stdout, _stderr = execute_rootwrap_daemon(
+                daemon_client, cmd, process_input=process_input,
+                addl_env=addl_env)
+        else:
+            obj, cmd = create_process(cmd, root_helper=root_helper,
+                                      addl_env=addl_env)
+            _stdout, _stderr = (process_input and
+                                obj.communicate(process_input) or
+                                obj.communicate())
+            obj.stdin.close()
+            returncode = obj.returncode
         m = _("\nCommand: %(cmd)s\nExit code: %(code)s\nStdout: %(stdout)r\n"
-              "Stderr: %(stderr)r") % {'cmd': cmd, 'code': obj.returncode,
+              "Stderr: %(stderr)r") % {'cmd': cmd, 'code': returncode,
                                        'stdout': _stdout, 'stderr': _stderr}
         LOG.debug(m)
-        if obj.returncode and check_exit_code:
+        if returncode and check_exit_code:
             raise RuntimeError(m)
     finally:
         # NOTE(termie): this appears to be necessary to let the subprocess
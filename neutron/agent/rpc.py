@@ -21,6 +21,7 @@ from neutron.common import topics
 
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import rpc
+from neutron.openstack.common.rpc import common as rpc_common
 from neutron.openstack.common.rpc import proxy
 from neutron.openstack.common import timeutils
 
@@ -74,11 +75,19 @@ class PluginReportStateAPI(proxy.RpcProxy):
             return self.cast(context, msg, topic=self.topic)
 
 
+def is_unsupported_version(error):
+    """Whether an RPC error means the server does not support its version."""
+    if isinstance(error, rpc_common.RemoteError):
+        return error.exc_type == 'UnsupportedRpcVersion'
+    return isinstance(error, rpc_common.UnsupportedRpcVersion)
+
+
 class PluginApi(proxy.RpcProxy):
     '''Agent side of the rpc API.
 
     API version history:
         1.0 - Initial version.
+        1.2 - Added get_devices_details_list and update_devices_status.
 
     '''
 
@@ -94,6 +103,24 @@ class PluginApi(proxy.RpcProxy):
                                        agent_id=agent_id),
                          topic=self.topic)
 
+    def get_devices_details_list(self, context, devices, agent_id):
+        try:
+            return self.call(context,
+                             self.make_msg('get_devices_details_list',
+                                           devices=devices,
+                                           agent_id=agent_id),
+                             topic=self.topic, version='1.2')
+        except (rpc_common.RemoteError,
+                rpc_common.UnsupportedRpcVersion) as e:
+            if not is_unsupported_version(e):
+                raise
+            # NOTE: the server has not been upgraded yet and does not
+            # provide the bulk call; fall back to one call per device.
+            LOG.debug(_("get_devices_details_list not supported by the "
+                        "server, falling back to get_device_details"))
+            return [self.get_device_details(context, device, agent_id)
+                    for device in devices]
+
     def update_device_down(self, context, device, agent_id, host=None):
         return self.call(context,
                          self.make_msg('update_device_down', device=device,
@@ -106,6 +133,29 @@ class PluginApi(proxy.RpcProxy):
                                        agent_id=agent_id, host=host),
                          topic=self.topic)
 
+    def update_devices_status(self, context, devices_up, devices_down,
+                              agent_id, host=None):
+        try:
+            return self.call(context,
+                             self.make_msg('update_devices_status',
+                                           devices_up=devices_up,
+                                           devices_down=devices_down,
+                                           agent_id=agent_id, host=host),
+                             topic=self.topic, version='1.2')
+        except (rpc_common.RemoteError,
+                rpc_common.UnsupportedRpcVersion) as e:
+            if not is_unsupported_version(e):
+                raise
+            LOG.debug(_("update_devices_status not supported by the "
+                        "server, falling back to update_device_up/down"))
+            for device in devices_up:
+                self.update_device_up(context, device, agent_id, host)
+            return {'devices_up': list(devices_up),
+                    'devices_down': [
+                        self.update_device_down(context, device,
+                                                agent_id, host)
+                        for device in devices_down]}
+
     def tunnel_sync(self, context, tunnel_ip, tunnel_type=None):
         return self.call(context,
                          self.make_msg('tunnel_sync', tunnel_ip=tunnel_ip,
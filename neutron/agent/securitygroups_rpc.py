@@ -18,18 +18,31 @@
 
 from oslo.config import cfg
 
+from neutron.agent import rpc as agent_rpc
 from neutron.common import topics
 from neutron.openstack.common import importutils
 from neutron.openstack.common import log as logging
+from neutron.openstack.common.rpc import common as rpc_common
 
 LOG = logging.getLogger(__name__)
 SG_RPC_VERSION = "1.1"
+# Version of the server RPCs returning the members of the remote security
+# groups apart from the rules, used by the agents with enable_ipset
+SG_RPC_MEMBERS_VERSION = "1.2"
 
 security_group_opts = [
     cfg.StrOpt(
         'firewall_driver',
         default='neutron.agent.firewall.NoopFirewallDriver',
-        help=_('Driver for Security Groups Firewall'))
+        help=_('Driver for Security Groups Firewall')),
+    cfg.BoolOpt(
+        'enable_ipset',
+        default=False,
+        help=_('Match remote security group rules against ipsets holding '
+               'the members of the groups, instead of one iptables rule '
+               'per member. Only used by the iptables firewall drivers. '
+               'It is ignored with a server not supporting version 1.2 of '
+               'the security group RPCs.'))
 ]
 cfg.CONF.register_opts(security_group_opts, 'SECURITYGROUP')
 
@@ -39,6 +52,10 @@ def is_firewall_enabled():
             'neutron.agent.firewall.NoopFirewallDriver')
 
 
+def is_ipset_enabled():
+    return cfg.CONF.SECURITYGROUP.enable_ipset
+
+
 def disable_security_group_extension_if_noop_driver(
     supported_extension_aliases):
     if not is_firewall_enabled():
@@ -57,6 +74,37 @@ class SecurityGroupServerRpcApiMixin(object):
                          version=SG_RPC_VERSION,
                          topic=self.topic)
 
+    def security_group_info_for_devices(self, context, devices,
+                                        sg_member_revisions=None):
+        LOG.debug(_("Get security group information "
+                    "for devices via rpc %r"), devices)
+        return self.call(context,
+                         self.make_msg(
+                             'security_group_info_for_devices',
+                             devices=devices,
+                             sg_member_revisions=sg_member_revisions),
+                         version=SG_RPC_MEMBERS_VERSION,
+                         topic=self.topic)
+
+    def security_group_members(self, context, security_groups):
+        LOG.debug(_("Get members of security groups "
+                    "via rpc %r"), security_groups)
+        return self.call(context,
+                         self.make_msg('security_group_members',
+                                       security_groups=security_groups),
+                         version=SG_RPC_MEMBERS_VERSION,
+                         topic=self.topic)
+
+    def security_group_member_updates(self, context, sg_member_revisions):
+        LOG.debug(_("Get updated members of security groups "
+                    "via rpc %r"), sg_member_revisions)
+        return self.call(context,
+                         self.make_msg(
+                             'security_group_member_updates',
+                             sg_member_revisions=sg_member_revisions),
+                         version=SG_RPC_MEMBERS_VERSION,
+                         topic=self.topic)
+
 
 class SecurityGroupAgentRpcCallbackMixin(object):
     """A mix-in that enable SecurityGroup agent
@@ -119,13 +167,74 @@ class SecurityGroupAgentRpcMixin(object):
         self.devices_to_refilter = set()
         # Flag raised when a global refresh is needed
         self.global_refresh_firewall = False
+        # Stores security groups whose members should be refreshed when
+        # deferred refresh is enabled and the firewall uses member sets.
+        self.security_groups_to_refresh = set()
+        # Revision of the members of the remote security groups known by
+        # the firewall
+        self.sg_member_revisions = {}
+
+    def _get_devices_with_rules(self, device_ids):
+        if not self.firewall.expand_remote_groups:
+            try:
+                info = self.plugin_rpc.security_group_info_for_devices(
+                    self.context, list(device_ids),
+                    sg_member_revisions=self._get_member_revisions())
+            except (rpc_common.RemoteError,
+                    rpc_common.UnsupportedRpcVersion) as e:
+                if not agent_rpc.is_unsupported_version(e):
+                    raise
+                self._expand_remote_groups()
+            else:
+                self._update_security_group_members(info)
+                return info['devices']
+        return self.plugin_rpc.security_group_rules_for_devices(
+            self.context, list(device_ids))
+
+    def _expand_remote_groups(self):
+        """Get the rules of the remote groups expanded by the server.
+
+        Used when the server does not support the security group member
+        RPCs, the ports are then filtered as without enable_ipset.
+        """
+        LOG.warning(_("The server does not support version %s of the "
+                      "security group RPCs, enable_ipset is ignored until "
+                      "the agent restarts"), SG_RPC_MEMBERS_VERSION)
+        self.firewall.expand_remote_groups = True
+        self.sg_member_revisions.clear()
+
+    def _get_member_revisions(self, security_groups=None):
+        """Return the known member revisions of security groups.
+
+        The firewall forgets the members of the groups no longer used by
+        its ports, so are the revisions of these groups.
+        """
+        used_groups = set()
+        for device in self.firewall.ports.values():
+            used_groups.update(device.get('security_group_source_groups', []))
+        for sg_id in set(self.sg_member_revisions) - used_groups:
+            del self.sg_member_revisions[sg_id]
+        if security_groups is None:
+            return dict(self.sg_member_revisions)
+        return dict((sg_id, self.sg_member_revisions.get(sg_id))
+                    for sg_id in security_groups)
+
+    def _update_security_group_members(self, info):
+        if 'sg_member_revisions' not in info:
+            # The server sent the members of all the groups, the known
+            # revisions are of no use to it
+            self.sg_member_revisions.clear()
+        revisions = info.get('sg_member_revisions', {})
+        for sg_id, member_ips in info['sg_member_ips'].iteritems():
+            self.firewall.update_security_group_members(sg_id, member_ips)
+            if sg_id in revisions:
+                self.sg_member_revisions[sg_id] = revisions[sg_id]
 
     def prepare_devices_filter(self, device_ids):
         if not device_ids:
             return
         LOG.info(_("Preparing filters for devices %s"), device_ids)
-        devices = self.plugin_rpc.security_group_rules_for_devices(
-            self.context, list(device_ids))
+        devices = self._get_devices_with_rules(device_ids)
         with self.firewall.defer_apply():
             for device in devices.values():
                 self.firewall.prepare_port_filter(device)
@@ -140,6 +249,11 @@ class SecurityGroupAgentRpcMixin(object):
     def security_groups_member_updated(self, security_groups):
         LOG.info(_("Security group "
                    "member updated %r"), security_groups)
+        if not self.firewall.expand_remote_groups:
+            # Only the member sets need to be updated, the rules of the
+            # ports stay the same
+            self._security_group_members_updated(security_groups)
+            return
         self._security_group_updated(
             security_groups,
             'security_group_source_groups')
@@ -159,6 +273,36 @@ class SecurityGroupAgentRpcMixin(object):
             else:
                 self.refresh_firewall(devices)
 
+    def _security_group_members_updated(self, security_groups):
+        sec_grp_set = set(security_groups)
+        used_groups = set()
+        for device in self.firewall.ports.values():
+            used_groups |= sec_grp_set & set(
+                device.get('security_group_source_groups', []))
+        if not used_groups:
+            return
+        if self.defer_refresh_firewall:
+            self.security_groups_to_refresh |= used_groups
+        else:
+            self.refresh_security_group_members(used_groups)
+
+    def refresh_security_group_members(self, security_groups):
+        LOG.info(_("Refresh members of security groups %r"), security_groups)
+        try:
+            info = self.plugin_rpc.security_group_member_updates(
+                self.context, self._get_member_revisions(security_groups))
+        except (rpc_common.RemoteError,
+                rpc_common.UnsupportedRpcVersion) as e:
+            if not agent_rpc.is_unsupported_version(e):
+                raise
+            self._expand_remote_groups()
+            self._security_group_updated(security_groups,
+                                         'security_group_source_groups')
+            return
+        LOG.debug(_("Members of security groups %r changed"),
+                  info['sg_member_ips'].keys())
+        self._update_security_group_members(info)
+
     def security_groups_provider_updated(self):
         LOG.info(_("Provider rule updated"))
         if self.defer_refresh_firewall:
@@ -187,15 +331,15 @@ class SecurityGroupAgentRpcMixin(object):
             if not device_ids:
                 LOG.info(_("No ports here to refresh firewall"))
                 return
-        devices = self.plugin_rpc.security_group_rules_for_devices(
-            self.context, device_ids)
+        devices = self._get_devices_with_rules(device_ids)
         with self.firewall.defer_apply():
             for device in devices.values():
                 LOG.debug(_("Update port filter for %s"), device['device'])
                 self.firewall.update_port_filter(device)
 
     def firewall_refresh_needed(self):
-        return self.global_refresh_firewall or self.devices_to_refilter
+        return (self.global_refresh_firewall or self.devices_to_refilter or
+                self.security_groups_to_refresh)
 
     def setup_port_filters(self, new_devices, updated_devices):
         """Configure port filters for devices.
@@ -216,8 +360,12 @@ class SecurityGroupAgentRpcMixin(object):
         # losing updates occurring during firewall refresh
         devices_to_refilter = self.devices_to_refilter
         global_refresh_firewall = self.global_refresh_firewall
+        security_groups_to_refresh = self.security_groups_to_refresh
         self.devices_to_refilter = set()
         self.global_refresh_firewall = False
+        self.security_groups_to_refresh = set()
+        if security_groups_to_refresh:
+            self.refresh_security_group_members(security_groups_to_refresh)
         # TODO(salv-orlando): Avoid if possible ever performing the global
         # refresh providing a precise list of devices for which firewall
         # should be refreshed
@@ -99,24 +99,43 @@ class L3AgentNotifyAPI(proxy.RpcProxy):
                                    router_id=router_id),
             topic=topics.L3_AGENT)
 
+    def _bump_router_revisions(self, context, router_ids):
+        """Record the changes of the routers for the incremental syncs."""
+        plugin = manager.NeutronManager.get_service_plugins().get(
+            service_constants.L3_ROUTER_NAT)
+        if not plugin or not hasattr(plugin, 'bump_router_revisions'):
+            return
+        adminContext = context.is_admin and context or context.elevated()
+        try:
+            plugin.bump_router_revisions(adminContext, router_ids)
+        except Exception:
+            # the notifications are still sent, an l3 agent missing the
+            # change only if it also misses them
+            LOG.exception(_('Failed recording the changes of routers %s'),
+                          router_ids)
+
     def agent_updated(self, context, admin_state_up, host):
         self._notification_host(context, 'agent_updated',
                                 {'admin_state_up': admin_state_up},
                                 host)
 
     def router_deleted(self, context, router_id):
+        self._bump_router_revisions(context, [router_id])
         self._notification_fanout(context, 'router_deleted', router_id)
 
     def routers_updated(self, context, router_ids, operation=None, data=None):
         if router_ids:
+            self._bump_router_revisions(context, router_ids)
             self._notification(context, 'routers_updated', router_ids,
                                operation, data)
 
     def router_removed_from_agent(self, context, router_id, host):
+        self._bump_router_revisions(context, [router_id])
         self._notification_host(context, 'router_removed_from_agent',
                                 {'router_id': router_id}, host)
 
     def router_added_to_agent(self, context, router_ids, host):
+        self._bump_router_revisions(context, router_ids)
         self._notification_host(context, 'router_added_to_agent',
                                 router_ids, host)
 
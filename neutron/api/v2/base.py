@@ -26,6 +26,7 @@ from neutron.api.v2 import attributes
 from neutron.api.v2 import resource as wsgi_resource
 from neutron.common import constants as const
 from neutron.common import exceptions
+from neutron.openstack.common import excutils
 from neutron.openstack.common import log as logging
 from neutron.openstack.common.notifier import api as notifier_api
 from neutron import policy
@@ -43,6 +44,107 @@ FAULT_MAP = {exceptions.NotFound: webob.exc.HTTPNotFound,
              netaddr.AddrFormatError: webob.exc.HTTPBadRequest,
              }
 
+_IMMUTABLE_DEFAULTS = (type(None), bool, int, long, float, basestring)
+
+
+class _RequestBodyPlan(object):
+    """Checks of a create or update body, prepared from an attribute map.
+
+    The attributes are sorted once by how the request must handle them
+    and their validators are compiled, so that the items of a request,
+    bulk ones in particular, are checked without walking the attribute
+    map. Unset attributes whose default needs no conversion or whose
+    converted default is immutable and valid are filled without being
+    checked again.
+    """
+
+    def __init__(self, attr_info, is_create):
+        self.is_create = is_create
+        self.attrs = frozenset(attr_info)
+        self.required = []
+        # attributes not allowed in the request
+        self.forbidden = []
+        # defaults of the unset attributes, converted and validated if
+        # checked is True
+        self.defaults = []
+        # (attr, convert_to, [(rule, validate)]) of the attributes to check
+        self.checks = []
+        for attr, attr_vals in attr_info.iteritems():
+            if is_create and attr_vals['allow_post']:
+                if 'default' not in attr_vals:
+                    self.required.append(attr)
+                else:
+                    self.defaults.append(
+                        self._prepare_default(attr, attr_vals))
+            elif not attr_vals['allow_post' if is_create else 'allow_put']:
+                self.forbidden.append(attr)
+            if 'convert_to' in attr_vals or 'validate' in attr_vals:
+                self.checks.append(
+                    (attr, attr_vals.get('convert_to'),
+                     [(rule, attributes.compile_validator(rule, values))
+                      for rule, values in
+                      attr_vals.get('validate', {}).iteritems()]))
+
+    @staticmethod
+    def _prepare_default(attr, attr_vals):
+        default = attr_vals['default']
+        if default is attributes.ATTR_NOT_SPECIFIED:
+            return attr, default, True
+        if not isinstance(default, _IMMUTABLE_DEFAULTS):
+            # Each request must get its own copy from convert_to
+            return attr, default, False
+        try:
+            value = default
+            if 'convert_to' in attr_vals:
+                value = attr_vals['convert_to'](value)
+                if not isinstance(value, _IMMUTABLE_DEFAULTS):
+                    # e.g. None converted to [], which must not be shared
+                    return attr, default, False
+            for rule, values in attr_vals.get('validate', {}).iteritems():
+                if attributes.validators[rule](value, values):
+                    return attr, default, False
+        except Exception:
+            # Let the request fail as it would have without a plan
+            return attr, default, False
+        return attr, value, True
+
+    def apply(self, res_dict):
+        """Check and convert res_dict, raising HTTPBadRequest if invalid."""
+        for attr in self.required:
+            if attr not in res_dict:
+                msg = _("Failed to parse request. Required "
+                        "attribute '%s' not specified") % attr
+                raise webob.exc.HTTPBadRequest(msg)
+        for attr in self.forbidden:
+            if attr in res_dict:
+                if self.is_create:
+                    msg = _("Attribute '%s' not allowed in POST") % attr
+                else:
+                    msg = _("Cannot update read-only attribute %s") % attr
+                raise webob.exc.HTTPBadRequest(msg)
+        checked = set()
+        for attr, default, default_checked in self.defaults:
+            if attr not in res_dict:
+                res_dict[attr] = default
+                if default_checked:
+                    checked.add(attr)
+
+        for attr, convert_to, validators in self.checks:
+            if (attr in checked or attr not in res_dict or
+                    res_dict[attr] is attributes.ATTR_NOT_SPECIFIED):
+                continue
+            # Convert values if necessary
+            if convert_to:
+                res_dict[attr] = convert_to(res_dict[attr])
+            # Check that configured values are correct
+            for rule, validate in validators:
+                res = validate(res_dict[attr])
+                if res:
+                    msg_dict = dict(attr=attr, reason=res)
+                    msg = _("Invalid input for %(attr)s. "
+                            "Reason: %(reason)s.") % msg_dict
+                    raise webob.exc.HTTPBadRequest(msg)
+
 
 class Controller(object):
     LIST = 'list'
@@ -68,6 +170,8 @@ class Controller(object):
         self._native_sorting = self._is_native_sorting_supported()
         self._policy_attrs = [name for (name, info) in self._attr_info.items()
                               if info.get('required_by_policy')]
+        self._body_plans = {True: _RequestBodyPlan(self._attr_info, True),
+                            False: _RequestBodyPlan(self._attr_info, False)}
         self._publisher_id = notifier_api.publisher_id('network')
         # use plugin's dhcp notifier, if this is already instantiated
         agent_notifiers = getattr(plugin, 'agent_notifiers', {})
@@ -238,11 +342,10 @@ class Controller(object):
             # FIXME(salvatore-orlando): obj_getter might return references to
             # other resources. Must check authZ on them too.
             # Omit items from list that should not be visible
-            obj_list = [obj for obj in obj_list
-                        if policy.check(request.context,
-                                        self._plugin_handlers[self.SHOW],
-                                        obj,
-                                        plugin=self._plugin)]
+            obj_list = policy.check_list(request.context,
+                                         self._plugin_handlers[self.SHOW],
+                                         obj_list,
+                                         plugin=self._plugin)
         collection = {self._collection:
                       [self._view(request.context, obj,
                                   fields_to_strip=fields_to_add)
@@ -276,10 +379,12 @@ class Controller(object):
     def index(self, request, **kwargs):
         """Returns a list of the requested entity."""
         parent_id = kwargs.get(self._parent_id_name)
+        request.context.allow_slave_reads()
         return self._items(request, True, parent_id)
 
     def show(self, request, id, **kwargs):
         """Returns detailed information about the requested entity."""
+        request.context.allow_slave_reads()
         try:
             # NOTE(salvatore-orlando): The following ensures that fields
             # which are needed for authZ policy validation are not stripped
@@ -342,36 +447,32 @@ class Controller(object):
                             self._resource + '.create.start',
                             notifier_api.CONF.default_notification_level,
                             body)
-        body = Controller.prepare_request_body(request.context, body, True,
-                                               self._resource, self._attr_info,
-                                               allow_bulk=self._allow_bulk)
+        body = Controller.prepare_request_body(
+            request.context, body, True, self._resource, self._attr_info,
+            allow_bulk=self._allow_bulk, plan=self._body_plans[True])
         action = self._plugin_handlers[self.CREATE]
         # Check authz
         if self._collection in body:
             # Have to account for bulk create
             items = body[self._collection]
-            deltas = {}
-            bulk = True
         else:
             items = [body]
-            bulk = False
+        deltas = {}
         for item in items:
             self._validate_network_tenant_ownership(request,
                                                     item[self._resource])
             policy.enforce(request.context,
                            action,
                            item[self._resource])
+            tenant_id = item[self._resource]['tenant_id']
+            deltas[tenant_id] = deltas.get(tenant_id, 0) + 1
+            if quota.QUOTAS.supports_reservations:
+                continue
             try:
-                tenant_id = item[self._resource]['tenant_id']
                 count = quota.QUOTAS.count(request.context, self._resource,
                                            self._plugin, self._collection,
                                            tenant_id)
-                if bulk:
-                    delta = deltas.get(tenant_id, 0) + 1
-                    deltas[tenant_id] = delta
-                else:
-                    delta = 1
-                kwargs = {self._resource: count + delta}
+                kwargs = {self._resource: count + deltas[tenant_id]}
             except exceptions.QuotaResourceUnknown as e:
                 # We don't want to quota this resource
                 LOG.debug(e)
@@ -379,6 +480,10 @@ class Controller(object):
                 quota.QUOTAS.limit_check(request.context,
                                          item[self._resource]['tenant_id'],
                                          **kwargs)
+        reservations = []
+        if quota.QUOTAS.supports_reservations:
+            reservations = self._make_quota_reservations(request.context,
+                                                         deltas)
 
         def notify(create_result):
             notifier_method = self._resource + '.create.end'
@@ -393,24 +498,49 @@ class Controller(object):
             return create_result
 
         kwargs = {self._parent_id_name: parent_id} if parent_id else {}
-        if self._collection in body and self._native_bulk:
-            # plugin does atomic bulk create operations
-            obj_creator = getattr(self._plugin, "%s_bulk" % action)
-            objs = obj_creator(request.context, body, **kwargs)
-            return notify({self._collection: [self._view(request.context, obj)
-                                              for obj in objs]})
-        else:
-            obj_creator = getattr(self._plugin, action)
-            if self._collection in body:
-                # Emulate atomic bulk behavior
-                objs = self._emulate_bulk_create(obj_creator, request,
-                                                 body, parent_id)
-                return notify({self._collection: objs})
+        try:
+            if self._collection in body and self._native_bulk:
+                # plugin does atomic bulk create operations
+                obj_creator = getattr(self._plugin, "%s_bulk" % action)
+                objs = obj_creator(request.context, body, **kwargs)
+                result = {self._collection: [self._view(request.context, obj)
+                                             for obj in objs]}
             else:
-                kwargs.update({self._resource: body})
-                obj = obj_creator(request.context, **kwargs)
-                return notify({self._resource: self._view(request.context,
-                                                          obj)})
+                obj_creator = getattr(self._plugin, action)
+                if self._collection in body:
+                    # Emulate atomic bulk behavior
+                    objs = self._emulate_bulk_create(obj_creator, request,
+                                                     body, parent_id)
+                    result = {self._collection: objs}
+                else:
+                    kwargs.update({self._resource: body})
+                    obj = obj_creator(request.context, **kwargs)
+                    result = {self._resource: self._view(request.context,
+                                                         obj)}
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                for reservation in reservations:
+                    quota.QUOTAS.cancel_reservation(request.context,
+                                                    reservation)
+        for reservation in reservations:
+            quota.QUOTAS.commit_reservation(request.context, reservation)
+        return notify(result)
+
+    def _make_quota_reservations(self, context, deltas):
+        reservations = []
+        try:
+            for tenant_id, delta in deltas.items():
+                reservations.append(quota.QUOTAS.make_reservation(
+                    context, tenant_id, {self._resource: delta},
+                    self._plugin, self._collection, tenant_id))
+        except exceptions.QuotaResourceUnknown as e:
+            # We don't want to quota this resource
+            LOG.debug(e)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                for reservation in reservations:
+                    quota.QUOTAS.cancel_reservation(context, reservation)
+        return reservations
 
     def delete(self, request, id, **kwargs):
         """Deletes the specified entity."""
@@ -461,9 +591,9 @@ class Controller(object):
                             self._resource + '.update.start',
                             notifier_api.CONF.default_notification_level,
                             payload)
-        body = Controller.prepare_request_body(request.context, body, False,
-                                               self._resource, self._attr_info,
-                                               allow_bulk=self._allow_bulk)
+        body = Controller.prepare_request_body(
+            request.context, body, False, self._resource, self._attr_info,
+            allow_bulk=self._allow_bulk, plan=self._body_plans[False])
         action = self._plugin_handlers[self.UPDATE]
         # Load object to check authz
         # but pass only attributes in the original body and required
@@ -522,7 +652,7 @@ class Controller(object):
 
     @staticmethod
     def prepare_request_body(context, body, is_create, resource, attr_info,
-                             allow_bulk=False):
+                             allow_bulk=False, plan=None):
         """Verifies required attributes are in request body.
 
         Also checking that an attribute is only specified if it is allowed
@@ -530,11 +660,15 @@ class Controller(object):
 
         Attribute with default values are considered to be optional.
 
-        body argument must be the deserialized body.
+        body argument must be the deserialized body. plan is the
+        _RequestBodyPlan of attr_info for the operation, prepared here
+        if not given.
         """
         collection = resource + "s"
         if not body:
             raise webob.exc.HTTPBadRequest(_("Resource body required"))
+        if plan is None:
+            plan = _RequestBodyPlan(attr_info, is_create)
 
         prep_req_body = lambda x: Controller.prepare_request_body(
             context,
@@ -542,7 +676,8 @@ class Controller(object):
             is_create,
             resource,
             attr_info,
-            allow_bulk)
+            allow_bulk,
+            plan)
         if collection in body:
             if not allow_bulk:
                 raise webob.exc.HTTPBadRequest(_("Bulk operation "
@@ -558,51 +693,13 @@ class Controller(object):
             raise webob.exc.HTTPBadRequest(msg)
 
         Controller._populate_tenant_id(context, res_dict, is_create)
-        Controller._verify_attributes(res_dict, attr_info)
-
-        if is_create:  # POST
-            for attr, attr_vals in attr_info.iteritems():
-                if attr_vals['allow_post']:
-                    if ('default' not in attr_vals and
-                        attr not in res_dict):
-                        msg = _("Failed to parse request. Required "
-                                "attribute '%s' not specified") % attr
-                        raise webob.exc.HTTPBadRequest(msg)
-                    res_dict[attr] = res_dict.get(attr,
-                                                  attr_vals.get('default'))
-                else:
-                    if attr in res_dict:
-                        msg = _("Attribute '%s' not allowed in POST") % attr
-                        raise webob.exc.HTTPBadRequest(msg)
-        else:  # PUT
-            for attr, attr_vals in attr_info.iteritems():
-                if attr in res_dict and not attr_vals['allow_put']:
-                    msg = _("Cannot update read-only attribute %s") % attr
-                    raise webob.exc.HTTPBadRequest(msg)
-
-        for attr, attr_vals in attr_info.iteritems():
-            if (attr not in res_dict or
-                res_dict[attr] is attributes.ATTR_NOT_SPECIFIED):
-                continue
-            # Convert values if necessary
-            if 'convert_to' in attr_vals:
-                res_dict[attr] = attr_vals['convert_to'](res_dict[attr])
-            # Check that configured values are correct
-            if 'validate' not in attr_vals:
-                continue
-            for rule in attr_vals['validate']:
-                res = attributes.validators[rule](res_dict[attr],
-                                                  attr_vals['validate'][rule])
-                if res:
-                    msg_dict = dict(attr=attr, reason=res)
-                    msg = _("Invalid input for %(attr)s. "
-                            "Reason: %(reason)s.") % msg_dict
-                    raise webob.exc.HTTPBadRequest(msg)
+        Controller._verify_attributes(res_dict, plan.attrs)
+        plan.apply(res_dict)
         return body
 
     @staticmethod
     def _verify_attributes(res_dict, attr_info):
-        extra_keys = set(res_dict.keys()) - set(attr_info.keys())
+        extra_keys = set(res_dict).difference(attr_info)
         if extra_keys:
             msg = _("Unrecognized attribute(s) '%s'") % ', '.join(extra_keys)
             raise webob.exc.HTTPBadRequest(msg)
@@ -224,6 +224,11 @@ class IpAddressGenerationFailure(Conflict):
     message = _("No more IP addresses available on network %(net_id)s.")
 
 
+class IpAvailabilityUpdateConflict(Conflict):
+    message = _("Unable to update IP availability of subnet %(subnet_id)s "
+                "because of concurrent updates.")
+
+
 class BridgeDoesNotExist(NeutronException):
     message = _("Bridge %(bridge)s does not exist.")
 
@@ -65,6 +65,9 @@ class ContextBase(common_context.RequestContext):
             timestamp = datetime.utcnow()
         self.timestamp = timestamp
         self._session = None
+        self._reader_session = None
+        # whether reader_session may read from the slave database
+        self.slave_reads = False
         self.roles = roles or []
         if self.is_admin is None:
             self.is_admin = policy.check_is_admin(self)
@@ -138,6 +141,21 @@ class ContextBase(common_context.RequestContext):
     def from_dict(cls, values):
         return cls(**values)
 
+    def allow_slave_reads(self):
+        """Let the reads tolerating stale data use the slave database.
+
+        These reads are those made with reader_session. They go back to
+        the master database once the context writes to it, so that the
+        context reads its own writes.
+        """
+        if not self.slave_reads:
+            self.slave_reads = True
+            if self._session is not None:
+                db_api.watch_writes(self._session, self._stop_slave_reads)
+
+    def _stop_slave_reads(self):
+        self.slave_reads = False
+
     def elevated(self, read_deleted=None):
         """Return a version of this context with admin flag set."""
         context = copy.copy(self)
@@ -157,8 +175,26 @@ class Context(ContextBase):
     def session(self):
         if self._session is None:
             self._session = db_api.get_session()
+            if self.slave_reads:
+                db_api.watch_writes(self._session, self._stop_slave_reads)
         return self._session
 
+    @property
+    def reader_session(self):
+        """Return the session for the reads tolerating stale data.
+
+        Unless slave reads are allowed, this is the session of the context.
+        It is too when the context is in a transaction, so that the reads
+        see the changes made in it.
+        """
+        if (not self.slave_reads or
+                self._session is not None and
+                self._session.transaction is not None):
+            return self.session
+        if self._reader_session is None:
+            self._reader_session = db_api.get_session(slave=True)
+        return self._reader_session
+
 
 def get_admin_context(read_deleted="no", load_admin_roles=True):
     return Context(user_id=None,
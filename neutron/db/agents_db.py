@@ -15,12 +15,15 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import hashlib
+
 from eventlet import greenthread
 
 from oslo.config import cfg
 import sqlalchemy as sa
 from sqlalchemy.orm import exc
 
+from neutron.db import api as db_api
 from neutron.db import model_base
 from neutron.db import models_v2
 from neutron.extensions import agent as ext_agent
@@ -29,14 +32,26 @@ from neutron.openstack.common.db import exception as db_exc
 from neutron.openstack.common import excutils
 from neutron.openstack.common import jsonutils
 from neutron.openstack.common import log as logging
+from neutron.openstack.common import loopingcall
 from neutron.openstack.common import timeutils
 
 LOG = logging.getLogger(__name__)
-cfg.CONF.register_opt(
+AGENT_OPTS = [
     cfg.IntOpt('agent_down_time', default=9,
                help=_("Seconds to regard the agent is down; should be at "
                       "least twice report_interval, to be sure the "
-                      "agent is down for good.")))
+                      "agent is down for good.")),
+    cfg.IntOpt('agent_heartbeat_batch_interval', default=0,
+               help=_("Seconds during which the heartbeats of the agents "
+                      "are kept in memory before being written together "
+                      "to the database; should be well below "
+                      "agent_down_time. 0 writes each heartbeat when "
+                      "received.")),
+]
+cfg.CONF.register_opts(AGENT_OPTS)
+
+# Maximum number of heartbeats written by one UPDATE
+HEARTBEATS_PER_UPDATE = 500
 
 
 class Agent(model_base.BASEV2, models_v2.HasId):
@@ -69,7 +84,109 @@ class Agent(model_base.BASEV2, models_v2.HasId):
 
     @property
     def is_active(self):
-        return not AgentDbMixin.is_agent_down(self.heartbeat_timestamp)
+        return not AgentDbMixin.is_agent_down(get_heartbeat_timestamp(self))
+
+
+def _hash_configurations(configurations):
+    return hashlib.md5(jsonutils.dumps(configurations,
+                                       sort_keys=True)).hexdigest()
+
+
+class AgentHeartbeats(object):
+    """Heartbeats of the agents, written to the database in batches.
+
+    The heartbeat of an agent known by this server, which did not restart
+    and whose configurations did not change, is only recorded in memory.
+    The recorded heartbeats are written every agent_heartbeat_batch_interval
+    seconds, with one UPDATE for many agents, and the liveness of the agents
+    is determined from the latest of their recorded and stored heartbeats.
+    """
+
+    def __init__(self):
+        # (agent_type, host) -> (id, hash of the configurations) of the
+        # agents whose state was written by this server
+        self._agents = {}
+        # id -> time of the latest heartbeat received from the agent
+        self._timestamps = {}
+        # id -> time of the heartbeat not written yet
+        self._pending = {}
+        self._writer = None
+
+    def get_timestamp(self, agent):
+        timestamp = self._timestamps.get(agent['id'])
+        if timestamp and timestamp > agent['heartbeat_timestamp']:
+            return timestamp
+        return agent['heartbeat_timestamp']
+
+    def record(self, agent, configurations_hash, timestamp):
+        """Record the heartbeat of an agent whose state is unchanged.
+
+        Return False if the state of the agent must be written instead.
+        """
+        known = self._agents.get((agent['agent_type'], agent['host']))
+        if (not known or known[1] != configurations_hash or
+                agent.get('start_flag')):
+            return False
+        agent_id = known[0]
+        self._timestamps[agent_id] = timestamp
+        self._pending[agent_id] = timestamp
+        if not self._writer:
+            self._writer = loopingcall.FixedIntervalLoopingCall(self.write)
+            self._writer.start(
+                interval=cfg.CONF.agent_heartbeat_batch_interval)
+        return True
+
+    def remember(self, agent_db, configurations_hash):
+        """Remember the state of an agent which was just written."""
+        self._agents[(agent_db.agent_type, agent_db.host)] = (
+            agent_db.id, configurations_hash)
+        self._timestamps[agent_db.id] = agent_db.heartbeat_timestamp
+        self._pending.pop(agent_db.id, None)
+
+    def forget(self, agent_id):
+        for key, (known_id, configurations_hash) in self._agents.items():
+            if known_id == agent_id:
+                del self._agents[key]
+        self._timestamps.pop(agent_id, None)
+        self._pending.pop(agent_id, None)
+
+    def write(self):
+        """Write the recorded heartbeats to the database."""
+        pending, self._pending = self._pending, {}
+        agent_ids = pending.keys()
+        session = db_api.get_session()
+        for i in xrange(0, len(agent_ids), HEARTBEATS_PER_UPDATE):
+            chunk = agent_ids[i:i + HEARTBEATS_PER_UPDATE]
+            try:
+                with session.begin():
+                    updated = session.query(Agent).filter(
+                        Agent.id.in_(chunk)).update(
+                            {'heartbeat_timestamp': sa.case(
+                                dict((agent_id, pending[agent_id])
+                                     for agent_id in chunk),
+                                value=Agent.id)},
+                            synchronize_session=False)
+                    if updated < len(chunk):
+                        # Write the state of the deleted agents again when
+                        # they next report
+                        existing = set(agent_id for agent_id, in
+                                       session.query(Agent.id).filter(
+                                           Agent.id.in_(chunk)))
+                        for agent_id in set(chunk) - existing:
+                            self.forget(agent_id)
+            except Exception:
+                LOG.exception(_("Failed writing the heartbeats of the "
+                                "agents"))
+                for agent_id in chunk:
+                    self._pending.setdefault(agent_id, pending[agent_id])
+
+
+_heartbeats = AgentHeartbeats()
+
+
+def get_heartbeat_timestamp(agent):
+    """Return the time of the latest heartbeat of the agent."""
+    return _heartbeats.get_timestamp(agent)
 
 
 class AgentDbMixin(ext_agent.AgentPluginBase):
@@ -103,6 +220,7 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
             ext_agent.RESOURCE_NAME + 's')
         res = dict((k, agent[k]) for k in attr
                    if k not in ['alive', 'configurations'])
+        res['heartbeat_timestamp'] = get_heartbeat_timestamp(agent)
         res['alive'] = not AgentDbMixin.is_agent_down(
             res['heartbeat_timestamp'])
         res['configurations'] = self.get_configuration_dict(agent)
@@ -112,6 +230,7 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
         with context.session.begin(subtransactions=True):
             agent = self._get_agent(context, id)
             context.session.delete(agent)
+        _heartbeats.forget(id)
 
     def update_agent(self, context, id, agent):
         agent_data = agent['agent']
@@ -172,10 +291,22 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
                 greenthread.sleep(0)
                 context.session.add(agent_db)
             greenthread.sleep(0)
+        return agent_db
 
     def create_or_update_agent(self, context, agent):
         """Create or update agent according to report."""
 
+        if cfg.CONF.agent_heartbeat_batch_interval <= 0:
+            self._create_or_update_agent_retry(context, agent)
+            return
+        configurations_hash = _hash_configurations(
+            agent.get('configurations', {}))
+        if not _heartbeats.record(agent, configurations_hash,
+                                  timeutils.utcnow()):
+            agent_db = self._create_or_update_agent_retry(context, agent)
+            _heartbeats.remember(agent_db, configurations_hash)
+
+    def _create_or_update_agent_retry(self, context, agent):
         try:
             return self._create_or_update_agent(context, agent)
         except db_exc.DBDuplicateEntry as e:
@@ -24,6 +24,7 @@ from sqlalchemy.orm import joinedload
 from neutron.common import constants
 from neutron.db import agents_db
 from neutron.db import model_base
+from neutron.db import models_v2
 from neutron.extensions import dhcpagentscheduler
 from neutron.openstack.common import log as logging
 
@@ -79,7 +80,7 @@ class AgentSchedulerDbMixin(agents_db.AgentDbMixin):
             #                   (i.e. have a recent heartbeat timestamp)
             #                   are eligible, even if active is False
             return not agents_db.AgentDbMixin.is_agent_down(
-                agent['heartbeat_timestamp'])
+                agents_db.get_heartbeat_timestamp(agent))
 
     def update_agent(self, context, id, agent):
         original_agent = self.get_agent(context, id)
@@ -174,20 +175,45 @@ class DhcpAgentSchedulerDbMixin(dhcpagentscheduler
         else:
             return {'networks': []}
 
-    def list_active_networks_on_active_dhcp_agent(self, context, host):
+    def list_active_networks_on_active_dhcp_agent(self, context, host,
+                                                  network_ids=None,
+                                                  limit=None, marker=None):
+        """Return the active networks hosted by the DHCP agent of host.
+
+        :param network_ids: only return the networks among these ones
+        :param limit: return at most limit networks, sorted by id
+        :param marker: only return the networks whose id follows it
+        """
         agent = self._get_agent_by_type_and_host(
             context, constants.AGENT_TYPE_DHCP, host)
         if not agent.admin_state_up:
             return []
-        query = context.session.query(NetworkDhcpAgentBinding.network_id)
-        query = query.filter(NetworkDhcpAgentBinding.dhcp_agent_id == agent.id)
+        binding = NetworkDhcpAgentBinding
+        query = context.session.query(binding.network_id)
+        query = query.filter(binding.dhcp_agent_id == agent.id)
+        if network_ids is not None:
+            if not network_ids:
+                return []
+            query = query.filter(binding.network_id.in_(network_ids))
+        if limit or marker:
+            # the networks are paged in the query rather than after it, so
+            # that no page holds fewer networks than the limit but the last
+            query = query.join(models_v2.Network,
+                               models_v2.Network.id == binding.network_id)
+            query = query.filter(models_v2.Network.admin_state_up == True)
+            if marker:
+                query = query.filter(binding.network_id > marker)
+            query = query.order_by(binding.network_id)
+            if limit:
+                query = query.limit(limit)
 
         net_ids = [item[0] for item in query]
         if net_ids:
-            return self.get_networks(
+            networks = self.get_networks(
                 context,
                 filters={'id': net_ids, 'admin_state_up': [True]}
             )
+            return sorted(networks, key=lambda network: network['id'])
         else:
             return []
 
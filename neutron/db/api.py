@@ -13,7 +13,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import time
+
+from oslo.config import cfg
 import sqlalchemy as sql
+from sqlalchemy import event
 
 from neutron.db import model_base
 from neutron.openstack.common.db.sqlalchemy import session
@@ -23,6 +27,32 @@ LOG = logging.getLogger(__name__)
 
 BASE = model_base.BASEV2
 
+database_opts = [
+    cfg.IntOpt('slave_max_staleness', default=1,
+               help=_('Maximum replication lag in seconds of the '
+                      'slave_connection database for the reads tolerating '
+                      'stale data to be sent to it. These reads go to the '
+                      'master database while the lag is higher or cannot '
+                      'be measured.')),
+]
+
+cfg.CONF.register_opts(database_opts, 'database')
+
+# seconds during which the replication lag measured is reused
+SLAVE_LAG_CHECK_INTERVAL = 1
+# maximum seconds between the checks while the lag can't be measured
+SLAVE_LAG_MAX_BACKOFF = 60
+
+# failures counts the consecutive failed measures of the lag, the checks
+# backing off exponentially meanwhile
+_SLAVE_STATE = {'checked_at': None, 'usable': False, 'failures': 0}
+
+_SLAVE_LAG_QUERIES = {
+    'postgresql': ('SELECT CASE WHEN pg_is_in_recovery() '
+                   'THEN EXTRACT(EPOCH FROM now() - '
+                   'pg_last_xact_replay_timestamp()) ELSE 0 END'),
+}
+
 
 def configure_db():
     """Configure database.
@@ -37,13 +67,77 @@ def configure_db():
 def clear_db(base=BASE):
     unregister_models(base)
     session.cleanup()
+    _SLAVE_STATE['checked_at'] = None
+    _SLAVE_STATE['failures'] = 0
+
 
+def get_session(autocommit=True, expire_on_commit=False, slave=False):
+    """Helper method to grab session.
 
-def get_session(autocommit=True, expire_on_commit=False):
-    """Helper method to grab session."""
+    :param slave: return a session on the slave_connection database when
+        it is configured and lags behind the master one by no more than
+        slave_max_staleness seconds, a session on the master database
+        otherwise. Such a session must only be used for reads.
+    """
     return session.get_session(autocommit=autocommit,
                                expire_on_commit=expire_on_commit,
-                               sqlite_fk=True)
+                               sqlite_fk=True,
+                               slave_session=slave and _slave_usable())
+
+
+def _get_slave_lag(engine):
+    """Return the replication lag of the slave database in seconds.
+
+    None is returned when the lag is unknown, e.g. when the replication
+    is stopped.
+    """
+    if engine.name == 'mysql':
+        status = engine.execute('SHOW SLAVE STATUS').first()
+        # a server which isn't a slave doesn't lag
+        return status['Seconds_Behind_Master'] if status else 0
+    query = _SLAVE_LAG_QUERIES.get(engine.name)
+    if query:
+        return engine.execute(query).scalar()
+    return 0
+
+
+def _slave_usable():
+    if not cfg.CONF.database.slave_connection:
+        return False
+    now = time.time()
+    checked_at = _SLAVE_STATE['checked_at']
+    interval = min(SLAVE_LAG_CHECK_INTERVAL * 2 ** _SLAVE_STATE['failures'],
+                   SLAVE_LAG_MAX_BACKOFF)
+    if checked_at is None or now - checked_at >= interval:
+        _SLAVE_STATE['checked_at'] = now
+        try:
+            lag = _get_slave_lag(session.get_engine(sqlite_fk=True,
+                                                    slave_engine=True))
+        except Exception:
+            # e.g. SHOW SLAVE STATUS without the REPLICATION CLIENT
+            # privilege, which would fail the same way at every check
+            if not _SLAVE_STATE['failures']:
+                LOG.exception(_("Unable to measure the replication lag of "
+                                "the slave database"))
+            _SLAVE_STATE['failures'] += 1
+            lag = None
+        else:
+            _SLAVE_STATE['failures'] = 0
+        usable = (lag is not None and
+                  lag <= cfg.CONF.database.slave_max_staleness)
+        if usable != _SLAVE_STATE['usable']:
+            LOG.info(_("Reads tolerating stale data sent to the %s "
+                       "database"), usable and 'slave' or 'master')
+        _SLAVE_STATE['usable'] = usable
+    return _SLAVE_STATE['usable']
+
+
+def watch_writes(session, callback):
+    """Call callback each time the session writes to the database."""
+    def _wrote(*args):
+        callback()
+    for name in ('after_flush', 'after_bulk_update', 'after_bulk_delete'):
+        event.listen(session, name, _wrote)
 
 
 def register_models(base=BASE):
@@ -27,6 +27,7 @@ from neutron.api.v2 import attributes
 from neutron.common import constants
 from neutron.common import exceptions as q_exc
 from neutron.db import api as db
+from neutron.db import ipam_db
 from neutron.db import models_v2
 from neutron.db import sqlalchemyutils
 from neutron import neutron_plugin_base_v2
@@ -90,7 +91,7 @@ class CommonDbMixin(object):
                              'result_filters': result_filters}
 
     def _model_query(self, context, model):
-        query = context.session.query(model)
+        query = context.reader_session.query(model)
         # define basic filter condition for model query
         # NOTE(jkoelker) non-admin queries are scoped to their tenant_id
         # NOTE(salvatore-orlando): unless the model allows for shared objects
@@ -205,6 +206,21 @@ class CommonDbMixin(object):
             return getattr(self, '_get_%s' % resource)(context, marker)
         return None
 
+    def _get_model_marker_obj(self, context, model, limit, marker):
+        """Return the marker object of a page of a model's collection.
+
+        Unlike _get_marker_obj, this doesn't need a getter for the resource,
+        so any collection query can be paginated.
+        """
+        if not (limit and marker):
+            return None
+        marker_obj = self._model_query(context, model).filter(
+            model.id == marker).first()
+        if marker_obj is None:
+            msg = _("Marker %s was not found") % marker
+            raise q_exc.BadRequest(resource=model.__tablename__, msg=msg)
+        return marker_obj
+
 
 class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                         CommonDbMixin):
@@ -347,9 +363,15 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
             network_id=network_id,
             ip_address=ip_address,
             subnet_id=subnet_id).delete()
+        ipam = ipam_db.get_ipam_driver()
+        if ipam:
+            ipam.release_ip(context, subnet_id, ip_address)
 
     @staticmethod
     def _generate_ip(context, subnets):
+        ipam = ipam_db.get_ipam_driver()
+        if ipam:
+            return ipam.generate_ip(context, subnets)
         try:
             return NeutronDbPluginV2._try_generate_ip(context, subnets)
         except q_exc.IpAddressGenerationFailure:
@@ -439,6 +461,9 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
     @staticmethod
     def _allocate_specific_ip(context, subnet_id, ip_address):
         """Allocate a specific IP address on the subnet."""
+        ipam = ipam_db.get_ipam_driver()
+        if ipam:
+            return ipam.allocate_specific_ip(context, subnet_id, ip_address)
         ip = int(netaddr.IPAddress(ip_address))
         range_qry = context.session.query(
             models_v2.IPAvailabilityRange).join(
@@ -1121,16 +1146,21 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                         nexthop=rt['nexthop'])
                     context.session.add(route)
 
+            ipam = ipam_db.get_ipam_driver()
             for pool in s['allocation_pools']:
                 ip_pool = models_v2.IPAllocationPool(subnet=subnet,
                                                      first_ip=pool['start'],
                                                      last_ip=pool['end'])
                 context.session.add(ip_pool)
-                ip_range = models_v2.IPAvailabilityRange(
-                    ipallocationpool=ip_pool,
-                    first_ip=pool['start'],
-                    last_ip=pool['end'])
-                context.session.add(ip_range)
+                if not ipam:
+                    ip_range = models_v2.IPAvailabilityRange(
+                        ipallocationpool=ip_pool,
+                        first_ip=pool['start'],
+                        last_ip=pool['end'])
+                    context.session.add(ip_range)
+            if ipam:
+                ipam.initialize_subnet(context, subnet.id,
+                                       s['allocation_pools'])
 
         return self._make_subnet_dict(subnet)
 
@@ -33,18 +33,39 @@ class DhcpRpcCallbackMixin(object):
     """A mix-in that enable DHCP agent support in plugin implementations."""
 
     def _get_active_networks(self, context, **kwargs):
-        """Retrieve and return a list of the active networks."""
+        """Retrieve and return a list of the active networks.
+
+        When network_ids is given, only the active networks among them are
+        returned. When limit or marker is given, a page of at most limit
+        networks whose id follows marker is returned, sorted by id.
+        """
         host = kwargs.get('host')
+        network_ids = kwargs.get('network_ids')
+        limit = kwargs.get('limit')
+        marker = kwargs.get('marker')
         plugin = manager.NeutronManager.get_plugin()
         if utils.is_extension_supported(
             plugin, constants.DHCP_AGENT_SCHEDULER_EXT_ALIAS):
-            if cfg.CONF.network_auto_schedule:
+            # Networks are not scheduled again for each batch or page of
+            # networks requested by an agent
+            if (cfg.CONF.network_auto_schedule and
+                    network_ids is None and marker is None):
                 plugin.auto_schedule_networks(context, host)
-            nets = plugin.list_active_networks_on_active_dhcp_agent(
-                context, host)
-        else:
-            filters = dict(admin_state_up=[True])
-            nets = plugin.get_networks(context, filters=filters)
+            if network_ids is None and not limit and not marker:
+                return plugin.list_active_networks_on_active_dhcp_agent(
+                    context, host)
+            return plugin.list_active_networks_on_active_dhcp_agent(
+                context, host, network_ids=network_ids, limit=limit,
+                marker=marker)
+        filters = dict(admin_state_up=[True])
+        if network_ids is not None:
+            filters['id'] = network_ids
+        nets = plugin.get_networks(context, filters=filters)
+        if limit or marker:
+            # plugins without the scheduler have no agent bindings to page
+            nets = sorted((net for net in nets
+                           if not marker or net['id'] > marker),
+                          key=lambda net: net['id'])[:limit or None]
         return nets
 
     def _port_action(self, plugin, context, port, action):
@@ -87,10 +108,19 @@ class DhcpRpcCallbackMixin(object):
         return [net['id'] for net in nets]
 
     def get_active_networks_info(self, context, **kwargs):
-        """Returns all the networks/subnets/ports in system."""
+        """Returns all the networks/subnets/ports in system.
+
+        When network_ids is given, only the active networks among them are
+        returned. When limit or marker is given, only a page of at most
+        limit networks, sorted by id and following the marker network id,
+        is returned.
+        """
         host = kwargs.get('host')
         LOG.debug(_('get_active_networks_info from %s'), host)
+        context.allow_slave_reads()
         networks = self._get_active_networks(context, **kwargs)
+        if not networks:
+            return []
         plugin = manager.NeutronManager.get_plugin()
         filters = {'network_id': [network['id'] for network in networks]}
         ports = plugin.get_ports(context, filters=filters)
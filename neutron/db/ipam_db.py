@@ -0,0 +1,413 @@
+# Copyright (c) 2014 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import bisect
+import weakref
+
+import netaddr
+from oslo.config import cfg
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy import orm
+
+from neutron.common import exceptions as q_exc
+from neutron.db import api as db_api
+from neutron.db import model_base
+from neutron.db import models_v2
+from neutron.openstack.common.db import exception as db_exc
+from neutron.openstack.common import importutils
+from neutron.openstack.common import jsonutils
+from neutron.openstack.common import log as logging
+from neutron.openstack.common import uuidutils
+
+LOG = logging.getLogger(__name__)
+
+ipam_opts = [
+    cfg.StrOpt('ipam_driver',
+               help=_("Driver used to allocate fixed IPs from subnets. "
+                      "When unset, IPs are allocated using the "
+                      "ipavailabilityranges table.")),
+    cfg.IntOpt('ipam_cas_retries', default=10,
+               help=_("Number of times the IPAM driver retries an "
+                      "allocation after a concurrent update of the same "
+                      "subnet.")),
+]
+cfg.CONF.register_opts(ipam_opts)
+
+_driver = None
+
+
+def get_ipam_driver():
+    """Return the configured IPAM driver, or None for the default one."""
+    global _driver
+    if _driver is None and cfg.CONF.ipam_driver:
+        _driver = importutils.import_object(cfg.CONF.ipam_driver)
+    return _driver
+
+
+def reset_ipam_driver():
+    global _driver
+    _driver = None
+
+
+# (on_commit, on_rollback) callbacks of the sessions in a transaction
+_transaction_callbacks = weakref.WeakKeyDictionary()
+
+
+def _when_transaction_ends(session, on_commit=None, on_rollback=None):
+    """Call on_commit once the transaction of session commits.
+
+    on_rollback is called instead if the transaction rolls back. When the
+    session is not in a transaction, on_commit is called right away.
+    """
+    if session.transaction is None:
+        if on_commit:
+            on_commit()
+        return
+    _transaction_callbacks.setdefault(session, []).append(
+        (on_commit, on_rollback))
+
+
+def _transaction_ended(session, committed):
+    for on_commit, on_rollback in _transaction_callbacks.pop(session, []):
+        callback = on_commit if committed else on_rollback
+        if not callback:
+            continue
+        try:
+            callback()
+        except Exception:
+            LOG.exception(_("Failed to update the IP availability of a "
+                            "subnet at the end of a transaction"))
+
+
+def _subnet_deleted(mapper, connection, subnet):
+    forget_subnet = getattr(_driver, 'forget_subnet', None)
+    if forget_subnet:
+        forget_subnet(orm.object_session(subnet), subnet.id)
+
+
+event.listen(orm.Session, 'after_commit',
+             lambda session: _transaction_ended(session, True))
+event.listen(orm.Session, 'after_rollback',
+             lambda session: _transaction_ended(session, False))
+event.listen(models_v2.Subnet, 'after_delete', _subnet_deleted)
+
+
+class IPAvailabilitySet(model_base.BASEV2):
+    """Free IP ranges of a subnet, stored as a single versioned row.
+
+    free_ranges holds a JSON encoded, sorted list of disjoint
+    [first, last] integer ranges. Every update sets a new random revision,
+    which allows updates to be performed as compare-and-swap operations.
+    """
+
+    subnet_id = sa.Column(sa.String(36),
+                          sa.ForeignKey('subnets.id', ondelete="CASCADE"),
+                          primary_key=True)
+    free_ranges = sa.Column(sa.Text, nullable=False)
+    next_ip = sa.Column(sa.String(64), nullable=False)
+    revision = sa.Column(sa.String(36), nullable=False)
+
+
+class IntervalSet(object):
+    """Sorted list of disjoint, inclusive [first, last] integer ranges."""
+
+    def __init__(self, ranges=None):
+        self.firsts = []
+        self.lasts = []
+        for first, last in sorted(ranges or []):
+            self.firsts.append(first)
+            self.lasts.append(last)
+
+    def __len__(self):
+        return len(self.firsts)
+
+    def __contains__(self, value):
+        i = bisect.bisect_right(self.firsts, value) - 1
+        return i >= 0 and value <= self.lasts[i]
+
+    def ranges(self):
+        return zip(self.firsts, self.lasts)
+
+    def copy(self):
+        copy = IntervalSet()
+        copy.firsts = list(self.firsts)
+        copy.lasts = list(self.lasts)
+        return copy
+
+    def first_from(self, start):
+        """Return the lowest value >= start, wrapping around if needed."""
+        if not self.firsts:
+            return
+        i = bisect.bisect_right(self.firsts, start) - 1
+        if i >= 0 and start <= self.lasts[i]:
+            return start
+        if i + 1 < len(self.firsts):
+            return self.firsts[i + 1]
+        return self.firsts[0]
+
+    def remove(self, value):
+        """Remove value from the set. Returns False if it was not there."""
+        i = bisect.bisect_right(self.firsts, value) - 1
+        if i < 0 or value > self.lasts[i]:
+            return False
+        first, last = self.firsts[i], self.lasts[i]
+        if first == last:
+            del self.firsts[i]
+            del self.lasts[i]
+        elif value == first:
+            self.firsts[i] = value + 1
+        elif value == last:
+            self.lasts[i] = value - 1
+        else:
+            self.lasts[i] = value - 1
+            self.firsts.insert(i + 1, value + 1)
+            self.lasts.insert(i + 1, last)
+        return True
+
+    def add(self, value):
+        """Add value to the set, merging adjacent ranges."""
+        i = bisect.bisect_right(self.firsts, value) - 1
+        if i >= 0 and value <= self.lasts[i]:
+            return
+        merge_prev = i >= 0 and self.lasts[i] == value - 1
+        merge_next = (i + 1 < len(self.firsts) and
+                      self.firsts[i + 1] == value + 1)
+        if merge_prev and merge_next:
+            self.lasts[i] = self.lasts[i + 1]
+            del self.firsts[i + 1]
+            del self.lasts[i + 1]
+        elif merge_prev:
+            self.lasts[i] = value
+        elif merge_next:
+            self.firsts[i + 1] = value
+        else:
+            self.firsts.insert(i + 1, value)
+            self.lasts.insert(i + 1, value)
+
+    def to_json(self):
+        return jsonutils.dumps([[first, last] for first, last
+                                in self.ranges()])
+
+    @classmethod
+    def from_json(cls, data):
+        return cls([(first, last) for first, last in jsonutils.loads(data)])
+
+
+class _SubnetState(object):
+    """Cached view of the IPAvailabilitySet row of a subnet."""
+
+    def __init__(self, revision, free, next_ip, pools):
+        self.revision = revision
+        self.free = free
+        self.next_ip = next_ip
+        self.pools = pools
+
+
+class IntervalIpamDriver(object):
+    """IPAM driver allocating IPs without taking a lock on the subnet.
+
+    The free IPs of each subnet are kept in a single IPAvailabilitySet row,
+    which is cached in memory and updated with an optimistic
+    compare-and-swap on its revision. Each swap runs in a short transaction
+    of its own, so that the row is not locked until the end of the
+    transaction creating or deleting the port. When the swap fails because
+    of a concurrent update the row is re-read and the update retried.
+
+    An IP allocated in a transaction which then rolls back is released
+    again. A released IP is only returned to the free ranges once the
+    transaction releasing it commits, and allocation continues from the
+    last allocated address so that recently released IPs are not reused
+    straight away.
+    """
+
+    def __init__(self):
+        self._subnets = {}
+
+    def initialize_subnet(self, context, subnet_id, pools):
+        """Create the availability set of a new subnet."""
+        pools = [(int(netaddr.IPAddress(pool['start'])),
+                  int(netaddr.IPAddress(pool['end'])))
+                 for pool in pools]
+        # There is no relationship ordering the insert of the set after
+        # the one of its subnet, flush the pending subnet first
+        context.session.flush()
+        state = self._create_state(context.session, subnet_id,
+                                   IntervalSet(pools), pools)
+        _when_transaction_ends(
+            context.session,
+            on_commit=lambda: self._subnets.__setitem__(subnet_id, state))
+
+    def forget_subnet(self, session, subnet_id):
+        """Drop the cached state of a subnet deleted in session."""
+        _when_transaction_ends(
+            session, on_commit=lambda: self._subnets.pop(subnet_id, None))
+
+    def generate_ip(self, context, subnets):
+        for subnet in subnets:
+            ip_address = self._update(subnet['id'], self._allocate_next)
+            if ip_address:
+                self._release_on_rollback(context, subnet['id'], ip_address)
+                LOG.debug(_("Allocated IP %(ip_address)s from subnet "
+                            "%(subnet_id)s"),
+                          {'ip_address': ip_address,
+                           'subnet_id': subnet['id']})
+                return {'ip_address': ip_address, 'subnet_id': subnet['id']}
+            LOG.debug(_("All IPs from subnet %(subnet_id)s (%(cidr)s) "
+                        "allocated"),
+                      {'subnet_id': subnet['id'], 'cidr': subnet['cidr']})
+        raise q_exc.IpAddressGenerationFailure(net_id=subnets[0]['network_id'])
+
+    def allocate_specific_ip(self, context, subnet_id, ip_address):
+        ip = int(netaddr.IPAddress(ip_address))
+        if self._update(subnet_id,
+                        lambda state: state.free.remove(ip) and ip_address):
+            self._release_on_rollback(context, subnet_id, ip_address)
+
+    def release_ip(self, context, subnet_id, ip_address):
+        # The IP is still allocated if the deletion rolls back
+        _when_transaction_ends(
+            context.session,
+            on_commit=lambda: self._release(subnet_id, ip_address))
+
+    def _release_on_rollback(self, context, subnet_id, ip_address):
+        _when_transaction_ends(
+            context.session,
+            on_rollback=lambda: self._release(subnet_id, ip_address))
+
+    def _release(self, subnet_id, ip_address):
+        ip = int(netaddr.IPAddress(ip_address))
+
+        def _release(state):
+            if (ip not in state.free and
+                    any(first <= ip <= last for first, last in state.pools)):
+                state.free.add(ip)
+                return True
+
+        self._update(subnet_id, _release)
+
+    @staticmethod
+    def _allocate_next(state):
+        ip = state.free.first_from(state.next_ip)
+        if ip is None:
+            return
+        state.free.remove(ip)
+        state.next_ip = ip + 1
+        return str(netaddr.IPAddress(ip))
+
+    def _update(self, subnet_id, func):
+        """Apply func to the subnet state and store it with a CAS.
+
+        func modifies the state it is given and returns a true value if the
+        state needs to be persisted; this value is then returned. The state
+        is read and swapped in transactions of their own, which always see
+        the latest committed state.
+        """
+        session = db_api.get_session()
+        state = self._subnets.get(subnet_id)
+        reloaded = False
+        for attempt in xrange(cfg.CONF.ipam_cas_retries + 1):
+            if state is None:
+                state = self._load_state(session, subnet_id)
+                reloaded = True
+                if state is None:
+                    # The subnet was deleted
+                    self._subnets.pop(subnet_id, None)
+                    return
+            new_state = _SubnetState(uuidutils.generate_uuid(),
+                                     state.free.copy(), state.next_ip,
+                                     state.pools)
+            result = func(new_state)
+            if not result:
+                if reloaded:
+                    return
+                # The cached state might be stale, reload it
+                state = None
+                continue
+            with session.begin():
+                swapped = self._swap(session, subnet_id, state.revision,
+                                     new_state)
+            if swapped:
+                self._subnets[subnet_id] = new_state
+                return result
+            LOG.debug(_("Concurrent update of the IP availability of "
+                        "subnet %s, retrying"), subnet_id)
+            state = None
+        raise q_exc.IpAvailabilityUpdateConflict(subnet_id=subnet_id)
+
+    def _swap(self, session, subnet_id, revision, state):
+        query = session.query(IPAvailabilitySet).filter_by(
+            subnet_id=subnet_id, revision=revision)
+        count = query.update({'free_ranges': state.free.to_json(),
+                              'next_ip': str(state.next_ip),
+                              'revision': state.revision},
+                             synchronize_session=False)
+        return count == 1
+
+    def _load_state(self, session, subnet_id):
+        """Return the committed state of the subnet, None if deleted."""
+        record = session.query(IPAvailabilitySet).filter_by(
+            subnet_id=subnet_id).populate_existing().first()
+        if not record:
+            return self._rebuild_state(session, subnet_id)
+        return _SubnetState(record.revision,
+                            IntervalSet.from_json(record.free_ranges),
+                            int(record.next_ip),
+                            self._get_pools(session, subnet_id))
+
+    def _rebuild_state(self, session, subnet_id):
+        """Build the availability set of a subnet created without one."""
+        if not session.query(models_v2.Subnet).filter_by(
+                id=subnet_id).count():
+            return
+        LOG.debug(_("Building IP availability set for subnet %s"), subnet_id)
+        pools = self._get_pools(session, subnet_id)
+        free = IntervalSet(pools)
+        allocations = session.query(
+            models_v2.IPAllocation).filter_by(subnet_id=subnet_id)
+        for allocation in allocations:
+            free.remove(int(netaddr.IPAddress(allocation['ip_address'])))
+        try:
+            with session.begin():
+                return self._create_state(session, subnet_id, free, pools)
+        except db_exc.DBDuplicateEntry:
+            # Another server built it first
+            session.expunge_all()
+            record = session.query(IPAvailabilitySet).get(subnet_id)
+            return _SubnetState(record.revision,
+                                IntervalSet.from_json(record.free_ranges),
+                                int(record.next_ip), pools)
+
+    def _create_state(self, session, subnet_id, free, pools):
+        state = _SubnetState(uuidutils.generate_uuid(), free,
+                             free.firsts[0] if len(free) else 0, pools)
+        with session.begin(subtransactions=True):
+            session.add(IPAvailabilitySet(
+                subnet_id=subnet_id,
+                free_ranges=free.to_json(),
+                next_ip=str(state.next_ip),
+                revision=state.revision))
+        return state
+
+    def _get_pools(self, session, subnet_id):
+        # Allocation pools cannot be updated, they can safely be cached
+        state = self._subnets.get(subnet_id)
+        if state:
+            return state.pools
+        pools = session.query(
+            models_v2.IPAllocationPool).filter_by(subnet_id=subnet_id)
+        return [(int(netaddr.IPAddress(pool['first_ip'])),
+                 int(netaddr.IPAddress(pool['last_ip'])))
+                for pool in pools]
@@ -126,8 +126,8 @@ class L3AgentSchedulerDbMixin(l3agentscheduler.L3AgentSchedulerPluginBase,
         else:
             return {'routers': []}
 
-    def list_active_sync_routers_on_active_l3_agent(
-            self, context, host, router_ids):
+    def list_router_ids_on_active_l3_agent(self, context, host,
+                                           router_ids=None):
         agent = self._get_agent_by_type_and_host(
             context, constants.AGENT_TYPE_L3, host)
         if not agent.admin_state_up:
@@ -141,7 +141,12 @@ class L3AgentSchedulerDbMixin(l3agentscheduler.L3AgentSchedulerPluginBase,
         else:
             query = query.filter(
                 RouterL3AgentBinding.router_id.in_(router_ids))
-        router_ids = [item[0] for item in query]
+        return [item[0] for item in query]
+
+    def list_active_sync_routers_on_active_l3_agent(
+            self, context, host, router_ids):
+        router_ids = self.list_router_ids_on_active_l3_agent(
+            context, host, router_ids)
         if router_ids:
             return self.get_sync_data(context, router_ids=router_ids,
                                       active=True)
@@ -168,7 +173,7 @@ class L3AgentSchedulerDbMixin(l3agentscheduler.L3AgentSchedulerPluginBase,
             l3_agents = [l3_agent for l3_agent in
                          l3_agents if not
                          agents_db.AgentDbMixin.is_agent_down(
-                             l3_agent['heartbeat_timestamp'])]
+                             agents_db.get_heartbeat_timestamp(l3_agent))]
         return l3_agents
 
     def _get_l3_bindings_hosting_routers(self, context, router_ids):
@@ -219,23 +224,30 @@ class L3AgentSchedulerDbMixin(l3agentscheduler.L3AgentSchedulerPluginBase,
             if not l3_agent.admin_state_up:
                 continue
             agent_conf = self.get_configuration_dict(l3_agent)
-            router_id = agent_conf.get('router_id', None)
-            use_namespaces = agent_conf.get('use_namespaces', True)
-            handle_internal_only_routers = agent_conf.get(
-                'handle_internal_only_routers', True)
-            gateway_external_network_id = agent_conf.get(
-                'gateway_external_network_id', None)
-            if not use_namespaces and router_id != sync_router['id']:
-                continue
-            ex_net_id = (sync_router['external_gateway_info'] or {}).get(
-                'network_id')
-            if ((not ex_net_id and not handle_internal_only_routers) or
-                (ex_net_id and gateway_external_network_id and
-                 ex_net_id != gateway_external_network_id)):
-                continue
-            candidates.append(l3_agent)
+            if self.is_router_supported_by_agent_conf(sync_router,
+                                                      agent_conf):
+                candidates.append(l3_agent)
         return candidates
 
+    @staticmethod
+    def is_router_supported_by_agent_conf(sync_router, agent_conf):
+        """Check whether an l3 agent with agent_conf can host the router."""
+        router_id = agent_conf.get('router_id', None)
+        use_namespaces = agent_conf.get('use_namespaces', True)
+        handle_internal_only_routers = agent_conf.get(
+            'handle_internal_only_routers', True)
+        gateway_external_network_id = agent_conf.get(
+            'gateway_external_network_id', None)
+        if not use_namespaces and router_id != sync_router['id']:
+            return False
+        ex_net_id = (sync_router['external_gateway_info'] or {}).get(
+            'network_id')
+        if ((not ex_net_id and not handle_internal_only_routers) or
+            (ex_net_id and gateway_external_network_id and
+             ex_net_id != gateway_external_network_id)):
+            return False
+        return True
+
     def auto_schedule_routers(self, context, host, router_ids):
         if self.router_scheduler:
             return self.router_scheduler.auto_schedule_routers(
@@ -248,8 +260,9 @@ class L3AgentSchedulerDbMixin(l3agentscheduler.L3AgentSchedulerPluginBase,
 
     def schedule_routers(self, context, routers):
         """Schedule the routers to l3 agents."""
-        for router in routers:
-            self.schedule_router(context, router)
+        if self.router_scheduler:
+            return self.router_scheduler.schedule_routers(
+                self, context, routers)
 
     def get_l3_agent_with_min_routers(self, context, agent_ids):
         """Return l3 agent with the least number of routers."""
@@ -54,6 +54,29 @@ class Router(model_base.BASEV2, models_v2.HasId, models_v2.HasTenant):
     gw_port = orm.relationship(models_v2.Port)
 
 
+class RouterRevision(model_base.BASEV2):
+    """Represents the revision at which a router last changed.
+
+    The revisions are shared by all the routers and only grow, so that the
+    l3 agents can ask for the routers changed after the revision they last
+    synchronized. The row of a deleted router is kept to report it removed.
+    """
+
+    router_id = sa.Column(sa.String(36), primary_key=True)
+    revision = sa.Column(sa.BigInteger, nullable=False, index=True)
+
+
+class RouterRevisionCounter(model_base.BASEV2):
+    """Holds the last router revision given, in a single row.
+
+    The row stays locked until the change taking a revision commits, so
+    that the revisions are given and committed in the same order.
+    """
+
+    id = sa.Column(sa.Integer, primary_key=True, autoincrement=False)
+    revision = sa.Column(sa.BigInteger, nullable=False)
+
+
 class FloatingIP(model_base.BASEV2, models_v2.HasId, models_v2.HasTenant):
     """Represents a floating IP address.
 
@@ -774,6 +797,37 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
                 router['gw_port'] = gw_port_id_gw_port_dict[gw_port_id]
         return routers
 
+    def get_routers_revision(self, context):
+        """Return the revision of the last change of any router."""
+        query = context.reader_session.query(RouterRevisionCounter.revision)
+        return query.scalar() or 0
+
+    def _next_router_revision(self, context):
+        query = context.session.query(RouterRevisionCounter)
+        counter = query.with_lockmode('update').first()
+        if not counter:
+            # the migration creates the row, the models alone don't
+            counter = RouterRevisionCounter(id=1, revision=0)
+            context.session.add(counter)
+        counter.revision += 1
+        return counter.revision
+
+    def bump_router_revisions(self, context, router_ids):
+        """Record that the routers changed at a new revision."""
+        if not router_ids:
+            return
+        with context.session.begin(subtransactions=True):
+            revision = self._next_router_revision(context)
+            for router_id in set(router_ids):
+                context.session.merge(RouterRevision(router_id=router_id,
+                                                     revision=revision))
+
+    def get_router_ids_changed_since(self, context, revision):
+        """Return the ids of the routers changed after revision."""
+        query = context.reader_session.query(RouterRevision.router_id)
+        query = query.filter(RouterRevision.revision > revision)
+        return [item[0] for item in query]
+
     def _get_sync_routers(self, context, router_ids=None, active=None):
         """Query routers and their gw ports for l3 agent.
 
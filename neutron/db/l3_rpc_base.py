@@ -35,15 +35,23 @@ class L3RpcCallbackMixin(object):
         """Sync routers according to filters to a specific agent.
 
         @param context: contain user information
-        @param kwargs: host, router_ids
+        @param kwargs: host, router_ids, and page_size, marker and
+                       since_revision to get a page of the routers
         @return: a list of routers
-                 with their interfaces and floating_ips
+                 with their interfaces and floating_ips, or a page of
+                 them as returned by _sync_routers_page if page_size is
+                 given
         """
         router_ids = kwargs.get('router_ids')
         host = kwargs.get('host')
         context = neutron_context.get_admin_context()
+        context.allow_slave_reads()
         l3plugin = manager.NeutronManager.get_service_plugins()[
             plugin_constants.L3_ROUTER_NAT]
+        if l3plugin and kwargs.get('page_size'):
+            return self._sync_routers_page(
+                context, l3plugin, host, router_ids, kwargs['page_size'],
+                kwargs.get('marker'), kwargs.get('since_revision'))
         if not l3plugin:
             routers = {}
             LOG.error(_('No plugin for L3 routing registered! Will reply '
@@ -64,6 +72,68 @@ class L3RpcCallbackMixin(object):
                   jsonutils.dumps(routers, indent=5))
         return routers
 
+    def _sync_routers_page(self, context, l3plugin, host, router_ids,
+                           page_size, marker, since_revision):
+        """Return a page of the routers to sync, in the order of their ids.
+
+        The page holds the routers whose id follows marker, restricted to
+        the routers changed after since_revision if it is given. The reply
+        is a dict with:
+            routers: the routers of the page, with their interfaces and
+                     floating_ips
+            router_ids: the ids the routers of the page were looked up
+                        for, a router missing from routers being disabled
+            next_marker: the marker of the next page, None on the last one
+            revision: the revision of the routers, to use as the
+                      since_revision of the next incremental sync
+            hosted_router_ids: on the first page only, the ids of all the
+                               routers hosted by the agent
+        """
+        # read before the auto scheduling, the routers it binds to the
+        # agent are then also part of the next incremental sync
+        revision = l3plugin.get_routers_revision(context)
+        scheduling = utils.is_extension_supported(
+            l3plugin, constants.L3_AGENT_SCHEDULER_EXT_ALIAS)
+        if scheduling:
+            if marker is None and cfg.CONF.router_auto_schedule:
+                l3plugin.auto_schedule_routers(context, host, router_ids)
+            hosted_router_ids = l3plugin.list_router_ids_on_active_l3_agent(
+                context, host, router_ids)
+        else:
+            filters = {'id': router_ids} if router_ids else None
+            hosted_router_ids = [router['id'] for router in
+                                 l3plugin.get_routers(context, filters,
+                                                      fields=['id'])]
+        page_ids = sorted(router_id for router_id in hosted_router_ids
+                          if marker is None or router_id > marker)
+        if since_revision is not None:
+            changed_ids = set(l3plugin.get_router_ids_changed_since(
+                context, since_revision))
+            page_ids = [router_id for router_id in page_ids
+                        if router_id in changed_ids]
+        next_marker = None
+        if len(page_ids) > page_size:
+            page_ids = page_ids[:page_size]
+            next_marker = page_ids[-1]
+        routers = []
+        if page_ids:
+            routers = l3plugin.get_sync_data(
+                context, page_ids, active=scheduling or None)
+        plugin = manager.NeutronManager.get_plugin()
+        if utils.is_extension_supported(
+            plugin, constants.PORT_BINDING_EXT_ALIAS):
+            self._ensure_host_set_on_ports(context, plugin, host, routers)
+        LOG.debug(_("Page of %(count)d routers returned to l3 agent, next "
+                    "marker %(marker)s"),
+                  {'count': len(routers), 'marker': next_marker})
+        page = {'routers': routers,
+                'router_ids': page_ids,
+                'next_marker': next_marker,
+                'revision': revision}
+        if marker is None:
+            page['hosted_router_ids'] = hosted_router_ids
+        return page
+
     def _ensure_host_set_on_ports(self, context, plugin, host, routers):
         for router in routers:
             LOG.debug(_("Checking router: %(id)s for host: %(host)s"),
@@ -104,8 +104,8 @@ class MeteringDbMixin(metering.MeteringPluginBase,
     def get_metering_labels(self, context, filters=None, fields=None,
                             sorts=None, limit=None, marker=None,
                             page_reverse=False):
-        marker_obj = self._get_marker_obj(context, 'metering_labels', limit,
-                                          marker)
+        marker_obj = self._get_model_marker_obj(context, MeteringLabel,
+                                                limit, marker)
         return self._get_collection(context, MeteringLabel,
                                     self._make_metering_label_dict,
                                     filters=filters, fields=fields,
@@ -125,8 +125,8 @@ class MeteringDbMixin(metering.MeteringPluginBase,
     def get_metering_label_rules(self, context, filters=None, fields=None,
                                  sorts=None, limit=None, marker=None,
                                  page_reverse=False):
-        marker_obj = self._get_marker_obj(context, 'metering_label_rules',
-                                          limit, marker)
+        marker_obj = self._get_model_marker_obj(context, MeteringLabelRule,
+                                                limit, marker)
 
         return self._get_collection(context, MeteringLabelRule,
                                     self._make_metering_label_rule_dict,
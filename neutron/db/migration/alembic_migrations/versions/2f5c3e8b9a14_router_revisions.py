@@ -0,0 +1,66 @@
+# Copyright 2014 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""router revisions
+
+Revision ID: 2f5c3e8b9a14
+Revises: 4a9d2b5f0e71
+Create Date: 2014-03-24 10:12:37.518036
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '2f5c3e8b9a14'
+down_revision = '4a9d2b5f0e71'
+
+# Change to ['*'] if this migration applies to all plugins
+
+migration_for_plugins = ['*']
+
+from alembic import op
+import sqlalchemy as sa
+
+from neutron.db import migration
+
+
+def upgrade(active_plugins=None, options=None):
+    if not migration.should_run(active_plugins, migration_for_plugins):
+        return
+
+    op.create_table(
+        'routerrevisions',
+        sa.Column('router_id', sa.String(length=36), nullable=False),
+        sa.Column('revision', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('router_id'),
+    )
+    op.create_index('ix_routerrevisions_revision', 'routerrevisions',
+                    ['revision'])
+    op.create_table(
+        'routerrevisioncounters',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('revision', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.execute("INSERT INTO routerrevisioncounters (id, revision) "
+               "VALUES (1, 0)")
+
+
+def downgrade(active_plugins=None, options=None):
+    if not migration.should_run(active_plugins, migration_for_plugins):
+        return
+
+    op.drop_table('routerrevisioncounters')
+    op.drop_index('ix_routerrevisions_revision', 'routerrevisions')
+    op.drop_table('routerrevisions')
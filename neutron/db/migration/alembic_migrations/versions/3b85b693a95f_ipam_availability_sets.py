@@ -0,0 +1,58 @@
+# Copyright 2014 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""ipam availability sets
+
+Revision ID: 3b85b693a95f
+Revises: fcac4c42e2cc
+Create Date: 2014-03-10 10:12:31.534207
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3b85b693a95f'
+down_revision = 'fcac4c42e2cc'
+
+# Change to ['*'] if this migration applies to all plugins
+
+migration_for_plugins = ['*']
+
+from alembic import op
+import sqlalchemy as sa
+
+from neutron.db import migration
+
+
+def upgrade(active_plugins=None, options=None):
+    if not migration.should_run(active_plugins, migration_for_plugins):
+        return
+
+    op.create_table(
+        'ipavailabilitysets',
+        sa.Column('subnet_id', sa.String(length=36), nullable=False),
+        sa.Column('free_ranges', sa.Text(), nullable=False),
+        sa.Column('next_ip', sa.String(length=64), nullable=False),
+        sa.Column('revision', sa.String(length=36), nullable=False),
+        sa.ForeignKeyConstraint(['subnet_id'], ['subnets.id'],
+                                ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('subnet_id'),
+    )
+
+
+def downgrade(active_plugins=None, options=None):
+    if not migration.should_run(active_plugins, migration_for_plugins):
+        return
+
+    op.drop_table('ipavailabilitysets')
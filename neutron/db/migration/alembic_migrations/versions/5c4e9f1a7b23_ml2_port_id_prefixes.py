@@ -0,0 +1,63 @@
+# Copyright 2014 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""ml2 port id prefixes
+
+Revision ID: 5c4e9f1a7b23
+Revises: 2f5c3e8b9a14
+Create Date: 2014-03-31 15:42:08.207113
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '5c4e9f1a7b23'
+down_revision = '2f5c3e8b9a14'
+
+# Change to ['*'] if this migration applies to all plugins
+
+migration_for_plugins = [
+    'neutron.plugins.ml2.plugin.Ml2Plugin'
+]
+
+from alembic import op
+import sqlalchemy as sa
+
+from neutron.db import migration
+
+
+def upgrade(active_plugins=None, options=None):
+    if not migration.should_run(active_plugins, migration_for_plugins):
+        return
+
+    op.create_table(
+        'ml2_port_id_prefixes',
+        sa.Column('port_id', sa.String(length=36), nullable=False),
+        sa.Column('prefix', sa.String(length=11), nullable=False),
+        sa.ForeignKeyConstraint(['port_id'], ['ports.id'],
+                                ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('port_id'),
+    )
+    op.create_index('ix_ml2_port_id_prefixes_prefix', 'ml2_port_id_prefixes',
+                    ['prefix'])
+    op.execute("INSERT INTO ml2_port_id_prefixes (port_id, prefix) "
+               "SELECT id, SUBSTR(id, 1, 11) FROM ports")
+
+
+def downgrade(active_plugins=None, options=None):
+    if not migration.should_run(active_plugins, migration_for_plugins):
+        return
+
+    op.drop_index('ix_ml2_port_id_prefixes_prefix', 'ml2_port_id_prefixes')
+    op.drop_table('ml2_port_id_prefixes')
@@ -15,11 +15,37 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
+import functools
+
+from oslo.config import cfg
 import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy import orm
 
 from neutron.common import exceptions
+from neutron.db import api as db_api
 from neutron.db import model_base
 from neutron.db import models_v2
+from neutron.openstack.common.db import exception as db_exc
+from neutron.openstack.common import importutils
+from neutron.openstack.common import log as logging
+from neutron.openstack.common import timeutils
+
+LOG = logging.getLogger(__name__)
+
+# The models of the resources whose usage TrackingDbQuotaDriver maintains
+TRACKED_RESOURCE_MODELS = {
+    'network': 'neutron.db.models_v2.Network',
+    'subnet': 'neutron.db.models_v2.Subnet',
+    'port': 'neutron.db.models_v2.Port',
+    'router': 'neutron.db.l3_db.Router',
+    'floatingip': 'neutron.db.l3_db.FloatingIP',
+    'security_group': 'neutron.db.securitygroups_db.SecurityGroup',
+    'security_group_rule': 'neutron.db.securitygroups_db.SecurityGroupRule',
+}
+# Maps the models whose creations and deletions are tracked to their resource
+_TRACKED_MODELS = {}
 
 
 class Quota(model_base.BASEV2, models_v2.HasId):
@@ -33,6 +59,22 @@ class Quota(model_base.BASEV2, models_v2.HasId):
     limit = sa.Column(sa.Integer)
 
 
+class QuotaUsage(model_base.BASEV2):
+    """Represent the usage of a resource by a tenant.
+
+    in_use is updated in the transactions creating and deleting the
+    resource, reserved is the sum of the reservations not committed yet,
+    which are all expired after reservations_expire_at. A dirty usage is
+    counted again before being used.
+    """
+    tenant_id = sa.Column(sa.String(255), primary_key=True)
+    resource = sa.Column(sa.String(255), primary_key=True)
+    in_use = sa.Column(sa.Integer, nullable=False, default=0)
+    reserved = sa.Column(sa.Integer, nullable=False, default=0)
+    reservations_expire_at = sa.Column(sa.DateTime)
+    dirty = sa.Column(sa.Boolean, nullable=False, default=False)
+
+
 class DbQuotaDriver(object):
     """Driver to perform necessary checks to enforce quotas and obtain quota
     information.
@@ -179,3 +221,203 @@ class DbQuotaDriver(object):
                  if quotas[key] >= 0 and quotas[key] < val]
         if overs:
             raise exceptions.OverQuota(overs=sorted(overs))
+
+
+class Reservation(object):
+    """Quota reserved for a tenant until the resources are created."""
+
+    def __init__(self, tenant_id, deltas):
+        self.tenant_id = tenant_id
+        self.deltas = deltas
+
+
+def _update_usage(resource, delta, mapper, connection, target):
+    usages = QuotaUsage.__table__
+    connection.execute(
+        usages.update().
+        where(usages.c.tenant_id == target.tenant_id).
+        where(usages.c.resource == resource).
+        values(in_use=usages.c.in_use + delta))
+
+
+def _mark_usages_dirty(session, query, query_context, result):
+    # The deleted rows are unknown, recount the usage of all the tenants
+    for description in query.column_descriptions:
+        resource = _TRACKED_MODELS.get(description['type'])
+        if resource:
+            usages = QuotaUsage.__table__
+            session.execute(usages.update().
+                            where(usages.c.resource == resource).
+                            values(dirty=True))
+
+
+def _track_resources():
+    if _TRACKED_MODELS:
+        return
+    event.listen(orm.Session, 'after_bulk_delete', _mark_usages_dirty)
+    for resource, model_path in TRACKED_RESOURCE_MODELS.items():
+        try:
+            model = importutils.import_class(model_path)
+        except ImportError:
+            LOG.debug(_("Unable to track the usage of %s"), resource)
+            continue
+        _TRACKED_MODELS[model] = resource
+        event.listen(model, 'after_insert',
+                     functools.partial(_update_usage, resource, 1))
+        event.listen(model, 'after_delete',
+                     functools.partial(_update_usage, resource, -1))
+
+
+class TrackingDbQuotaDriver(DbQuotaDriver):
+    """Quota driver maintaining the usage of the resources in the database.
+
+    Instead of counting the resources of a tenant on each creation, their
+    usage is updated in the transactions creating and deleting them, and
+    the quota is reserved until the creation is over. The usages are
+    counted when first used, when bulk deletions may have changed them,
+    and before refusing a reservation in case they have drifted.
+
+    The resources which aren't in TRACKED_RESOURCE_MODELS are counted on
+    each reservation, like with DbQuotaDriver.
+
+    A reservation which is neither committed nor cancelled, e.g. because
+    its server died while creating the resources, expires after
+    reservation_expiration seconds.
+    """
+
+    def __init__(self):
+        _track_resources()
+        # The resources created before the tracking started are unknown
+        session = db_api.get_session()
+        with session.begin():
+            session.query(QuotaUsage).update({'dirty': True},
+                                             synchronize_session=False)
+
+    @staticmethod
+    def track_resources():
+        """Update the usages on the creations and deletions of resources.
+
+        Every process creating or deleting resources must call it, even
+        if it never reserves quota.
+        """
+        _track_resources()
+
+    def _get_usage(self, context, tenant_id, resource, count):
+        """Return the usage of the resource, locked for update."""
+        usage = context.session.query(QuotaUsage).filter_by(
+            tenant_id=tenant_id, resource=resource).with_lockmode(
+                'update').first()
+        if usage is None:
+            usage = QuotaUsage(tenant_id=tenant_id, resource=resource,
+                               in_use=count(resource), reserved=0,
+                               dirty=False)
+            context.session.add(usage)
+        else:
+            if usage.dirty:
+                usage.in_use = count(resource)
+                usage.dirty = False
+            if (usage.reserved and
+                    usage.reservations_expire_at < timeutils.utcnow()):
+                LOG.warning(_("Expiring %(reserved)s reservations of "
+                              "%(resource)s for tenant %(tenant_id)s"),
+                            {'reserved': usage.reserved,
+                             'resource': resource, 'tenant_id': tenant_id})
+                usage.reserved = 0
+        return usage
+
+    def _reserve(self, context, tenant_id, quotas, deltas, count):
+        tracked = set(_TRACKED_MODELS.values())
+        with context.session.begin(subtransactions=True):
+            usages = dict((key, self._get_usage(context, tenant_id, key,
+                                                count))
+                          for key in deltas if key in tracked)
+
+            def get_overs():
+                overs = []
+                for key, delta in deltas.items():
+                    if quotas[key] < 0:
+                        continue
+                    usage = usages.get(key)
+                    if usage:
+                        used = usage.in_use + usage.reserved
+                    else:
+                        used = count(key)
+                    if used + delta > quotas[key]:
+                        overs.append(key)
+                return overs
+
+            overs = get_overs()
+            if overs:
+                # The usages may have drifted, recount them before refusing
+                for key in overs:
+                    if key in usages:
+                        usages[key].in_use = count(key)
+                overs = get_overs()
+                if overs:
+                    raise exceptions.OverQuota(overs=sorted(overs))
+            expire_at = timeutils.utcnow() + datetime.timedelta(
+                seconds=cfg.CONF.QUOTAS.reservation_expiration)
+            for key, usage in usages.items():
+                usage.reserved += deltas[key]
+                usage.reservations_expire_at = expire_at
+        return Reservation(tenant_id,
+                           dict((key, deltas[key]) for key in usages))
+
+    def make_reservation(self, context, tenant_id, resources, deltas,
+                         *count_args):
+        """Reserve quota for the creation of resources.
+
+        This method will raise a QuotaResourceUnknown exception if a
+        given resource is unknown.
+
+        If any of the resources would go over the quota, an OverQuota
+        exception will be raised with the sorted list of these resources.
+        Otherwise, the reservation is returned, which must be committed or
+        cancelled once the resources are created or their creation failed.
+
+        :param context: The request context, for access checks.
+        :param tenant_id: The tenant_id to reserve quota for.
+        :param resources: A dictionary of the registered resources.
+        :param deltas: A dictionary of the number of resources to create.
+        :param count_args: The arguments of the count functions of the
+                           resources.
+        """
+
+        # Ensure no value is less than zero
+        unders = [key for key, val in deltas.items() if val < 0]
+        if unders:
+            raise exceptions.InvalidQuotaValue(unders=sorted(unders))
+
+        quotas = self._get_quotas(context, tenant_id, resources,
+                                  deltas.keys())
+
+        def count(key):
+            return resources[key].count(context, *count_args)
+
+        try:
+            return self._reserve(context, tenant_id, quotas, deltas, count)
+        except db_exc.DBDuplicateEntry:
+            # Another request created the usage first, use it
+            return self._reserve(context, tenant_id, quotas, deltas, count)
+
+    def _release_reservation(self, context, reservation):
+        with context.session.begin(subtransactions=True):
+            for key, delta in reservation.deltas.items():
+                # The reservation may have expired already
+                context.session.query(QuotaUsage).filter_by(
+                    tenant_id=reservation.tenant_id, resource=key).update(
+                        {'reserved': sa.case(
+                            [(QuotaUsage.reserved > delta,
+                              QuotaUsage.reserved - delta)], else_=0)},
+                        synchronize_session=False)
+
+    def commit_reservation(self, context, reservation):
+        """Commit a reservation once the resources are created.
+
+        The creation of the resources already added them to the usages.
+        """
+        self._release_reservation(context, reservation)
+
+    def cancel_reservation(self, context, reservation):
+        """Cancel a reservation when the resources could not be created."""
+        self._release_reservation(context, reservation)
@@ -15,6 +15,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import hashlib
+
 import netaddr
 
 from neutron.common import constants as q_const
@@ -22,6 +24,7 @@ from neutron.common import utils
 from neutron.db import models_v2
 from neutron.db import securitygroups_db as sg_db
 from neutron.extensions import securitygroup as ext_sg
+from neutron.openstack.common import jsonutils
 from neutron.openstack.common import log as logging
 
 LOG = logging.getLogger(__name__)
@@ -35,6 +38,19 @@ DIRECTION_IP_PREFIX = {'ingress': 'source_ip_prefix',
                        'egress': 'dest_ip_prefix'}
 
 
+def get_member_revision(member_ips):
+    """Return the revision of the members of a security group.
+
+    The revision is computed from the member IP addresses, so that it is
+    the same on every server and changes whichever way the membership of
+    the group was updated.
+    """
+    data = jsonutils.dumps(dict((ethertype, sorted(ips)) for ethertype, ips
+                                in member_ips.iteritems()),
+                           sort_keys=True)
+    return hashlib.sha1(data).hexdigest()
+
+
 class SecurityGroupServerRpcMixin(sg_db.SecurityGroupDbMixin):
 
     def create_security_group_rule(self, context, security_group_rule):
@@ -126,6 +142,14 @@ class SecurityGroupServerRpcMixin(sg_db.SecurityGroupDbMixin):
 class SecurityGroupServerRpcCallbackMixin(object):
     """A mix-in that enable SecurityGroup agent support in plugin
     implementations.
+
+    API version history:
+        1.1 - security_group_rules_for_devices.
+        1.2 - Added security_group_info_for_devices, security_group_members
+              and security_group_member_updates.
+
+    The RPC_API_VERSION of the plugin callbacks must be at least 1.2 for
+    the agents to use the methods added in 1.2.
     """
 
     def security_group_rules_for_devices(self, context, **kwargs):
@@ -138,7 +162,80 @@ class SecurityGroupServerRpcCallbackMixin(object):
         :returns: port correspond to the devices with security group rules
         """
         devices = kwargs.get('devices')
+        context.allow_slave_reads()
+        ports = self._get_ports_for_devices(devices)
+        return self._security_group_rules_for_ports(context, ports)
+
+    def security_group_info_for_devices(self, context, **kwargs):
+        """Return security group rules and remote group members.
+
+        Unlike security_group_rules_for_devices, remote_group_id rules are
+        not converted, the IP addresses of the members of the remote groups
+        are returned once instead.
 
+        :params devices: list of devices
+        :params sg_member_revisions: optional, dict of the member revisions
+        of the remote groups already known by the caller. The members of
+        these groups are only returned if their revision changed.
+        :returns: dict with the ports correspond to the devices with their
+        security group rules as 'devices', the member IP addresses of
+        the remote groups by ethertype as 'sg_member_ips' and the
+        revisions of these members as 'sg_member_revisions'
+        """
+        devices = kwargs.get('devices')
+        context.allow_slave_reads()
+        ports = self._get_ports_for_devices(devices)
+        self._add_security_group_rules_to_ports(context, ports)
+        remote_group_ids = self._select_remote_group_ids(ports)
+        for port in ports.values():
+            for rule in port['security_group_rules']:
+                remote_group_id = rule.get('remote_group_id')
+                if remote_group_id:
+                    port['security_group_source_groups'].append(
+                        remote_group_id)
+        revisions = kwargs.get('sg_member_revisions') or {}
+        info = self._select_changed_members(
+            context, dict((sg_id, revisions.get(sg_id))
+                          for sg_id in remote_group_ids))
+        info['devices'] = ports
+        return info
+
+    def security_group_members(self, context, **kwargs):
+        """Return the member IP addresses of security groups.
+
+        :params security_groups: list of security group ids
+        :returns: dict of the member IP addresses of each group by
+        ethertype
+        """
+        security_groups = kwargs.get('security_groups')
+        context.allow_slave_reads()
+        return self._select_member_ips_by_ethertype(context, security_groups)
+
+    def security_group_member_updates(self, context, **kwargs):
+        """Return the members of the security groups which changed.
+
+        :params sg_member_revisions: dict of the member revisions known by
+        the caller for each security group, None for the groups whose
+        members are unknown
+        :returns: dict with the member IP addresses by ethertype as
+        'sg_member_ips' and their revision as 'sg_member_revisions', only
+        for the groups whose revision differs from the given one
+        """
+        revisions = kwargs.get('sg_member_revisions')
+        context.allow_slave_reads()
+        return self._select_changed_members(context, revisions)
+
+    def _select_changed_members(self, context, revisions):
+        member_ips = self._select_member_ips_by_ethertype(context, revisions)
+        changed = {'sg_member_ips': {}, 'sg_member_revisions': {}}
+        for sg_id, ips in member_ips.iteritems():
+            revision = get_member_revision(ips)
+            if revision != revisions[sg_id]:
+                changed['sg_member_ips'][sg_id] = ips
+                changed['sg_member_revisions'][sg_id] = revision
+        return changed
+
+    def _get_ports_for_devices(self, devices):
         ports = {}
         for device in devices:
             port = self.get_port_from_device(device)
@@ -147,7 +244,7 @@ class SecurityGroupServerRpcCallbackMixin(object):
             if port['device_owner'].startswith('network:'):
                 continue
             ports[port['id']] = port
-        return self._security_group_rules_for_ports(context, ports)
+        return ports
 
     def _select_rules_for_ports(self, context, ports):
         if not ports:
@@ -157,8 +254,8 @@ class SecurityGroupServerRpcCallbackMixin(object):
 
         sgr_sgid = sg_db.SecurityGroupRule.security_group_id
 
-        query = context.session.query(sg_db.SecurityGroupPortBinding,
-                                      sg_db.SecurityGroupRule)
+        query = context.reader_session.query(sg_db.SecurityGroupPortBinding,
+                                             sg_db.SecurityGroupRule)
         query = query.join(sg_db.SecurityGroupRule,
                            sgr_sgid == sg_binding_sgid)
         query = query.filter(sg_binding_port.in_(ports.keys()))
@@ -175,9 +272,9 @@ class SecurityGroupServerRpcCallbackMixin(object):
         sg_binding_port = sg_db.SecurityGroupPortBinding.port_id
         sg_binding_sgid = sg_db.SecurityGroupPortBinding.security_group_id
 
-        query = context.session.query(sg_binding_sgid,
-                                      models_v2.Port,
-                                      models_v2.IPAllocation.ip_address)
+        query = context.reader_session.query(
+            sg_binding_sgid, models_v2.Port,
+            models_v2.IPAllocation.ip_address)
         query = query.join(models_v2.IPAllocation,
                            ip_port == sg_binding_port)
         query = query.join(models_v2.Port,
@@ -192,6 +289,18 @@ class SecurityGroupServerRpcCallbackMixin(object):
                         address_pair['ip_address'])
         return ips_by_group
 
+    def _select_member_ips_by_ethertype(self, context, security_group_ids):
+        ips = self._select_ips_for_remote_group(context,
+                                                set(security_group_ids))
+        member_ips = {}
+        for security_group_id, group_ips in ips.iteritems():
+            by_ethertype = member_ips[security_group_id] = {
+                q_const.IPv4: [], q_const.IPv6: []}
+            for ip in group_ips:
+                cidr = netaddr.IPNetwork(ip).cidr
+                by_ethertype['IPv%s' % cidr.version].append(str(cidr))
+        return member_ips
+
     def _select_remote_group_ids(self, ports):
         remote_group_ids = []
         for port in ports.values():
@@ -207,8 +316,8 @@ class SecurityGroupServerRpcCallbackMixin(object):
     def _select_dhcp_ips_for_network_ids(self, context, network_ids):
         if not network_ids:
             return {}
-        query = context.session.query(models_v2.Port,
-                                      models_v2.IPAllocation.ip_address)
+        query = context.reader_session.query(
+            models_v2.Port, models_v2.IPAllocation.ip_address)
         query = query.join(models_v2.IPAllocation)
         query = query.filter(models_v2.Port.network_id.in_(network_ids))
         owner = q_const.DEVICE_OWNER_DHCP
@@ -289,6 +398,10 @@ class SecurityGroupServerRpcCallbackMixin(object):
             self._add_ingress_dhcp_rule(port, ips)
 
     def _security_group_rules_for_ports(self, context, ports):
+        self._add_security_group_rules_to_ports(context, ports)
+        return self._convert_remote_group_id_to_ip_prefix(context, ports)
+
+    def _add_security_group_rules_to_ports(self, context, ports):
         rules_in_db = self._select_rules_for_ports(context, ports)
         for (binding, rule_in_db) in rules_in_db:
             port_id = binding['port_id']
@@ -309,4 +422,3 @@ class SecurityGroupServerRpcCallbackMixin(object):
                     rule_dict[key] = rule_in_db[key]
             port['security_group_rules'].append(rule_dict)
         self._apply_provider_rule(context, ports)
-        return self._convert_remote_group_id_to_ip_prefix(context, ports)
@@ -56,7 +56,11 @@ def paginate_query(query, model, limit, sorts, marker_obj=None):
     :return: The query with sorting/pagination added.
     """
     if not sorts:
-        return query
+        if not limit:
+            return query
+        # A page is only well defined in a unique order
+        sorts = [(key, True)
+                 for key in model.__table__.primary_key.columns.keys()]
 
     # A primary key must be specified in sort keys
     assert not (limit and
@@ -362,10 +362,17 @@ class VPNPluginDb(VPNPluginBase, base_db.CommonDbMixin):
         return self._make_ipsec_site_connection_dict(
             ipsec_site_conn_db, fields)
 
-    def get_ipsec_site_connections(self, context, filters=None, fields=None):
+    def get_ipsec_site_connections(self, context, filters=None, fields=None,
+                                   sorts=None, limit=None, marker=None,
+                                   page_reverse=False):
+        marker_obj = self._get_model_marker_obj(context, IPsecSiteConnection,
+                                                limit, marker)
         return self._get_collection(context, IPsecSiteConnection,
                                     self._make_ipsec_site_connection_dict,
-                                    filters=filters, fields=fields)
+                                    filters=filters, fields=fields,
+                                    sorts=sorts, limit=limit,
+                                    marker_obj=marker_obj,
+                                    page_reverse=page_reverse)
 
     def _make_ikepolicy_dict(self, ikepolicy, fields=None):
         res = {'id': ikepolicy['id'],
@@ -441,10 +448,17 @@ class VPNPluginDb(VPNPluginBase, base_db.CommonDbMixin):
         ike_db = self._get_resource(context, IKEPolicy, ikepolicy_id)
         return self._make_ikepolicy_dict(ike_db, fields)
 
-    def get_ikepolicies(self, context, filters=None, fields=None):
+    def get_ikepolicies(self, context, filters=None, fields=None,
+                        sorts=None, limit=None, marker=None,
+                        page_reverse=False):
+        marker_obj = self._get_model_marker_obj(context, IKEPolicy, limit,
+                                                marker)
         return self._get_collection(context, IKEPolicy,
                                     self._make_ikepolicy_dict,
-                                    filters=filters, fields=fields)
+                                    filters=filters, fields=fields,
+                                    sorts=sorts, limit=limit,
+                                    marker_obj=marker_obj,
+                                    page_reverse=page_reverse)
 
     def _make_ipsecpolicy_dict(self, ipsecpolicy, fields=None):
 
@@ -523,10 +537,17 @@ class VPNPluginDb(VPNPluginBase, base_db.CommonDbMixin):
         ipsec_db = self._get_resource(context, IPsecPolicy, ipsecpolicy_id)
         return self._make_ipsecpolicy_dict(ipsec_db, fields)
 
-    def get_ipsecpolicies(self, context, filters=None, fields=None):
+    def get_ipsecpolicies(self, context, filters=None, fields=None,
+                          sorts=None, limit=None, marker=None,
+                          page_reverse=False):
+        marker_obj = self._get_model_marker_obj(context, IPsecPolicy, limit,
+                                                marker)
         return self._get_collection(context, IPsecPolicy,
                                     self._make_ipsecpolicy_dict,
-                                    filters=filters, fields=fields)
+                                    filters=filters, fields=fields,
+                                    sorts=sorts, limit=limit,
+                                    marker_obj=marker_obj,
+                                    page_reverse=page_reverse)
 
     def _make_vpnservice_dict(self, vpnservice, fields=None):
         res = {'id': vpnservice['id'],
@@ -600,10 +621,17 @@ class VPNPluginDb(VPNPluginBase, base_db.CommonDbMixin):
         vpns_db = self._get_resource(context, VPNService, vpnservice_id)
         return self._make_vpnservice_dict(vpns_db, fields)
 
-    def get_vpnservices(self, context, filters=None, fields=None):
+    def get_vpnservices(self, context, filters=None, fields=None,
+                        sorts=None, limit=None, marker=None,
+                        page_reverse=False):
+        marker_obj = self._get_model_marker_obj(context, VPNService, limit,
+                                                marker)
         return self._get_collection(context, VPNService,
                                     self._make_vpnservice_dict,
-                                    filters=filters, fields=fields)
+                                    filters=filters, fields=fields,
+                                    sorts=sorts, limit=limit,
+                                    marker_obj=marker_obj,
+                                    page_reverse=page_reverse)
 
     def check_router_in_use(self, context, router_id):
         vpnservices = self.get_vpnservices(
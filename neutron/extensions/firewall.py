@@ -360,7 +360,8 @@ class FirewallPluginBase(ServicePluginBase):
         return 'Firewall service plugin'
 
     @abc.abstractmethod
-    def get_firewalls(self, context, filters=None, fields=None):
+    def get_firewalls(self, context, filters=None, fields=None, sorts=None,
+                      limit=None, marker=None, page_reverse=False):
         pass
 
     @abc.abstractmethod
@@ -380,7 +381,9 @@ class FirewallPluginBase(ServicePluginBase):
         pass
 
     @abc.abstractmethod
-    def get_firewall_rules(self, context, filters=None, fields=None):
+    def get_firewall_rules(self, context, filters=None, fields=None,
+                           sorts=None, limit=None, marker=None,
+                           page_reverse=False):
         pass
 
     @abc.abstractmethod
@@ -404,7 +407,9 @@ class FirewallPluginBase(ServicePluginBase):
         pass
 
     @abc.abstractmethod
-    def get_firewall_policies(self, context, filters=None, fields=None):
+    def get_firewall_policies(self, context, filters=None, fields=None,
+                              sorts=None, limit=None, marker=None,
+                              page_reverse=False):
         pass
 
     @abc.abstractmethod
@@ -402,7 +402,8 @@ class LoadBalancerPluginBase(ServicePluginBase):
         return 'LoadBalancer service plugin'
 
     @abc.abstractmethod
-    def get_vips(self, context, filters=None, fields=None):
+    def get_vips(self, context, filters=None, fields=None, sorts=None,
+                 limit=None, marker=None, page_reverse=False):
         pass
 
     @abc.abstractmethod
@@ -422,7 +423,8 @@ class LoadBalancerPluginBase(ServicePluginBase):
         pass
 
     @abc.abstractmethod
-    def get_pools(self, context, filters=None, fields=None):
+    def get_pools(self, context, filters=None, fields=None, sorts=None,
+                  limit=None, marker=None, page_reverse=False):
         pass
 
     @abc.abstractmethod
@@ -458,7 +460,8 @@ class LoadBalancerPluginBase(ServicePluginBase):
         pass
 
     @abc.abstractmethod
-    def get_members(self, context, filters=None, fields=None):
+    def get_members(self, context, filters=None, fields=None, sorts=None,
+                    limit=None, marker=None, page_reverse=False):
         pass
 
     @abc.abstractmethod
@@ -478,7 +481,9 @@ class LoadBalancerPluginBase(ServicePluginBase):
         pass
 
     @abc.abstractmethod
-    def get_health_monitors(self, context, filters=None, fields=None):
+    def get_health_monitors(self, context, filters=None, fields=None,
+                            sorts=None, limit=None, marker=None,
+                            page_reverse=False):
         pass
 
     @abc.abstractmethod
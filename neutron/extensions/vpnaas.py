@@ -400,7 +400,8 @@ class VPNPluginBase(ServicePluginBase):
         return 'VPN service plugin'
 
     @abc.abstractmethod
-    def get_vpnservices(self, context, filters=None, fields=None):
+    def get_vpnservices(self, context, filters=None, fields=None, sorts=None,
+                        limit=None, marker=None, page_reverse=False):
         pass
 
     @abc.abstractmethod
@@ -420,7 +421,9 @@ class VPNPluginBase(ServicePluginBase):
         pass
 
     @abc.abstractmethod
-    def get_ipsec_site_connections(self, context, filters=None, fields=None):
+    def get_ipsec_site_connections(self, context, filters=None, fields=None,
+                                   sorts=None, limit=None, marker=None,
+                                   page_reverse=False):
         pass
 
     @abc.abstractmethod
@@ -446,7 +449,8 @@ class VPNPluginBase(ServicePluginBase):
         pass
 
     @abc.abstractmethod
-    def get_ikepolicies(self, context, filters=None, fields=None):
+    def get_ikepolicies(self, context, filters=None, fields=None, sorts=None,
+                        limit=None, marker=None, page_reverse=False):
         pass
 
     @abc.abstractmethod
@@ -462,7 +466,8 @@ class VPNPluginBase(ServicePluginBase):
         pass
 
     @abc.abstractmethod
-    def get_ipsecpolicies(self, context, filters=None, fields=None):
+    def get_ipsecpolicies(self, context, filters=None, fields=None, sorts=None,
+                          limit=None, marker=None, page_reverse=False):
         pass
 
     @abc.abstractmethod
@@ -21,6 +21,7 @@ from neutron.openstack.common import importutils
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import periodic_task
 from neutron.plugins.common import constants
+from neutron import quota
 
 from stevedore import driver
 
@@ -123,6 +124,8 @@ class NeutronManager(object):
         # the rest of service plugins
         self.service_plugins = {constants.CORE: self.plugin}
         self._load_service_plugins()
+        # Every process loading the plugins creates or deletes resources
+        quota.QUOTAS.track_resources()
 
     def _get_plugin_instance(self, namespace, plugin_provider):
         try:
@@ -324,3 +324,23 @@ class NeutronPluginBaseV2(object):
         :param id: UUID representing the port to delete.
         """
         pass
+
+    def start_rpc_listener(self):
+        """Start the RPC listeners of the plugin.
+
+        Called in each of the rpc_workers processes, or once in the server
+        process when rpc_workers is 0, instead of consuming the plugin
+        topics when the plugin is created.
+
+        :returns: the connection consuming the plugin topics, which is
+                  closed to stop the listeners.
+
+        .. note:: this method is optional, plugins not implementing it
+                  consume their topics in the server process only.
+        """
+        raise NotImplementedError
+
+    def rpc_workers_supported(self):
+        """Return whether the plugin implements start_rpc_listener."""
+        return (self.__class__.start_rpc_listener !=
+                NeutronPluginBaseV2.start_rpc_listener)
@@ -868,18 +868,27 @@ class LinuxBridgeNeutronAgentRPC(sg_rpc.SecurityGroupAgentRpcMixin):
     def treat_devices_added(self, devices):
         resync = False
         self.prepare_devices_filter(devices)
-        for device in devices:
-            LOG.debug(_("Port %s added"), device)
-            try:
-                details = self.plugin_rpc.get_device_details(self.context,
-                                                             device,
-                                                             self.agent_id)
-            except Exception as e:
-                LOG.debug(_("Unable to get port details for "
-                            "%(device)s: %(e)s"),
-                          {'device': device, 'e': e})
+        devices = list(devices)
+        chunk_size = cfg.CONF.AGENT.rpc_devices_chunk_size
+        for i in xrange(0, len(devices), chunk_size):
+            if self._treat_devices_added_chunk(devices[i:i + chunk_size]):
                 resync = True
-                continue
+        return resync
+
+    def _treat_devices_added_chunk(self, devices):
+        LOG.debug(_("Ports %s added"), devices)
+        try:
+            devices_details_list = self.plugin_rpc.get_devices_details_list(
+                self.context, devices, self.agent_id)
+        except Exception as e:
+            LOG.debug(_("Unable to get port details for "
+                        "%(devices)s: %(e)s"),
+                      {'devices': devices, 'e': e})
+            return True
+        devices_up = []
+        devices_down = []
+        for details in devices_details_list:
+            device = details['device']
             if 'port_id' in details:
                 LOG.info(_("Port %(device)s updated. Details: %(details)s"),
                          {'device': device, 'details': details})
@@ -898,23 +907,26 @@ class LinuxBridgeNeutronAgentRPC(sg_rpc.SecurityGroupAgentRpcMixin):
                                                  details['physical_network'],
                                                  segmentation_id,
                                                  details['port_id']):
-
-                        # update plugin about port status
-                        self.plugin_rpc.update_device_up(self.context,
-                                                         device,
-                                                         self.agent_id,
-                                                         cfg.CONF.host)
+                        devices_up.append(device)
                     else:
-                        self.plugin_rpc.update_device_down(self.context,
-                                                           device,
-                                                           self.agent_id,
-                                                           cfg.CONF.host)
+                        devices_down.append(device)
                 else:
                     self.remove_port_binding(details['network_id'],
                                              details['port_id'])
             else:
                 LOG.info(_("Device %s not defined on plugin"), device)
-        return resync
+        if devices_up or devices_down:
+            # update plugin about port status
+            try:
+                self.plugin_rpc.update_devices_status(
+                    self.context, devices_up, devices_down, self.agent_id,
+                    cfg.CONF.host)
+            except Exception as e:
+                LOG.debug(_("Unable to update status of %(devices)s: "
+                            "%(e)s"),
+                          {'devices': devices_up + devices_down, 'e': e})
+                return True
+        return False
 
     def treat_devices_removed(self, devices):
         resync = False
@@ -991,6 +1003,11 @@ def main():
                     " Agent terminated!"), e)
         sys.exit(1)
     LOG.info(_("Interface mappings: %s"), interface_mappings)
+    if cfg.CONF.AGENT.rpc_devices_chunk_size < 1:
+        LOG.error(_("Invalid rpc_devices_chunk_size %s, it must be at "
+                    "least 1. Agent terminated!"),
+                  cfg.CONF.AGENT.rpc_devices_chunk_size)
+        sys.exit(1)
 
     polling_interval = cfg.CONF.AGENT.polling_interval
     root_helper = cfg.CONF.AGENT.root_helper
@@ -67,6 +67,10 @@ agent_opts = [
                       "polling for local device changes.")),
     cfg.BoolOpt('rpc_support_old_agents', default=False,
                 help=_("Enable server RPC compatibility with old agents")),
+    cfg.IntOpt('rpc_devices_chunk_size', default=100,
+               help=_("Maximum number of devices whose details are "
+                      "requested from the plugin in a single RPC call, "
+                      "at least 1")),
 ]
 
 
@@ -44,7 +44,7 @@ class DhcpNoOpDriver(dhcp.DhcpLocalProcess):
             self.device_manager.destroy(self.network, self.interface_name)
         self._remove_config_files()
 
-    def reload_allocations(self):
+    def reload_allocations(self, port_ids=None):
         """Force the DHCP server to reload the assignment database."""
         pass
 
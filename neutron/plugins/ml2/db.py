@@ -13,6 +13,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import sqlalchemy as sa
 from sqlalchemy.orm import exc
 
 from neutron.db import api as db_api
@@ -56,6 +57,46 @@ def get_network_segments(session, network_id):
                 for record in records]
 
 
+def get_networks_segments(session, network_ids):
+    """Return a dict mapping each network id to its list of segments."""
+    if not network_ids:
+        return {}
+    with session.begin(subtransactions=True):
+        records = (session.query(models.NetworkSegment).
+                   filter(models.NetworkSegment.network_id.in_(network_ids)))
+        result = dict((network_id, []) for network_id in network_ids)
+        for record in records:
+            result[record.network_id].append(
+                {api.ID: record.id,
+                 api.NETWORK_TYPE: record.network_type,
+                 api.PHYSICAL_NETWORK: record.physical_network,
+                 api.SEGMENTATION_ID: record.segmentation_id})
+        return result
+
+
+def add_port_id_prefix(session, port_id):
+    with session.begin(subtransactions=True):
+        record = models.PortIdPrefix(
+            port_id=port_id,
+            prefix=port_id[:models.PORT_ID_PREFIX_LEN])
+        session.add(record)
+
+
+def _filter_by_port_id(query, column, port_id):
+    """Filter query on the port id column with a possibly truncated id.
+
+    Full ids and the prefixes of tap device names are looked up exactly,
+    only ids truncated to another length fall back to a prefix match.
+    """
+    if uuidutils.is_uuid_like(port_id):
+        return query.filter(column == port_id)
+    if len(port_id) == models.PORT_ID_PREFIX_LEN:
+        return query.join(models.PortIdPrefix,
+                          models.PortIdPrefix.port_id == column).filter(
+                              models.PortIdPrefix.prefix == port_id)
+    return query.filter(column.startswith(port_id))
+
+
 def ensure_port_binding(session, port_id):
     with session.begin(subtransactions=True):
         try:
@@ -75,9 +116,9 @@ def get_port(session, port_id):
 
     with session.begin(subtransactions=True):
         try:
-            record = (session.query(models_v2.Port).
-                      filter(models_v2.Port.id.startswith(port_id)).
-                      one())
+            query = session.query(models_v2.Port)
+            record = _filter_by_port_id(query, models_v2.Port.id,
+                                        port_id).one()
             return record
         except exc.NoResultFound:
             return
@@ -87,6 +128,136 @@ def get_port(session, port_id):
             return
 
 
+def get_port_status(session, port_id):
+    """Get the id, network id, status and binding host of a port.
+
+    Only these columns are retrieved, for the status changes frequently
+    reported by the agents.
+    """
+    with session.begin(subtransactions=True):
+        query = session.query(models_v2.Port.id, models_v2.Port.network_id,
+                              models_v2.Port.status, models.PortBinding.host)
+        query = _filter_by_port_id(query, models_v2.Port.id, port_id)
+        query = query.outerjoin(
+            models.PortBinding,
+            models.PortBinding.port_id == models_v2.Port.id)
+        try:
+            return query.one()
+        except exc.NoResultFound:
+            return
+        except exc.MultipleResultsFound:
+            LOG.error(_("Multiple ports have port_id starting with %s"),
+                      port_id)
+            return
+
+
+def set_port_status(session, port_id, original_status, status):
+    """Change the status of a port which still has original_status.
+
+    Returns whether the port was updated.
+    """
+    with session.begin(subtransactions=True):
+        count = (session.query(models_v2.Port).
+                 filter_by(id=port_id, status=original_status).
+                 update({'status': status}))
+    return count == 1
+
+
+def set_ports_status(session, port_ids, original_status, status):
+    """Change the status of the ports which still have original_status.
+
+    Same as set_port_status with a single UPDATE for a list of ports.
+    Returns the number of ports updated.
+    """
+    with session.begin(subtransactions=True):
+        return (session.query(models_v2.Port).
+                filter(models_v2.Port.id.in_(port_ids),
+                       models_v2.Port.status == original_status).
+                update({'status': status}, synchronize_session=False))
+
+
+def ensure_port_bindings(session, port_ids):
+    """Return a dict mapping port ids to bindings, creating missing ones."""
+    if not port_ids:
+        return {}
+    with session.begin(subtransactions=True):
+        records = (session.query(models.PortBinding).
+                   filter(models.PortBinding.port_id.in_(port_ids)))
+        bindings = dict((record.port_id, record) for record in records)
+        for port_id in port_ids:
+            if port_id not in bindings:
+                record = models.PortBinding(
+                    port_id=port_id,
+                    vif_type=portbindings.VIF_TYPE_UNBOUND)
+                session.add(record)
+                bindings[port_id] = record
+        return bindings
+
+
+def get_ports(session, port_ids):
+    """Get port records for update within transaction in a single query.
+
+    port_ids may be truncated port UUIDs, as reported by the agents. Returns
+    a dict mapping each requested id to its port record; ids which do not
+    match exactly one port are left out.
+    """
+    return _get_ports_by_ids(session, port_ids,
+                             session.query(models_v2.Port))
+
+
+def get_ports_status(session, port_ids):
+    """Get the id, network id, status and binding host of ports.
+
+    Same as get_port_status for a list of ports, in a single query. Returns
+    a dict mapping each requested id to its record, as get_ports does.
+    """
+    query = session.query(models_v2.Port.id, models_v2.Port.network_id,
+                          models_v2.Port.status, models.PortBinding.host)
+    query = query.outerjoin(
+        models.PortBinding,
+        models.PortBinding.port_id == models_v2.Port.id)
+    return _get_ports_by_ids(session, port_ids, query)
+
+
+def _get_ports_by_ids(session, port_ids, query):
+    if not port_ids:
+        return {}
+    requested = set(port_ids)
+    full_ids = set(port_id for port_id in requested
+                   if uuidutils.is_uuid_like(port_id))
+    prefixes = set(port_id for port_id in requested - full_ids
+                   if len(port_id) == models.PORT_ID_PREFIX_LEN)
+    criteria = [models_v2.Port.id.startswith(port_id)
+                for port_id in requested - full_ids - prefixes]
+    with session.begin(subtransactions=True):
+        if prefixes:
+            # The ids are selected first, as MySQL 5.5 runs IN (SELECT ...)
+            # as a dependent subquery scanning all the ports
+            prefix_query = (session.query(models.PortIdPrefix.port_id).
+                            filter(models.PortIdPrefix.prefix.in_(prefixes)))
+            full_ids |= set(item[0] for item in prefix_query)
+        if full_ids:
+            criteria.append(models_v2.Port.id.in_(full_ids))
+        if not criteria:
+            return {}
+        records = query.filter(sa.or_(*criteria)).all()
+    prefix_lengths = set(len(port_id) for port_id in requested)
+    matches = {}
+    for record in records:
+        for length in prefix_lengths:
+            prefix = record.id[:length]
+            if prefix in requested:
+                matches.setdefault(prefix, []).append(record)
+    ports = {}
+    for port_id, port_records in matches.iteritems():
+        if len(port_records) > 1:
+            LOG.error(_("Multiple ports have port_id starting with %s"),
+                      port_id)
+            continue
+        ports[port_id] = port_records[0]
+    return ports
+
+
 def get_port_and_sgs(port_id):
     """Get port from database with security group info."""
 
@@ -99,7 +270,7 @@ def get_port_and_sgs(port_id):
                               sg_db.SecurityGroupPortBinding.security_group_id)
         query = query.outerjoin(sg_db.SecurityGroupPortBinding,
                                 models_v2.Port.id == sg_binding_port)
-        query = query.filter(models_v2.Port.id.startswith(port_id))
+        query = _filter_by_port_id(query, models_v2.Port.id, port_id)
         port_and_sgs = query.all()
         if not port_and_sgs:
             return
@@ -119,9 +290,9 @@ def get_port_binding_host(port_id):
     session = db_api.get_session()
     with session.begin(subtransactions=True):
         try:
-            query = (session.query(models.PortBinding).
-                     filter(models.PortBinding.port_id.startswith(port_id)).
-                     one())
+            query = session.query(models.PortBinding)
+            query = _filter_by_port_id(query, models.PortBinding.port_id,
+                                       port_id).one()
         except exc.NoResultFound:
             LOG.debug(_("No binding found for port %(port_id)s"),
                       {'port_id': port_id})
@@ -260,6 +260,41 @@ class PortContext(object):
         pass
 
 
+@six.add_metaclass(ABCMeta)
+class PortStatusContext(object):
+    """Context passed to MechanismDrivers for port status changes.
+
+    A PortStatusContext describes a change of the status of a port, as
+    reported by the agents. Unlike PortContext, it does not wrap the
+    port resource, which is not retrieved for these frequent updates.
+    """
+
+    @abstractproperty
+    def port_id(self):
+        """Return the id of the port."""
+        pass
+
+    @abstractproperty
+    def network_id(self):
+        """Return the id of the network of the port."""
+        pass
+
+    @abstractproperty
+    def host(self):
+        """Return the host the port is bound to."""
+        pass
+
+    @abstractproperty
+    def status(self):
+        """Return the new status of the port."""
+        pass
+
+    @abstractproperty
+    def original_status(self):
+        """Return the status of the port prior to the change."""
+        pass
+
+
 @six.add_metaclass(ABCMeta)
 class MechanismDriver(object):
     """Define stable abstract interface for ML2 mechanism drivers.
@@ -531,6 +566,22 @@ class MechanismDriver(object):
         """
         pass
 
+    def update_port_status(self, context):
+        """Notify a change of the status of a port.
+
+        :param context: PortStatusContext instance describing the
+        status change.
+
+        Called after the transaction changing the status reported by
+        an agent completes. Status changes are not passed to
+        update_port_precommit and update_port_postcommit, unless the
+        mechanism driver sets its port_status_full_context attribute
+        to True, in which case both are called with a PortContext as
+        for any other port update. Raising an exception does not undo
+        the status change.
+        """
+        pass
+
     def delete_port_precommit(self, context):
         """Delete resources of a port.
 
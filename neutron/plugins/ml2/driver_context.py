@@ -109,3 +109,35 @@ class PortContext(MechanismDriverContext, api.PortContext):
         self._binding.segment = segment_id
         self._binding.vif_type = vif_type
         self._binding.vif_details = jsonutils.dumps(vif_details)
+
+
+class PortStatusContext(MechanismDriverContext, api.PortStatusContext):
+
+    def __init__(self, plugin, plugin_context, port_id, network_id, host,
+                 status, original_status):
+        super(PortStatusContext, self).__init__(plugin, plugin_context)
+        self._port_id = port_id
+        self._network_id = network_id
+        self._host = host
+        self._status = status
+        self._original_status = original_status
+
+    @property
+    def port_id(self):
+        return self._port_id
+
+    @property
+    def network_id(self):
+        return self._network_id
+
+    @property
+    def host(self):
+        return self._host
+
+    @property
+    def status(self):
+        return self._status
+
+    @property
+    def original_status(self):
+        return self._original_status
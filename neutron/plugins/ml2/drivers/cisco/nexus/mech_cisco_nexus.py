@@ -37,6 +37,9 @@ class CiscoNexusMechanismDriver(api.MechanismDriver):
 
     """Cisco Nexus ML2 Mechanism Driver."""
 
+    # the VLANs are configured when the compute ports become active
+    port_status_full_context = True
+
     def initialize(self):
         # Create ML2 device dictionary from ml2_conf.ini entries.
         conf.ML2MechCiscoConfig()
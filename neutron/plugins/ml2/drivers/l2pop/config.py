@@ -24,6 +24,11 @@ l2_population_options = [
     cfg.IntOpt('agent_boot_time', default=180,
                help=_('Delay within which agent is expected to update '
                       'existing ports whent it restarts')),
+    cfg.FloatOpt('notification_delay', default=0,
+                 help=_('Delay in seconds during which the fdb entries '
+                        'notified are batched before being sent to the '
+                        'agents hosting their network. 0 sends each '
+                        'notification immediately.')),
 ]
 
 cfg.CONF.register_opts(l2_population_options, "l2pop")
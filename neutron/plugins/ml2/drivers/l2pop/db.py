@@ -39,8 +39,8 @@ class L2populationDbMixin(base_db.CommonDbMixin):
         return configuration.get('tunneling_ip')
 
     def get_agent_uptime(self, agent):
-        return timeutils.delta_seconds(agent.started_at,
-                                       agent.heartbeat_timestamp)
+        return timeutils.delta_seconds(
+            agent.started_at, agents_db.get_heartbeat_timestamp(agent))
 
     def get_agent_tunnel_types(self, agent):
         configuration = jsonutils.loads(agent.configurations)
@@ -54,19 +54,51 @@ class L2populationDbMixin(base_db.CommonDbMixin):
                                      l2_const.SUPPORTED_AGENT_TYPES))
             return query.first()
 
-    def get_network_ports(self, session, network_id):
+    def get_network_port_ips(self, session, network_id, exclude_host=None):
+        """Return the agent, mac address and ip of the ports of a network.
+
+        One row is returned per ip address of the ports bound to an agent,
+        with None as ip for the ports without any.
+        """
         with session.begin(subtransactions=True):
-            query = session.query(ml2_models.PortBinding,
-                                  agents_db.Agent)
-            query = query.join(agents_db.Agent,
+            query = session.query(agents_db.Agent,
+                                  models_v2.Port.mac_address,
+                                  models_v2.IPAllocation.ip_address)
+            query = query.join(ml2_models.PortBinding,
                                agents_db.Agent.host ==
                                ml2_models.PortBinding.host)
-            query = query.join(models_v2.Port)
+            query = query.join(models_v2.Port,
+                               models_v2.Port.id ==
+                               ml2_models.PortBinding.port_id)
+            query = query.outerjoin(models_v2.IPAllocation,
+                                    models_v2.IPAllocation.port_id ==
+                                    models_v2.Port.id)
             query = query.filter(models_v2.Port.network_id == network_id,
                                  models_v2.Port.admin_state_up == True,
                                  agents_db.Agent.agent_type.in_(
                                      l2_const.SUPPORTED_AGENT_TYPES))
-            return query
+            if exclude_host:
+                query = query.filter(agents_db.Agent.host != exclude_host)
+            return query.all()
+
+    def get_network_agent_hosts(self, session, network_ids):
+        """Return the hosts of the agents bound to ports of each network."""
+        hosts = dict((network_id, set()) for network_id in network_ids)
+        if not network_ids:
+            return hosts
+        with session.begin(subtransactions=True):
+            query = session.query(models_v2.Port.network_id,
+                                  ml2_models.PortBinding.host).distinct()
+            query = query.join(ml2_models.PortBinding)
+            query = query.join(agents_db.Agent,
+                               agents_db.Agent.host ==
+                               ml2_models.PortBinding.host)
+            query = query.filter(models_v2.Port.network_id.in_(network_ids),
+                                 agents_db.Agent.agent_type.in_(
+                                     l2_const.SUPPORTED_AGENT_TYPES))
+            for network_id, host in query:
+                hosts[network_id].add(host)
+        return hosts
 
     def get_agent_network_active_port_count(self, session, agent_host,
                                             network_id):
@@ -34,6 +34,9 @@ LOG = logging.getLogger(__name__)
 class L2populationMechanismDriver(api.MechanismDriver,
                                   l2pop_db.L2populationDbMixin):
 
+    # the fdb entries are added and removed as the ports go up and down
+    port_status_full_context = True
+
     def initialize(self):
         LOG.debug(_("Experimental L2 population driver"))
         self.rpc_ctx = n_context.get_admin_context_without_session()
@@ -165,22 +168,23 @@ class L2populationMechanismDriver(api.MechanismDriver,
                                   'ports': {}}}
             ports = agent_fdb_entries[network_id]['ports']
 
-            network_ports = self.get_network_ports(session, network_id)
-            for network_port in network_ports:
-                binding, agent = network_port
-                if agent.host == agent_host:
-                    continue
-
-                ip = self.get_agent_ip(agent)
-                if not ip:
-                    LOG.debug(_("Unable to retrieve the agent ip, check "
-                                "the agent %(agent_host)s configuration."),
-                              {'agent_host': agent.host})
-                    continue
-
-                agent_ports = ports.get(ip, [const.FLOODING_ENTRY])
-                agent_ports += self._get_port_fdb_entries(binding.port)
-                ports[ip] = agent_ports
+            agent_ips = {}
+            port_ips = self.get_network_port_ips(session, network_id,
+                                                 exclude_host=agent_host)
+            for other_agent, mac_address, ip_address in port_ips:
+                if other_agent.host not in agent_ips:
+                    ip = self.get_agent_ip(other_agent)
+                    agent_ips[other_agent.host] = ip
+                    if not ip:
+                        LOG.debug(_("Unable to retrieve the agent ip, check "
+                                    "the agent %(agent_host)s "
+                                    "configuration."),
+                                  {'agent_host': other_agent.host})
+                    else:
+                        ports.setdefault(ip, [const.FLOODING_ENTRY])
+                ip = agent_ips[other_agent.host]
+                if ip and ip_address:
+                    ports[ip].append([mac_address, ip_address])
 
             # And notify other agents to add flooding entry
             other_fdb_entries[network_id]['ports'][agent_ip].append(
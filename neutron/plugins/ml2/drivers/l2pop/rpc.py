@@ -17,15 +17,32 @@
 # @author: Francois Eleouet, Orange
 # @author: Mathieu Rohon, Orange
 
+import copy
+
+import eventlet
+from oslo.config import cfg
+
 from neutron.common import topics
+from neutron.db import api as db_api
 from neutron.openstack.common import log as logging
 from neutron.openstack.common.rpc import proxy
+from neutron.plugins.ml2.drivers.l2pop import config  # noqa
+from neutron.plugins.ml2.drivers.l2pop import db as l2pop_db
 
 
 LOG = logging.getLogger(__name__)
 
 
 class L2populationAgentNotifyAPI(proxy.RpcProxy):
+    """Notify the fdb entries of a network to the agents hosting it.
+
+    The entries are only sent to the agents bound to ports of their
+    network, each agent receiving the networks it hosts. The notifications
+    made within l2pop.notification_delay are sent together, those of a
+    network being merged in a single message when they are not
+    interleaved with other methods.
+    """
+
     BASE_RPC_API_VERSION = '1.0'
 
     def __init__(self, topic=topics.AGENT):
@@ -35,17 +52,9 @@ class L2populationAgentNotifyAPI(proxy.RpcProxy):
         self.topic_l2pop_update = topics.get_topic_name(topic,
                                                         topics.L2POPULATION,
                                                         topics.UPDATE)
-
-    def _notification_fanout(self, context, method, fdb_entries):
-        LOG.debug(_('Fanout notify l2population agents at %(topic)s '
-                    'the message %(method)s with %(fdb_entries)s'),
-                  {'topic': self.topic,
-                   'method': method,
-                   'fdb_entries': fdb_entries})
-
-        self.fanout_cast(context,
-                         self.make_msg(method, fdb_entries=fdb_entries),
-                         topic=self.topic_l2pop_update)
+        self.db = l2pop_db.L2populationDbMixin()
+        # (context, method, fdb_entries, host) waiting to be sent
+        self.pending_notifications = []
 
     def _notification_host(self, context, method, fdb_entries, host):
         LOG.debug(_('Notify l2population agent %(host)s at %(topic)s the '
@@ -58,31 +67,85 @@ class L2populationAgentNotifyAPI(proxy.RpcProxy):
                   self.make_msg(method, fdb_entries=fdb_entries),
                   topic='%s.%s' % (self.topic_l2pop_update, host))
 
+    def _notify(self, context, method, fdb_entries, host=None):
+        if not fdb_entries:
+            return
+        self.pending_notifications.append(
+            (context, method, fdb_entries, host))
+        delay = cfg.CONF.l2pop.notification_delay
+        if not delay:
+            self._send_pending_notifications()
+        elif len(self.pending_notifications) == 1:
+            eventlet.spawn_after(delay, self._send_pending_notifications)
+
+    @staticmethod
+    def _split_by_network(method, fdb_entries):
+        if method == 'update_fdb_entries':
+            return [(network_id, {action: {network_id: entry}})
+                    for action, entries in fdb_entries.items()
+                    for network_id, entry in entries.items()]
+        return [(network_id, {network_id: entry})
+                for network_id, entry in fdb_entries.items()]
+
+    @staticmethod
+    def _merge(message, method, network_id, entries):
+        """Merge the entries of a network in a message, if possible."""
+        if method != message[1]:
+            return False
+        if method == 'update_fdb_entries':
+            (action, network_entries), = entries.items()
+            merged = message[2].setdefault(action, {})
+            if network_id in merged:
+                return False
+            merged[network_id] = copy.deepcopy(network_entries[network_id])
+            return True
+        merged = message[2].get(network_id)
+        if merged is None:
+            message[2][network_id] = copy.deepcopy(entries[network_id])
+            return True
+        for agent_ip, ports in entries[network_id]['ports'].items():
+            agent_ports = merged['ports'].setdefault(agent_ip, [])
+            agent_ports.extend(port for port in ports
+                               if port not in agent_ports)
+        return True
+
+    def _send_pending_notifications(self):
+        pending = self.pending_notifications
+        self.pending_notifications = []
+        network_ids = set()
+        for context, method, fdb_entries, host in pending:
+            if not host:
+                network_ids.update(network_id for network_id, entries in
+                                   self._split_by_network(method,
+                                                          fdb_entries))
+        network_hosts = self.db.get_network_agent_hosts(
+            db_api.get_session(), network_ids)
+
+        # the messages of each host, in the order of the notifications
+        messages = {}
+        for context, method, fdb_entries, host in pending:
+            for network_id, entries in self._split_by_network(method,
+                                                              fdb_entries):
+                for agent_host in host and [host] or sorted(
+                        network_hosts[network_id]):
+                    host_messages = messages.setdefault(agent_host, [])
+                    if not (host_messages and
+                            self._merge(host_messages[-1], method,
+                                        network_id, entries)):
+                        host_messages.append(
+                            (context, method, copy.deepcopy(entries)))
+        for agent_host, host_messages in messages.items():
+            for context, method, fdb_entries in host_messages:
+                self._notification_host(context, method, fdb_entries,
+                                        agent_host)
+
     def add_fdb_entries(self, context, fdb_entries, host=None):
-        if fdb_entries:
-            if host:
-                self._notification_host(context, 'add_fdb_entries',
-                                        fdb_entries, host)
-            else:
-                self._notification_fanout(context, 'add_fdb_entries',
-                                          fdb_entries)
+        self._notify(context, 'add_fdb_entries', fdb_entries, host)
 
     def remove_fdb_entries(self, context, fdb_entries, host=None):
-        if fdb_entries:
-            if host:
-                self._notification_host(context, 'remove_fdb_entries',
-                                        fdb_entries, host)
-            else:
-                self._notification_fanout(context, 'remove_fdb_entries',
-                                          fdb_entries)
+        self._notify(context, 'remove_fdb_entries', fdb_entries, host)
 
     def update_fdb_entries(self, context, fdb_entries, host=None):
-        if fdb_entries:
-            if host:
-                self._notification_host(context, 'update_fdb_entries',
-                                        fdb_entries, host)
-            else:
-                self._notification_fanout(context, 'update_fdb_entries',
-                                          fdb_entries)
+        self._notify(context, 'update_fdb_entries', fdb_entries, host)
 
 L2populationAgentNotify = L2populationAgentNotifyAPI()
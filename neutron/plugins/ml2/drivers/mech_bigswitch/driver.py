@@ -41,6 +41,9 @@ class BigSwitchMechanismDriver(NeutronRestProxyV2Base,
     operations to the Big Switch Controller.
     """
 
+    # the state and status of the ports are relayed to the controller
+    port_status_full_context = True
+
     def initialize(self, server_timeout=None):
         LOG.debug(_('Initializing driver'))
 
@@ -60,6 +60,8 @@ class NCSMechanismDriver(api.MechanismDriver):
     on failure it transitions to the out-of-sync state.
     """
     out_of_sync = True
+    # the ports are replicated with their status
+    port_status_full_context = True
 
     def initialize(self):
         self.url = cfg.CONF.ml2_ncs.url
@@ -110,6 +110,8 @@ class MechanismManager(stevedore.named.NamedExtensionManager):
         # Ordered list of mechanism drivers, defining
         # the order in which the drivers are called.
         self.ordered_mech_drivers = []
+        # Mechanism drivers receiving a PortContext on status changes.
+        self.port_status_drivers = []
 
         LOG.info(_("Configured mechanism driver names: %s"),
                  cfg.CONF.ml2.mechanism_drivers)
@@ -140,20 +142,25 @@ class MechanismManager(stevedore.named.NamedExtensionManager):
             driver.obj.initialize()
             self.native_bulk_support &= getattr(driver.obj,
                                                 'native_bulk_support', True)
+            if getattr(driver.obj, 'port_status_full_context', False):
+                self.port_status_drivers.append(driver)
 
     def _call_on_drivers(self, method_name, context,
-                         continue_on_failure=False):
+                         continue_on_failure=False, drivers=None):
         """Helper method for calling a method across all mechanism drivers.
 
         :param method_name: name of the method to call
         :param context: context parameter to pass to each method call
         :param continue_on_failure: whether or not to continue to call
         all mechanism drivers once one has raised an exception
+        :param drivers: mechanism drivers to call, all of them if None
         :raises: neutron.plugins.ml2.common.MechanismDriverError
         if any mechanism driver call fails.
         """
         error = False
-        for driver in self.ordered_mech_drivers:
+        if drivers is None:
+            drivers = self.ordered_mech_drivers
+        for driver in drivers:
             try:
                 getattr(driver.obj, method_name)(context)
             except Exception:
@@ -396,6 +403,43 @@ class MechanismManager(stevedore.named.NamedExtensionManager):
         """
         self._call_on_drivers("update_port_postcommit", context)
 
+    def update_port_status(self, context):
+        """Notify all mechanism drivers of a port status change.
+
+        :raises: neutron.plugins.ml2.common.MechanismDriverError
+        if any mechanism driver update_port_status call fails.
+
+        Called after the database transaction. All mechanism drivers
+        are called, even if one raises an exception, as the status
+        change is not undone.
+        """
+        self._call_on_drivers("update_port_status", context,
+                              continue_on_failure=True)
+
+    def update_port_status_precommit(self, context):
+        """Notify the port_status_drivers during a port status change.
+
+        :raises: neutron.plugins.ml2.common.MechanismDriverError
+        if any mechanism driver update_port_precommit call fails.
+
+        Same as update_port_precommit, for the mechanism drivers which
+        asked for a PortContext on status changes.
+        """
+        self._call_on_drivers("update_port_precommit", context,
+                              drivers=self.port_status_drivers)
+
+    def update_port_status_postcommit(self, context):
+        """Notify the port_status_drivers after a port status change.
+
+        :raises: neutron.plugins.ml2.common.MechanismDriverError
+        if any mechanism driver update_port_postcommit call fails.
+
+        Same as update_port_postcommit, for the mechanism drivers which
+        asked for a PortContext on status changes.
+        """
+        self._call_on_drivers("update_port_postcommit", context,
+                              drivers=self.port_status_drivers)
+
     def delete_port_precommit(self, context):
         """Notify all mechanism drivers during port deletion.
 
@@ -21,6 +21,9 @@ from neutron.db import models_v2
 from neutron.extensions import portbindings
 
 BINDING_PROFILE_LEN = 4095
+# Length of the port id prefix left in the tap device names reported by the
+# agents, the interface names being limited to 14 characters
+PORT_ID_PREFIX_LEN = 11
 
 
 class NetworkSegment(model_base.BASEV2, models_v2.HasId):
@@ -74,3 +77,20 @@ class PortBinding(model_base.BASEV2):
         backref=orm.backref("port_binding",
                             lazy='joined', uselist=False,
                             cascade='delete'))
+
+
+class PortIdPrefix(model_base.BASEV2):
+    """Map the port id prefix found in device names to the full port id.
+
+    The agents report tap devices named after the first characters of
+    the port id. This indexed prefix lets the RPC handlers find the port
+    with an exact lookup rather than a LIKE scan of the ports table.
+    """
+
+    __tablename__ = 'ml2_port_id_prefixes'
+
+    port_id = sa.Column(sa.String(36),
+                        sa.ForeignKey('ports.id', ondelete="CASCADE"),
+                        primary_key=True)
+    prefix = sa.Column(sa.String(PORT_ID_PREFIX_LEN), nullable=False,
+                       index=True)
@@ -124,11 +124,14 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
         )
         self.callbacks = rpc.RpcCallbacks(self.notifier, self.type_manager)
         self.topic = topics.PLUGIN
-        self.conn = c_rpc.create_connection(new=True)
         self.dispatcher = self.callbacks.create_rpc_dispatcher()
+
+    def start_rpc_listener(self):
+        self.conn = c_rpc.create_connection(new=True)
         self.conn.create_consumer(self.topic, self.dispatcher,
                                   fanout=False)
         self.conn.consume_in_thread()
+        return self.conn
 
     def _process_provider_segment(self, segment):
         network_type = self._get_attribute(segment, provider.NETWORK_TYPE)
@@ -181,7 +184,7 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
 
     def _extend_network_dict_provider(self, context, network):
         id = network['id']
-        segments = db.get_network_segments(context.session, id)
+        segments = db.get_network_segments(context.reader_session, id)
         if not segments:
             LOG.error(_("Network %s has no segments"), id)
             network[provider.NETWORK_TYPE] = None
@@ -405,25 +408,25 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
         return updated_network
 
     def get_network(self, context, id, fields=None):
-        session = context.session
-        with session.begin(subtransactions=True):
-            result = super(Ml2Plugin, self).get_network(context, id, None)
-            self._extend_network_dict_provider(context, result)
+        # No transaction is opened, so that these reads may go to the
+        # slave database when the context allows it
+        result = super(Ml2Plugin, self).get_network(context, id, None)
+        self._extend_network_dict_provider(context, result)
 
         return self._fields(result, fields)
 
     def get_networks(self, context, filters=None, fields=None,
                      sorts=None, limit=None, marker=None, page_reverse=False):
-        session = context.session
-        with session.begin(subtransactions=True):
-            nets = super(Ml2Plugin,
-                         self).get_networks(context, filters, None, sorts,
-                                            limit, marker, page_reverse)
-            for net in nets:
-                self._extend_network_dict_provider(context, net)
+        # No transaction is opened, so that these reads may go to the
+        # slave database when the context allows it
+        nets = super(Ml2Plugin,
+                     self).get_networks(context, filters, None, sorts,
+                                        limit, marker, page_reverse)
+        for net in nets:
+            self._extend_network_dict_provider(context, net)
 
-            nets = self._filter_nets_provider(context, nets, filters)
-            nets = self._filter_nets_l3(context, nets, filters)
+        nets = self._filter_nets_provider(context, nets, filters)
+        nets = self._filter_nets_l3(context, nets, filters)
 
         return [self._fields(net, fields) for net in nets]
 
@@ -613,6 +616,7 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
             sgids = self._get_security_groups_on_port(context, port)
             dhcp_opts = port['port'].get(edo_ext.EXTRADHCPOPTS, [])
             result = super(Ml2Plugin, self).create_port(context, port)
+            db.add_port_id_prefix(session, result['id'])
             self._process_port_create_security_group(context, result, sgids)
             network = self.get_network(context, result['network_id'])
             mech_context = driver_context.PortContext(self, context, result,
@@ -730,32 +734,133 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
             LOG.error(_("mechanism_manager.delete_port_postcommit failed"))
         self.notify_security_groups_member_updated(context, port)
 
-    def update_port_status(self, context, port_id, status):
-        updated = False
+    def update_port_status(self, context, port_id, status, host=None):
+        """Set the status of a port, as reported by an agent.
+
+        The status is changed with a single UPDATE guarded by the
+        current status, without building the port and network dicts.
+        Those are only built for the mechanism drivers asking for a
+        PortContext on status changes, the others get the lighter
+        update_port_status call. When host is given, the port is left
+        unchanged unless it is bound to that host. Returns whether the
+        port exists.
+        """
+        mech_context = None
         session = context.session
         with session.begin(subtransactions=True):
-            port = db.get_port(session, port_id)
-            if not port:
-                LOG.warning(_("Port %(port)s updated up by agent not found"),
-                            {'port': port_id})
+            record = db.get_port_status(session, port_id)
+            if not record:
+                LOG.warning(_("Port %(port)s reported %(status)s by agent "
+                              "not found"),
+                            {'port': port_id, 'status': status})
                 return False
-            if port.status != status:
-                original_port = self._make_port_dict(port)
-                port.status = status
+            if host and record.host != host:
+                LOG.debug(_("Port %(port)s not bound to the agent host "
+                            "%(host)s"), {'port': port_id, 'host': host})
+                return True
+            if record.status == status:
+                return True
+            if not db.set_port_status(session, record.id, record.status,
+                                      status):
+                LOG.debug(_("Status of port %s changed concurrently"),
+                          record.id)
+                return True
+            if self.mechanism_manager.port_status_drivers:
+                port = db.get_port(session, record.id)
                 updated_port = self._make_port_dict(port)
-                network = self.get_network(context,
-                                           original_port['network_id'])
+                original_port = dict(updated_port, status=record.status)
+                network = self.get_network(context, record.network_id)
                 mech_context = driver_context.PortContext(
                     self, context, updated_port, network,
                     original_port=original_port)
-                self.mechanism_manager.update_port_precommit(mech_context)
-                updated = True
+                self.mechanism_manager.update_port_status_precommit(
+                    mech_context)
 
-        if updated:
-            self.mechanism_manager.update_port_postcommit(mech_context)
+        status_context = driver_context.PortStatusContext(
+            self, context, record.id, record.network_id, record.host, status,
+            record.status)
+        try:
+            self.mechanism_manager.update_port_status(status_context)
+        except ml2_exc.MechanismDriverError:
+            LOG.error(_("mechanism_manager.update_port_status failed for "
+                        "port %s"), record.id)
+        if mech_context:
+            self.mechanism_manager.update_port_status_postcommit(mech_context)
 
         return True
 
+    def update_ports_status(self, context, port_ids, status, host=None):
+        """Set the status of ports, as reported by an agent.
+
+        Same as update_port_status for a list of ports: their statuses are
+        read with one query and changed with one UPDATE for each of their
+        current statuses. Returns the requested ids of the ports which
+        exist.
+        """
+        mech_contexts = []
+        session = context.session
+        with session.begin(subtransactions=True):
+            records = db.get_ports_status(session, port_ids)
+            for port_id in set(port_ids) - set(records):
+                LOG.warning(_("Port %(port)s reported %(status)s by agent "
+                              "not found"),
+                            {'port': port_id, 'status': status})
+            originals = {}
+            for record in records.values():
+                if host and record.host != host:
+                    LOG.debug(_("Port %(port)s not bound to the agent host "
+                                "%(host)s"), {'port': record.id,
+                                              'host': host})
+                elif record.status != status:
+                    originals.setdefault(record.status, {})[record.id] = (
+                        record)
+            changed = []
+            for original_status, group in originals.iteritems():
+                count = db.set_ports_status(session, group.keys(),
+                                            original_status, status)
+                if count != len(group):
+                    # Only the ports now having the status were changed by
+                    # this request, the others were concurrently
+                    current = db.get_ports_status(session, group.keys())
+                    LOG.debug(_("Status of %d ports changed concurrently"),
+                              len(group) - count)
+                    group = dict((port_id, record)
+                                 for port_id, record in group.iteritems()
+                                 if port_id in current and
+                                 current[port_id].status == status)
+                changed.extend(group.values())
+            if changed and self.mechanism_manager.port_status_drivers:
+                ports = db.get_ports(session,
+                                     [record.id for record in changed])
+                networks = {}
+                for record in changed:
+                    updated_port = self._make_port_dict(ports[record.id])
+                    original_port = dict(updated_port, status=record.status)
+                    network = networks.get(record.network_id)
+                    if network is None:
+                        network = networks[record.network_id] = (
+                            self.get_network(context, record.network_id))
+                    mech_context = driver_context.PortContext(
+                        self, context, updated_port, network,
+                        original_port=original_port)
+                    self.mechanism_manager.update_port_status_precommit(
+                        mech_context)
+                    mech_contexts.append(mech_context)
+
+        for record in changed:
+            status_context = driver_context.PortStatusContext(
+                self, context, record.id, record.network_id, record.host,
+                status, record.status)
+            try:
+                self.mechanism_manager.update_port_status(status_context)
+            except ml2_exc.MechanismDriverError:
+                LOG.error(_("mechanism_manager.update_port_status failed for "
+                            "port %s"), record.id)
+        for mech_context in mech_contexts:
+            self.mechanism_manager.update_port_status_postcommit(mech_context)
+
+        return set(records)
+
     def port_bound_to_host(self, port_id, host):
         port_host = db.get_port_binding_host(port_id)
         return (port_host == host)
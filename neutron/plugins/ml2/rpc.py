@@ -40,10 +40,14 @@ class RpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
                    sg_db_rpc.SecurityGroupServerRpcCallbackMixin,
                    type_tunnel.TunnelRpcCallbackMixin):
 
-    RPC_API_VERSION = '1.1'
+    RPC_API_VERSION = '1.2'
     # history
     #   1.0 Initial version (from openvswitch/linuxbridge)
     #   1.1 Support Security Group RPC
+    #   1.2 Support get_devices_details_list and update_devices_status,
+    #       network_ids, limit and marker in get_active_networks_info, and
+    #       security_group_info_for_devices, security_group_members and
+    #       security_group_member_updates
 
     def __init__(self, notifier, type_manager):
         # REVISIT(kmestery): This depends on the first three super classes
@@ -92,56 +96,97 @@ class RpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
         with session.begin(subtransactions=True):
             port = db.get_port(session, port_id)
             if not port:
-                LOG.warning(_("Device %(device)s requested by agent "
-                              "%(agent_id)s not found in database"),
-                            {'device': device, 'agent_id': agent_id})
-                return {'device': device}
-
+                return self._get_device_details(device, agent_id, None,
+                                                None, None)
             segments = db.get_network_segments(session, port.network_id)
-            if not segments:
-                LOG.warning(_("Device %(device)s requested by agent "
-                              "%(agent_id)s has network %(network_id)s with "
-                              "no segments"),
-                            {'device': device,
-                             'agent_id': agent_id,
-                             'network_id': port.network_id})
-                return {'device': device}
-
             binding = db.ensure_port_binding(session, port.id)
-            if not binding.segment:
-                LOG.warning(_("Device %(device)s requested by agent "
-                              "%(agent_id)s on network %(network_id)s not "
-                              "bound, vif_type: %(vif_type)s"),
-                            {'device': device,
-                             'agent_id': agent_id,
-                             'network_id': port.network_id,
-                             'vif_type': binding.vif_type})
-                return {'device': device}
-
-            segment = self._find_segment(segments, binding.segment)
-            if not segment:
-                LOG.warning(_("Device %(device)s requested by agent "
-                              "%(agent_id)s on network %(network_id)s "
-                              "invalid segment, vif_type: %(vif_type)s"),
-                            {'device': device,
-                             'agent_id': agent_id,
-                             'network_id': port.network_id,
-                             'vif_type': binding.vif_type})
-                return {'device': device}
-
-            new_status = (q_const.PORT_STATUS_BUILD if port.admin_state_up
-                          else q_const.PORT_STATUS_DOWN)
-            if port.status != new_status:
-                port.status = new_status
-            entry = {'device': device,
-                     'network_id': port.network_id,
-                     'port_id': port.id,
-                     'admin_state_up': port.admin_state_up,
-                     'network_type': segment[api.NETWORK_TYPE],
-                     'segmentation_id': segment[api.SEGMENTATION_ID],
-                     'physical_network': segment[api.PHYSICAL_NETWORK]}
-            LOG.debug(_("Returning: %s"), entry)
-            return entry
+            return self._get_device_details(device, agent_id, port,
+                                            segments, binding)
+
+    def get_devices_details_list(self, rpc_context, **kwargs):
+        """Agent requests details for a list of devices.
+
+        Ports, segments and bindings are retrieved with one query each,
+        regardless of the number of devices.
+        """
+        agent_id = kwargs.get('agent_id')
+        devices = kwargs.get('devices', [])
+        LOG.debug(_("Details for devices %(devices)s requested by agent "
+                    "%(agent_id)s"),
+                  {'devices': devices, 'agent_id': agent_id})
+        port_ids = dict((device, self._device_to_port_id(device))
+                        for device in devices)
+
+        session = db_api.get_session()
+        with session.begin(subtransactions=True):
+            ports = db.get_ports(session, port_ids.values())
+            network_ids = set(port.network_id for port in ports.values())
+            segments = db.get_networks_segments(session, network_ids)
+            bindings = db.ensure_port_bindings(
+                session, [port.id for port in ports.values()])
+            entries = []
+            for device in devices:
+                port = ports.get(port_ids[device])
+                if port:
+                    entries.append(self._get_device_details(
+                        device, agent_id, port, segments[port.network_id],
+                        bindings[port.id]))
+                else:
+                    entries.append(self._get_device_details(
+                        device, agent_id, None, None, None))
+            return entries
+
+    def _get_device_details(self, device, agent_id, port, segments,
+                            binding):
+        if not port:
+            LOG.warning(_("Device %(device)s requested by agent "
+                          "%(agent_id)s not found in database"),
+                        {'device': device, 'agent_id': agent_id})
+            return {'device': device}
+
+        if not segments:
+            LOG.warning(_("Device %(device)s requested by agent "
+                          "%(agent_id)s has network %(network_id)s with "
+                          "no segments"),
+                        {'device': device,
+                         'agent_id': agent_id,
+                         'network_id': port.network_id})
+            return {'device': device}
+
+        if not binding.segment:
+            LOG.warning(_("Device %(device)s requested by agent "
+                          "%(agent_id)s on network %(network_id)s not "
+                          "bound, vif_type: %(vif_type)s"),
+                        {'device': device,
+                         'agent_id': agent_id,
+                         'network_id': port.network_id,
+                         'vif_type': binding.vif_type})
+            return {'device': device}
+
+        segment = self._find_segment(segments, binding.segment)
+        if not segment:
+            LOG.warning(_("Device %(device)s requested by agent "
+                          "%(agent_id)s on network %(network_id)s "
+                          "invalid segment, vif_type: %(vif_type)s"),
+                        {'device': device,
+                         'agent_id': agent_id,
+                         'network_id': port.network_id,
+                         'vif_type': binding.vif_type})
+            return {'device': device}
+
+        new_status = (q_const.PORT_STATUS_BUILD if port.admin_state_up
+                      else q_const.PORT_STATUS_DOWN)
+        if port.status != new_status:
+            port.status = new_status
+        entry = {'device': device,
+                 'network_id': port.network_id,
+                 'port_id': port.id,
+                 'admin_state_up': port.admin_state_up,
+                 'network_type': segment[api.NETWORK_TYPE],
+                 'segmentation_id': segment[api.SEGMENTATION_ID],
+                 'physical_network': segment[api.PHYSICAL_NETWORK]}
+        LOG.debug(_("Returning: %s"), entry)
+        return entry
 
     def _find_segment(self, segments, segment_id):
         for segment in segments:
@@ -159,16 +204,9 @@ class RpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
                   {'device': device, 'agent_id': agent_id})
         plugin = manager.NeutronManager.get_plugin()
         port_id = self._device_to_port_id(device)
-        port_exists = True
-        if (host and not plugin.port_bound_to_host(port_id, host)):
-            LOG.debug(_("Device %(device)s not bound to the"
-                        " agent host %(host)s"),
-                      {'device': device, 'host': host})
-            return {'device': device,
-                    'exists': port_exists}
-
         port_exists = plugin.update_port_status(rpc_context, port_id,
-                                                q_const.PORT_STATUS_DOWN)
+                                                q_const.PORT_STATUS_DOWN,
+                                                host=host)
 
         return {'device': device,
                 'exists': port_exists}
@@ -182,14 +220,40 @@ class RpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
                   {'device': device, 'agent_id': agent_id})
         plugin = manager.NeutronManager.get_plugin()
         port_id = self._device_to_port_id(device)
-        if (host and not plugin.port_bound_to_host(port_id, host)):
-            LOG.debug(_("Device %(device)s not bound to the"
-                        " agent host %(host)s"),
-                      {'device': device, 'host': host})
-            return
-
         plugin.update_port_status(rpc_context, port_id,
-                                  q_const.PORT_STATUS_ACTIVE)
+                                  q_const.PORT_STATUS_ACTIVE, host=host)
+
+    def update_devices_status(self, rpc_context, **kwargs):
+        """Agent reports the status of a list of devices.
+
+        The statuses of the ports of the devices up, then of the devices
+        down, are each changed with one bulk update.
+        """
+        agent_id = kwargs.get('agent_id')
+        host = kwargs.get('host')
+        devices_up = kwargs.get('devices_up', [])
+        devices_down = kwargs.get('devices_down', [])
+        LOG.debug(_("Devices %(devices_up)s up and %(devices_down)s no "
+                    "longer existing at agent %(agent_id)s"),
+                  {'devices_up': devices_up, 'devices_down': devices_down,
+                   'agent_id': agent_id})
+        plugin = manager.NeutronManager.get_plugin()
+        if devices_up:
+            plugin.update_ports_status(
+                rpc_context,
+                [self._device_to_port_id(device) for device in devices_up],
+                q_const.PORT_STATUS_ACTIVE, host=host)
+        port_ids = dict((device, self._device_to_port_id(device))
+                        for device in devices_down)
+        existing = set()
+        if port_ids:
+            existing = plugin.update_ports_status(
+                rpc_context, port_ids.values(), q_const.PORT_STATUS_DOWN,
+                host=host)
+        return {'devices_up': devices_up,
+                'devices_down': [{'device': device,
+                                  'exists': port_ids[device] in existing}
+                                 for device in devices_down]}
 
 
 class AgentNotifierApi(proxy.RpcProxy,
@@ -14,6 +14,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
 import signal
 import sys
 import time
@@ -209,6 +210,7 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
         self.local_ip = local_ip
         self.tunnel_count = 0
         self.vxlan_udp_port = cfg.CONF.AGENT.vxlan_udp_port
+        self.rpc_devices_chunk_size = cfg.CONF.AGENT.rpc_devices_chunk_size
         self._check_ovs_version()
         if self.enable_tunneling:
             self.setup_tunnel_br(tun_br)
@@ -276,6 +278,33 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
             if vif_id in vlan_mapping.vif_ports:
                 return network_id
 
+    def _flow_bridges(self):
+        bridges = [self.int_br] + self.phys_brs.values()
+        if self.enable_tunneling:
+            bridges.append(self.tun_br)
+        return bridges
+
+    @contextlib.contextmanager
+    def deferred_flows(self, *bridges):
+        """Batch the flow changes made in the block.
+
+        The changes are queued on the given bridges, all the bridges the
+        agent programs by default, and applied once when the block ends.
+        """
+        bridges = bridges or self._flow_bridges()
+        for br in bridges:
+            br.defer_apply_on()
+        try:
+            yield
+        finally:
+            for br in bridges:
+                br.defer_apply_off()
+
+    def apply_deferred_flows(self):
+        """Apply the flow changes deferred so far on all the bridges."""
+        for br in self._flow_bridges():
+            br.apply_deferred_flows()
+
     def network_delete(self, context, **kwargs):
         LOG.debug(_("network_delete received"))
         network_id = kwargs.get('network_id')
@@ -283,7 +312,8 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
         # The network may not be defined on this agent
         lvm = self.local_vlan_map.get(network_id)
         if lvm:
-            self.reclaim_local_vlan(network_id)
+            with self.deferred_flows():
+                self.reclaim_local_vlan(network_id)
         else:
             LOG.debug(_("Network %s not used on agent."), network_id)
 
@@ -315,10 +345,12 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
             return
         tun_name = '%s-%s' % (tunnel_type, tunnel_id)
         if not self.l2_pop:
-            self.setup_tunnel_port(tun_name, tunnel_ip, tunnel_type)
+            with self.deferred_flows(self.tun_br):
+                self.setup_tunnel_port(tun_name, tunnel_ip, tunnel_type)
 
-    def fdb_add(self, context, fdb_entries):
-        LOG.debug(_("fdb_add received"))
+    def _fdb_agent_ports(self, fdb_entries):
+        """Return the networks and remote ports of the entries to wire."""
+        entries = []
         for network_id, values in fdb_entries.items():
             lvm = self.local_vlan_map.get(network_id)
             if not lvm:
@@ -327,7 +359,16 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
             agent_ports = values.get('ports')
             agent_ports.pop(self.local_ip, None)
             if len(agent_ports):
-                self.tun_br.defer_apply_on()
+                entries.append((lvm, agent_ports))
+        return entries
+
+    def fdb_add(self, context, fdb_entries):
+        LOG.debug(_("fdb_add received"))
+        entries = self._fdb_agent_ports(fdb_entries)
+        if not entries:
+            return
+        with self.deferred_flows(self.tun_br):
+            for lvm, agent_ports in entries:
                 for agent_ip, ports in agent_ports.items():
                     # Ensure we have a tunnel port with this remote agent
                     ofport = self.tun_br_ofports[
@@ -340,19 +381,14 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                             continue
                     for port in ports:
                         self._add_fdb_flow(port, agent_ip, lvm, ofport)
-                self.tun_br.defer_apply_off()
 
     def fdb_remove(self, context, fdb_entries):
         LOG.debug(_("fdb_remove received"))
-        for network_id, values in fdb_entries.items():
-            lvm = self.local_vlan_map.get(network_id)
-            if not lvm:
-                # Agent doesn't manage any more ports in this network
-                continue
-            agent_ports = values.get('ports')
-            agent_ports.pop(self.local_ip, None)
-            if len(agent_ports):
-                self.tun_br.defer_apply_on()
+        entries = self._fdb_agent_ports(fdb_entries)
+        if not entries:
+            return
+        with self.deferred_flows(self.tun_br):
+            for lvm, agent_ports in entries:
                 for agent_ip, ports in agent_ports.items():
                     ofport = self.tun_br_ofports[
                         lvm.network_type].get(agent_ip)
@@ -360,7 +396,6 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                         continue
                     for port in ports:
                         self._del_fdb_flow(port, agent_ip, lvm, ofport)
-                self.tun_br.defer_apply_off()
 
     def _add_fdb_flow(self, port_info, agent_ip, lvm, ofport):
         if port_info == q_const.FLOODING_ENTRY:
@@ -810,8 +845,23 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                 int_veth.link.set_mtu(self.veth_mtu)
                 phys_veth.link.set_mtu(self.veth_mtu)
 
-    def scan_ports(self, registered_ports, updated_ports=None):
-        cur_ports = self.int_br.get_vif_port_set()
+    def scan_ports(self, registered_ports, updated_ports=None, events=None):
+        """Return the changes of the ports on the integration bridge.
+
+        :param events: optional, VIFs added and removed since the previous
+               scan as returned by the polling manager. When given, only
+               the names of the bridge ports are read to locate the added
+               VIFs, instead of listing all the interfaces.
+        """
+        if events is None:
+            cur_ports = self.int_br.get_vif_port_set()
+        else:
+            cur_ports = registered_ports - events['removed']
+            if events['added']:
+                port_names = set(self.int_br.get_port_name_list())
+                cur_ports |= set(vif_id for vif_id, name
+                                 in events['added'].iteritems()
+                                 if name in port_names)
         self.int_br_device_count = len(cur_ports)
         port_info = {'current': cur_ports}
         if updated_ports:
@@ -919,28 +969,39 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
 
     def treat_devices_added_or_updated(self, devices):
         resync = False
+        devices = list(devices)
+        chunk_size = self.rpc_devices_chunk_size
+        for i in xrange(0, len(devices), chunk_size):
+            if self._treat_devices_chunk(devices[i:i + chunk_size]):
+                resync = True
+        return resync
+
+    def _treat_devices_chunk(self, devices):
+        vif_ports = self.int_br.get_vif_ports_by_ids(devices)
         for device in devices:
-            LOG.debug(_("Processing port %s"), device)
-            port = self.int_br.get_vif_port_by_id(device)
-            if not port:
+            if device not in vif_ports:
                 # The port has disappeared and should not be processed
                 # There is no need to put the port DOWN in the plugin as
                 # it never went up in the first place
                 LOG.info(_("Port %s was not found on the integration bridge "
                            "and will therefore not be processed"), device)
-                continue
-            try:
-                # TODO(salv-orlando): Provide bulk API for retrieving
-                # details for all devices in one call
-                details = self.plugin_rpc.get_device_details(self.context,
-                                                             device,
-                                                             self.agent_id)
-            except Exception as e:
-                LOG.debug(_("Unable to get port details for "
-                            "%(device)s: %(e)s"),
-                          {'device': device, 'e': e})
-                resync = True
-                continue
+        devices = [device for device in devices if device in vif_ports]
+        if not devices:
+            return False
+        LOG.debug(_("Processing ports %s"), devices)
+        try:
+            devices_details_list = self.plugin_rpc.get_devices_details_list(
+                self.context, devices, self.agent_id)
+        except Exception as e:
+            LOG.debug(_("Unable to get port details for "
+                        "%(devices)s: %(e)s"),
+                      {'devices': devices, 'e': e})
+            return True
+        devices_up = []
+        devices_down = []
+        for details in devices_details_list:
+            device = details['device']
+            port = vif_ports[device]
             if 'port_id' in details:
                 LOG.info(_("Port %(device)s updated. Details: %(details)s"),
                          {'device': device, 'details': details})
@@ -953,18 +1014,30 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                 # update plugin about port status
                 if details.get('admin_state_up'):
                     LOG.debug(_("Setting status for %s to UP"), device)
-                    self.plugin_rpc.update_device_up(
-                        self.context, device, self.agent_id, cfg.CONF.host)
+                    devices_up.append(device)
                 else:
                     LOG.debug(_("Setting status for %s to DOWN"), device)
-                    self.plugin_rpc.update_device_down(
-                        self.context, device, self.agent_id, cfg.CONF.host)
-                LOG.info(_("Configuration for device %s completed."), device)
+                    devices_down.append(device)
             else:
                 LOG.warn(_("Device %s not defined on plugin"), device)
                 if (port and port.ofport != -1):
                     self.port_dead(port)
-        return resync
+        if devices_up or devices_down:
+            # the ports are only reported up once their flows are in place,
+            # even if the flows of the loop are still being batched
+            self.apply_deferred_flows()
+            try:
+                self.plugin_rpc.update_devices_status(
+                    self.context, devices_up, devices_down, self.agent_id,
+                    cfg.CONF.host)
+            except Exception as e:
+                LOG.debug(_("Unable to update status of %(devices)s: "
+                            "%(e)s"),
+                          {'devices': devices_up + devices_down, 'e': e})
+                return True
+            LOG.info(_("Configuration for devices %s completed."),
+                     devices_up + devices_down)
+        return False
 
     def treat_ancillary_devices_added(self, devices):
         resync = False
@@ -1126,6 +1199,7 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
             polling_manager = polling.AlwaysPoll()
 
         sync = True
+        full_scan = True
         ports = set()
         updated_ports_copy = set()
         ancillary_ports = set()
@@ -1139,11 +1213,17 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                                         'removed': 0}}
             LOG.debug(_("Agent rpc_loop - iteration:%d started"),
                       self.iter_num)
+            # The flows changed by the iteration are applied in one batch
+            # per bridge before waiting for the next one
+            flow_bridges = self._flow_bridges()
+            for br in flow_bridges:
+                br.defer_apply_on()
             if sync:
                 LOG.info(_("Agent out of sync with plugin!"))
                 ports.clear()
                 ancillary_ports.clear()
                 sync = False
+                full_scan = True
                 polling_manager.force_polling()
             # Notify the plugin of tunnel IP
             if self.enable_tunneling and tunnel_sync:
@@ -1165,8 +1245,14 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                     # between these two statements, this will be thread-safe
                     updated_ports_copy = self.updated_ports
                     self.updated_ports = set()
-                    port_info = self.scan_ports(ports, updated_ports_copy)
+                    # Always consume the events, even for a full scan
+                    events = polling_manager.get_events()
+                    if full_scan:
+                        events = None
+                    port_info = self.scan_ports(ports, updated_ports_copy,
+                                                events)
                     ports = port_info['current']
+                    full_scan = False
                     LOG.debug(_("Agent rpc_loop - iteration:%(iter_num)d - "
                                 "port information retrieved. "
                                 "Elapsed:%(elapsed).3f"),
@@ -1222,7 +1308,10 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                     self.updated_ports |= updated_ports_copy
                     sync = True
 
-            # sleep till end of polling interval
+            for br in flow_bridges:
+                br.defer_apply_off()
+            # sleep till end of polling interval, or until the polling
+            # manager detects changes
             elapsed = (time.time() - start)
             LOG.debug(_("Agent rpc_loop - iteration:%(iter_num)d "
                         "completed. Processed ports statistics: "
@@ -1231,7 +1320,7 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                        'port_stats': port_stats,
                        'elapsed': elapsed})
             if (elapsed < self.polling_interval):
-                time.sleep(self.polling_interval - elapsed)
+                polling_manager.wait(self.polling_interval - elapsed)
             else:
                 LOG.debug(_("Loop iteration exceeded interval "
                             "(%(polling_interval)s vs. %(elapsed)s)!"),
@@ -1289,6 +1378,11 @@ def create_agent_config_map(config):
             msg = _('Tunneling cannot be enabled without a valid local_ip.')
             raise ValueError(msg)
 
+    if config.AGENT.rpc_devices_chunk_size < 1:
+        msg = (_('Invalid rpc_devices_chunk_size %s, it must be at least 1.')
+               % config.AGENT.rpc_devices_chunk_size)
+        raise ValueError(msg)
+
     return kwargs
 
 
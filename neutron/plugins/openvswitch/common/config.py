@@ -80,6 +80,10 @@ agent_opts = [
     cfg.BoolOpt('l2_population', default=False,
                 help=_("Use ml2 l2population mechanism driver to learn "
                        "remote mac and IPs and improve tunnel scalability")),
+    cfg.IntOpt('rpc_devices_chunk_size', default=100,
+               help=_("Maximum number of devices whose details are "
+                      "requested from the plugin in a single RPC call, "
+                      "at least 1")),
 ]
 
 
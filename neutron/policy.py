@@ -36,6 +36,13 @@ from neutron.openstack.common import policy
 LOG = logging.getLogger(__name__)
 _POLICY_PATH = None
 _POLICY_CACHE = {}
+# Match rules built by _build_match_rule, and the number of lookups which
+# found or missed them since the rules were last loaded
+_MATCH_RULE_CACHE = {}
+_MATCH_RULE_CACHE_STATS = {'hits': 0, 'misses': 0}
+# Policy enforced attributes of the resources, by resource, computed by
+# _get_policy_attributes since the rules were last loaded
+_POLICY_ATTRIBUTES = {}
 ADMIN_CTX_POLICY = 'context_is_admin'
 # Maps deprecated 'extension' policies to new-style policies
 DEPRECATED_POLICY_MAP = {
@@ -62,6 +69,7 @@ def reset():
     global _POLICY_CACHE
     _POLICY_PATH = None
     _POLICY_CACHE = {}
+    _clear_match_rule_cache()
     policy.reset()
 
 
@@ -116,19 +124,30 @@ def _set_rules(data):
                 LOG.error(_("Backward compatibility unavailable for "
                             "deprecated policy %s. The policy will "
                             "not be enforced"), pol)
+    _clear_match_rule_cache()
     policy.set_rules(policies)
 
 
-def _is_attribute_explicitly_set(attribute_name, resource, target):
-    """Verify that an attribute is present and has a non-default value."""
-    return ('default' in resource[attribute_name] and
-            attribute_name in target and
-            target[attribute_name] is not attributes.ATTR_NOT_SPECIFIED and
-            target[attribute_name] != resource[attribute_name]['default'])
+def _clear_match_rule_cache():
+    _MATCH_RULE_CACHE.clear()
+    _POLICY_ATTRIBUTES.clear()
+    _MATCH_RULE_CACHE_STATS['hits'] = 0
+    _MATCH_RULE_CACHE_STATS['misses'] = 0
 
 
-def _build_subattr_match_rule(attr_name, attr, action, target):
-    """Create the rule to match for sub-attribute policy checks."""
+def get_match_rule_cache_stats():
+    """Return the hits, misses and size of the match rule cache."""
+    return dict(_MATCH_RULE_CACHE_STATS, size=len(_MATCH_RULE_CACHE))
+
+
+def _has_subattr_policy(attribute):
+    validate = attribute.get('validate')
+    return (validate and any([k.startswith('type:dict') and v
+                              for (k, v) in validate.iteritems()]))
+
+
+def _get_subattr_descriptor(attr_name, attr):
+    """Return the dict descriptor of the sub-attributes, None if unknown."""
     # TODO(salv-orlando): Instead of relying on validator info, introduce
     # typing for API attributes
     # Expect a dict as type descriptor
@@ -144,15 +163,104 @@ def _build_subattr_match_rule(attr_name, attr, action, target):
                     "generate any sub-attr policy rule for %s."),
                   attr_name)
         return
+    return data
+
+
+def _get_subattr_names(attr_name, attr, target):
+    """Return the sub-attributes set on the target by the dict descriptor."""
+    data = _get_subattr_descriptor(attr_name, attr)
+    if data is None:
+        return
+    return [sub_attr_name for sub_attr_name in data
+            if sub_attr_name in target[attr_name]]
+
+
+def _build_subattr_rule(action, attr_name, sub_attr_names):
     sub_attr_rules = [policy.RuleCheck('rule', '%s:%s:%s' %
                                        (action, attr_name,
                                         sub_attr_name)) for
-                      sub_attr_name in data if sub_attr_name in
-                      target[attr_name]]
+                      sub_attr_name in sub_attr_names]
     return policy.AndCheck(sub_attr_rules)
 
 
+def _build_subattr_match_rule(attr_name, attr, action, target):
+    """Create the rule to match for sub-attribute policy checks."""
+    sub_attr_names = _get_subattr_names(attr_name, attr, target)
+    if sub_attr_names is None:
+        return
+    return _build_subattr_rule(action, attr_name, sub_attr_names)
+
+
+def _get_policy_attributes(resource):
+    """Return the attributes of a resource whose policy is enforced.
+
+    They are returned as (name, default, sub-attribute names) tuples, the
+    sub-attribute names being None when the attribute has no sub-attribute
+    policy. Only the attributes with a default are returned, the other
+    ones can't be explicitly set.
+
+    They are computed once for each resource until the policies are
+    reloaded, or the attributes of the resource are extended.
+    """
+    res_attrs = attributes.RESOURCE_ATTRIBUTE_MAP[resource]
+    cached = _POLICY_ATTRIBUTES.get(resource)
+    if cached and cached[0] is res_attrs and cached[1] == len(res_attrs):
+        return cached[2]
+    policy_attrs = []
+    for attr_name, attr in res_attrs.iteritems():
+        if 'enforce_policy' not in attr or 'default' not in attr:
+            continue
+        sub_attr_names = None
+        if _has_subattr_policy(attr):
+            data = _get_subattr_descriptor(attr_name, attr)
+            if data is not None:
+                sub_attr_names = tuple(data)
+        policy_attrs.append((attr_name, attr['default'], sub_attr_names))
+    _POLICY_ATTRIBUTES[resource] = (res_attrs, len(res_attrs), policy_attrs)
+    return policy_attrs
+
+
+def _get_match_rule_key(action, target):
+    """Return what the match rule of the action on the target depends on.
+
+    This is the action, along with the policy enforced attributes which
+    are explicitly set on the target and their sub-attributes.
+    """
+    resource, is_write = get_resource_and_action(action)
+    # Attribute-based checks shall not be enforced on GETs
+    if not is_write or resource not in attributes.RESOURCE_ATTRIBUTE_MAP:
+        return action, ()
+    attrs = []
+    for attr_name, default, sub_attr_names in _get_policy_attributes(
+            resource):
+        value = target.get(attr_name, attributes.ATTR_NOT_SPECIFIED)
+        if value is attributes.ATTR_NOT_SPECIFIED or value == default:
+            continue
+        if sub_attr_names is not None:
+            sub_attr_names = tuple(name for name in sub_attr_names
+                                   if name in value)
+        attrs.append((attr_name, sub_attr_names))
+    return action, tuple(attrs)
+
+
 def _build_match_rule(action, target):
+    """Return the rule to match for a given action.
+
+    The rule only depends on the action and on the attributes set on the
+    target, so it is built once for each of their combinations by
+    _compile_match_rule, and cached until the policies are reloaded.
+    """
+    key = _get_match_rule_key(action, target)
+    match_rule = _MATCH_RULE_CACHE.get(key)
+    if match_rule is None:
+        _MATCH_RULE_CACHE_STATS['misses'] += 1
+        match_rule = _MATCH_RULE_CACHE[key] = _compile_match_rule(*key)
+    else:
+        _MATCH_RULE_CACHE_STATS['hits'] += 1
+    return match_rule
+
+
+def _compile_match_rule(action, attrs):
     """Create the rule to match for a given action.
 
     The policy rule to be matched is built in the following way:
@@ -163,33 +271,20 @@ def _build_match_rule(action, target):
     4) add an entry for sub-attributes of a resource for which the
        action is being executed
        (e.g.: create_router:external_gateway_info:network_id)
+
+    attrs are the attributes set on the target and their sub-attributes,
+    as returned by _get_match_rule_key.
     """
 
     match_rule = policy.RuleCheck('rule', action)
-    resource, is_write = get_resource_and_action(action)
-    # Attribute-based checks shall not be enforced on GETs
-    if is_write:
-        # assigning to variable with short name for improving readability
-        res_map = attributes.RESOURCE_ATTRIBUTE_MAP
-        if resource in res_map:
-            for attribute_name in res_map[resource]:
-                if _is_attribute_explicitly_set(attribute_name,
-                                                res_map[resource],
-                                                target):
-                    attribute = res_map[resource][attribute_name]
-                    if 'enforce_policy' in attribute:
-                        attr_rule = policy.RuleCheck('rule', '%s:%s' %
-                                                     (action, attribute_name))
-                        # Build match entries for sub-attributes, if present
-                        validate = attribute.get('validate')
-                        if (validate and any([k.startswith('type:dict') and v
-                                              for (k, v) in
-                                              validate.iteritems()])):
-                            attr_rule = policy.AndCheck(
-                                [attr_rule, _build_subattr_match_rule(
-                                    attribute_name, attribute,
-                                    action, target)])
-                        match_rule = policy.AndCheck([match_rule, attr_rule])
+    for attr_name, sub_attr_names in attrs:
+        attr_rule = policy.RuleCheck('rule', '%s:%s' % (action, attr_name))
+        # Build match entries for sub-attributes, if present
+        if sub_attr_names is not None:
+            attr_rule = policy.AndCheck(
+                [attr_rule,
+                 _build_subattr_rule(action, attr_name, sub_attr_names)])
+        match_rule = policy.AndCheck([match_rule, attr_rule])
     return match_rule
 
 
@@ -223,43 +318,49 @@ class OwnerCheck(policy.Check):
                 reason=err_reason)
         super(OwnerCheck, self).__init__(kind, match)
 
+    def get_parent_info(self):
+        """Return the parent resource, field and foreign key to check."""
+        # target field is in the form resource:field
+        # however if they're not separated by a colon, use an underscore
+        # as a separator for backward compatibility
+
+        def do_split(separator):
+            parent_res, parent_field = self.target_field.split(
+                separator, 1)
+            return parent_res, parent_field
+
+        for separator in (':', '_'):
+            try:
+                parent_res, parent_field = do_split(separator)
+                break
+            except ValueError:
+                LOG.debug(_("Unable to find ':' as separator in %s."),
+                          self.target_field)
+        else:
+            # If we are here split failed with both separators
+            err_reason = (_("Unable to find resource name in %s") %
+                          self.target_field)
+            LOG.exception(err_reason)
+            raise exceptions.PolicyCheckError(
+                policy="%s:%s" % (self.kind, self.match),
+                reason=err_reason)
+        parent_foreign_key = attributes.RESOURCE_FOREIGN_KEYS.get(
+            "%ss" % parent_res, None)
+        if not parent_foreign_key:
+            err_reason = (_("Unable to verify match:%(match)s as the "
+                            "parent resource: %(res)s was not found") %
+                          {'match': self.match, 'res': parent_res})
+            LOG.exception(err_reason)
+            raise exceptions.PolicyCheckError(
+                policy="%s:%s" % (self.kind, self.match),
+                reason=err_reason)
+        return parent_res, parent_field, parent_foreign_key
+
     def __call__(self, target, creds):
         if self.target_field not in target:
             # policy needs a plugin check
-            # target field is in the form resource:field
-            # however if they're not separated by a colon, use an underscore
-            # as a separator for backward compatibility
-
-            def do_split(separator):
-                parent_res, parent_field = self.target_field.split(
-                    separator, 1)
-                return parent_res, parent_field
-
-            for separator in (':', '_'):
-                try:
-                    parent_res, parent_field = do_split(separator)
-                    break
-                except ValueError:
-                    LOG.debug(_("Unable to find ':' as separator in %s."),
-                              self.target_field)
-            else:
-                # If we are here split failed with both separators
-                err_reason = (_("Unable to find resource name in %s") %
-                              self.target_field)
-                LOG.exception(err_reason)
-                raise exceptions.PolicyCheckError(
-                    policy="%s:%s" % (self.kind, self.match),
-                    reason=err_reason)
-            parent_foreign_key = attributes.RESOURCE_FOREIGN_KEYS.get(
-                "%ss" % parent_res, None)
-            if not parent_foreign_key:
-                err_reason = (_("Unable to verify match:%(match)s as the "
-                                "parent resource: %(res)s was not found") %
-                              {'match': self.match, 'res': parent_res})
-                LOG.exception(err_reason)
-                raise exceptions.PolicyCheckError(
-                    policy="%s:%s" % (self.kind, self.match),
-                    reason=err_reason)
+            parent_res, parent_field, parent_foreign_key = (
+                self.get_parent_info())
             # NOTE(salv-orlando): This check currently assumes the parent
             # resource is handled by the core plugin. It might be worth
             # having a way to map resources to plugins so to make this
@@ -343,6 +444,88 @@ def check(context, action, target, plugin=None):
     return policy.check(*(_prepare_check(context, action, target)))
 
 
+def _extract_owner_checks(rule, checks):
+    if isinstance(rule, OwnerCheck):
+        checks.append(rule)
+    elif isinstance(rule, policy.RuleCheck):
+        try:
+            _extract_owner_checks(policy._rules[rule.match], checks)
+        except KeyError:
+            pass
+    elif hasattr(rule, 'rules'):
+        for rule in rule.rules:
+            _extract_owner_checks(rule, checks)
+    elif hasattr(rule, 'rule'):
+        _extract_owner_checks(rule.rule, checks)
+
+
+def _prefetch_parent_fields(match_rule, targets):
+    """Set on the targets the parent resource fields checked by the rule.
+
+    The parents of all the targets are loaded with a single call to the
+    core plugin, instead of one call per target in OwnerCheck.
+    """
+    owner_checks = []
+    _extract_owner_checks(match_rule, owner_checks)
+    for check in owner_checks:
+        missing = [target for target in targets
+                   if check.target_field not in target]
+        if not missing:
+            continue
+        try:
+            parent_res, parent_field, parent_foreign_key = (
+                check.get_parent_info())
+        except exceptions.PolicyCheckError:
+            # Raised by OwnerCheck if the check is ever evaluated
+            continue
+        parent_ids = set(target[parent_foreign_key] for target in missing
+                         if parent_foreign_key in target)
+        f = getattr(manager.NeutronManager.get_instance().plugin,
+                    'get_%ss' % parent_res, None)
+        if not parent_ids or not f:
+            continue
+        context = importutils.import_module('neutron.context')
+        parents = f(context.get_admin_context(),
+                    filters={'id': list(parent_ids)},
+                    fields=['id', parent_field])
+        values = dict((parent['id'], parent[parent_field])
+                      for parent in parents)
+        for target in missing:
+            parent_id = target.get(parent_foreign_key)
+            if parent_id in values:
+                target[check.target_field] = values[parent_id]
+
+
+def check_list(context, action, targets, plugin=None):
+    """Return the targets on which the action is valid in this context.
+
+    This is equivalent to calling check on each target, but the match rule
+    of read actions is built once, and the parent resources whose owner is
+    checked are loaded together for all the targets.
+
+    :param context: neutron context
+    :param action: string representing the action to be checked
+    :param targets: list of dictionaries representing the objects of the
+        action
+    :param plugin: currently unused and deprecated.
+        Kept for backward compatibility.
+
+    :return: Returns the list of the targets on which access is permitted.
+    """
+    init()
+    resource, is_write = get_resource_and_action(action)
+    if is_write:
+        # The match rule depends on the attributes set on each target
+        return [target for target in targets
+                if policy.check(*(_prepare_check(context, action, target)))]
+    match_rule = _build_match_rule(action, {})
+    credentials = context.to_dict()
+    if not context.is_admin:
+        _prefetch_parent_fields(match_rule, targets)
+    return [target for target in targets
+            if policy.check(match_rule, target, credentials)]
+
+
 def check_if_exists(context, action, target):
     """Verify if the action can be authorized, and raise if it is unknown.
 
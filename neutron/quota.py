@@ -55,6 +55,12 @@ quota_opts = [
     cfg.StrOpt('quota_driver',
                default=QUOTA_DB_DRIVER,
                help=_('Default driver to use for quota checks')),
+    cfg.IntOpt('reservation_expiration',
+               default=120,
+               help=_('Number of seconds after which the quota reserved '
+                      'for resources being created is released, if the '
+                      'drivers reserving quota do not see the end of '
+                      'their creation.')),
 ]
 # Register the configuration options
 cfg.CONF.register_opts(quota_opts, 'QUOTAS')
@@ -235,6 +241,26 @@ class QuotaEngine(object):
             LOG.info(_('Loaded quota_driver: %s.'), _driver_class)
         return self._driver
 
+    def track_resources(self):
+        """Let the driver track the usage of the resources.
+
+        The driver is only loaded by the first quota check, which the
+        processes not serving the API, e.g. RPC workers, never do. The
+        drivers updating the usages on the creations and deletions of
+        resources must nonetheless be told about them.
+        """
+        _driver_class = (self._driver or self._driver_class or
+                         cfg.CONF.QUOTAS.quota_driver)
+        if isinstance(_driver_class, basestring):
+            if (_driver_class.startswith(QUOTA_DB_MODULE + '.') and
+                    QUOTA_DB_MODULE not in sys.modules):
+                # get_driver would load the ConfDriver
+                return
+            _driver_class = importutils.import_class(_driver_class)
+        track_resources = getattr(_driver_class, 'track_resources', None)
+        if track_resources:
+            track_resources()
+
     def __contains__(self, resource):
         return resource in self._resources
 
@@ -301,6 +327,41 @@ class QuotaEngine(object):
         return self.get_driver().limit_check(context, tenant_id,
                                              self._resources, values)
 
+    @property
+    def supports_reservations(self):
+        """Whether the driver reserves quota rather than counting usage."""
+        return hasattr(self.get_driver(), 'make_reservation')
+
+    def make_reservation(self, context, tenant_id, deltas, *args):
+        """Reserve quota for the creation of resources.
+
+        The deltas are the number of resources of each type to create.
+        Arguments following them are passed to the count functions of
+        the resources when the driver needs to count their usage.
+
+        This method will raise a QuotaResourceUnknown exception if a
+        given resource is unknown, and an OverQuota exception if any of
+        the resources would go over the quota.  Otherwise the reservation
+        is returned, which must be passed to commit_reservation or
+        cancel_reservation once the resources are created or failed to.
+
+        :param context: The request context, for access checks.
+        :param tenant_id: The tenant_id to reserve quota for.
+        :param deltas: A dictionary of the number of resources to create.
+        """
+
+        return self.get_driver().make_reservation(context, tenant_id,
+                                                  self._resources, deltas,
+                                                  *args)
+
+    def commit_reservation(self, context, reservation):
+        """Commit a reservation once its resources are created."""
+        self.get_driver().commit_reservation(context, reservation)
+
+    def cancel_reservation(self, context, reservation):
+        """Cancel a reservation whose resources could not be created."""
+        self.get_driver().cancel_reservation(context, reservation)
+
     @property
     def resources(self):
         return self._resources
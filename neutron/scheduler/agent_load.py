@@ -0,0 +1,62 @@
+# Copyright 2014 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import heapq
+import random
+
+
+class AgentLoadHeap(object):
+    """Agents ordered by the number of resources they host.
+
+    The heap is filled once from the loads of the agents and updated as
+    resources are placed, so that a batch of resources is scheduled
+    without querying the agents again. Agents carrying the same load are
+    taken in a random order, so that servers scheduling concurrently from
+    the same counts do not all pick the same agent.
+    """
+
+    def __init__(self):
+        self._heap = []
+
+    def __len__(self):
+        return len(self._heap)
+
+    def add(self, agent, load=0):
+        heapq.heappush(self._heap, (load, random.random(), agent))
+
+    def min_load(self):
+        """Return the load of the least loaded agent, None if empty."""
+        if self._heap:
+            return self._heap[0][0]
+
+    def take(self, count=1, exclude=()):
+        """Take the count least loaded agents whose id is not in exclude.
+
+        The load of each agent taken is increased by one. Fewer agents
+        are returned when not enough of them are eligible.
+        """
+        chosen = []
+        skipped = []
+        while self._heap and len(chosen) < count:
+            entry = heapq.heappop(self._heap)
+            if entry[2].id in exclude:
+                skipped.append(entry)
+            else:
+                chosen.append(entry)
+        for load, tie, agent in chosen:
+            heapq.heappush(self._heap, (load + 1, tie, agent))
+        for entry in skipped:
+            heapq.heappush(self._heap, entry)
+        return [entry[2] for entry in chosen]
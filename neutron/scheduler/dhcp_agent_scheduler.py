@@ -18,12 +18,15 @@
 import random
 
 from oslo.config import cfg
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
 
 from neutron.common import constants
 from neutron.db import agents_db
 from neutron.db import agentschedulers_db
 from neutron.openstack.common.db import exception as db_exc
 from neutron.openstack.common import log as logging
+from neutron.scheduler import agent_load
 
 
 LOG = logging.getLogger(__name__)
@@ -79,7 +82,7 @@ class ChanceScheduler(object):
             active_dhcp_agents = [
                 agent for agent in set(enabled_dhcp_agents)
                 if not agents_db.AgentDbMixin.is_agent_down(
-                    agent['heartbeat_timestamp'])
+                    agents_db.get_heartbeat_timestamp(agent))
                 and agent not in dhcp_agents
             ]
             if not active_dhcp_agents:
@@ -105,7 +108,7 @@ class ChanceScheduler(object):
             dhcp_agents = query.all()
             for dhcp_agent in dhcp_agents:
                 if agents_db.AgentDbMixin.is_agent_down(
-                    dhcp_agent.heartbeat_timestamp):
+                    agents_db.get_heartbeat_timestamp(dhcp_agent)):
                     LOG.warn(_('DHCP agent %s is not active'), dhcp_agent.id)
                     continue
                 fields = ['network_id', 'enable_dhcp']
@@ -127,3 +130,108 @@ class ChanceScheduler(object):
                     binding.network_id = net_id
                     context.session.add(binding)
         return True
+
+
+class LeastLoadedScheduler(ChanceScheduler):
+    """Allocate the DHCP agents hosting the fewest networks to networks.
+
+    The number of networks bound to every DHCP agent is read with a single
+    aggregated query and the active agents are kept in a heap ordered by
+    that load, so that a batch of networks is placed in one pass.
+    """
+
+    def schedule(self, plugin, context, network):
+        """Schedule the network to the least loaded active DHCP agent(s).
+
+        A list of scheduled agents is returned.
+        """
+        chosen_agents = self.schedule_networks(plugin, context,
+                                               [network['id']])
+        return chosen_agents.get(network['id'])
+
+    def schedule_networks(self, plugin, context, network_ids):
+        """Schedule the networks to the least loaded active DHCP agents.
+
+        A dict of the agents scheduled to each network is returned.
+        """
+        agents_per_network = cfg.CONF.dhcp_agents_per_network
+        scheduled = {}
+        with context.session.begin(subtransactions=True):
+            active_dhcp_agents = self._get_active_agents(plugin, context)
+            if not active_dhcp_agents:
+                LOG.warn(_('No more DHCP agents'))
+                return scheduled
+            hosting_agent_ids = self._get_hosting_agent_ids(context,
+                                                            network_ids)
+            agent_heap = agent_load.AgentLoadHeap()
+            loads = self._get_agent_loads(context)
+            for agent in active_dhcp_agents:
+                agent_heap.add(agent, loads.get(agent.id, 0))
+            for network_id in network_ids:
+                agent_ids = hosting_agent_ids.get(network_id, {})
+                n_agents = agents_per_network - len(
+                    [a for a in agent_ids.values() if a])
+                if n_agents <= 0:
+                    LOG.debug(_('Network %s is hosted already'),
+                              network_id)
+                    continue
+                chosen_agents = agent_heap.take(n_agents, exclude=agent_ids)
+                if not chosen_agents:
+                    LOG.warn(_('No more DHCP agents'))
+                    continue
+                for agent in chosen_agents:
+                    self._schedule_bind_network(context, agent, network_id)
+                scheduled[network_id] = chosen_agents
+        return scheduled
+
+    def auto_schedule_networks(self, plugin, context, host):
+        """Schedule the networks lacking DHCP agents.
+
+        The networks are spread over all the active DHCP agents, the agent
+        on the specified host being one of them, rather than all given to
+        that agent.
+        """
+        fields = ['network_id', 'enable_dhcp']
+        subnets = plugin.get_subnets(context, fields=fields)
+        net_ids = set(s['network_id'] for s in subnets if s['enable_dhcp'])
+        if not net_ids:
+            LOG.debug(_('No non-hosted networks'))
+            return False
+        self.schedule_networks(plugin, context, sorted(net_ids))
+        return True
+
+    def _get_active_agents(self, plugin, context):
+        enabled_dhcp_agents = plugin.get_agents_db(
+            context, filters={
+                'agent_type': [constants.AGENT_TYPE_DHCP],
+                'admin_state_up': [True]})
+        return [agent for agent in enabled_dhcp_agents
+                if not agents_db.AgentDbMixin.is_agent_down(
+                    agents_db.get_heartbeat_timestamp(agent))]
+
+    def _get_hosting_agent_ids(self, context, network_ids):
+        """Return the agents bound to each network.
+
+        Each network is mapped to a dict telling for the id of every agent
+        bound to it whether that agent is active.
+        """
+        if not network_ids:
+            return {}
+        binding = agentschedulers_db.NetworkDhcpAgentBinding
+        query = context.session.query(binding)
+        query = query.options(joinedload('dhcp_agent'))
+        query = query.filter(binding.network_id.in_(network_ids))
+        hosting_agent_ids = {}
+        for item in query:
+            agent = item.dhcp_agent
+            hosting_agent_ids.setdefault(item.network_id, {})[agent.id] = (
+                agent.admin_state_up and
+                not agents_db.AgentDbMixin.is_agent_down(
+                    agents_db.get_heartbeat_timestamp(agent)))
+        return hosting_agent_ids
+
+    def _get_agent_loads(self, context):
+        binding = agentschedulers_db.NetworkDhcpAgentBinding
+        query = context.session.query(binding.dhcp_agent_id,
+                                      func.count(binding.network_id))
+        return dict(query.group_by(binding.dhcp_agent_id))
@@ -19,6 +19,7 @@ import abc
 import random
 
 import six
+from sqlalchemy import func
 from sqlalchemy.orm import exc
 from sqlalchemy.sql import exists
 
@@ -27,6 +28,7 @@ from neutron.db import agents_db
 from neutron.db import l3_agentschedulers_db
 from neutron.db import l3_db
 from neutron.openstack.common import log as logging
+from neutron.scheduler import agent_load
 
 
 LOG = logging.getLogger(__name__)
@@ -43,6 +45,19 @@ class L3Scheduler(object):
         """
         pass
 
+    def schedule_routers(self, plugin, context, router_ids):
+        """Schedule the routers to active L3 agents.
+
+        The agents chosen for the routers which were scheduled are
+        returned.
+        """
+        chosen_agents = []
+        for router_id in router_ids:
+            chosen_agent = self.schedule(plugin, context, router_id)
+            if chosen_agent:
+                chosen_agents.append(chosen_agent)
+        return chosen_agents
+
     def auto_schedule_routers(self, plugin, context, host, router_ids):
         """Schedule non-hosted routers to L3 Agent running on host.
 
@@ -66,21 +81,12 @@ class L3Scheduler(object):
                           host)
                 return False
             if agents_db.AgentDbMixin.is_agent_down(
-                l3_agent.heartbeat_timestamp):
+                agents_db.get_heartbeat_timestamp(l3_agent)):
                 LOG.warn(_('L3 agent %s is not active'), l3_agent.id)
             # check if each of the specified routers is hosted
             if router_ids:
-                unscheduled_router_ids = []
-                for router_id in router_ids:
-                    l3_agents = plugin.get_l3_agents_hosting_routers(
-                        context, [router_id], admin_state_up=True)
-                    if l3_agents:
-                        LOG.debug(_('Router %(router_id)s has already been'
-                                    ' hosted by L3 agent %(agent_id)s'),
-                                  {'router_id': router_id,
-                                   'agent_id': l3_agents[0]['id']})
-                    else:
-                        unscheduled_router_ids.append(router_id)
+                unscheduled_router_ids = self._get_unhosted_router_ids(
+                    context, router_ids)
                 if not unscheduled_router_ids:
                     # all (specified) routers are already scheduled
                     return False
@@ -101,12 +107,10 @@ class L3Scheduler(object):
             # with the router
             routers = plugin.get_routers(
                 context, filters={'id': unscheduled_router_ids})
-            to_removed_ids = []
-            for router in routers:
-                candidates = plugin.get_l3_agent_candidates(router, [l3_agent])
-                if not candidates:
-                    to_removed_ids.append(router['id'])
-            router_ids = set([r['id'] for r in routers]) - set(to_removed_ids)
+            agent_conf = plugin.get_configuration_dict(l3_agent)
+            router_ids = set(router['id'] for router in routers
+                             if plugin.is_router_supported_by_agent_conf(
+                                 router, agent_conf))
             if not router_ids:
                 LOG.warn(_('No routers compatible with L3 agent configuration'
                            ' on host %s'), host)
@@ -114,8 +118,24 @@ class L3Scheduler(object):
 
             for router_id in router_ids:
                 self.bind_router(context, router_id, l3_agent)
+            plugin.bump_router_revisions(context, router_ids)
         return True
 
+    def _get_unhosted_router_ids(self, context, router_ids):
+        """Return the routers not hosted by an enabled L3 agent yet."""
+        if not router_ids:
+            return []
+        binding = l3_agentschedulers_db.RouterL3AgentBinding
+        query = context.session.query(binding.router_id)
+        query = query.join(binding.l3_agent)
+        query = query.filter(binding.router_id.in_(router_ids),
+                             agents_db.Agent.admin_state_up == True)
+        hosted = set(item[0] for item in query)
+        for router_id in hosted:
+            LOG.debug(_('Router %s has already been hosted'), router_id)
+        return [router_id for router_id in router_ids
+                if router_id not in hosted]
+
     def get_candidates(self, plugin, context, sync_router):
         """Return L3 agents where a router could be scheduled."""
         with context.session.begin(subtransactions=True):
@@ -190,3 +210,76 @@ class LeastRoutersScheduler(L3Scheduler):
             self.bind_router(context, router_id, chosen_agent)
 
             return chosen_agent
+
+
+class LeastLoadedScheduler(L3Scheduler):
+    """Allocate routers to the L3 agents hosting the fewest routers.
+
+    The number of routers bound to every L3 agent is read with a single
+    aggregated query, and the active agents sharing a configuration are
+    kept in a heap ordered by that load. A batch of routers is then placed
+    in one pass, where the other schedulers query all the L3 agents, parse
+    their configurations and count their routers again for each router.
+    """
+
+    def schedule(self, plugin, context, router_id):
+        chosen_agents = self.schedule_routers(plugin, context, [router_id])
+        if chosen_agents:
+            return chosen_agents[0]
+
+    def schedule_routers(self, plugin, context, router_ids):
+        with context.session.begin(subtransactions=True):
+            router_ids = self._get_unhosted_router_ids(context, router_ids)
+            if not router_ids:
+                return []
+            active_l3_agents = plugin.get_l3_agents(context, active=True)
+            if not active_l3_agents:
+                LOG.warn(_('No active L3 agents'))
+                return []
+            agent_pools = self._get_agent_pools(plugin, context,
+                                                active_l3_agents)
+            chosen_agents = []
+            routers = plugin.get_routers(context,
+                                         filters={'id': router_ids})
+            for router in routers:
+                # the pools are few, one per distinct agent configuration
+                candidate_pools = [
+                    pool for agent_conf, pool in agent_pools
+                    if plugin.is_router_supported_by_agent_conf(
+                        router, agent_conf)]
+                if not candidate_pools:
+                    LOG.warn(_('No L3 agents can host the router %s'),
+                             router['id'])
+                    continue
+                pool = min(candidate_pools, key=lambda p: p.min_load())
+                chosen_agent = pool.take()[0]
+                self.bind_router(context, router['id'], chosen_agent)
+                chosen_agents.append(chosen_agent)
+        return chosen_agents
+
+    def _get_agent_pools(self, plugin, context, l3_agents):
+        """Group the agents by configuration in heaps ordered by load.
+
+        A list of (agent configuration, heap) tuples is returned.
+        """
+        binding = l3_agentschedulers_db.RouterL3AgentBinding
+        query = context.session.query(binding.l3_agent_id,
+                                      func.count(binding.router_id))
+        loads = dict(query.group_by(binding.l3_agent_id))
+        pools = {}
+        for l3_agent in l3_agents:
+            agent_conf = plugin.get_configuration_dict(l3_agent)
+            use_namespaces = agent_conf.get('use_namespaces', True)
+            pool_conf = {
+                'use_namespaces': use_namespaces,
+                'router_id': (None if use_namespaces
+                              else agent_conf.get('router_id')),
+                'handle_internal_only_routers': agent_conf.get(
+                    'handle_internal_only_routers', True),
+                'gateway_external_network_id': agent_conf.get(
+                    'gateway_external_network_id')}
+            key = tuple(sorted(pool_conf.items()))
+            if key not in pools:
+                pools[key] = (pool_conf, agent_load.AgentLoadHeap())
+            pools[key][1].add(l3_agent, loads.get(l3_agent.id, 0))
+        return pools.values()
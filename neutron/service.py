@@ -23,11 +23,14 @@ from oslo.config import cfg
 from neutron.common import config
 from neutron.common import legacy
 from neutron import context
+from neutron import manager
+from neutron.openstack.common.db.sqlalchemy import session
 from neutron.openstack.common import excutils
 from neutron.openstack.common import importutils
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import loopingcall
 from neutron.openstack.common.rpc import service
+from neutron.openstack.common import service as common_service
 from neutron import wsgi
 
 
@@ -38,6 +41,10 @@ service_opts = [
     cfg.IntOpt('api_workers',
                default=0,
                help=_('Number of separate worker processes for service')),
+    cfg.IntOpt('rpc_workers',
+               default=0,
+               help=_('Number of separate worker processes consuming the '
+                      'RPC messages of the agents')),
     cfg.IntOpt('periodic_fuzzy_delay',
                default=5,
                help=_('Range of seconds to randomly delay when starting the '
@@ -124,6 +131,63 @@ def _run_wsgi(app_name):
     return server
 
 
+class RpcWorker(common_service.Service):
+    """Consume the RPC messages of the plugin, in a worker process.
+
+    Each worker opens its own connection, the workers consuming the
+    plugin topics share their messages. Stopping the worker, including
+    on a SIGHUP restart, stops consuming and lets the messages being
+    processed complete before closing the connection.
+    """
+
+    def __init__(self, plugin):
+        super(RpcWorker, self).__init__()
+        self._plugin = plugin
+        self._conn = None
+
+    def start(self):
+        super(RpcWorker, self).start()
+        # We may have just forked from parent process.  A quick disposal of the
+        # existing sql connections avoids sharing them with the parent.
+        session.get_engine(sqlite_fk=True).pool.dispose()
+        self._conn = self._plugin.start_rpc_listener()
+
+    def stop(self):
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+        super(RpcWorker, self).stop()
+
+
+def serve_rpc():
+    """Start consuming the RPC messages of the plugin.
+
+    The messages are consumed in rpc_workers forked processes, or in this
+    process when rpc_workers is 0. Returns the launcher or worker to wait
+    on, None if the plugin consumes its messages on its own.
+    """
+    plugin = manager.NeutronManager.get_plugin()
+    if not plugin.rpc_workers_supported():
+        if cfg.CONF.rpc_workers > 0:
+            LOG.error(_("'rpc_workers = %d' ignored because the plugin does "
+                        "not implement start_rpc_listener"),
+                      cfg.CONF.rpc_workers)
+        return
+
+    try:
+        rpc = RpcWorker(plugin)
+        if cfg.CONF.rpc_workers < 1:
+            rpc.start()
+            return rpc
+        launcher = common_service.ProcessLauncher(wait_interval=1.0)
+        launcher.launch_service(rpc, workers=cfg.CONF.rpc_workers)
+        return launcher
+    except Exception:
+        with excutils.save_and_reraise_exception():
+            LOG.exception(_('Unrecoverable error: please check log '
+                            'for details.'))
+
+
 class Service(service.Service):
     """Service object for binaries running on hosts.
 
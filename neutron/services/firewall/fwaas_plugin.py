@@ -151,6 +151,9 @@ class FirewallPlugin(firewall_db.Firewall_db_mixin):
     """
     supported_extension_aliases = ["fwaas"]
 
+    __native_pagination_support = True
+    __native_sorting_support = True
+
     def __init__(self):
         """Do the initialization for the firewall service plugin here."""
         qdbapi.register_models()
@@ -64,6 +64,9 @@ class L3RouterPlugin(db_base_plugin_v2.CommonDbMixin,
     supported_extension_aliases = ["router", "ext-gw-mode",
                                    "extraroute", "l3_agent_scheduler"]
 
+    __native_pagination_support = True
+    __native_sorting_support = True
+
     def __init__(self):
         qdbapi.register_models(base=model_base.BASEV2)
         self.setup_rpc()
@@ -43,6 +43,9 @@ class LoadBalancerPlugin(ldb.LoadBalancerPluginDb,
                                    "lbaas_agent_scheduler",
                                    "service-type"]
 
+    __native_pagination_support = True
+    __native_sorting_support = True
+
     # lbaas agent notifiers to handle agent update operations;
     # can be updated by plugin drivers while loading;
     # will be extracted by neutron manager when loading service plugins;
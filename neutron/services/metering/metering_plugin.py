@@ -39,6 +39,9 @@ class MeteringPlugin(metering_db.MeteringDbMixin):
     """Implementation of the Neutron Metering Service Plugin."""
     supported_extension_aliases = ["metering"]
 
+    __native_pagination_support = True
+    __native_sorting_support = True
+
     def __init__(self):
         super(MeteringPlugin, self).__init__()
 
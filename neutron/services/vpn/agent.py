@@ -33,6 +33,8 @@ cfg.CONF.register_opts(vpn_agent_opts, 'vpnagent')
 class VPNAgent(l3_agent.L3NATAgentWithStateReport):
     """VPNAgent class which can handle vpn service drivers."""
     def __init__(self, host, conf=None):
+        # Routers processed since the devices were last synced
+        self._routers_to_sync = []
         super(VPNAgent, self).__init__(host=host, conf=conf)
         self.setup_device_drivers(host)
 
@@ -132,15 +134,28 @@ class VPNAgent(l3_agent.L3NATAgentWithStateReport):
         for device in self.devices:
             device.destroy_router(router_id)
 
-    def _process_routers(self, routers, all_routers=False):
-        """Router sync event.
+    def _process_updated_router(self, router):
+        """Router updated event.
 
         This method overwrites parent class method.
-        :param routers: list of routers
+        :param router: dict of router
         """
-        super(VPNAgent, self)._process_routers(routers, all_routers)
-        for device in self.devices:
-            device.sync(self.context, routers)
+        super(VPNAgent, self)._process_updated_router(router)
+        self._routers_to_sync.append(router)
+
+    def _process_router_update(self):
+        """Process a router update, then sync the devices if none is left.
+
+        This method overwrites parent class method.
+        The devices fetch and report all their services on each sync,
+        they are synced once for all the routers updated together.
+        """
+        super(VPNAgent, self)._process_router_update()
+        if self._routers_to_sync and not self._queue.router_ids():
+            routers = self._routers_to_sync
+            self._routers_to_sync = []
+            for device in self.devices:
+                device.sync(self.context, routers)
 
 
 def main():
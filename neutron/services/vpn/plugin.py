@@ -32,9 +32,14 @@ class VPNPlugin(vpn_db.VPNPluginDb):
     """
     supported_extension_aliases = ["vpnaas"]
 
+    __native_pagination_support = True
+    __native_sorting_support = True
+
 
 class VPNDriverPlugin(VPNPlugin, vpn_db.VPNPluginRpcDbMixin):
     """VpnPlugin which supports VPN Service Drivers."""
+    __native_pagination_support = True
+    __native_sorting_support = True
     #TODO(nati) handle ikepolicy and ipsecpolicy update usecase
     def __init__(self):
         super(VPNDriverPlugin, self).__init__()
@@ -0,0 +1,126 @@
+# Copyright 2014 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark the dnsmasq reloads caused by port-create notifications.
+
+    python -m neutron.tests.benchmarks.dhcp_port_reload \\
+        --ports 1000 --rate 50 --delay 0.5
+
+The notifications of the creation of --ports ports on one network are
+replayed against the Dnsmasq driver, the way the DHCP agent handles them:
+regenerating the whole config files for each port, patching the entries of
+each port, and patching the entries of the ports received at --rate ports
+per second during each --delay (port_reload_delay) window. The config files
+are written to a temporary directory, dnsmasq is not run.
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+
+from oslo.config import cfg
+
+from neutron.agent.common import config
+from neutron.agent.linux import dhcp
+from neutron.agent.linux import interface
+from neutron.common import config as base_config
+
+NETWORK_ID = 'bbbbbbbb-bbbb-bbbb-bbbb-bbbbbbbbbbbb'
+SUBNET_ID = 'cccccccc-cccc-cccc-cccc-cccccccccccc'
+
+
+class _NoOpDeviceManager(object):
+    def update(self, network):
+        pass
+
+
+def _port(i):
+    return {'id': 'port-%06d' % i,
+            'network_id': NETWORK_ID,
+            'device_owner': 'compute:nova',
+            'mac_address': 'fa:16:3e:%02x:%02x:%02x' % (
+                i >> 16, (i >> 8) & 0xff, i & 0xff),
+            'fixed_ips': [{'subnet_id': SUBNET_ID,
+                           'ip_address': '10.%d.%d.%d' % (
+                               i >> 16, (i >> 8) & 0xff, i & 0xff)}],
+            'extra_dhcp_opts': []}
+
+
+def _network():
+    return dhcp.NetModel(True, {
+        'id': NETWORK_ID, 'tenant_id': 'bench', 'admin_state_up': True,
+        'subnets': [{'id': SUBNET_ID, 'network_id': NETWORK_ID,
+                     'ip_version': 4, 'cidr': '10.0.0.0/8',
+                     'gateway_ip': '10.0.0.1', 'enable_dhcp': True,
+                     'dns_nameservers': [], 'host_routes': []}],
+        'ports': []})
+
+
+def run(conf, ports, batch, incremental):
+    """Replay the notifications, reloading every batch ports."""
+    network = _network()
+    reloads = 0
+    start = time.time()
+    for first in xrange(0, ports, batch):
+        port_ids = []
+        for i in xrange(first, min(first + batch, ports)):
+            port = dhcp.DictModel(_port(i))
+            network.ports.append(port)
+            port_ids.append(port.id)
+        # The agent instantiates a driver for each action
+        driver = dhcp.Dnsmasq(conf, network,
+                              version=dhcp.Dnsmasq.MINIMUM_VERSION)
+        driver.device_manager = _NoOpDeviceManager()
+        driver.reload_allocations(port_ids=incremental and port_ids or None)
+        reloads += 1
+    return {'elapsed': time.time() - start, 'reloads': reloads}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--ports', type=int, default=1000)
+    parser.add_argument('--rate', type=float, default=50,
+                        help='port notifications received per second')
+    parser.add_argument('--delay', type=float, default=0.5,
+                        help='port_reload_delay of the agent')
+    args = parser.parse_args()
+
+    conf = config.setup_conf()
+    conf.register_opts(base_config.core_opts)
+    conf.register_opts(dhcp.OPTS)
+    conf.register_opts(interface.OPTS)
+    config.register_interface_driver_opts_helper(conf)
+    conf.register_opt(cfg.BoolOpt('enable_isolated_metadata', default=False))
+    conf([])
+    conf.set_override('interface_driver',
+                      'neutron.agent.linux.interface.NullDriver')
+    confs_dir = tempfile.mkdtemp()
+    conf.set_override('dhcp_confs', confs_dir)
+
+    batch = max(1, int(args.rate * args.delay))
+    try:
+        for name, size, incremental in (('full', 1, False),
+                                        ('incremental', 1, True),
+                                        ('coalesced', batch, True)):
+            result = run(conf, args.ports, size, incremental)
+            print('%-12s %5d reloads  %7.3fs  %.2fms/port' %
+                  (name, result['reloads'], result['elapsed'],
+                   result['elapsed'] * 1000 / args.ports))
+    finally:
+        shutil.rmtree(confs_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
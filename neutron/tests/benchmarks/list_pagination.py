@@ -0,0 +1,110 @@
+# Copyright 2014 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark the latency of a sorted page of a collection against its size.
+
+    python -m neutron.tests.benchmarks.list_pagination \\
+        --connection sqlite:////tmp/list.db --sizes 1000,10000,50000
+
+A page of --limit metering labels sorted by name is listed the way the API
+controller does it for a plugin with emulated pagination (the whole
+collection is loaded, then sorted and sliced by the api_common helpers) and
+for a plugin with native pagination (the query is sorted and limited in the
+database). The first page and a page in the middle of the collection are
+timed.
+"""
+
+import argparse
+import time
+
+from oslo.config import cfg
+import webob
+
+from neutron.api import api_common
+from neutron.common import config  # noqa
+from neutron import context
+from neutron.db import api as db_api
+from neutron.db.metering import metering_db
+from neutron.extensions import metering
+from neutron.openstack.common import uuidutils
+
+
+def _populate(size):
+    db_api.clear_db()
+    db_api.configure_db()
+    session = db_api.get_session()
+    with session.begin(subtransactions=True):
+        for i in xrange(size):
+            session.add(metering_db.MeteringLabel(
+                id=uuidutils.generate_uuid(), tenant_id='bench',
+                name='label-%08d' % ((i * 7919) % size), description=''))
+
+
+def _list_emulated(plugin, ctx, query):
+    request = webob.Request.blank('/metering/metering-labels?' + query)
+    attr_info = metering.RESOURCE_ATTRIBUTE_MAP['metering_labels']
+    sorting_helper = api_common.SortingEmulatedHelper(request, attr_info)
+    pagination_helper = api_common.PaginationEmulatedHelper(request)
+    items = plugin.get_metering_labels(ctx)
+    return pagination_helper.paginate(sorting_helper.sort(items))
+
+
+def _list_native(plugin, ctx, query):
+    request = webob.Request.blank('/metering/metering-labels?' + query)
+    attr_info = metering.RESOURCE_ATTRIBUTE_MAP['metering_labels']
+    args = {}
+    api_common.SortingNativeHelper(request, attr_info).update_args(args)
+    api_common.PaginationNativeHelper(request).update_args(args)
+    return plugin.get_metering_labels(ctx, **args)
+
+
+def _time(func, plugin, ctx, query, repeat):
+    start = time.time()
+    for i in xrange(repeat):
+        items = func(plugin, ctx, query)
+    return (time.time() - start) / repeat, items
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--connection', default='sqlite:////tmp/list.db')
+    parser.add_argument('--sizes', default='1000,10000,50000')
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    cfg.CONF([], project='neutron')
+    cfg.CONF.set_override('connection', args.connection, group='database')
+
+    plugin = metering_db.MeteringDbMixin()
+    ctx = context.get_admin_context()
+    for size in [int(s) for s in args.sizes.split(',')]:
+        _populate(size)
+        query = 'sort_key=name&sort_dir=asc&limit=%d' % args.limit
+        middle = _list_native(plugin, ctx, 'sort_key=name&sort_dir=asc'
+                              '&limit=%d' % (size // 2))[-1]['id']
+        for page, page_query in (('first', query),
+                                 ('middle', query + '&marker=' + middle)):
+            emulated, expected = _time(_list_emulated, plugin, ctx,
+                                       page_query, args.repeat)
+            native, items = _time(_list_native, plugin, ctx,
+                                  page_query, args.repeat)
+            assert ([i['id'] for i in items] ==
+                    [i['id'] for i in expected])
+            print('%6d labels  %-6s page  emulated %8.1fms  '
+                  'native %8.1fms' %
+                  (size, page, emulated * 1000, native * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+# Copyright 2014 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark the ML2 lookups of ports from the tap device names.
+
+    python -m neutron.tests.benchmarks.ml2_port_lookup \\
+        --connection sqlite:////tmp/ports.db --ports 100000 --lookups 1000
+
+--ports ports and their bindings are created, then --lookups of them are
+looked up from the port id prefix of their tap device name, with a LIKE
+prefix match on the ports and bindings tables and with the indexed
+prefixes of ml2_port_id_prefixes. The lookups are done one device at a
+time, as get_device_details does, and by batches of --batch devices, as
+get_devices_details_list does.
+"""
+
+import argparse
+import random
+import time
+
+from oslo.config import cfg
+import sqlalchemy as sa
+
+from neutron.common import config  # noqa
+from neutron.db import api as db_api
+from neutron.db import models_v2
+from neutron.openstack.common import uuidutils
+from neutron.plugins.ml2 import db as ml2_db
+from neutron.plugins.ml2 import models
+
+NETWORK_ID = 'bbbbbbbb-bbbb-bbbb-bbbb-bbbbbbbbbbbb'
+
+
+def _populate(n_ports):
+    """Create the ports, returning their ids."""
+    db_api.clear_db()
+    db_api.configure_db()
+    session = db_api.get_session()
+    port_ids = [uuidutils.generate_uuid() for i in xrange(n_ports)]
+    with session.begin(subtransactions=True):
+        session.add(models_v2.Network(id=NETWORK_ID, tenant_id='bench',
+                                      name='bench', status='ACTIVE',
+                                      admin_state_up=True, shared=False))
+        session.execute(models_v2.Port.__table__.insert(), [
+            {'id': port_id, 'tenant_id': 'bench', 'name': '',
+             'network_id': NETWORK_ID, 'admin_state_up': True,
+             'status': 'DOWN', 'device_id': '', 'device_owner': '',
+             'mac_address': 'fa:16:3e:%02x:%02x:%02x' % (
+                 i >> 16, (i >> 8) & 0xff, i & 0xff)}
+            for i, port_id in enumerate(port_ids)])
+        session.execute(models.PortBinding.__table__.insert(), [
+            {'port_id': port_id, 'host': 'host', 'vnic_type': 'normal',
+             'profile': '', 'vif_type': 'ovs', 'vif_details': ''}
+            for port_id in port_ids])
+        session.execute(models.PortIdPrefix.__table__.insert(), [
+            {'port_id': port_id,
+             'prefix': port_id[:models.PORT_ID_PREFIX_LEN]}
+            for port_id in port_ids])
+    return port_ids
+
+
+def _like_port(session, port_id):
+    return (session.query(models_v2.Port).
+            filter(models_v2.Port.id.startswith(port_id)).one())
+
+
+def _like_binding_host(session, port_id):
+    return (session.query(models.PortBinding).
+            filter(models.PortBinding.port_id.startswith(port_id)).
+            one()).host
+
+
+def _like_ports(session, port_ids):
+    return (session.query(models_v2.Port).
+            filter(sa.or_(*[models_v2.Port.id.startswith(port_id)
+                            for port_id in port_ids])).all())
+
+
+def _time(name, devices, lookup):
+    start = time.time()
+    lookup()
+    elapsed = time.time() - start
+    print('%-28s %8.3fs  %8.3fms/device' %
+          (name, elapsed, elapsed * 1000 / max(devices, 1)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--connection', default='sqlite:////tmp/ports.db')
+    parser.add_argument('--ports', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=1000)
+    parser.add_argument('--batch', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    cfg.CONF([], project='neutron')
+    cfg.CONF.set_override('connection', args.connection, group='database')
+
+    port_ids = _populate(args.ports)
+    rand = random.Random(args.seed)
+    prefixes = [port_id[:models.PORT_ID_PREFIX_LEN] for port_id in
+                rand.sample(port_ids, min(args.lookups, len(port_ids)))]
+    batches = [prefixes[i:i + args.batch]
+               for i in xrange(0, len(prefixes), args.batch)]
+    session = db_api.get_session()
+
+    def each(lookup):
+        def run():
+            for prefix in prefixes:
+                lookup(session, prefix)
+        return run
+
+    def batched(lookup):
+        def run():
+            for batch in batches:
+                lookup(session, batch)
+        return run
+
+    _time('port, LIKE', len(prefixes), each(_like_port))
+    _time('port, prefix index', len(prefixes), each(ml2_db.get_port))
+    _time('binding host, LIKE', len(prefixes), each(_like_binding_host))
+    _time('binding host, prefix index', len(prefixes),
+          each(lambda session, prefix: ml2_db.get_port_binding_host(prefix)))
+    _time('port batches, LIKE', len(prefixes), batched(_like_ports))
+    _time('port batches, prefix index', len(prefixes),
+          batched(ml2_db.get_ports))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+# Copyright 2014 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark the RPC throughput of the server against rpc_workers.
+
+    python -m neutron.tests.benchmarks.rpc_workers \\
+        --config-file /etc/neutron/neutron.conf --workers 0 1 2 4 \\
+        --calls 2000 --concurrency 100 --cost 5
+
+For each --workers count, the RPC workers of the server are started
+consuming a benchmark topic on the message broker configured in
+--config-file, and --calls calls are made by --concurrency clients. Each
+call burns --cost milliseconds of CPU in the server, standing for the
+processing of an agent request such as get_device_details. The calls per
+second are printed.
+"""
+
+import argparse
+import time
+import uuid
+
+import eventlet
+from oslo.config import cfg
+
+from neutron.common import config
+from neutron.common import rpc as q_rpc
+from neutron import context
+from neutron.openstack.common import rpc
+from neutron.openstack.common.rpc import proxy
+from neutron.openstack.common import service as common_service
+from neutron import service
+
+
+class _Callbacks(object):
+
+    RPC_API_VERSION = '1.0'
+
+    def work(self, context, cost):
+        deadline = time.time() + cost / 1000.0
+        while time.time() < deadline:
+            pass
+        return cost
+
+
+class _Plugin(object):
+    """Stands for a plugin consuming its topic in start_rpc_listener."""
+
+    def __init__(self, topic):
+        self.topic = topic
+
+    def start_rpc_listener(self):
+        conn = rpc.create_connection(new=True)
+        conn.create_consumer(
+            self.topic, q_rpc.PluginRpcDispatcher([_Callbacks()]),
+            fanout=False)
+        conn.consume_in_thread()
+        return conn
+
+
+def run(workers, calls, concurrency, cost):
+    topic = 'bench-rpc-%s' % uuid.uuid4().hex
+    plugin = _Plugin(topic)
+    if workers:
+        launcher = common_service.ProcessLauncher(wait_interval=1.0)
+        launcher.launch_service(service.RpcWorker(plugin), workers=workers)
+    else:
+        worker = service.RpcWorker(plugin)
+        worker.start()
+    client = proxy.RpcProxy(topic=topic, default_version='1.0')
+    ctx = context.get_admin_context_without_session()
+    # the first call waits for the consumers to be declared
+    client.call(ctx, client.make_msg('work', cost=0), timeout=60)
+    pool = eventlet.GreenPool(concurrency)
+    start = time.time()
+    for i in xrange(calls):
+        pool.spawn_n(client.call, ctx, client.make_msg('work', cost=cost))
+    pool.waitall()
+    elapsed = time.time() - start
+    if workers:
+        # stop the children as neutron-server does on SIGTERM
+        launcher.running = False
+        launcher.sigcaught = None
+        launcher.wait()
+    else:
+        worker.stop()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--config-file', required=True)
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=[0, 1, 2, 4])
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--cost', type=float, default=5,
+                        help='milliseconds of CPU burnt by each call')
+    args = parser.parse_args()
+    eventlet.monkey_patch()
+    config.parse(['--config-file', args.config_file])
+    cfg.CONF.set_override('rpc_response_timeout', 600)
+    # the workers dispose of the connections to the database on start
+    cfg.CONF.set_override('connection', 'sqlite://', group='database')
+
+    for workers in args.workers:
+        elapsed = run(workers, args.calls, args.concurrency, args.cost)
+        print('%2d workers  %8.3fs  %8.1f calls/s' %
+              (workers, elapsed, args.calls / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+# Copyright 2014 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Simulate the scheduling of routers and networks on many agents.
+
+    python -m neutron.tests.benchmarks.scheduler_load \\
+        --connection sqlite:////tmp/sched.db --agents 2000 --resources 20000
+
+--agents L3 agents and --agents DHCP agents are registered, and
+--resources routers and networks are created. A random half of them is
+bound to the agents beforehand, so that the agents start unevenly loaded.
+The other half is then scheduled, one resource per call with the existing
+schedulers (--baseline resources only, as they query all the agents for
+each resource) and in a single call with the load-aware ones. The time per
+resource and the spread of the load over the agents are printed.
+"""
+
+import argparse
+import collections
+import random
+import time
+
+from oslo.config import cfg
+
+from neutron.common import config  # noqa
+from neutron.common import constants
+from neutron import context
+from neutron.db import agents_db
+from neutron.db import agentschedulers_db
+from neutron.db import api as db_api
+from neutron.db import db_base_plugin_v2
+from neutron.db import l3_agentschedulers_db
+from neutron.db import l3_db
+from neutron.db import models_v2
+from neutron.openstack.common import jsonutils
+from neutron.openstack.common import timeutils
+from neutron.openstack.common import uuidutils
+from neutron.scheduler import dhcp_agent_scheduler
+from neutron.scheduler import l3_agent_scheduler
+
+
+class _Plugin(db_base_plugin_v2.CommonDbMixin,
+              l3_db.L3_NAT_db_mixin,
+              l3_agentschedulers_db.L3AgentSchedulerDbMixin,
+              agentschedulers_db.DhcpAgentSchedulerDbMixin):
+    pass
+
+
+def _agent(agent_type, host):
+    now = timeutils.utcnow()
+    return agents_db.Agent(
+        id=uuidutils.generate_uuid(), agent_type=agent_type,
+        binary='neutron-bench-agent', topic='bench', host=host,
+        admin_state_up=True, created_at=now, started_at=now,
+        heartbeat_timestamp=now,
+        configurations=jsonutils.dumps({'use_namespaces': True}))
+
+
+def _populate(n_agents, n_resources, seed):
+    """Create the agents and resources, returning the unbound ones."""
+    db_api.clear_db()
+    db_api.configure_db()
+    rand = random.Random(seed)
+    session = db_api.get_session()
+    router_ids = []
+    network_ids = []
+    with session.begin(subtransactions=True):
+        l3_agents = [_agent(constants.AGENT_TYPE_L3, 'l3-%05d' % i)
+                     for i in xrange(n_agents)]
+        dhcp_agents = [_agent(constants.AGENT_TYPE_DHCP, 'dhcp-%05d' % i)
+                       for i in xrange(n_agents)]
+        session.add_all(l3_agents + dhcp_agents)
+        for i in xrange(n_resources):
+            router = l3_db.Router(id=uuidutils.generate_uuid(),
+                                  tenant_id='bench', name='r%d' % i,
+                                  status='ACTIVE', admin_state_up=True)
+            network = models_v2.Network(id=uuidutils.generate_uuid(),
+                                        tenant_id='bench', name='n%d' % i,
+                                        status='ACTIVE',
+                                        admin_state_up=True, shared=False)
+            session.add_all([router, network])
+            if i % 2:
+                router_ids.append(router.id)
+                network_ids.append(network.id)
+                continue
+            # skew the initial load towards the first agents
+            agent = int(rand.paretovariate(1.5)) % n_agents
+            session.add(l3_agentschedulers_db.RouterL3AgentBinding(
+                id=uuidutils.generate_uuid(), router_id=router.id,
+                l3_agent_id=l3_agents[agent].id))
+            session.add(agentschedulers_db.NetworkDhcpAgentBinding(
+                network_id=network.id,
+                dhcp_agent_id=dhcp_agents[agent].id))
+    return router_ids, network_ids
+
+
+def _spread(ctx, agent_type, column):
+    query = ctx.session.query(column)
+    counts = collections.Counter(item[0] for item in query)
+    agents = ctx.session.query(agents_db.Agent.id).filter(
+        agents_db.Agent.agent_type == agent_type).count()
+    loads = counts.values() + [0] * (agents - len(counts))
+    return min(loads), max(loads)
+
+
+def _run(args, name, schedule):
+    router_ids, network_ids = _populate(args.agents, args.resources,
+                                        args.seed)
+    ctx = context.get_admin_context()
+    start = time.time()
+    placed = schedule(ctx, router_ids, network_ids)
+    elapsed = time.time() - start
+    l3_min, l3_max = _spread(
+        ctx, constants.AGENT_TYPE_L3,
+        l3_agentschedulers_db.RouterL3AgentBinding.l3_agent_id)
+    dhcp_min, dhcp_max = _spread(
+        ctx, constants.AGENT_TYPE_DHCP,
+        agentschedulers_db.NetworkDhcpAgentBinding.dhcp_agent_id)
+    print('%-24s %6d placed  %8.2fms/resource  '
+          'l3 load %d-%d  dhcp load %d-%d' %
+          (name, placed, elapsed * 1000 / max(placed, 1),
+           l3_min, l3_max, dhcp_min, dhcp_max))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--connection', default='sqlite:////tmp/sched.db')
+    parser.add_argument('--agents', type=int, default=2000)
+    parser.add_argument('--resources', type=int, default=20000)
+    parser.add_argument('--baseline', type=int, default=200,
+                        help='resources scheduled by the existing schedulers')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    cfg.CONF([], project='neutron')
+    cfg.CONF.set_override('connection', args.connection, group='database')
+
+    plugin = _Plugin()
+
+    def one_by_one(l3_scheduler, dhcp_scheduler):
+        def schedule(ctx, router_ids, network_ids):
+            for router_id in router_ids[:args.baseline]:
+                l3_scheduler.schedule(plugin, ctx, router_id)
+            for network_id in network_ids[:args.baseline]:
+                dhcp_scheduler.schedule(plugin, ctx, {'id': network_id})
+            return (min(args.baseline, len(router_ids)) +
+                    min(args.baseline, len(network_ids)))
+        return schedule
+
+    def bulk(ctx, router_ids, network_ids):
+        l3_scheduler = l3_agent_scheduler.LeastLoadedScheduler()
+        dhcp_scheduler = dhcp_agent_scheduler.LeastLoadedScheduler()
+        l3_scheduler.schedule_routers(plugin, ctx, router_ids)
+        dhcp_scheduler.schedule_networks(plugin, ctx, network_ids)
+        return len(router_ids) + len(network_ids)
+
+    _run(args, 'chance', one_by_one(
+        l3_agent_scheduler.ChanceScheduler(),
+        dhcp_agent_scheduler.ChanceScheduler()))
+    _run(args, 'least-routers', one_by_one(
+        l3_agent_scheduler.LeastRoutersScheduler(),
+        dhcp_agent_scheduler.ChanceScheduler()))
+    _run(args, 'least-loaded (bulk)', bulk)
+
+
+if __name__ == '__main__':
+    main()
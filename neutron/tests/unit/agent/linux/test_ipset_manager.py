@@ -0,0 +1,64 @@
+# Copyright (c) 2014 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from neutron.agent.linux import ipset_manager
+from neutron.tests import base
+
+
+class TestIpsetManager(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestIpsetManager, self).setUp()
+        self.execute = mock.Mock()
+        self.ipset = ipset_manager.IpsetManager(execute=self.execute,
+                                                root_helper='sudo')
+
+    def _assert_restore(self, lines):
+        self.execute.assert_called_once_with(
+            ['ipset', 'restore', '-exist'],
+            process_input='\n'.join(lines) + '\n', root_helper='sudo')
+        self.execute.reset_mock()
+
+    def test_get_set_name_truncated(self):
+        name = ipset_manager.get_set_name('a' * 36, 'IPv6')
+        self.assertEqual(ipset_manager.IPSET_NAME_MAX_LENGTH, len(name))
+        self.assertTrue(name.startswith('IPv6aaa'))
+
+    def test_set_members_creates_set(self):
+        self.ipset.set_members('sg', 'IPv6', ['fe80::1', 'fe80::/64'])
+        self._assert_restore(['create IPv6sg hash:net family inet6 -exist',
+                              'flush IPv6sg',
+                              'add IPv6sg fe80::/64 -exist',
+                              'add IPv6sg fe80::1/128 -exist'])
+        self.assertTrue(self.ipset.set_exists('sg', 'IPv6'))
+        self.assertFalse(self.ipset.set_exists('sg', 'IPv4'))
+
+    def test_set_members_sends_delta(self):
+        self.ipset.set_members('sg', 'IPv4', ['10.0.0.1', '10.0.0.2'])
+        self.execute.reset_mock()
+        self.ipset.set_members('sg', 'IPv4', ['10.0.0.2', '10.0.0.3'])
+        self._assert_restore(['add IPv4sg 10.0.0.3/32 -exist',
+                              'del IPv4sg 10.0.0.1/32 -exist'])
+        self.ipset.set_members('sg', 'IPv4', ['10.0.0.3', '10.0.0.2'])
+        self.assertFalse(self.execute.called)
+
+    def test_destroy(self):
+        self.ipset.set_members('sg', 'IPv4', [])
+        self.ipset.destroy('IPv4sg')
+        self.execute.assert_called_with(['ipset', 'destroy', 'IPv4sg'],
+                                        root_helper='sudo')
+        self.assertEqual(set(), self.ipset.set_names())
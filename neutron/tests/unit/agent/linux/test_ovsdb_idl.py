@@ -0,0 +1,431 @@
+# Copyright 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import copy
+import os
+import select
+import socket
+import tempfile
+import threading
+import time
+
+from neutron.agent.linux import ovsdb_idl
+from neutron.openstack.common import jsonutils
+from neutron.openstack.common import uuidutils
+from neutron.tests import base
+
+
+DEFAULT_ROWS = {
+    'Bridge': {'name': '', 'ports': ['set', []]},
+    'Port': {'name': '', 'interfaces': ['set', []], 'tag': ['set', []]},
+    'Interface': {'name': '', 'type': '', 'ofport': ['set', []],
+                  'options': ['map', []], 'external_ids': ['map', []]},
+}
+
+
+def _atoms(datum):
+    if isinstance(datum, list) and datum[0] == 'set':
+        return datum[1]
+    return [datum]
+
+
+class StubOvsdbServer(object):
+    """A minimal ovsdb-server serving the bridge tables on a UNIX socket.
+
+    It implements the echo, monitor and transact methods, the latter with
+    the insert, update, mutate and delete operations. Unreferenced ports
+    and interfaces are garbage collected, and new interfaces are given an
+    ofport in a later update, as ovs-vswitchd would do. The rows are kept
+    in their JSON encoding.
+    """
+
+    def __init__(self, path, tables=None):
+        self.path = path
+        self.tables = tables or {'Bridge': {}, 'Port': {}, 'Interface': {}}
+        self.requests = []
+        self.replies = []
+        self.assign_ofports = True
+        self._next_ofport = 1
+        self._clients = {}
+        self._monitors = set()
+        self._lock = threading.Lock()
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._listener.bind(path)
+        self._listener.listen(5)
+        self._running = True
+        self._thread = threading.Thread(target=self._serve)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._thread.join()
+        for sock in self._clients:
+            sock.close()
+        self._listener.close()
+        os.unlink(self.path)
+
+    def add_bridge(self, name):
+        with self._change():
+            port = self._insert_port(name, type='internal', ofport=65534)
+            self.tables['Bridge'][uuidutils.generate_uuid()] = {
+                'name': name, 'ports': ['set', [['uuid', port]]]}
+
+    def add_port(self, bridge, name, ofport=None, **external_ids):
+        with self._change():
+            port = self._insert_port(
+                name, ofport=ofport,
+                external_ids=['map', sorted(external_ids.items())])
+            row = self._find('Bridge', name=bridge)
+            row['ports'] = ['set', _atoms(row['ports']) + [['uuid', port]]]
+
+    def echo(self):
+        with self._lock:
+            for sock in self._monitors:
+                self._send(sock, {'method': 'echo', 'params': [],
+                                  'id': 'echo'})
+
+    def _insert_port(self, name, ofport=None, **columns):
+        iface = uuidutils.generate_uuid()
+        port = uuidutils.generate_uuid()
+        row = dict(DEFAULT_ROWS['Interface'], name=name, **columns)
+        if ofport is not None:
+            row['ofport'] = ofport
+        self.tables['Interface'][iface] = row
+        self.tables['Port'][port] = dict(DEFAULT_ROWS['Port'], name=name,
+                                         interfaces=['uuid', iface])
+        return port
+
+    def _find(self, table, **where):
+        for row in self.tables[table].itervalues():
+            if all(row.get(k) == v for k, v in where.iteritems()):
+                return row
+
+    def _send(self, sock, message):
+        sock.sendall(jsonutils.dumps(message))
+
+    def _change(self):
+        server = self
+
+        class _Change(object):
+            def __enter__(self):
+                server._lock.acquire()
+                self.before = copy.deepcopy(server.tables)
+
+            def __exit__(self, *exc_info):
+                try:
+                    server._notify(self.before)
+                finally:
+                    server._lock.release()
+        return _Change()
+
+    def _notify(self, before):
+        updates = {}
+        for table, rows in self.tables.iteritems():
+            old_rows = before[table]
+            changes = {}
+            for uuid in set(rows) | set(old_rows):
+                old = old_rows.get(uuid)
+                new = rows.get(uuid)
+                if old == new:
+                    continue
+                change = {}
+                if old is not None:
+                    change['old'] = old
+                if new is not None:
+                    change['new'] = new
+                changes[uuid] = change
+            if changes:
+                updates[table] = changes
+        if updates:
+            for sock in self._monitors:
+                self._send(sock, {'method': 'update',
+                                  'params': [None, updates], 'id': None})
+
+    def _serve(self):
+        while self._running:
+            socks = [self._listener] + list(self._clients)
+            for sock in select.select(socks, [], [], 0.02)[0]:
+                if sock is self._listener:
+                    client = self._listener.accept()[0]
+                    self._clients[client] = ovsdb_idl._MessageSplitter()
+                    continue
+                data = sock.recv(65536)
+                if not data:
+                    self._monitors.discard(sock)
+                    del self._clients[sock]
+                    sock.close()
+                    continue
+                for message in self._clients[sock].feed(data):
+                    self._handle(sock, message)
+            if self.assign_ofports:
+                with self._change():
+                    for row in self.tables['Interface'].itervalues():
+                        if row['ofport'] == ['set', []]:
+                            row['ofport'] = self._next_ofport
+                            self._next_ofport += 1
+
+    def _handle(self, sock, message):
+        method = message.get('method')
+        if method is None:
+            self.replies.append(message)
+            return
+        self.requests.append(method)
+        if method == 'echo':
+            result = message['params']
+        elif method == 'monitor':
+            # no update may be sent between the snapshot and the reply
+            with self._lock:
+                self._monitors.add(sock)
+                result = dict(
+                    (table, dict((uuid, {'new': row})
+                                 for uuid, row in rows.iteritems()))
+                    for table, rows in self.tables.iteritems())
+                self._send(sock, {'id': message['id'], 'result': result,
+                                  'error': None})
+            return
+        elif method == 'transact':
+            # the updates are sent before the reply, as ovsdb-server does
+            with self._change():
+                result = self._transact(message['params'][1:])
+        with self._lock:
+            self._send(sock, {'id': message['id'], 'result': result,
+                              'error': None})
+
+    def _resolve(self, datum, names):
+        if isinstance(datum, dict):
+            return dict((key, self._resolve(value, names))
+                        for key, value in datum.iteritems())
+        if isinstance(datum, list) and datum:
+            if datum[0] == 'named-uuid':
+                return ['uuid', names[datum[1]]]
+            return [self._resolve(atom, names) for atom in datum]
+        return datum
+
+    def _select(self, table, where, names):
+        where = self._resolve(where, names)
+        matches = []
+        for uuid, row in self.tables[table].iteritems():
+            for column, _op, value in where:
+                current = column == '_uuid' and ['uuid', uuid] or row[column]
+                if current != value:
+                    break
+            else:
+                matches.append(row)
+        return matches
+
+    def _transact(self, ops):
+        names = {}
+        results = []
+        for op in ops:
+            table = self.tables[op['table']]
+            if op['op'] == 'insert':
+                uuid = uuidutils.generate_uuid()
+                names[op.get('uuid-name')] = uuid
+                row = dict(DEFAULT_ROWS[op['table']])
+                row.update(self._resolve(op['row'], names))
+                table[uuid] = row
+                results.append({'uuid': ['uuid', uuid]})
+                continue
+            rows = self._select(op['table'], op.get('where', []), names)
+            for row in rows:
+                if op['op'] == 'update':
+                    row.update(self._resolve(op['row'], names))
+                elif op['op'] == 'mutate':
+                    for column, mutator, value in op['mutations']:
+                        value = _atoms(self._resolve(value, names))
+                        current = _atoms(row[column])
+                        if mutator == 'insert':
+                            current = current + [atom for atom in value
+                                                 if atom not in current]
+                        else:
+                            current = [atom for atom in current
+                                       if atom not in value]
+                        row[column] = ['set', current]
+                elif op['op'] == 'delete':
+                    for uuid, candidate in table.items():
+                        if candidate is row:
+                            del table[uuid]
+            results.append({'count': len(rows)})
+        self._collect_garbage()
+        return results
+
+    def _collect_garbage(self):
+        ports = set(atom[1] for row in self.tables['Bridge'].itervalues()
+                    for atom in _atoms(row['ports']))
+        for uuid in set(self.tables['Port']) - ports:
+            del self.tables['Port'][uuid]
+        ifaces = set(atom[1] for row in self.tables['Port'].itervalues()
+                     for atom in _atoms(row['interfaces']))
+        for uuid in set(self.tables['Interface']) - ifaces:
+            del self.tables['Interface'][uuid]
+
+
+class OvsdbServerTestCase(base.BaseTestCase):
+    """Start a StubOvsdbServer serving br-int for the test."""
+
+    def setUp(self):
+        super(OvsdbServerTestCase, self).setUp()
+        self.path = os.path.join(tempfile.mkdtemp(), 'db.sock')
+        self.server = self.start_server()
+        self.server.add_bridge('br-int')
+        self.addCleanup(ovsdb_idl._connections.clear)
+
+    def start_server(self, tables=None):
+        server = StubOvsdbServer(self.path, tables)
+        self.addCleanup(lambda: server._running and server.stop())
+        return server
+
+    def wait_for(self, predicate, timeout=5):
+        deadline = time.time() + timeout
+        while not predicate():
+            self.assertTrue(time.time() < deadline)
+            time.sleep(0.01)
+
+
+class TestMessageSplitter(base.BaseTestCase):
+
+    def test_feed_splits_messages_across_chunks(self):
+        messages = [{'id': 1, 'result': {'a': ['set', []]}},
+                    {'id': 2, 'result': 'quoted \\" } { ] [ text'},
+                    {'id': 3, 'result': None}]
+        stream = ''.join(jsonutils.dumps(m) for m in messages)
+        for size in (1, 2, 3, 7, len(stream)):
+            splitter = ovsdb_idl._MessageSplitter()
+            received = []
+            for i in range(0, len(stream), size):
+                received.extend(splitter.feed(stream[i:i + size]))
+            self.assertEqual(messages, received)
+
+
+class TestFormatValue(base.BaseTestCase):
+
+    def test_format_value(self):
+        self.assertEqual('5', ovsdb_idl.format_value(5))
+        self.assertEqual('[]', ovsdb_idl.format_value([]))
+        self.assertEqual('tap1', ovsdb_idl.format_value('tap1'))
+        self.assertEqual('"0000f6a1"', ovsdb_idl.format_value('0000f6a1'))
+        self.assertEqual('{attached-mac="fa:16:3e:00:00:01", iface-id=abc}',
+                         ovsdb_idl.format_value(
+                             {'iface-id': 'abc',
+                              'attached-mac': 'fa:16:3e:00:00:01'}))
+
+
+class TestConnection(OvsdbServerTestCase):
+
+    def setUp(self):
+        super(TestConnection, self).setUp()
+        self.server.add_port('br-int', 'tap1', ofport=1, **{'iface-id': 'p1'})
+        self.conn = ovsdb_idl.Connection('unix:' + self.path, 5)
+
+    def test_replica_from_monitor(self):
+        self.assertEqual(['br-int'], self.conn.get_bridges())
+        self.assertEqual(['tap1'], self.conn.get_ports('br-int'))
+        self.assertEqual(1, self.conn.get_column('Interface', 'tap1',
+                                                 'ofport'))
+        self.assertEqual('tap1',
+                         self.conn.find_interface('iface-id', 'p1')['name'])
+        self.assertEqual('br-int', self.conn.iface_to_bridge('tap1'))
+        self.assertIsNone(self.conn.get_column('Interface', 'tap2',
+                                               'ofport'))
+
+    def test_queries_do_not_call_the_server(self):
+        self.conn.get_bridges()
+        for i in range(10):
+            self.conn.get_ports('br-int')
+            self.conn.find_interface('iface-id', 'p1')
+        self.assertEqual(['monitor'], self.server.requests)
+
+    def test_updates_are_applied(self):
+        self.conn.get_bridges()
+        self.server.add_port('br-int', 'tap2', ofport=2)
+        self.wait_for(
+            lambda: self.conn.get_ports('br-int') == ['tap1', 'tap2'])
+
+    def test_echo_is_answered(self):
+        self.conn.get_bridges()
+        self.server.echo()
+        self.wait_for(lambda: self.conn.get_bridges() and
+                      self.server.replies)
+        self.assertEqual('echo', self.server.replies[0]['id'])
+
+    def test_transaction_is_sent_in_one_request(self):
+        txn = self.conn.transaction()
+        txn.add_port('br-int', 'tap2')
+        txn.add_port('br-int', 'gre-1', type='gre',
+                     options={'remote_ip': '10.0.0.2'})
+        txn.del_port('br-int', 'tap1')
+        txn.set_column('Port', 'tap2', 'tag', '5')
+        txn.commit()
+        self.assertEqual(['monitor', 'transact'], self.server.requests)
+        self.assertEqual(['gre-1', 'tap2'], self.conn.get_ports('br-int'))
+        self.assertEqual(5, self.conn.get_column('Port', 'tap2', 'tag'))
+        self.assertEqual({'remote_ip': '10.0.0.2'},
+                         self.conn.get_column('Interface', 'gre-1',
+                                              'options'))
+        self.assertIsNone(self.conn.get_column('Interface', 'tap1',
+                                               'ofport'))
+
+    def test_add_existing_port_sets_interface_columns(self):
+        txn = self.conn.transaction()
+        txn.add_port('br-int', 'tap1', options={'peer': 'patch-tun'})
+        txn.commit()
+        self.assertEqual(['tap1'], self.conn.get_ports('br-int'))
+        self.assertEqual({'peer': 'patch-tun'},
+                         self.conn.get_column('Interface', 'tap1',
+                                              'options'))
+
+    def test_clear_column(self):
+        txn = self.conn.transaction()
+        txn.set_column('Port', 'tap1', 'tag', '5')
+        txn.commit()
+        txn.clear_column('Port', 'tap1', 'tag')
+        txn.commit()
+        self.assertEqual([], self.conn.get_column('Port', 'tap1', 'tag'))
+
+    def test_transaction_on_missing_bridge_fails(self):
+        txn = self.conn.transaction()
+        txn.add_port('br-tun', 'tap2')
+        self.assertRaises(ovsdb_idl.OvsdbError, txn.commit)
+        self.assertEqual(['monitor'], self.server.requests)
+
+    def test_wait_for_ofport(self):
+        txn = self.conn.transaction()
+        txn.add_port('br-int', 'tap2')
+        txn.commit()
+        ofport = self.conn.wait_for_ofport('tap2')
+        self.assertIsInstance(ofport, int)
+        self.assertEqual(ofport, self.conn.get_column('Interface', 'tap2',
+                                                      'ofport'))
+
+    def test_wait_for_ofport_times_out(self):
+        self.server.assign_ofports = False
+        self.conn.timeout = 0.1
+        txn = self.conn.transaction()
+        txn.add_port('br-int', 'tap2')
+        txn.commit()
+        self.assertEqual([], self.conn.wait_for_ofport('tap2'))
+
+    def test_reconnect_after_server_restart(self):
+        self.conn.get_bridges()
+        tables = copy.deepcopy(self.server.tables)
+        self.server.stop()
+        self.server = self.start_server(tables)
+        self.server.add_port('br-int', 'tap2', ofport=2)
+        self.assertEqual(['tap1', 'tap2'], self.conn.get_ports('br-int'))
+
+    def test_get_connection_is_shared(self):
+        conn = ovsdb_idl.get_connection('unix:' + self.path, 5)
+        self.assertIs(conn, ovsdb_idl.get_connection('unix:' + self.path, 5))
@@ -18,6 +18,7 @@ import eventlet.event
 import mock
 
 from neutron.agent.linux import ovsdb_monitor
+from neutron.openstack.common import jsonutils
 from neutron.tests import base
 
 
@@ -110,3 +111,68 @@ class TestSimpleInterfaceMonitor(base.BaseTestCase):
                 return_value=output):
             self.monitor._read_stdout()
         self.assertFalse(self.monitor.data_received)
+
+    def _row(self, action, iface_id, name='tap1', ofport=1, mac=True):
+        external_ids = [['iface-id', iface_id]]
+        if mac:
+            external_ids.append(['attached-mac', 'fa:16:3e:00:00:01'])
+        return ['uuid-%s' % iface_id, action, name, ofport,
+                ['map', external_ids]]
+
+    def _update(self, *rows):
+        return jsonutils.dumps({
+            'headings': ['row', 'action', 'name', 'ofport', 'external_ids'],
+            'data': list(rows)})
+
+    def _read(self, output):
+        with mock.patch(
+                'neutron.agent.linux.ovsdb_monitor.OvsdbMonitor._read_stdout',
+                return_value=output):
+            self.monitor._read_stdout()
+
+    def test_get_events_is_none_before_initial_dump(self):
+        self.assertIsNone(self.monitor.get_events())
+
+    def test_get_events_ignores_initial_dump(self):
+        self._read(self._update(self._row('initial', 'port1')))
+        self.assertIsNone(self.monitor.get_events())
+        self.assertEqual({'added': {}, 'removed': set()},
+                         self.monitor.get_events())
+
+    def test_get_events_returns_added_and_removed_ports(self):
+        self._read(self._update())
+        self.monitor.get_events()
+        self._read(self._update(self._row('insert', 'port1', 'tap1'),
+                                self._row('delete', 'port2', 'tap2')))
+        self.assertEqual({'added': {'port1': 'tap1'},
+                          'removed': set(['port2'])},
+                         self.monitor.get_events())
+
+    def test_get_events_waits_for_ofport(self):
+        self._read(self._update())
+        self.monitor.get_events()
+        self._read(self._update(self._row('insert', 'port1', ofport=['set',
+                                                                     []])))
+        self.assertEqual({}, self.monitor.get_events()['added'])
+        self._read(self._update(self._row('new', 'port1'),
+                                self._row('old', 'port1', ofport=['set',
+                                                                  []])))
+        self.assertEqual({'port1': 'tap1'}, self.monitor.get_events()['added'])
+
+    def test_get_events_is_none_after_kill(self):
+        self._read(self._update())
+        with mock.patch(
+                'neutron.agent.linux.ovsdb_monitor.OvsdbMonitor._kill'):
+            self.monitor._kill()
+        self.assertIsNone(self.monitor.get_events())
+
+    def test_get_events_is_none_for_unparsable_output(self):
+        self._read(self._update())
+        self.monitor.get_events()
+        self._read('foo')
+        self.assertIsNone(self.monitor.get_events())
+
+    def test__read_stdout_calls_on_update(self):
+        self.monitor.on_update = mock.Mock()
+        self._read(self._update())
+        self.monitor.on_update.assert_called_once_with()
@@ -14,6 +14,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import eventlet
 import mock
 
 from neutron.agent.linux import polling
@@ -79,6 +80,22 @@ class TestBasePollingManager(base.BaseTestCase):
         with self.mock_is_polling_required(False):
             self.assertFalse(self.pm.is_polling_required)
 
+    def test_wait_returns_after_timeout(self):
+        self.pm.wait(0.01)
+
+    def test_wait_returns_when_notified(self):
+        self.pm.notify()
+        with eventlet.timeout.Timeout(1):
+            self.pm.wait(5)
+
+    def test_wait_resets_notification(self):
+        self.pm.notify()
+        self.pm.wait(0)
+        self.assertFalse(self.pm._wakeup.ready())
+
+    def test_get_events_returns_none(self):
+        self.assertIsNone(self.pm.get_events())
+
 
 class TestAlwaysPoll(base.BaseTestCase):
 
@@ -114,3 +131,11 @@ class TestInterfacePollingMinimizer(base.BaseTestCase):
     def test__is_polling_required_returns_when_updates_are_present(self):
         with self.mock_has_updates(True):
             self.assertTrue(self.pm._is_polling_required())
+
+    def test_notified_by_monitor(self):
+        self.assertEqual(self.pm.notify, self.pm._monitor.on_update)
+
+    def test_get_events_returns_monitor_events(self):
+        with mock.patch.object(self.pm._monitor, 'get_events',
+                               return_value='events'):
+            self.assertEqual('events', self.pm.get_events())
@@ -25,6 +25,7 @@ from neutron.common import config
 from neutron import context
 import neutron.extensions
 from neutron.extensions import metering
+from neutron.openstack.common import uuidutils
 from neutron.plugins.common import constants
 from neutron.services.metering import metering_plugin
 from neutron.tests.unit import test_db_plugin
@@ -174,6 +175,40 @@ class MeteringPluginDbTestCase(test_db_plugin.NeutronDbPluginV2TestCase,
 
             self._test_list_resources('metering-label', metering_label)
 
+    def test_list_metering_labels_with_sort(self):
+        with contextlib.nested(self.metering_label('label1'),
+                               self.metering_label('label2'),
+                               self.metering_label('label3')
+                               ) as (ml1, ml2, ml3):
+            self._test_list_with_sort('metering-label', (ml3, ml2, ml1),
+                                      [('name', 'desc')])
+
+    def test_list_metering_labels_with_pagination(self):
+        with contextlib.nested(self.metering_label('label1'),
+                               self.metering_label('label2'),
+                               self.metering_label('label3')
+                               ) as (ml1, ml2, ml3):
+            self._test_list_with_pagination('metering-label',
+                                            (ml1, ml2, ml3),
+                                            ('name', 'asc'), 2, 2)
+
+    def test_list_metering_labels_with_pagination_reverse(self):
+        with contextlib.nested(self.metering_label('label1'),
+                               self.metering_label('label2'),
+                               self.metering_label('label3')
+                               ) as (ml1, ml2, ml3):
+            self._test_list_with_pagination_reverse('metering-label',
+                                                    (ml1, ml2, ml3),
+                                                    ('name', 'asc'), 2, 2)
+
+    def test_list_metering_labels_with_invalid_marker(self):
+        with self.metering_label('label1'):
+            req = self.new_list_request(
+                'metering-labels',
+                params='limit=1&marker=%s' % uuidutils.generate_uuid())
+            res = req.get_response(self.ext_api)
+            self.assertEqual(res.status_int, webob.exc.HTTPBadRequest.code)
+
     def test_create_metering_label_rule(self):
         name = 'my label'
         description = 'my metering label'
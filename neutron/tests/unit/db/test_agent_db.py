@@ -15,13 +15,17 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import datetime
+
 import mock
+from oslo.config import cfg
 
 from neutron import context
 from neutron.db import agents_db
 from neutron.db import api as db
 from neutron.db import db_base_plugin_v2 as base_plugin
 from neutron.openstack.common.db import exception as exc
+from neutron.openstack.common import timeutils
 from neutron.tests import base
 
 
@@ -84,3 +88,67 @@ class TestAgentsDbMixin(base.BaseTestCase):
 
             self.assertEqual(add_mock.call_count, 2,
                              "Agent entry creation hasn't been retried")
+
+
+class TestAgentHeartbeats(base.BaseTestCase):
+    def setUp(self):
+        super(TestAgentHeartbeats, self).setUp()
+
+        self.context = context.get_admin_context()
+        self.plugin = FakePlugin()
+        self.addCleanup(db.clear_db)
+
+        self.agent_status = {
+            'agent_type': 'Open vSwitch agent',
+            'binary': 'neutron-openvswitch-agent',
+            'host': 'overcloud-notcompute',
+            'topic': 'N/A'
+        }
+        cfg.CONF.set_override('agent_heartbeat_batch_interval', 30)
+        mock.patch.object(agents_db, '_heartbeats',
+                          new=agents_db.AgentHeartbeats()).start()
+        mock.patch.object(agents_db.loopingcall,
+                          'FixedIntervalLoopingCall').start()
+        self.addCleanup(mock.patch.stopall)
+        self.addCleanup(timeutils.clear_time_override)
+        self.start_time = timeutils.utcnow()
+        timeutils.set_time_override(self.start_time)
+        self.plugin.create_or_update_agent(self.context, self.agent_status)
+        self.later_time = self.start_time + datetime.timedelta(seconds=20)
+        timeutils.set_time_override(self.later_time)
+
+    def _get_stored_heartbeat(self):
+        return self.plugin.get_agents_db(self.context)[0].heartbeat_timestamp
+
+    def test_heartbeat_recorded_in_memory(self):
+        self.plugin.create_or_update_agent(self.context, self.agent_status)
+
+        self.assertEqual(self.start_time, self._get_stored_heartbeat())
+        agent = self.plugin.get_agents(self.context)[0]
+        self.assertEqual(self.later_time, agent['heartbeat_timestamp'])
+        self.assertTrue(agent['alive'])
+
+    def test_heartbeats_written_in_batch(self):
+        self.plugin.create_or_update_agent(self.context, self.agent_status)
+        agents_db._heartbeats.write()
+
+        self.context.session.expire_all()
+        self.assertEqual(self.later_time, self._get_stored_heartbeat())
+
+    def test_changed_configurations_written(self):
+        self.agent_status['configurations'] = {'devices': 1}
+        self.plugin.create_or_update_agent(self.context, self.agent_status)
+
+        self.assertEqual(self.later_time, self._get_stored_heartbeat())
+
+    def test_deleted_agent_written_again(self):
+        agent_id = self.plugin.get_agents_db(self.context)[0].id
+        self.plugin.create_or_update_agent(self.context, self.agent_status)
+        with self.context.session.begin():
+            self.context.session.query(agents_db.Agent).delete()
+        agents_db._heartbeats.write()
+        self.plugin.create_or_update_agent(self.context, self.agent_status)
+
+        agents = self.plugin.get_agents_db(self.context)
+        self.assertEqual(1, len(agents))
+        self.assertNotEqual(agent_id, agents[0].id)
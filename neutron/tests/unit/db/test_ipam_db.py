@@ -0,0 +1,152 @@
+# Copyright (c) 2014 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import netaddr
+from oslo.config import cfg
+
+from neutron import context
+from neutron.db import api as db
+from neutron.db import ipam_db
+from neutron.tests import base
+from neutron.tests.unit import test_db_plugin
+
+
+class TestIntervalSet(base.BaseTestCase):
+
+    def test_remove_splits_range(self):
+        free = ipam_db.IntervalSet([(1, 10)])
+        self.assertTrue(free.remove(5))
+        self.assertEqual([(1, 4), (6, 10)], free.ranges())
+        self.assertFalse(free.remove(5))
+
+    def test_remove_bounds(self):
+        free = ipam_db.IntervalSet([(1, 3), (7, 7)])
+        self.assertTrue(free.remove(1))
+        self.assertTrue(free.remove(3))
+        self.assertTrue(free.remove(7))
+        self.assertEqual([(2, 2)], free.ranges())
+
+    def test_add_merges_ranges(self):
+        free = ipam_db.IntervalSet([(1, 4), (6, 10)])
+        free.add(5)
+        self.assertEqual([(1, 10)], free.ranges())
+        free.add(12)
+        free.add(11)
+        self.assertEqual([(1, 12)], free.ranges())
+
+    def test_first_from_wraps_around(self):
+        free = ipam_db.IntervalSet([(1, 4), (8, 10)])
+        self.assertEqual(3, free.first_from(3))
+        self.assertEqual(8, free.first_from(5))
+        self.assertEqual(1, free.first_from(11))
+        self.assertIsNone(ipam_db.IntervalSet().first_from(1))
+
+    def test_json_round_trip(self):
+        free = ipam_db.IntervalSet([(2 ** 64, 2 ** 65), (1, 2)])
+        self.assertEqual(free.ranges(),
+                         ipam_db.IntervalSet.from_json(
+                             free.to_json()).ranges())
+
+
+class TestIntervalIpamDriver(test_db_plugin.NeutronDbPluginV2TestCase):
+
+    def setUp(self):
+        cfg.CONF.set_override('ipam_driver',
+                              'neutron.db.ipam_db.IntervalIpamDriver')
+        ipam_db.reset_ipam_driver()
+        self.addCleanup(ipam_db.reset_ipam_driver)
+        super(TestIntervalIpamDriver, self).setUp()
+
+    def _port_ip(self, port):
+        return port['port']['fixed_ips'][0]['ip_address']
+
+    def test_allocate_sequential_ips(self):
+        with self.subnet() as subnet:
+            with self.port(subnet=subnet) as port1:
+                with self.port(subnet=subnet) as port2:
+                    self.assertEqual('10.0.0.2', self._port_ip(port1))
+                    self.assertEqual('10.0.0.3', self._port_ip(port2))
+
+    def test_released_ip_not_reused_immediately(self):
+        with self.subnet() as subnet:
+            with self.port(subnet=subnet, no_delete=True) as port1:
+                self.assertEqual('10.0.0.2', self._port_ip(port1))
+            self._delete('ports', port1['port']['id'])
+            with self.port(subnet=subnet) as port2:
+                self.assertEqual('10.0.0.3', self._port_ip(port2))
+
+    def test_allocate_specific_ip(self):
+        with self.subnet() as subnet:
+            fixed_ips = [{'subnet_id': subnet['subnet']['id'],
+                          'ip_address': '10.0.0.2'}]
+            with self.port(subnet=subnet, fixed_ips=fixed_ips) as port1:
+                with self.port(subnet=subnet) as port2:
+                    self.assertEqual('10.0.0.2', self._port_ip(port1))
+                    self.assertEqual('10.0.0.3', self._port_ip(port2))
+
+    def test_stale_cache_is_reloaded(self):
+        with self.subnet() as subnet:
+            subnet_id = subnet['subnet']['id']
+            with self.port(subnet=subnet):
+                # Simulate an allocation by another server process
+                ctx = context.get_admin_context()
+                record = ctx.session.query(ipam_db.IPAvailabilitySet).get(
+                    subnet_id)
+                free = ipam_db.IntervalSet.from_json(record.free_ranges)
+                free.remove(int(netaddr.IPAddress('10.0.0.3')))
+                with ctx.session.begin():
+                    record.free_ranges = free.to_json()
+                    record.revision = 'other-revision'
+                with self.port(subnet=subnet) as port2:
+                    self.assertEqual('10.0.0.4', self._port_ip(port2))
+
+    def _is_free(self, subnet_id, ip_address):
+        session = db.get_session()
+        record = session.query(ipam_db.IPAvailabilitySet).get(subnet_id)
+        return (int(netaddr.IPAddress(ip_address)) in
+                ipam_db.IntervalSet.from_json(record.free_ranges))
+
+    def test_ip_released_when_transaction_rolls_back(self):
+        with self.subnet() as subnet:
+            ctx = context.get_admin_context()
+            driver = ipam_db.get_ipam_driver()
+            try:
+                with ctx.session.begin():
+                    ip = driver.generate_ip(ctx, [subnet['subnet']])
+                    self.assertFalse(self._is_free(ip['subnet_id'],
+                                                   ip['ip_address']))
+                    raise ValueError()
+            except ValueError:
+                pass
+            self.assertTrue(self._is_free(ip['subnet_id'], ip['ip_address']))
+
+    def test_ip_released_when_transaction_commits(self):
+        with self.subnet() as subnet:
+            subnet_id = subnet['subnet']['id']
+            ctx = context.get_admin_context()
+            driver = ipam_db.get_ipam_driver()
+            driver.allocate_specific_ip(ctx, subnet_id, '10.0.0.5')
+            with ctx.session.begin():
+                driver.release_ip(ctx, subnet_id, '10.0.0.5')
+                self.assertFalse(self._is_free(subnet_id, '10.0.0.5'))
+            self.assertTrue(self._is_free(subnet_id, '10.0.0.5'))
+
+    def test_deleted_subnet_forgotten(self):
+        with self.subnet(do_delete=False) as subnet:
+            subnet_id = subnet['subnet']['id']
+            driver = ipam_db.get_ipam_driver()
+            self.assertIn(subnet_id, driver._subnets)
+            self._delete('subnets', subnet_id)
+            self.assertNotIn(subnet_id, driver._subnets)
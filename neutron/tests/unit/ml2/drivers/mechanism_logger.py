@@ -102,6 +102,14 @@ class LoggerMechanismDriver(api.MechanismDriver):
     def update_port_postcommit(self, context):
         self._log_port_call("update_port_postcommit", context)
 
+    def update_port_status(self, context):
+        LOG.info(_("update_port_status called for port %(port_id)s on host "
+                   "%(host)s: %(original_status)s -> %(status)s"),
+                 {'port_id': context.port_id,
+                  'host': context.host,
+                  'original_status': context.original_status,
+                  'status': context.status})
+
     def delete_port_precommit(self, context):
         self._log_port_call("delete_port_precommit", context)
 
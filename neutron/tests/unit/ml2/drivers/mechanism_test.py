@@ -105,6 +105,12 @@ class TestMechanismDriver(api.MechanismDriver):
     def update_port_postcommit(self, context):
         self._check_port_context(context, True)
 
+    def update_port_status(self, context):
+        assert(isinstance(context, api.PortStatusContext))
+        assert(context.port_id is not None)
+        assert(context.network_id is not None)
+        assert(context.status != context.original_status)
+
     def delete_port_precommit(self, context):
         self._check_port_context(context, False)
 
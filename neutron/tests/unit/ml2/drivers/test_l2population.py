@@ -30,6 +30,7 @@ from neutron import manager
 from neutron.openstack.common import timeutils
 from neutron.plugins.ml2 import config as config
 from neutron.plugins.ml2.drivers.l2pop import constants as l2_consts
+from neutron.plugins.ml2.drivers.l2pop import rpc as l2pop_rpc
 from neutron.plugins.ml2 import managers
 from neutron.plugins.ml2 import rpc
 from neutron.tests.unit import test_db_plugin as test_plugin
@@ -107,6 +108,14 @@ class TestL2PopulationRpcTestCase(test_plugin.NeutronDbPluginV2TestCase):
         self.fanout_topic = topics.get_topic_name(topics.AGENT,
                                                   topics.L2POPULATION,
                                                   topics.UPDATE)
+        self.host_topic = topics.get_topic_name(topics.AGENT,
+                                                topics.L2POPULATION,
+                                                topics.UPDATE,
+                                                HOST)
+        self.host_2_topic = topics.get_topic_name(topics.AGENT,
+                                                  topics.L2POPULATION,
+                                                  topics.UPDATE,
+                                                  HOST + '_2')
         fanout = ('neutron.openstack.common.rpc.proxy.RpcProxy.fanout_cast')
         fanout_patch = mock.patch(fanout)
         self.mock_fanout = fanout_patch.start()
@@ -154,7 +163,7 @@ class TestL2PopulationRpcTestCase(test_plugin.NeutronDbPluginV2TestCase):
 
                     device = 'tap' + p1['id']
 
-                    self.mock_fanout.reset_mock()
+                    self.mock_cast.reset_mock()
                     self.callbacks.update_device_up(self.adminContext,
                                                     agent_id=HOST,
                                                     device=device)
@@ -172,8 +181,9 @@ class TestL2PopulationRpcTestCase(test_plugin.NeutronDbPluginV2TestCase):
                                 'namespace': None,
                                 'method': 'add_fdb_entries'}
 
-                    self.mock_fanout.assert_called_with(
-                        mock.ANY, expected, topic=self.fanout_topic)
+                    self.mock_cast.assert_called_with(
+                        mock.ANY, expected, topic=self.host_topic)
+                    self.assertFalse(self.mock_fanout.called)
 
     def test_fdb_add_not_called_type_local(self):
         self._register_ml2_agents()
@@ -190,12 +200,60 @@ class TestL2PopulationRpcTestCase(test_plugin.NeutronDbPluginV2TestCase):
 
                     device = 'tap' + p1['id']
 
-                    self.mock_fanout.reset_mock()
+                    self.mock_cast.reset_mock()
                     self.callbacks.update_device_up(self.adminContext,
                                                     agent_id=HOST,
                                                     device=device)
 
-                    self.assertFalse(self.mock_fanout.called)
+                    self.assertFalse(self.mock_cast.called)
+
+    def test_fdb_add_batched(self):
+        self._register_ml2_agents()
+        config.cfg.CONF.set_override('notification_delay', 1, 'l2pop')
+
+        with self.subnet(network=self._network) as subnet:
+            host_arg = {portbindings.HOST_ID: HOST}
+            with self.port(subnet=subnet,
+                           arg_list=(portbindings.HOST_ID,),
+                           **host_arg) as port1:
+                with self.port(subnet=subnet,
+                               arg_list=(portbindings.HOST_ID,),
+                               **host_arg) as port2:
+                    p1 = port1['port']
+                    p2 = port2['port']
+
+                    self.mock_cast.reset_mock()
+                    with mock.patch.object(l2pop_rpc.eventlet,
+                                           'spawn_after') as spawn_after:
+                        self.callbacks.update_device_up(
+                            self.adminContext, agent_id=HOST,
+                            device='tap' + p1['id'])
+                        self.callbacks.update_device_up(
+                            self.adminContext, agent_id=HOST,
+                            device='tap' + p2['id'])
+
+                    spawn_after.assert_called_once_with(1, mock.ANY)
+                    self.assertFalse(self.mock_cast.called)
+                    spawn_after.call_args[0][1]()
+
+                    p1_ips = [p['ip_address'] for p in p1['fixed_ips']]
+                    p2_ips = [p['ip_address'] for p in p2['fixed_ips']]
+                    expected = {'args':
+                                {'fdb_entries':
+                                 {p1['network_id']:
+                                  {'ports':
+                                   {'20.0.0.1': [constants.FLOODING_ENTRY,
+                                                 [p1['mac_address'],
+                                                  p1_ips[0]],
+                                                 [p2['mac_address'],
+                                                  p2_ips[0]]]},
+                                   'network_type': 'vxlan',
+                                   'segment_id': 1}}},
+                                'namespace': None,
+                                'method': 'add_fdb_entries'}
+
+                    self.mock_cast.assert_called_once_with(
+                        mock.ANY, expected, topic=self.host_topic)
 
     def test_fdb_add_two_agents(self):
         self._register_ml2_agents()
@@ -218,7 +276,6 @@ class TestL2PopulationRpcTestCase(test_plugin.NeutronDbPluginV2TestCase):
                     device = 'tap' + p1['id']
 
                     self.mock_cast.reset_mock()
-                    self.mock_fanout.reset_mock()
                     self.callbacks.update_device_up(self.adminContext,
                                                     agent_id=HOST,
                                                     device=device)
@@ -243,9 +300,9 @@ class TestL2PopulationRpcTestCase(test_plugin.NeutronDbPluginV2TestCase):
                                                   topics.UPDATE,
                                                   HOST)
 
-                    self.mock_cast.assert_called_with(mock.ANY,
-                                                      expected1,
-                                                      topic=topic)
+                    self.mock_cast.assert_any_call(mock.ANY,
+                                                   expected1,
+                                                   topic=topic)
 
                     expected2 = {'args':
                                  {'fdb_entries':
@@ -259,8 +316,11 @@ class TestL2PopulationRpcTestCase(test_plugin.NeutronDbPluginV2TestCase):
                                  'namespace': None,
                                  'method': 'add_fdb_entries'}
 
-                    self.mock_fanout.assert_called_with(
-                        mock.ANY, expected2, topic=self.fanout_topic)
+                    self.mock_cast.assert_any_call(
+                        mock.ANY, expected2, topic=self.host_topic)
+                    self.mock_cast.assert_any_call(
+                        mock.ANY, expected2, topic=self.host_2_topic)
+                    self.assertEqual(self.mock_cast.call_count, 3)
 
     def test_fdb_add_called_two_networks(self):
         self._register_ml2_agents()
@@ -284,7 +344,6 @@ class TestL2PopulationRpcTestCase(test_plugin.NeutronDbPluginV2TestCase):
                             device = 'tap' + p3['id']
 
                             self.mock_cast.reset_mock()
-                            self.mock_fanout.reset_mock()
                             self.callbacks.update_device_up(
                                 self.adminContext, agent_id=HOST,
                                 device=device)
@@ -309,9 +368,9 @@ class TestL2PopulationRpcTestCase(test_plugin.NeutronDbPluginV2TestCase):
                                                           topics.UPDATE,
                                                           HOST)
 
-                            self.mock_cast.assert_called_with(mock.ANY,
-                                                              expected1,
-                                                              topic=topic)
+                            self.mock_cast.assert_any_call(mock.ANY,
+                                                           expected1,
+                                                           topic=topic)
 
                             p3_ips = [p['ip_address']
                                       for p in p3['fixed_ips']]
@@ -328,9 +387,13 @@ class TestL2PopulationRpcTestCase(test_plugin.NeutronDbPluginV2TestCase):
                                          'namespace': None,
                                          'method': 'add_fdb_entries'}
 
-                            self.mock_fanout.assert_called_with(
+                            self.mock_cast.assert_any_call(
                                 mock.ANY, expected2,
-                                topic=self.fanout_topic)
+                                topic=self.host_topic)
+                            self.mock_cast.assert_any_call(
+                                mock.ANY, expected2,
+                                topic=self.host_2_topic)
+                            self.assertEqual(self.mock_cast.call_count, 3)
 
     def test_update_port_down(self):
         self._register_ml2_agents()
@@ -346,7 +409,7 @@ class TestL2PopulationRpcTestCase(test_plugin.NeutronDbPluginV2TestCase):
                     p2 = port2['port']
                     device2 = 'tap' + p2['id']
 
-                    self.mock_fanout.reset_mock()
+                    self.mock_cast.reset_mock()
                     self.callbacks.update_device_up(self.adminContext,
                                                     agent_id=HOST,
                                                     device=device2)
@@ -357,7 +420,7 @@ class TestL2PopulationRpcTestCase(test_plugin.NeutronDbPluginV2TestCase):
                     self.callbacks.update_device_up(self.adminContext,
                                                     agent_id=HOST,
                                                     device=device1)
-                    self.mock_fanout.reset_mock()
+                    self.mock_cast.reset_mock()
                     self.callbacks.update_device_down(self.adminContext,
                                                       agent_id=HOST,
                                                       device=device2)
@@ -374,8 +437,8 @@ class TestL2PopulationRpcTestCase(test_plugin.NeutronDbPluginV2TestCase):
                                 'namespace': None,
                                 'method': 'remove_fdb_entries'}
 
-                    self.mock_fanout.assert_called_with(
-                        mock.ANY, expected, topic=self.fanout_topic)
+                    self.mock_cast.assert_called_with(
+                        mock.ANY, expected, topic=self.host_topic)
 
     def test_update_port_down_last_port_up(self):
         self._register_ml2_agents()
@@ -391,7 +454,7 @@ class TestL2PopulationRpcTestCase(test_plugin.NeutronDbPluginV2TestCase):
                     p2 = port2['port']
                     device2 = 'tap' + p2['id']
 
-                    self.mock_fanout.reset_mock()
+                    self.mock_cast.reset_mock()
                     self.callbacks.update_device_up(self.adminContext,
                                                     agent_id=HOST,
                                                     device=device2)
@@ -413,8 +476,8 @@ class TestL2PopulationRpcTestCase(test_plugin.NeutronDbPluginV2TestCase):
                                 'namespace': None,
                                 'method': 'remove_fdb_entries'}
 
-                    self.mock_fanout.assert_called_with(
-                        mock.ANY, expected, topic=self.fanout_topic)
+                    self.mock_cast.assert_called_with(
+                        mock.ANY, expected, topic=self.host_topic)
 
     def test_delete_port(self):
         self._register_ml2_agents()
@@ -427,7 +490,7 @@ class TestL2PopulationRpcTestCase(test_plugin.NeutronDbPluginV2TestCase):
                 p1 = port['port']
                 device = 'tap' + p1['id']
 
-                self.mock_fanout.reset_mock()
+                self.mock_cast.reset_mock()
                 self.callbacks.update_device_up(self.adminContext,
                                                 agent_id=HOST,
                                                 device=device)
@@ -438,7 +501,7 @@ class TestL2PopulationRpcTestCase(test_plugin.NeutronDbPluginV2TestCase):
                     p2 = port2['port']
                     device1 = 'tap' + p2['id']
 
-                    self.mock_fanout.reset_mock()
+                    self.mock_cast.reset_mock()
                     self.callbacks.update_device_up(self.adminContext,
                                                     agent_id=HOST,
                                                     device=device1)
@@ -455,8 +518,8 @@ class TestL2PopulationRpcTestCase(test_plugin.NeutronDbPluginV2TestCase):
                             'namespace': None,
                             'method': 'remove_fdb_entries'}
 
-                self.mock_fanout.assert_any_call(
-                    mock.ANY, expected, topic=self.fanout_topic)
+                self.mock_cast.assert_any_call(
+                    mock.ANY, expected, topic=self.host_topic)
 
     def test_delete_port_last_port_up(self):
         self._register_ml2_agents()
@@ -490,8 +553,8 @@ class TestL2PopulationRpcTestCase(test_plugin.NeutronDbPluginV2TestCase):
                             'namespace': None,
                             'method': 'remove_fdb_entries'}
 
-                self.mock_fanout.assert_any_call(
-                    mock.ANY, expected, topic=self.fanout_topic)
+                self.mock_cast.assert_any_call(
+                    mock.ANY, expected, topic=self.host_topic)
 
     def test_fixed_ips_changed(self):
         self._register_ml2_agents()
@@ -509,7 +572,7 @@ class TestL2PopulationRpcTestCase(test_plugin.NeutronDbPluginV2TestCase):
                                                 agent_id=HOST,
                                                 device=device)
 
-                self.mock_fanout.reset_mock()
+                self.mock_cast.reset_mock()
 
                 data = {'port': {'fixed_ips': [{'ip_address': '10.0.0.2'},
                                                {'ip_address': '10.0.0.10'}]}}
@@ -528,10 +591,10 @@ class TestL2PopulationRpcTestCase(test_plugin.NeutronDbPluginV2TestCase):
                                 'namespace': None,
                                 'method': 'update_fdb_entries'}
 
-                self.mock_fanout.assert_any_call(
-                    mock.ANY, add_expected, topic=self.fanout_topic)
+                self.mock_cast.assert_any_call(
+                    mock.ANY, add_expected, topic=self.host_topic)
 
-                self.mock_fanout.reset_mock()
+                self.mock_cast.reset_mock()
 
                 data = {'port': {'fixed_ips': [{'ip_address': '10.0.0.2'},
                                                {'ip_address': '10.0.0.16'}]}}
@@ -552,10 +615,10 @@ class TestL2PopulationRpcTestCase(test_plugin.NeutronDbPluginV2TestCase):
                                 'namespace': None,
                                 'method': 'update_fdb_entries'}
 
-                self.mock_fanout.assert_any_call(
-                    mock.ANY, upd_expected, topic=self.fanout_topic)
+                self.mock_cast.assert_any_call(
+                    mock.ANY, upd_expected, topic=self.host_topic)
 
-                self.mock_fanout.reset_mock()
+                self.mock_cast.reset_mock()
 
                 data = {'port': {'fixed_ips': [{'ip_address': '10.0.0.16'}]}}
                 req = self.new_update_request('ports', data, p1['id'])
@@ -573,8 +636,8 @@ class TestL2PopulationRpcTestCase(test_plugin.NeutronDbPluginV2TestCase):
                                 'namespace': None,
                                 'method': 'update_fdb_entries'}
 
-                self.mock_fanout.assert_any_call(
-                    mock.ANY, del_expected, topic=self.fanout_topic)
+                self.mock_cast.assert_any_call(
+                    mock.ANY, del_expected, topic=self.host_topic)
 
     def test_no_fdb_updates_without_port_updates(self):
         self._register_ml2_agents()
@@ -592,15 +655,15 @@ class TestL2PopulationRpcTestCase(test_plugin.NeutronDbPluginV2TestCase):
                                                 agent_id=HOST,
                                                 device=device)
                 p1['status'] = 'ACTIVE'
-                self.mock_fanout.reset_mock()
+                self.mock_cast.reset_mock()
 
-                fanout = ('neutron.plugins.ml2.drivers.l2pop.rpc.'
-                          'L2populationAgentNotifyAPI._notification_fanout')
-                fanout_patch = mock.patch(fanout)
-                mock_fanout = fanout_patch.start()
+                notify = ('neutron.plugins.ml2.drivers.l2pop.rpc.'
+                          'L2populationAgentNotifyAPI._notify')
+                notify_patch = mock.patch(notify)
+                mock_notify = notify_patch.start()
 
                 plugin = manager.NeutronManager.get_plugin()
                 plugin.update_port(self.adminContext, p1['id'], port1)
 
-                self.assertFalse(mock_fanout.called)
-                fanout_patch.stop()
+                self.assertFalse(mock_notify.called)
+                notify_patch.stop()
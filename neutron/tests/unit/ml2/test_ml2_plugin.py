@@ -19,6 +19,7 @@ import webob
 
 from neutron.common import exceptions as exc
 from neutron import context
+from neutron.db import api as db_api
 from neutron.extensions import multiprovidernet as mpnet
 from neutron.extensions import portbindings
 from neutron.extensions import providernet as pnet
@@ -91,7 +92,21 @@ class TestMl2V2HTTPResponse(test_plugin.TestV2HTTPResponse,
 
 class TestMl2NetworksV2(test_plugin.TestNetworksV2,
                         Ml2PluginV2TestCase):
-    pass
+
+    def test_get_networks_read_from_slave(self):
+        with self.network() as network:
+            ctx = context.get_admin_context()
+            ctx.allow_slave_reads()
+            net_id = network['network']['id']
+            with mock.patch.object(db_api, 'get_session',
+                                   wraps=db_api.get_session) as get_session:
+                net = self.driver.get_network(ctx, net_id)
+                self.assertEqual(net_id, net['id'])
+                self.assertIn('provider:network_type', net)
+                nets = self.driver.get_networks(ctx)
+                self.assertEqual([net_id], [n['id'] for n in nets])
+            get_session.assert_called_once_with(slave=True)
+            self.assertIsNone(ctx._session)
 
 
 class TestMl2PortsV2(test_plugin.TestPortsV2, Ml2PluginV2TestCase):
@@ -101,6 +116,17 @@ class TestMl2PortsV2(test_plugin.TestPortsV2, Ml2PluginV2TestCase):
             self.assertEqual(port['port']['status'], 'DOWN')
             self.assertEqual(self.port_create_status, 'DOWN')
 
+    def test_start_rpc_listener(self):
+        plugin = manager.NeutronManager.get_plugin()
+        with mock.patch.object(ml2_plugin.c_rpc,
+                               'create_connection') as create_connection:
+            conn = plugin.start_rpc_listener()
+        self.assertEqual(create_connection.return_value, conn)
+        conn.create_consumer.assert_called_once_with(
+            plugin.topic, plugin.dispatcher, fanout=False)
+        conn.consume_in_thread.assert_called_once_with()
+        self.assertTrue(plugin.rpc_workers_supported())
+
     def test_update_non_existent_port(self):
         ctx = context.get_admin_context()
         plugin = manager.NeutronManager.get_plugin()
@@ -13,12 +13,15 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
+
 import mock
 
 from neutron import context
 from neutron.extensions import portbindings
 from neutron import manager
 from neutron.plugins.ml2 import config as config
+from neutron.plugins.ml2 import db as ml2_db
 from neutron.tests.unit import test_db_plugin as test_plugin
 
 
@@ -63,6 +66,128 @@ class PortBindingTestCase(test_plugin.NeutronDbPluginV2TestCase):
             else:
                 self.assertNotIn('network_type', details)
 
+    def test_get_devices_details_list(self):
+        host_arg = {portbindings.HOST_ID: "host-ovs-no_filter"}
+        with self.subnet() as subnet:
+            with contextlib.nested(
+                self.port(subnet=subnet, name='name1',
+                          arg_list=(portbindings.HOST_ID,), **host_arg),
+                self.port(subnet=subnet, name='name2')
+            ) as (port1, port2):
+                bound_id = port1['port']['id']
+                unbound_id = port2['port']['id']
+                devices = ['tap' + bound_id[:11], unbound_id, 'tapunknown']
+                details = self.plugin.callbacks.get_devices_details_list(
+                    None, agent_id="theAgentId", devices=devices)
+                self.assertEqual(devices, [d['device'] for d in details])
+                self.assertEqual(details[0]['port_id'], bound_id)
+                self.assertEqual(details[0]['network_type'], 'local')
+                self.assertNotIn('port_id', details[1])
+                self.assertNotIn('port_id', details[2])
+
+    def test_get_device_details_from_tap_device(self):
+        host_arg = {portbindings.HOST_ID: "host-ovs-no_filter"}
+        with self.port(name='name', arg_list=(portbindings.HOST_ID,),
+                       **host_arg) as port:
+            port_id = port['port']['id']
+            device = 'tap' + port_id[:11]
+            details = self.plugin.callbacks.get_device_details(
+                None, agent_id="theAgentId", device=device)
+            self.assertEqual(details['port_id'], port_id)
+            self.assertEqual(details['device'], device)
+            self.assertTrue(self.plugin.port_bound_to_host(
+                port_id[:11], "host-ovs-no_filter"))
+            port = self.plugin.callbacks.get_port_from_device(device)
+            self.assertEqual(port['id'], port_id)
+
+    def test_update_device_up_status_only(self):
+        host_arg = {portbindings.HOST_ID: "host-ovs-no_filter"}
+        with self.port(name='name', arg_list=(portbindings.HOST_ID,),
+                       **host_arg) as port:
+            port_id = port['port']['id']
+            manager = self.plugin.mechanism_manager
+            ctx = context.get_admin_context()
+            with contextlib.nested(
+                mock.patch.object(manager, 'update_port_status'),
+                mock.patch.object(manager, 'update_port_postcommit')
+            ) as (status_mock, postcommit_mock):
+                self.plugin.callbacks.update_device_up(
+                    ctx, agent_id="theAgentId", device='tap' + port_id[:11],
+                    host="host-ovs-no_filter")
+                self.plugin.callbacks.update_device_up(
+                    ctx, agent_id="theAgentId", device=port_id,
+                    host="host-ovs-no_filter")
+            self.assertFalse(postcommit_mock.called)
+            self.assertEqual(1, status_mock.call_count)
+            status_context = status_mock.call_args[0][0]
+            self.assertEqual(port_id, status_context.port_id)
+            self.assertEqual('DOWN', status_context.original_status)
+            self.assertEqual('ACTIVE', status_context.status)
+            port = self._show('ports', port_id)
+            self.assertEqual('ACTIVE', port['port']['status'])
+
+    def test_update_device_down_other_host(self):
+        host_arg = {portbindings.HOST_ID: "host-ovs-no_filter"}
+        with self.port(name='name', arg_list=(portbindings.HOST_ID,),
+                       **host_arg) as port:
+            port_id = port['port']['id']
+            ctx = context.get_admin_context()
+            self.plugin.callbacks.update_device_up(
+                ctx, agent_id="theAgentId", device=port_id,
+                host="host-ovs-no_filter")
+            details = self.plugin.callbacks.update_device_down(
+                ctx, agent_id="theAgentId", device=port_id, host="other")
+            self.assertTrue(details['exists'])
+            port = self._show('ports', port_id)
+            self.assertEqual('ACTIVE', port['port']['status'])
+
+    def test_update_devices_status(self):
+        host_arg = {portbindings.HOST_ID: "host-ovs-no_filter"}
+        with contextlib.nested(
+            self.port(name='name1', arg_list=(portbindings.HOST_ID,),
+                      **host_arg),
+            self.port(name='name2', arg_list=(portbindings.HOST_ID,),
+                      **host_arg)
+        ) as (port1, port2):
+            port_id1 = port1['port']['id']
+            port_id2 = port2['port']['id']
+            manager = self.plugin.mechanism_manager
+            ctx = context.get_admin_context()
+            with contextlib.nested(
+                mock.patch.object(manager, 'update_port_status'),
+                mock.patch.object(ml2_db, 'set_ports_status',
+                                  wraps=ml2_db.set_ports_status)
+            ) as (status_mock, set_status_mock):
+                result = self.plugin.callbacks.update_devices_status(
+                    ctx, agent_id="theAgentId",
+                    devices_up=['tap' + port_id1[:11], port_id2],
+                    devices_down=['tap' + port_id1[:11], 'tapmissing'],
+                    host="host-ovs-no_filter")
+            self.assertEqual(3, status_mock.call_count)
+            self.assertEqual(2, set_status_mock.call_count)
+            self.assertEqual([{'device': 'tap' + port_id1[:11],
+                               'exists': True},
+                              {'device': 'tapmissing', 'exists': False}],
+                             result['devices_down'])
+            port = self._show('ports', port_id1)
+            self.assertEqual('DOWN', port['port']['status'])
+            port = self._show('ports', port_id2)
+            self.assertEqual('ACTIVE', port['port']['status'])
+
+    def test_get_ports_from_tap_devices(self):
+        with contextlib.nested(self.port(), self.port()) as (port1, port2):
+            port_id1 = port1['port']['id']
+            port_id2 = port2['port']['id']
+            session = context.get_admin_context().session
+            ports = ml2_db.get_ports(
+                session, [port_id1[:11], port_id2, port_id2[:8], 'missing'])
+            self.assertEqual({port_id1[:11]: port_id1,
+                              port_id2: port_id2,
+                              port_id2[:8]: port_id2},
+                             dict((port_id, port.id)
+                                  for port_id, port in ports.items()))
+            self.assertEqual({}, ml2_db.get_ports(session, ['missing']))
+
     def test_unbound(self):
         self._test_port_binding("",
                                 portbindings.VIF_TYPE_UNBOUND,
@@ -264,6 +264,29 @@ class OvsAgentSchedulerTestCase(OvsAgentSchedulerTestCaseBase):
         self.assertEqual(0, num_hosta_nets)
         self.assertEqual(2, num_hostc_nets)
 
+    def test_get_active_networks_info_by_page(self):
+        cfg.CONF.set_override('allow_overlapping_ips', True)
+        with contextlib.nested(self.subnet(),
+                               self.subnet(),
+                               self.subnet()) as subnets:
+            dhcp_rpc = dhcp_rpc_base.DhcpRpcCallbackMixin()
+            self._register_agent_states()
+            hosta_id = self._get_agent_id(constants.AGENT_TYPE_DHCP,
+                                          DHCP_HOSTA)
+            self._disable_agent(hosta_id)
+            network_ids = sorted(subnet['subnet']['network_id']
+                                 for subnet in subnets)
+            page = dhcp_rpc.get_active_networks_info(
+                self.adminContext, host=DHCP_HOSTC, limit=2)
+            self.assertEqual(network_ids[:2],
+                             [network['id'] for network in page])
+            page = dhcp_rpc.get_active_networks_info(
+                self.adminContext, host=DHCP_HOSTC, limit=2,
+                marker=page[-1]['id'])
+            self.assertEqual(network_ids[2:],
+                             [network['id'] for network in page])
+            self.assertEqual(1, len(page[0]['subnets']))
+
     def test_network_auto_schedule_with_no_dhcp(self):
         cfg.CONF.set_override('allow_overlapping_ips', True)
         with contextlib.nested(self.subnet(enable_dhcp=False),
@@ -748,6 +771,72 @@ class OvsAgentSchedulerTestCase(OvsAgentSchedulerTestCaseBase):
             self.assertIn(router_ids[0], [r['id'] for r in ret_a])
             self.assertIn(router_ids[2], [r['id'] for r in ret_a])
 
+    def test_rpc_sync_routers_by_page(self):
+        l3_rpc = l3_rpc_base.L3RpcCallbackMixin()
+        self._register_agent_states()
+
+        with contextlib.nested(self.router(),
+                               self.router(),
+                               self.router()) as routers:
+            router_ids = sorted(r['router']['id'] for r in routers)
+
+            page = l3_rpc.sync_routers(self.adminContext, host=L3_HOSTA,
+                                       page_size=2)
+            self.assertEqual(router_ids[:2], page['router_ids'])
+            self.assertEqual(set(router_ids[:2]),
+                             set(r['id'] for r in page['routers']))
+            self.assertEqual(router_ids, sorted(page['hosted_router_ids']))
+            self.assertEqual(router_ids[1], page['next_marker'])
+
+            page = l3_rpc.sync_routers(self.adminContext, host=L3_HOSTA,
+                                       page_size=2,
+                                       marker=page['next_marker'])
+            self.assertEqual([router_ids[2]],
+                             [r['id'] for r in page['routers']])
+            self.assertIsNone(page['next_marker'])
+            self.assertNotIn('hosted_router_ids', page)
+
+    def test_rpc_sync_routers_since_revision(self):
+        l3_rpc = l3_rpc_base.L3RpcCallbackMixin()
+        self._register_agent_states()
+
+        with contextlib.nested(self.router(),
+                               self.router()) as (router1, router2):
+            # the first sync schedules the routers to the agent
+            l3_rpc.sync_routers(self.adminContext, host=L3_HOSTA,
+                                page_size=10)
+            page = l3_rpc.sync_routers(self.adminContext, host=L3_HOSTA,
+                                       page_size=10)
+            revision = page['revision']
+
+            page = l3_rpc.sync_routers(self.adminContext, host=L3_HOSTA,
+                                       page_size=10, since_revision=revision)
+            self.assertEqual([], page['routers'])
+            self.assertEqual(2, len(page['hosted_router_ids']))
+
+            self._update('routers', router1['router']['id'],
+                         {'router': {'name': 'renamed'}})
+            page = l3_rpc.sync_routers(self.adminContext, host=L3_HOSTA,
+                                       page_size=10, since_revision=revision)
+            self.assertEqual([router1['router']['id']],
+                             [r['id'] for r in page['routers']])
+            self.assertEqual('renamed', page['routers'][0]['name'])
+            self.assertTrue(page['revision'] > revision)
+
+    def test_bump_router_revisions(self):
+        plugin = manager.NeutronManager.get_service_plugins().get(
+            service_constants.L3_ROUTER_NAT)
+        revision = plugin.get_routers_revision(self.adminContext)
+        plugin.bump_router_revisions(self.adminContext, ['r1', 'r2'])
+        plugin.bump_router_revisions(self.adminContext, ['r2'])
+        self.assertEqual(revision + 2,
+                         plugin.get_routers_revision(self.adminContext))
+        self.assertEqual(['r2'], plugin.get_router_ids_changed_since(
+            self.adminContext, revision + 1))
+        self.assertEqual(['r1', 'r2'], sorted(
+            plugin.get_router_ids_changed_since(self.adminContext,
+                                                revision)))
+
     def test_router_auto_schedule_for_specified_routers(self):
 
         def _sync_router_with_ids(router_ids, exp_synced, exp_hosted, host_id):
@@ -982,6 +1071,67 @@ class OvsAgentSchedulerTestCase(OvsAgentSchedulerTestCaseBase):
                 admin_context=False)
 
 
+class OvsLeastLoadedDhcpSchedulerTestCase(OvsAgentSchedulerTestCaseBase):
+
+    def setUp(self):
+        cfg.CONF.set_override('network_scheduler_driver',
+                              'neutron.scheduler.dhcp_agent_scheduler.'
+                              'LeastLoadedScheduler')
+        super(OvsLeastLoadedDhcpSchedulerTestCase, self).setUp()
+
+    def _get_dhcp_agent_ids(self, network_id):
+        dhcp_agents = self._list_dhcp_agents_hosting_network(network_id)
+        return [dhcp_agent['id'] for dhcp_agent in dhcp_agents['agents']]
+
+    def test_network_auto_schedule_spreads_networks(self):
+        cfg.CONF.set_override('allow_overlapping_ips', True)
+        with contextlib.nested(self.subnet(),
+                               self.subnet()):
+            dhcp_rpc = dhcp_rpc_base.DhcpRpcCallbackMixin()
+            self._register_agent_states()
+            hosta_id = self._get_agent_id(constants.AGENT_TYPE_DHCP,
+                                          DHCP_HOSTA)
+            hostc_id = self._get_agent_id(constants.AGENT_TYPE_DHCP,
+                                          DHCP_HOSTC)
+            dhcp_rpc.get_active_networks(self.adminContext, host=DHCP_HOSTA)
+            dhcp_rpc.get_active_networks(self.adminContext, host=DHCP_HOSTC)
+            networks = self._list_networks_hosted_by_dhcp_agent(hosta_id)
+            num_hosta_nets = len(networks['networks'])
+            networks = self._list_networks_hosted_by_dhcp_agent(hostc_id)
+            num_hostc_nets = len(networks['networks'])
+        self.assertEqual(1, num_hosta_nets)
+        self.assertEqual(1, num_hostc_nets)
+
+    def test_network_scheduling_on_port_creation_balances_load(self):
+        cfg.CONF.set_override('allow_overlapping_ips', True)
+        with contextlib.nested(self.subnet(),
+                               self.subnet()) as (subnet1, subnet2):
+            self._register_agent_states()
+            with contextlib.nested(
+                self.port(subnet=subnet1,
+                          device_owner="compute:test:" + DHCP_HOSTA),
+                self.port(subnet=subnet2,
+                          device_owner="compute:test:" + DHCP_HOSTA)
+            ) as (port1, port2):
+                agent_ids1 = self._get_dhcp_agent_ids(
+                    port1['port']['network_id'])
+                agent_ids2 = self._get_dhcp_agent_ids(
+                    port2['port']['network_id'])
+        self.assertEqual(1, len(agent_ids1))
+        self.assertEqual(1, len(agent_ids2))
+        self.assertNotEqual(agent_ids1, agent_ids2)
+
+    def test_network_ha_scheduling_on_port_creation(self):
+        cfg.CONF.set_override('dhcp_agents_per_network', 2)
+        with self.subnet() as subnet:
+            self._register_agent_states()
+            with self.port(subnet=subnet,
+                           device_owner="compute:test:" + DHCP_HOSTA) as port:
+                agent_ids = self._get_dhcp_agent_ids(
+                    port['port']['network_id'])
+        self.assertEqual(2, len(set(agent_ids)))
+
+
 class OvsDhcpAgentNotifierTestCase(test_l3_plugin.L3NatTestCaseMixin,
                                    test_agent_ext_plugin.AgentDBTestMixIn,
                                    AgentSchedulerTestMixIn,
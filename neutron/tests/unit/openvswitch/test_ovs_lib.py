@@ -12,17 +12,23 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
+import os
+
 import mock
 from oslo.config import cfg
 import testtools
 
 from neutron.agent.linux import ovs_lib
+from neutron.agent.linux import ovsdb_idl
 from neutron.agent.linux import utils
 from neutron.openstack.common import jsonutils
 from neutron.openstack.common import uuidutils
+from neutron.plugins.common import constants as p_const
 from neutron.plugins.openvswitch.common import constants
 from neutron.tests import base
 from neutron.tests import tools
+from neutron.tests.unit.agent.linux import test_ovsdb_idl
 
 
 class TestBaseOVS(base.BaseTestCase):
@@ -331,6 +337,86 @@ class OVS_Lib_Test(base.BaseTestCase):
             mock.call('del-flows', ['-'], 'deleted_flow_1\n')
         ])
 
+    def test_apply_deferred_flows_keeps_deferring(self):
+        run_ofctl = mock.patch.object(self.br, 'run_ofctl').start()
+        self.br.defer_apply_on()
+        self.br.add_flow(table=1, priority=2, dl_vlan=5, actions='output:1')
+        self.br.apply_deferred_flows()
+        self.assertEqual(1, run_ofctl.call_count)
+        self.br.add_flow(table=1, priority=2, dl_vlan=6, actions='output:1')
+        self.assertEqual(1, run_ofctl.call_count)
+        self.br.defer_apply_off()
+        self.assertEqual(2, run_ofctl.call_count)
+
+    def test_defer_apply_flows_drops_redundant_flows(self):
+        run_ofctl = mock.patch.object(self.br, 'run_ofctl').start()
+        self.br.defer_apply_on()
+        self.br.add_flow(table=1, priority=2, dl_vlan=5, actions='output:1')
+        self.br.add_flow(table=1, priority=2, dl_vlan=5, actions='output:2')
+        self.br.add_flow(table=2, priority=1, dl_dst='mac', actions='drop')
+        self.br.delete_flows(table=2, dl_dst='mac')
+        self.br.defer_apply_off()
+
+        run_ofctl.assert_has_calls([
+            mock.call('add-flows', ['-'],
+                      'hard_timeout=0,idle_timeout=0,priority=2,'
+                      'table=1,dl_vlan=5,actions=output:2\n'),
+            mock.call('del-flows', ['-'], 'table=2,dl_dst=mac\n')
+        ])
+        self.assertEqual(run_ofctl.call_count, 2)
+
+    def test_defer_apply_flows_merges_runs_of_other_tables(self):
+        run_ofctl = mock.patch.object(self.br, 'run_ofctl').start()
+        self.br.defer_apply_on()
+        self.br.add_flow(table=1, priority=1, dl_vlan=5, actions='drop')
+        self.br.delete_flows(table=2, dl_vlan=6)
+        self.br.add_flow(table=3, priority=1, dl_vlan=7, actions='drop')
+        self.br.delete_flows(dl_vlan=8)
+        self.br.add_flow(table=4, priority=1, dl_vlan=9, actions='drop')
+        self.br.defer_apply_off()
+
+        run_ofctl.assert_has_calls([
+            mock.call('add-flows', ['-'],
+                      'hard_timeout=0,idle_timeout=0,priority=1,'
+                      'table=1,dl_vlan=5,actions=drop\n'
+                      'hard_timeout=0,idle_timeout=0,priority=1,'
+                      'table=3,dl_vlan=7,actions=drop\n'),
+            mock.call('del-flows', ['-'], 'table=2,dl_vlan=6\n'
+                      'dl_vlan=8\n'),
+            mock.call('add-flows', ['-'],
+                      'hard_timeout=0,idle_timeout=0,priority=1,'
+                      'table=4,dl_vlan=9,actions=drop\n')
+        ])
+        self.assertEqual(run_ofctl.call_count, 3)
+
+    def test_defer_apply_flows_remove_all_flows(self):
+        run_ofctl = mock.patch.object(self.br, 'run_ofctl').start()
+        self.br.defer_apply_on()
+        self.br.add_flow(table=1, priority=1, dl_vlan=5, actions='drop')
+        self.br.remove_all_flows()
+        self.br.add_flow(priority=0, actions='normal')
+        self.br.defer_apply_off()
+
+        run_ofctl.assert_has_calls([
+            mock.call('del-flows', []),
+            mock.call('add-flows', ['-'],
+                      'hard_timeout=0,idle_timeout=0,priority=0,'
+                      'actions=normal\n')
+        ])
+        self.assertEqual(run_ofctl.call_count, 2)
+
+    def test_defer_apply_flows_nested(self):
+        run_ofctl = mock.patch.object(self.br, 'run_ofctl').start()
+        self.br.defer_apply_on()
+        self.br.defer_apply_on()
+        self.br.add_flow(priority=0, actions='normal')
+        self.br.defer_apply_off()
+        self.assertEqual(run_ofctl.call_count, 1)
+        self.assertTrue(self.br.defer_apply_flows)
+        self.br.defer_apply_off()
+        self.assertEqual(run_ofctl.call_count, 1)
+        self.assertFalse(self.br.defer_apply_flows)
+
     def test_add_tunnel_port(self):
         pname = "tap99"
         local_ip = "1.1.1.1"
@@ -742,3 +828,136 @@ class OVS_Lib_Test(base.BaseTestCase):
         self._check_ovs_vxlan_version(min_vxlan_ver,
                                       install_ver,
                                       expecting_ok=False)
+
+
+class OVS_Lib_Native_Test(test_ovsdb_idl.OvsdbServerTestCase):
+    """Exercise the native interface against a stub ovsdb-server."""
+
+    def setUp(self):
+        super(OVS_Lib_Native_Test, self).setUp()
+        self.server.assign_ofports = False
+        self.config(ovsdb_interface='native',
+                    ovsdb_connection='unix:' + self.path)
+        self.server.add_port('br-int', 'tap99', ofport=6,
+                             **{'iface-id': 'tap99id',
+                                'attached-mac': 'tap99mac'})
+        self.server.add_port('br-int', 'tap98',
+                             **{'iface-id': 'tap98id',
+                                'attached-mac': 'tap98mac'})
+        self.server.add_port('br-int', 'tun22', ofport=2)
+        self.server.add_bridge('br-ex')
+        self.server.add_port('br-ex', 'tap88', ofport=1,
+                             **{'iface-id': 'tap88id',
+                                'attached-mac': 'tap88mac'})
+        self.execute = mock.patch.object(utils, "execute").start()
+        self.addCleanup(mock.patch.stopall)
+        self.br = ovs_lib.OVSBridge('br-int', 'sudo')
+
+    def tearDown(self):
+        self.assertFalse(self.execute.called)
+        super(OVS_Lib_Native_Test, self).tearDown()
+
+    def test_vsctl_used_while_socket_inaccessible(self):
+        with contextlib.nested(
+            mock.patch.object(ovs_lib.os, 'access', return_value=False),
+            mock.patch.object(ovs_lib.LOG, 'warn')
+        ) as (access, warn):
+            self.assertIsNone(ovs_lib.OVSBridge('br-int', 'sudo').ovsdb)
+            self.assertIsNone(ovs_lib.OVSBridge('br-ex', 'sudo').ovsdb)
+            access.assert_called_with(self.path, os.R_OK | os.W_OK)
+            self.assertEqual(1, warn.call_count)
+        self.assertIsNotNone(ovs_lib.OVSBridge('br-ex', 'sudo').ovsdb)
+
+    def test_bridges(self):
+        self.assertEqual(['br-ex', 'br-int'], ovs_lib.get_bridges('sudo'))
+        self.assertTrue(self.br.bridge_exists('br-ex'))
+        self.assertFalse(self.br.bridge_exists('br-tun'))
+        self.assertEqual('br-ex', ovs_lib.get_bridge_for_iface('sudo',
+                                                               'tap88'))
+        self.assertTrue(self.br.port_exists('tap99'))
+        self.assertFalse(self.br.port_exists('tap77'))
+
+    def test_get_port_name_list(self):
+        self.assertEqual(['tap98', 'tap99', 'tun22'],
+                         self.br.get_port_name_list())
+
+    def test_get_vif_ports(self):
+        ports = self.br.get_vif_ports()
+        self.assertEqual([('tap98', '[]', 'tap98id', 'tap98mac'),
+                          ('tap99', '6', 'tap99id', 'tap99mac')],
+                         [(p.port_name, p.ofport, p.vif_id, p.vif_mac)
+                          for p in ports])
+
+    def test_get_vif_port_set(self):
+        self.assertEqual(set(['tap99id']), self.br.get_vif_port_set())
+
+    def test_get_vif_port_by_id(self):
+        port = self.br.get_vif_port_by_id('tap99id')
+        self.assertEqual(('tap99', 6, 'tap99mac'),
+                         (port.port_name, port.ofport, port.vif_mac))
+        self.assertIsNone(self.br.get_vif_port_by_id('tap98id'))
+        self.assertIsNone(self.br.get_vif_port_by_id('tap88id'))
+        self.assertIsNone(self.br.get_vif_port_by_id('tap77id'))
+
+    def test_get_vif_ports_by_ids(self):
+        ports = self.br.get_vif_ports_by_ids(['tap99id', 'tap98id',
+                                              'tap88id'])
+        self.assertEqual(['tap99id'], ports.keys())
+        self.assertEqual(6, ports['tap99id'].ofport)
+
+    def test_db_get_val(self):
+        self.assertEqual('6', self.br.db_get_val('Interface', 'tap99',
+                                                 'ofport'))
+        self.assertEqual('[]', self.br.db_get_val('Port', 'tap99', 'tag'))
+        self.assertEqual({'iface-id': 'tap99id', 'attached-mac': 'tap99mac'},
+                         self.br.db_get_map('Interface', 'tap99',
+                                            'external_ids'))
+        self.assertIsNone(self.br.db_get_val('Interface', 'tap77',
+                                             'ofport'))
+
+    def test_set_and_clear_db_attribute(self):
+        self.br.set_db_attribute('Port', 'tap99', 'tag', '5')
+        self.assertEqual('5', self.br.db_get_val('Port', 'tap99', 'tag'))
+        self.br.clear_db_attribute('Port', 'tap99', 'tag')
+        self.assertEqual('[]', self.br.db_get_val('Port', 'tap99', 'tag'))
+
+    def test_add_port_returns_ofport(self):
+        self.server.assign_ofports = True
+        ofport = self.br.add_port('tap77')
+        self.assertEqual(ofport, self.br.get_port_ofport('tap77'))
+        self.assertTrue(int(ofport) > 0)
+
+    def test_add_tunnel_port(self):
+        self.server.assign_ofports = True
+        self.br.add_tunnel_port('vxlan-1', '10.0.0.2', '10.0.0.1',
+                                p_const.TYPE_VXLAN, vxlan_udp_port=9999)
+        self.assertEqual('vxlan', self.br.db_get_val('Interface', 'vxlan-1',
+                                                     'type'))
+        self.assertEqual({'remote_ip': '10.0.0.2', 'local_ip': '10.0.0.1',
+                          'in_key': 'flow', 'out_key': 'flow',
+                          'dst_port': '9999'},
+                         self.br.db_get_map('Interface', 'vxlan-1',
+                                            'options'))
+
+    def test_add_patch_port(self):
+        self.server.assign_ofports = True
+        self.br.add_patch_port('patch-tun', 'patch-int')
+        self.assertEqual({'peer': 'patch-int'},
+                         self.br.db_get_map('Interface', 'patch-tun',
+                                            'options'))
+
+    def test_delete_ports_in_one_transaction(self):
+        self.br.delete_ports(all_ports=True)
+        self.assertEqual([], self.br.get_port_name_list())
+        self.assertEqual(1, self.server.requests.count('transact'))
+
+    def test_delete_port(self):
+        self.br.delete_port('tap99')
+        self.br.delete_port('tap77')
+        self.assertEqual(['tap98', 'tun22'], self.br.get_port_name_list())
+
+    def test_errors_are_logged_unless_checked(self):
+        self.server.stop()
+        self.assertIsNone(self.br.db_get_val('Interface', 'tap99',
+                                             'ofport'))
+        self.assertRaises(ovsdb_idl.OvsdbError, self.br.get_port_name_list)
@@ -69,6 +69,14 @@ class CreateAgentConfigMap(base.BaseTestCase):
         with testtools.ExpectedException(ValueError):
             ovs_neutron_agent.create_agent_config_map(cfg.CONF)
 
+    def test_create_agent_config_map_fails_for_invalid_chunk_size(self):
+        self.addCleanup(cfg.CONF.reset)
+        for chunk_size in (0, -1):
+            cfg.CONF.set_override('rpc_devices_chunk_size', chunk_size,
+                                  group='AGENT')
+            with testtools.ExpectedException(ValueError):
+                ovs_neutron_agent.create_agent_config_map(cfg.CONF)
+
     def test_create_agent_config_map_fails_for_invalid_tunnel_type(self):
         self.addCleanup(cfg.CONF.reset)
         cfg.CONF.set_override('tunnel_types', ['foobar'], group='AGENT')
@@ -247,57 +255,89 @@ class TestOvsNeutronAgent(base.BaseTestCase):
                                       updated_ports)
         self.assertEqual(expected, actual)
 
+    def test_scan_ports_with_events(self):
+        registered_ports = set([1, 2])
+        events = {'added': {3: 'tap3', 4: 'tap4'}, 'removed': set([2])}
+        with contextlib.nested(
+            mock.patch.object(self.agent.int_br, 'get_vif_port_set'),
+            mock.patch.object(self.agent.int_br, 'get_port_name_list',
+                              return_value=['tap1', 'tap3'])
+        ) as (get_vif_port_set, get_port_name_list):
+            actual = self.agent.scan_ports(registered_ports, set([1]),
+                                           events)
+        # tap4 was added to another bridge
+        expected = dict(current=set([1, 3]), added=set([3]),
+                        removed=set([2]), updated=set([1]))
+        self.assertEqual(expected, actual)
+        self.assertFalse(get_vif_port_set.called)
+
+    def test_scan_ports_with_events_without_additions(self):
+        events = {'added': {}, 'removed': set()}
+        with mock.patch.object(self.agent.int_br,
+                               'get_port_name_list') as get_port_name_list:
+            actual = self.agent.scan_ports(set([1]), None, events)
+        self.assertEqual({'current': set([1])}, actual)
+        self.assertFalse(get_port_name_list.called)
+
     def test_treat_devices_added_returns_true_for_missing_device(self):
         with contextlib.nested(
-            mock.patch.object(self.agent.plugin_rpc, 'get_device_details',
+            mock.patch.object(self.agent.plugin_rpc,
+                              'get_devices_details_list',
                               side_effect=Exception()),
-            mock.patch.object(self.agent.int_br, 'get_vif_port_by_id',
-                              return_value=mock.Mock())):
-            self.assertTrue(self.agent.treat_devices_added_or_updated([{}]))
+            mock.patch.object(self.agent.int_br, 'get_vif_ports_by_ids',
+                              return_value={'xxx': mock.Mock()})):
+            self.assertTrue(
+                self.agent.treat_devices_added_or_updated(['xxx']))
 
     def _mock_treat_devices_added_updated(self, details, port, func_name):
         """Mock treat devices added or updated.
 
         :param details: the details to return for the device
-        :param port: the port that get_vif_port_by_id should return
+        :param port: the port that get_vif_ports_by_ids should return
         :param func_name: the function that should be called
         :returns: whether the named function was called
         """
         with contextlib.nested(
-            mock.patch.object(self.agent.plugin_rpc, 'get_device_details',
-                              return_value=details),
-            mock.patch.object(self.agent.int_br, 'get_vif_port_by_id',
-                              return_value=port),
-            mock.patch.object(self.agent.plugin_rpc, 'update_device_up'),
-            mock.patch.object(self.agent.plugin_rpc, 'update_device_down'),
+            mock.patch.object(self.agent.plugin_rpc,
+                              'get_devices_details_list',
+                              return_value=[details]),
+            mock.patch.object(self.agent.int_br, 'get_vif_ports_by_ids',
+                              return_value={'xxx': port}),
+            mock.patch.object(self.agent.plugin_rpc,
+                              'update_devices_status'),
             mock.patch.object(self.agent, func_name)
-        ) as (get_dev_fn, get_vif_func, upd_dev_up, upd_dev_down, func):
-            self.assertFalse(self.agent.treat_devices_added_or_updated([{}]))
+        ) as (get_dev_fn, get_vif_func, upd_dev_status, func):
+            self.assertFalse(
+                self.agent.treat_devices_added_or_updated(['xxx']))
         return func.called
 
     def test_treat_devices_added_updated_ignores_invalid_ofport(self):
         port = mock.Mock()
         port.ofport = -1
         self.assertFalse(self._mock_treat_devices_added_updated(
-            mock.MagicMock(), port, 'port_dead'))
+            {'device': 'xxx'}, port, 'port_dead'))
 
     def test_treat_devices_added_updated_marks_unknown_port_as_dead(self):
         port = mock.Mock()
         port.ofport = 1
         self.assertTrue(self._mock_treat_devices_added_updated(
-            mock.MagicMock(), port, 'port_dead'))
+            {'device': 'xxx'}, port, 'port_dead'))
 
     def test_treat_devices_added_does_not_process_missing_port(self):
         with contextlib.nested(
-            mock.patch.object(self.agent.plugin_rpc, 'get_device_details'),
-            mock.patch.object(self.agent.int_br, 'get_vif_port_by_id',
-                              return_value=None)
+            mock.patch.object(self.agent.plugin_rpc,
+                              'get_devices_details_list'),
+            mock.patch.object(self.agent.int_br, 'get_vif_ports_by_ids',
+                              return_value={})
         ) as (get_dev_fn, get_vif_func):
+            self.assertFalse(
+                self.agent.treat_devices_added_or_updated(['xxx']))
             self.assertFalse(get_dev_fn.called)
 
     def test_treat_devices_added__updated_updates_known_port(self):
         details = mock.MagicMock()
         details.__contains__.side_effect = lambda x: True
+        details.__getitem__.side_effect = lambda x: 'xxx'
         self.assertTrue(self._mock_treat_devices_added_updated(
             details, mock.Mock(), 'treat_vif_port'))
 
@@ -310,18 +350,70 @@ class TestOvsNeutronAgent(base.BaseTestCase):
                              'segmentation_id': 'bar',
                              'network_type': 'baz'}
         with contextlib.nested(
-            mock.patch.object(self.agent.plugin_rpc, 'get_device_details',
-                              return_value=fake_details_dict),
-            mock.patch.object(self.agent.int_br, 'get_vif_port_by_id',
-                              return_value=mock.MagicMock()),
-            mock.patch.object(self.agent.plugin_rpc, 'update_device_up'),
-            mock.patch.object(self.agent.plugin_rpc, 'update_device_down'),
+            mock.patch.object(self.agent.plugin_rpc,
+                              'get_devices_details_list',
+                              return_value=[fake_details_dict]),
+            mock.patch.object(self.agent.int_br, 'get_vif_ports_by_ids',
+                              return_value={'xxx': mock.MagicMock()}),
+            mock.patch.object(self.agent.plugin_rpc,
+                              'update_devices_status'),
             mock.patch.object(self.agent, 'treat_vif_port')
-        ) as (get_dev_fn, get_vif_func, upd_dev_up,
-              upd_dev_down, treat_vif_port):
-            self.assertFalse(self.agent.treat_devices_added_or_updated([{}]))
+        ) as (get_dev_fn, get_vif_func, upd_dev_status, treat_vif_port):
+            self.assertFalse(
+                self.agent.treat_devices_added_or_updated(['xxx']))
             self.assertTrue(treat_vif_port.called)
-            self.assertTrue(upd_dev_down.called)
+            upd_dev_status.assert_called_once_with(
+                self.agent.context, [], ['xxx'], self.agent.agent_id,
+                cfg.CONF.host)
+
+    def test_treat_devices_added_updated_applies_flows_first(self):
+        fake_details_dict = {'admin_state_up': True,
+                             'port_id': 'xxx',
+                             'device': 'xxx',
+                             'network_id': 'yyy',
+                             'physical_network': 'foo',
+                             'segmentation_id': 'bar',
+                             'network_type': 'baz'}
+        parent = mock.Mock()
+        with contextlib.nested(
+            mock.patch.object(self.agent.plugin_rpc,
+                              'get_devices_details_list',
+                              return_value=[fake_details_dict]),
+            mock.patch.object(self.agent.int_br, 'get_vif_ports_by_ids',
+                              return_value={'xxx': mock.MagicMock()}),
+            mock.patch.object(self.agent.plugin_rpc,
+                              'update_devices_status'),
+            mock.patch.object(self.agent, 'treat_vif_port'),
+            mock.patch.object(self.agent.int_br, 'apply_deferred_flows')
+        ) as (get_dev_fn, get_vif_func, upd_dev_status, treat_vif_port,
+              apply_flows):
+            parent.attach_mock(treat_vif_port, 'treat_vif_port')
+            parent.attach_mock(apply_flows, 'apply_deferred_flows')
+            parent.attach_mock(upd_dev_status, 'update_devices_status')
+            self.assertFalse(
+                self.agent.treat_devices_added_or_updated(['xxx']))
+            self.assertEqual(['treat_vif_port', 'apply_deferred_flows',
+                              'update_devices_status'],
+                             [call[0] for call in parent.mock_calls])
+
+    def test_treat_devices_added_updated_processes_chunks(self):
+        cfg.CONF.set_override('rpc_devices_chunk_size', 2, group='AGENT')
+        self.agent.rpc_devices_chunk_size = 2
+        devices = ['dev1', 'dev2', 'dev3']
+        with contextlib.nested(
+            mock.patch.object(self.agent.plugin_rpc,
+                              'get_devices_details_list',
+                              side_effect=lambda ctx, devs, agent_id: [
+                                  {'device': dev} for dev in devs]),
+            mock.patch.object(self.agent.int_br, 'get_vif_ports_by_ids',
+                              side_effect=lambda devs: dict(
+                                  (dev, mock.Mock()) for dev in devs)),
+            mock.patch.object(self.agent, 'port_dead')
+        ) as (get_dev_fn, get_vif_func, port_dead):
+            self.assertFalse(
+                self.agent.treat_devices_added_or_updated(devices))
+            self.assertEqual(get_dev_fn.call_count, 2)
+            self.assertEqual(port_dead.call_count, 3)
 
     def test_treat_devices_removed_returns_true_for_missing_device(self):
         with mock.patch.object(self.agent.plugin_rpc, 'update_device_down',
@@ -612,6 +704,46 @@ class TestOvsNeutronAgent(base.BaseTestCase):
                                            actions='strip_vlan,'
                                            'set_tunnel:seg2,output:1')
 
+    def test_fdb_add_flows_batched(self):
+        self._prepare_l2_pop_ofports()
+        fdb_entry = {'net1':
+                     {'network_type': 'gre',
+                      'segment_id': 'tun1',
+                      'ports': {'ip_agent_2': [['mac1', 'ip1']]}},
+                     'net2':
+                     {'network_type': 'gre',
+                      'segment_id': 'tun2',
+                      'ports': {'ip_agent_2': [['mac2', 'ip2']]}}}
+        self.agent.fdb_add(None, fdb_entry)
+        self.assertEqual(self.agent.tun_br.mock_calls[0],
+                         mock.call.defer_apply_on())
+        self.assertEqual(self.agent.tun_br.mock_calls[-1],
+                         mock.call.defer_apply_off())
+        self.assertEqual(self.agent.tun_br.defer_apply_on.call_count, 1)
+        self.assertEqual(self.agent.tun_br.add_flow.call_count, 2)
+
+    def test_deferred_flows(self):
+        self.agent.enable_tunneling = True
+        self.agent.int_br = mock.Mock()
+        self.agent.phys_brs = {'physnet1': mock.Mock()}
+        bridges = [self.agent.int_br, self.agent.phys_brs['physnet1'],
+                   self.agent.tun_br]
+        with self.agent.deferred_flows():
+            for br in bridges:
+                br.defer_apply_on.assert_called_once_with()
+                self.assertFalse(br.defer_apply_off.called)
+        for br in bridges:
+            br.defer_apply_off.assert_called_once_with()
+
+    def test_deferred_flows_applied_on_error(self):
+        self.agent.tun_br = mock.Mock()
+        try:
+            with self.agent.deferred_flows(self.agent.tun_br):
+                raise ValueError()
+        except ValueError:
+            pass
+        self.agent.tun_br.defer_apply_off.assert_called_once_with()
+
     def test_fdb_add_port(self):
         self._prepare_l2_pop_ofports()
         fdb_entry = {'net1':
@@ -468,10 +468,12 @@ class TunnelTest(base.BaseTestCase):
         tunnel_port = '9999'
         self.mock_tun_bridge.add_tunnel_port.return_value = tunnel_port
         self.mock_tun_bridge_expected += [
+            mock.call.defer_apply_on(),
             mock.call.add_tunnel_port('gre-1', '10.0.10.1', '10.0.0.1',
                                       'gre', 4789),
             mock.call.add_flow(priority=1, in_port=tunnel_port,
-                               actions='resubmit(,2)')
+                               actions='resubmit(,2)'),
+            mock.call.defer_apply_off()
         ]
 
         a = ovs_neutron_agent.OVSNeutronAgent(self.INT_BRIDGE,
@@ -535,8 +537,8 @@ class TunnelTest(base.BaseTestCase):
         log_exception.assert_called_once_with(
             "Error while processing VIF ports")
         scan_ports.assert_has_calls([
-            mock.call(set(), set()),
-            mock.call(set(['tap0']), set())
+            mock.call(set(), set(), None),
+            mock.call(set(['tap0']), set(), None)
         ])
         process_network_ports.assert_has_calls([
             mock.call({'current': set(['tap0']),
@@ -546,6 +548,14 @@ class TunnelTest(base.BaseTestCase):
                        'removed': set(['tap0']),
                        'added': set([])})
         ])
+        # the flows of each iteration are batched, the second one raises
+        # before they are applied
+        for expected in (self.mock_int_bridge_expected,
+                         self.mock_map_tun_bridge_expected,
+                         self.mock_tun_bridge_expected):
+            expected += [mock.call.defer_apply_on(),
+                         mock.call.defer_apply_off(),
+                         mock.call.defer_apply_on()]
         self._verify_mock_calls()
 
 
@@ -194,4 +194,24 @@ class TestVPNAgent(base.BaseTestCase):
         device = mock.Mock()
         self.agent.devices = [device]
         self.agent._process_routers(routers, False)
+        self.assertFalse(device.sync.called)
+        self.agent._process_router_update()
         device.sync.assert_called_once_with(mock.ANY, routers)
+
+    def test_process_routers_syncs_devices_once(self):
+        self.plugin_api.get_external_network_id.return_value = None
+        routers = [
+            {'id': _uuid(),
+             'admin_state_up': True,
+             'routes': [],
+             'external_gateway_info': {}} for i in range(2)]
+
+        device = mock.Mock()
+        self.agent.devices = [device]
+        self.agent._process_routers(routers, False)
+        self.agent._process_router_update()
+        self.assertFalse(device.sync.called)
+        self.agent._process_router_update()
+        device.sync.assert_called_once_with(mock.ANY, mock.ANY)
+        self.assertEqual(sorted(r['id'] for r in routers),
+                         sorted(r['id'] for r in device.sync.call_args[0][1]))
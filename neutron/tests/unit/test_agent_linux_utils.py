@@ -14,8 +14,10 @@
 
 import fixtures
 import mock
+from oslo.config import cfg
 import testtools
 
+from neutron.agent.common import config
 from neutron.agent.linux import utils
 from neutron.tests import base
 
@@ -77,6 +79,57 @@ class AgentUtilsExecuteTest(base.BaseTestCase):
         self.assertEqual(result, expected)
 
 
+class AgentUtilsExecuteRootwrapDaemonTest(base.BaseTestCase):
+    def setUp(self):
+        super(AgentUtilsExecuteRootwrapDaemonTest, self).setUp()
+        config.register_root_helper(cfg.CONF)
+        cfg.CONF.set_override('root_helper_daemon',
+                              'sudo neutron-rootwrap-daemon /etc/rw.conf',
+                              'AGENT')
+        self.client = mock.Mock()
+        self.client.execute.return_value = (0, 'out', 'err')
+        mock.patch.object(utils, '_rootwrap_daemon_client',
+                          self.client).start()
+        self.create_process = mock.patch.object(utils,
+                                                'create_process').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_root_command_runs_in_daemon(self):
+        result = utils.execute(['ip', 'link'], 'sudo', process_input='in')
+        self.assertEqual('out', result)
+        self.client.execute.assert_called_once_with(
+            ['ip', 'link'], env=mock.ANY, stdin='in')
+        self.assertFalse(self.create_process.called)
+
+    def test_daemon_command_env(self):
+        with mock.patch.dict('os.environ', {'PATH': '/sbin:/bin',
+                                            'LANG': 'C'}, clear=True):
+            utils.execute(['ip', 'link'], 'sudo', addl_env={'foo': 'bar'})
+        self.client.execute.assert_called_once_with(
+            ['ip', 'link'], env={'PATH': '/sbin:/bin', 'LANG': 'C',
+                                 'foo': 'bar'},
+            stdin=None)
+
+    def test_daemon_command_failure(self):
+        self.client.execute.return_value = (1, '', 'err')
+        self.assertRaises(RuntimeError, utils.execute, ['ip', 'link'],
+                          'sudo')
+        self.assertEqual('', utils.execute(['ip', 'link'], 'sudo',
+                                           check_exit_code=False))
+
+    def test_command_without_root_helper_not_in_daemon(self):
+        self.create_process.return_value = (mock.Mock(returncode=0),
+                                            ['ls'])
+        self.create_process.return_value[0].communicate.return_value = (
+            'out', '')
+        self.assertEqual('out', utils.execute(['ls']))
+        self.assertFalse(self.client.execute.called)
+
+    def test_no_daemon_configured(self):
+        cfg.CONF.set_override('root_helper_daemon', None, 'AGENT')
+        self.assertIsNone(utils.get_rootwrap_daemon_client())
+
+
 class AgentUtilsGetInterfaceMAC(base.BaseTestCase):
     def test_get_interface_mac(self):
         expect_val = '01:02:03:04:05:06'
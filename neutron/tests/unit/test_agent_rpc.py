@@ -15,10 +15,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
+
 import mock
 
 from neutron.agent import rpc
 from neutron.openstack.common import context
+from neutron.openstack.common.rpc import common as rpc_common
 from neutron.tests import base
 
 
@@ -45,6 +48,67 @@ class AgentRPCPluginApi(base.BaseTestCase):
     def test_tunnel_sync(self):
         self._test_rpc_call('tunnel_sync')
 
+    def test_get_devices_details_list(self):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        with mock.patch.object(agent, 'call',
+                               return_value=['foo']) as rpc_call:
+            self.assertEqual(['foo'], agent.get_devices_details_list(
+                ctxt, ['fake_device'], 'fake_agent_id'))
+            self.assertEqual(1, rpc_call.call_count)
+            self.assertEqual('1.2', rpc_call.call_args[1]['version'])
+
+    def test_get_devices_details_list_falls_back_on_old_server(self):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        with contextlib.nested(
+            mock.patch.object(agent, 'call',
+                              side_effect=rpc_common.RemoteError(
+                                  'UnsupportedRpcVersion')),
+            mock.patch.object(agent, 'get_device_details',
+                              side_effect=lambda ctxt, dev, agent_id:
+                              {'device': dev})
+        ) as (rpc_call, get_device_details):
+            self.assertEqual(
+                [{'device': 'dev1'}, {'device': 'dev2'}],
+                agent.get_devices_details_list(ctxt, ['dev1', 'dev2'],
+                                               'fake_agent_id'))
+            self.assertEqual(2, get_device_details.call_count)
+
+    def test_update_devices_status_falls_back_on_old_server(self):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        with contextlib.nested(
+            mock.patch.object(agent, 'call',
+                              side_effect=rpc_common.RemoteError(
+                                  'UnsupportedRpcVersion')),
+            mock.patch.object(agent, 'update_device_up'),
+            mock.patch.object(agent, 'update_device_down',
+                              return_value={'exists': True})
+        ) as (rpc_call, update_up, update_down):
+            result = agent.update_devices_status(
+                ctxt, ['dev1'], ['dev2'], 'fake_agent_id', 'fake_host')
+            update_up.assert_called_once_with(
+                ctxt, 'dev1', 'fake_agent_id', 'fake_host')
+            update_down.assert_called_once_with(
+                ctxt, 'dev2', 'fake_agent_id', 'fake_host')
+            self.assertEqual({'devices_up': ['dev1'],
+                              'devices_down': [{'exists': True}]}, result)
+
+    def test_update_devices_status_raises_remote_errors(self):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        with contextlib.nested(
+            mock.patch.object(agent, 'call',
+                              side_effect=rpc_common.RemoteError(
+                                  'DBError')),
+            mock.patch.object(agent, 'update_device_up')
+        ) as (rpc_call, update_up):
+            self.assertRaises(rpc_common.RemoteError,
+                              agent.update_devices_status, ctxt, ['dev1'],
+                              [], 'fake_agent_id', 'fake_host')
+            self.assertFalse(update_up.called)
+
 
 class AgentPluginReportState(base.BaseTestCase):
     def test_plugin_report_state_use_call(self):
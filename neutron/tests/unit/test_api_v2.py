@@ -1499,6 +1499,86 @@ class FiltersTestCase(base.BaseTestCase):
         self.assertEqual(actual_val, expect_val)
 
 
+class PrepareRequestBodyTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(PrepareRequestBodyTestCase, self).setUp()
+        self.attr_info = {
+            'id': {'allow_post': False, 'allow_put': False},
+            'name': {'allow_post': True, 'allow_put': True,
+                     'default': '', 'validate': {'type:regex': '^[a-z]*$'}},
+            'enabled': {'allow_post': True, 'allow_put': True,
+                        'default': 'true',
+                        'convert_to': attributes.convert_to_boolean},
+            'tags': {'allow_post': True, 'allow_put': True, 'default': [],
+                     'validate': {'type:values': [[]]}},
+            'members': {'allow_post': True, 'allow_put': True,
+                        'default': None,
+                        'convert_to': attributes.convert_to_list},
+            'network_id': {'allow_post': True, 'allow_put': False,
+                           'validate': {'type:uuid': None}},
+            'tenant_id': {'allow_post': True, 'allow_put': False}}
+        self.context = context.Context('', 'tenant', is_admin=False)
+
+    def _prepare(self, body, is_create=True, plan=None):
+        return v2_base.Controller.prepare_request_body(
+            self.context, body, is_create, 'thing', self.attr_info,
+            allow_bulk=True, plan=plan)
+
+    def test_defaults(self):
+        network_id = uuidutils.generate_uuid()
+        body = self._prepare({'thing': {'network_id': network_id}})
+        self.assertEqual({'thing': {'network_id': network_id, 'name': '',
+                                    'enabled': True, 'tags': [],
+                                    'members': [],
+                                    'tenant_id': 'tenant'}}, body)
+
+    def test_bulk_with_plan(self):
+        plan = v2_base._RequestBodyPlan(self.attr_info, True)
+        network_id = uuidutils.generate_uuid()
+        body = self._prepare(
+            {'things': [{'network_id': network_id, 'enabled': 'false'},
+                        {'network_id': network_id, 'name': 'abc'}]},
+            plan=plan)
+        first, second = body['things']
+        self.assertFalse(first['thing']['enabled'])
+        self.assertTrue(second['thing']['enabled'])
+        self.assertEqual('abc', second['thing']['name'])
+
+    def test_converted_default_not_shared(self):
+        plan = v2_base._RequestBodyPlan(self.attr_info, True)
+        network_id = uuidutils.generate_uuid()
+        body = self._prepare(
+            {'things': [{'network_id': network_id},
+                        {'network_id': network_id}]},
+            plan=plan)
+        first, second = body['things']
+        self.assertEqual([], first['thing']['members'])
+        self.assertEqual([], second['thing']['members'])
+        first['thing']['members'].append('member')
+        self.assertEqual([], second['thing']['members'])
+        body = self._prepare({'thing': {'network_id': network_id}},
+                             plan=plan)
+        self.assertEqual([], body['thing']['members'])
+
+    def test_invalid_values(self):
+        network_id = uuidutils.generate_uuid()
+        for res_dict in ({'network_id': network_id, 'name': 'ABC'},
+                         {'network_id': 'garbage'},
+                         {'network_id': network_id, 'enabled': 'maybe'},
+                         {'name': 'abc'},
+                         {'network_id': network_id, 'id': network_id},
+                         {'network_id': network_id, 'foo': 'bar'}):
+            self.assertRaises((exc.HTTPBadRequest, q_exc.InvalidInput),
+                              self._prepare, {'thing': res_dict})
+
+    def test_update(self):
+        body = self._prepare({'thing': {'enabled': 0}}, is_create=False)
+        self.assertEqual({'thing': {'enabled': False}}, body)
+        self.assertRaises(exc.HTTPBadRequest, self._prepare,
+                          {'thing': {'network_id': 'x'}}, is_create=False)
+
+
 class CreateResourceTestCase(base.BaseTestCase):
     def test_resource_creation(self):
         resource = v2_base.create_resource('fakes', 'fake', None, {})
@@ -15,6 +15,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import copy
+import re
+
 import testtools
 
 from neutron.api.v2 import attributes
@@ -661,6 +664,45 @@ class TestAttributes(base.BaseTestCase):
             self.assertIsNone(msg)
 
 
+class TestCompileValidator(base.BaseTestCase):
+
+    def test_regex(self):
+        validate = attributes.compile_validator('type:regex', '[hc]at')
+        for data in (None, 'bat', 'hat', 'cat'):
+            self.assertEqual(attributes._validate_regex(data, '[hc]at'),
+                             validate(data))
+
+    def test_invalid_regex(self):
+        validate = attributes.compile_validator('type:regex', '[')
+        self.assertRaises(re.error, validate, 'data')
+
+    def test_dict(self):
+        constraints = {'key1': {'type:values': ['val1', 'val2'],
+                                'required': True},
+                       'key2': {'type:regex': '^[a-z]+$'},
+                       'key3': {'convert_to': attributes.convert_to_int,
+                                'type:non_negative': None},
+                       'key4': {'type:unknown': None}}
+        for rule in ('type:dict', 'type:dict_or_none', 'type:dict_or_empty',
+                     'type:dict_or_nodata'):
+            validate = attributes.compile_validator(rule, constraints)
+            for data in ({'key1': 'val1'}, {'key2': 'abc'},
+                         {'key1': 'val3'}, {'key1': 'val2', 'key2': 'A'},
+                         {'key1': 'val1', 'key3': '-2'},
+                         {'key1': 'val1', 'key4': 'x'},
+                         None, {}, 'string'):
+                expected = attributes.validators[rule](
+                    copy.deepcopy(data), constraints)
+                self.assertEqual(expected, validate(data))
+            data = {'key1': 'val1', 'key3': '2'}
+            self.assertIsNone(validate(data))
+            self.assertEqual(2, data['key3'])
+
+    def test_unknown_rule(self):
+        validate = attributes.compile_validator('type:unknown', None)
+        self.assertRaises(KeyError, validate, 'data')
+
+
 class TestConvertToBoolean(base.BaseTestCase):
 
     def test_convert_to_boolean_bool(self):
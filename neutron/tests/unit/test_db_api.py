@@ -0,0 +1,100 @@
+# Copyright 2014 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from oslo.config import cfg
+
+from neutron import context
+from neutron.db import api as db_api
+from neutron.db import models_v2
+from neutron.tests import base
+
+
+SESSION = 'neutron.openstack.common.db.sqlalchemy.session.get_session'
+
+
+class TestSlaveSession(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestSlaveSession, self).setUp()
+        db_api.configure_db()
+        self.addCleanup(db_api.clear_db)
+        self.addCleanup(cfg.CONF.reset)
+        self.lag = mock.patch.object(db_api, '_get_slave_lag',
+                                     return_value=0).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def _slave_session_used(self):
+        with mock.patch(SESSION) as get_session:
+            db_api.get_session(slave=True)
+        return get_session.call_args[1]['slave_session']
+
+    def test_master_session_without_slave_connection(self):
+        self.assertFalse(self._slave_session_used())
+        self.assertFalse(self.lag.called)
+
+    def test_slave_session(self):
+        cfg.CONF.set_override('slave_connection', 'sqlite://', 'database')
+        self.assertTrue(self._slave_session_used())
+
+    def test_master_session_when_slave_lags(self):
+        cfg.CONF.set_override('slave_connection', 'sqlite://', 'database')
+        self.lag.return_value = 2
+        self.assertFalse(self._slave_session_used())
+
+    def test_master_session_when_lag_unknown(self):
+        cfg.CONF.set_override('slave_connection', 'sqlite://', 'database')
+        self.lag.side_effect = Exception()
+        self.assertFalse(self._slave_session_used())
+
+    def test_lag_checked_once_per_interval(self):
+        cfg.CONF.set_override('slave_connection', 'sqlite://', 'database')
+        with mock.patch.object(db_api.time, 'time', return_value=100):
+            self.assertTrue(self._slave_session_used())
+            self.lag.return_value = 2
+            self.assertTrue(self._slave_session_used())
+        with mock.patch.object(db_api.time, 'time',
+                               return_value=100 +
+                               db_api.SLAVE_LAG_CHECK_INTERVAL):
+            self.assertFalse(self._slave_session_used())
+        self.assertEqual(self.lag.call_count, 2)
+
+    def test_lag_checks_back_off_on_errors(self):
+        cfg.CONF.set_override('slave_connection', 'sqlite://', 'database')
+        self.lag.side_effect = Exception()
+        with mock.patch.object(db_api.LOG, 'exception') as log_exception:
+            for now in (100, 101, 102, 103, 104, 105, 106, 107, 108):
+                with mock.patch.object(db_api.time, 'time',
+                                       return_value=now):
+                    self.assertFalse(self._slave_session_used())
+            # checked at 100, 102 and 106
+            self.assertEqual(3, self.lag.call_count)
+            self.assertEqual(1, log_exception.call_count)
+            self.lag.side_effect = None
+            with mock.patch.object(db_api.time, 'time', return_value=115):
+                self.assertTrue(self._slave_session_used())
+        self.assertEqual(0, db_api._SLAVE_STATE['failures'])
+
+    def test_context_reads_own_writes(self):
+        ctx = context.get_admin_context()
+        ctx.allow_slave_reads()
+        with ctx.session.begin(subtransactions=True):
+            ctx.session.add(models_v2.Network(id='net', name='net',
+                                              tenant_id='tenant',
+                                              admin_state_up=True,
+                                              status='ACTIVE',
+                                              shared=False))
+        self.assertFalse(ctx.slave_reads)
+        self.assertIs(ctx.reader_session, ctx.session)
@@ -51,6 +51,47 @@ class TestDhcpRpcCallackMixin(base.BaseTestCase):
 
         self.assertEqual(len(self.log.mock_calls), 1)
 
+    def test_get_active_networks_info_for_networks(self):
+        self.plugin.get_networks.return_value = [dict(id='b')]
+        self.plugin.get_ports.return_value = [dict(id='p', network_id='b')]
+        self.plugin.get_subnets.return_value = []
+
+        networks = self.callbacks.get_active_networks_info(
+            mock.Mock(), host='host', network_ids=['b', 'c'])
+
+        self.assertEqual([dict(id='b', subnets=[],
+                               ports=[dict(id='p', network_id='b')])],
+                         networks)
+        self.plugin.get_networks.assert_called_once_with(
+            mock.ANY, filters=dict(admin_state_up=[True], id=['b', 'c']))
+        self.assertEqual(
+            ['b'], self.plugin.get_ports.call_args[1]['filters']['network_id'])
+
+    def test_get_active_networks_info_page(self):
+        self.plugin.get_networks.return_value = [
+            dict(id=net_id) for net_id in 'dcba']
+        self.plugin.get_ports.return_value = []
+        self.plugin.get_subnets.return_value = []
+
+        networks = self.callbacks.get_active_networks_info(
+            mock.Mock(), host='host', limit=2, marker='a')
+
+        self.assertEqual(['b', 'c'], [network['id'] for network in networks])
+
+    def test_get_active_networks_info_page_from_agent(self):
+        self.plugin.supported_extension_aliases = ['dhcp_agent_scheduler']
+        self.plugin.list_active_networks_on_active_dhcp_agent.return_value = (
+            [])
+        context = mock.Mock()
+
+        self.callbacks.get_active_networks_info(
+            context, host='host', limit=2, marker='a')
+
+        self.plugin.list_active_networks_on_active_dhcp_agent.\
+            assert_called_once_with(context, 'host', network_ids=None,
+                                    limit=2, marker='a')
+        self.assertFalse(self.plugin.auto_schedule_networks.called)
+
     def _test__port_action_with_failures(self, exc=None, action=None):
         port = {
             'network_id': 'foo_network_id',
@@ -15,6 +15,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
 import copy
 import os
 import sys
@@ -242,40 +243,54 @@ class TestDhcpAgent(base.BaseTestCase):
             trace_level='warning',
             expected_sync=False)
 
+    def _network(self, network_id):
+        return dhcp.NetModel(True, dict(id=network_id, admin_state_up=True,
+                                        subnets=[], ports=[]))
+
     def _test_sync_state_helper(self, known_networks, active_networks):
         with mock.patch(DHCP_PLUGIN) as plug:
             mock_plugin = mock.Mock()
-            mock_plugin.get_active_networks_info.return_value = active_networks
+            mock_plugin.get_active_networks_info.return_value = (
+                active_networks)
             plug.return_value = mock_plugin
 
             dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
 
             attrs_to_mock = dict(
                 [(a, mock.DEFAULT) for a in
-                 ['refresh_dhcp_helper', 'disable_dhcp_helper', 'cache']])
+                 ['safe_configure_dhcp_for_network', 'disable_dhcp_helper',
+                  'cache']])
 
-            with mock.patch.multiple(dhcp, **attrs_to_mock) as mocks:
+            with contextlib.nested(
+                mock.patch.multiple(dhcp, **attrs_to_mock),
+                mock.patch.object(dhcp_agent.eventlet.GreenPool, 'spawn')
+            ) as (mocks, spawn):
                 mocks['cache'].get_network_ids.return_value = known_networks
+                mocks['cache'].is_network_unchanged.return_value = False
                 dhcp.sync_state()
 
-                exp_refresh = [
-                    mock.call(net_id) for net_id in active_networks]
+                exp_configure = [
+                    mock.call(mocks['safe_configure_dhcp_for_network'], net)
+                    for net in active_networks]
 
-                diff = set(known_networks) - set(active_networks)
+                diff = (set(known_networks) -
+                        set(net.id for net in active_networks))
                 exp_disable = [mock.call(net_id) for net_id in diff]
 
                 mocks['cache'].assert_has_calls([mock.call.get_network_ids()])
-                mocks['refresh_dhcp_helper'].assert_has_called(exp_refresh)
-                mocks['disable_dhcp_helper'].assert_has_called(exp_disable)
+                spawn.assert_has_calls(exp_configure, any_order=True)
+                mocks['disable_dhcp_helper'].assert_has_calls(
+                    exp_disable, any_order=True)
+                self.assertFalse(dhcp.needs_resync)
 
     def test_sync_state_initial(self):
-        self._test_sync_state_helper([], ['a'])
+        self._test_sync_state_helper([], [self._network('a')])
 
     def test_sync_state_same(self):
-        self._test_sync_state_helper(['a'], ['a'])
+        self._test_sync_state_helper(['a'], [self._network('a')])
 
     def test_sync_state_disabled_net(self):
-        self._test_sync_state_helper(['b'], ['a'])
+        self._test_sync_state_helper(['b'], [self._network('a')])
 
     def test_sync_state_waitall(self):
         class mockNetwork():
@@ -304,7 +319,121 @@ class TestDhcpAgent(base.BaseTestCase):
                 dhcp.sync_state()
 
                 self.assertTrue(log.called)
-                self.assertTrue(dhcp.needs_resync)
+                self.assertTrue(dhcp.needs_full_resync)
+
+    def _test_sync_state_pages(self, get_page, expected_calls,
+                               expected_ids):
+        cfg.CONF.set_override('sync_batch_size', 2)
+        with mock.patch(DHCP_PLUGIN) as plug:
+            mock_plugin = mock.Mock()
+            mock_plugin.get_active_networks_info.side_effect = get_page
+            plug.return_value = mock_plugin
+            dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+            with mock.patch.object(
+                dhcp, 'safe_configure_dhcp_for_network') as configure:
+                dhcp.sync_state()
+                configured = sorted(call[0][0].id
+                                    for call in configure.call_args_list)
+        self.assertEqual(expected_ids, configured)
+        self.assertEqual(expected_calls,
+                         mock_plugin.get_active_networks_info.call_args_list)
+
+    def test_sync_state_pages(self):
+        networks = [self._network(net_id) for net_id in ('a', 'b', 'c')]
+
+        def get_page(limit, marker):
+            return [net for net in networks
+                    if marker is None or net.id > marker][:limit]
+
+        self._test_sync_state_pages(
+            get_page, [mock.call(limit=2, marker=None),
+                       mock.call(limit=2, marker='b')], ['a', 'b', 'c'])
+
+    def test_sync_state_pages_unsupported_by_server(self):
+        networks = [self._network(net_id) for net_id in ('b', 'a', 'c')]
+
+        def get_page(limit=None, marker=None):
+            if limit:
+                raise common.RemoteError('UnsupportedRpcVersion')
+            return networks
+
+        self._test_sync_state_pages(
+            get_page, [mock.call(limit=2, marker=None), mock.call()],
+            ['a', 'b', 'c'])
+
+    def test_sync_state_batches_unsupported_by_server(self):
+        cfg.CONF.set_override('sync_batch_size', 2)
+        networks = [self._network(net_id) for net_id in ('a', 'b', 'c')]
+        with mock.patch(DHCP_PLUGIN) as plug:
+            mock_plugin = mock.Mock()
+            mock_plugin.get_active_networks_info.side_effect = [
+                common.UnsupportedRpcVersion(version='1.2'), networks]
+            plug.return_value = mock_plugin
+            dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+            with mock.patch.object(
+                dhcp, 'safe_configure_dhcp_for_network') as configure:
+                dhcp.sync_state(set(['b']))
+                configure.assert_called_once_with(networks[1])
+        self.assertEqual(2, mock_plugin.get_active_networks_info.call_count)
+
+    def test_sync_state_batches(self):
+        cfg.CONF.set_override('sync_batch_size', 2)
+        with mock.patch(DHCP_PLUGIN) as plug:
+            mock_plugin = mock.Mock()
+            mock_plugin.get_active_networks_info.return_value = []
+            plug.return_value = mock_plugin
+            dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+            dhcp.sync_state(set(['c', 'a', 'b']))
+        mock_plugin.get_active_networks_info.assert_has_calls(
+            [mock.call(['a', 'b']), mock.call(['c'])])
+
+    def test_sync_state_skips_unchanged_networks(self):
+        network = dhcp.NetModel(True, dict(id='a', admin_state_up=True,
+                                           subnets=[], ports=[]))
+        with mock.patch(DHCP_PLUGIN) as plug:
+            mock_plugin = mock.Mock()
+            mock_plugin.get_active_networks_info.return_value = [network]
+            plug.return_value = mock_plugin
+            dhcp_obj = dhcp_agent.DhcpAgent(HOSTNAME)
+            dhcp_obj.cache.put(network)
+            with mock.patch.object(
+                dhcp_obj, 'safe_configure_dhcp_for_network') as configure:
+                dhcp_obj.sync_state()
+                self.assertFalse(configure.called)
+                # A failed network is reconfigured even if unchanged
+                dhcp_obj.schedule_resync('a')
+                dhcp_obj.sync_state()
+                configure.assert_called_once_with(network)
+
+    def test_sync_state_networks(self):
+        network = self._network('a')
+        with mock.patch(DHCP_PLUGIN) as plug:
+            mock_plugin = mock.Mock()
+            mock_plugin.get_active_networks_info.return_value = [network]
+            plug.return_value = mock_plugin
+            dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+            attrs_to_mock = dict(
+                [(a, mock.DEFAULT) for a in
+                 ['safe_configure_dhcp_for_network', 'disable_dhcp_helper',
+                  'cache']])
+            with mock.patch.multiple(dhcp, **attrs_to_mock) as mocks:
+                mocks['cache'].get_network_ids.return_value = ['a', 'b', 'c']
+                mocks['cache'].is_network_unchanged.return_value = True
+                dhcp.sync_state(set(['a', 'b']))
+                mocks['safe_configure_dhcp_for_network'].\
+                    assert_called_once_with(network)
+                mocks['disable_dhcp_helper'].assert_called_once_with('b')
+
+    def test_sync_state_networks_plugin_error(self):
+        with mock.patch(DHCP_PLUGIN) as plug:
+            mock_plugin = mock.Mock()
+            mock_plugin.get_active_networks_info.side_effect = Exception
+            plug.return_value = mock_plugin
+            with mock.patch.object(dhcp_agent.LOG, 'exception'):
+                dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+                dhcp.sync_state(set(['a']))
+        self.assertFalse(dhcp.needs_full_resync)
+        self.assertEqual(set(['a']), dhcp.needs_resync_networks)
 
     def test_periodic_resync(self):
         dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
@@ -315,7 +444,8 @@ class TestDhcpAgent(base.BaseTestCase):
     def test_periodoc_resync_helper(self):
         with mock.patch.object(dhcp_agent.eventlet, 'sleep') as sleep:
             dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
-            dhcp.needs_resync = True
+            dhcp.schedule_resync('a')
+            dhcp.schedule_resync()
             with mock.patch.object(dhcp, 'sync_state') as sync_state:
                 sync_state.side_effect = RuntimeError
                 with testtools.ExpectedException(RuntimeError):
@@ -324,6 +454,17 @@ class TestDhcpAgent(base.BaseTestCase):
                 sleep.assert_called_once_with(dhcp.conf.resync_interval)
                 self.assertFalse(dhcp.needs_resync)
 
+    def test_periodic_resync_helper_networks(self):
+        with mock.patch.object(dhcp_agent.eventlet, 'sleep'):
+            dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+            dhcp.schedule_resync('a')
+            with mock.patch.object(dhcp, 'sync_state') as sync_state:
+                sync_state.side_effect = RuntimeError
+                with testtools.ExpectedException(RuntimeError):
+                    dhcp._periodic_resync_helper()
+                sync_state.assert_called_once_with(set(['a']))
+                self.assertFalse(dhcp.needs_resync)
+
     def test_populate_cache_on_start_without_active_networks_support(self):
         # emul dhcp driver that doesn't support retrieving of active networks
         self.driver.existing_dhcp_networks.side_effect = NotImplementedError
@@ -796,6 +937,15 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
         self.cache.assert_has_calls(
             [mock.call.get_network_by_id(fake_port2.network_id),
              mock.call.put_port(mock.ANY)])
+        self.call_driver.assert_called_once_with('reload_allocations',
+                                                 fake_network,
+                                                 port_ids=[fake_port2.id])
+
+    def test_port_update_end_driver_without_port_ids(self):
+        payload = dict(port=vars(fake_port2))
+        self.cache.get_network_by_id.return_value = fake_network
+        self.dhcp.dhcp_driver_cls = mock.Mock(spec=['check_version'])
+        self.dhcp.port_update_end(None, payload)
         self.call_driver.assert_called_once_with('reload_allocations',
                                                  fake_network)
 
@@ -810,7 +960,8 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
             [mock.call.get_network_by_id(fake_port1.network_id),
              mock.call.put_port(mock.ANY)])
         self.call_driver.assert_has_calls(
-            [mock.call.call_driver('reload_allocations', fake_network)])
+            [mock.call.call_driver('reload_allocations', fake_network,
+                                   port_ids=[fake_port1.id])])
 
     def test_port_delete_end(self):
         payload = dict(port_id=fake_port2.id)
@@ -823,7 +974,8 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
              mock.call.get_network_by_id(fake_network.id),
              mock.call.remove_port(fake_port2)])
         self.call_driver.assert_has_calls(
-            [mock.call.call_driver('reload_allocations', fake_network)])
+            [mock.call.call_driver('reload_allocations', fake_network,
+                                   port_ids=[fake_port2.id])])
 
     def test_port_delete_end_unknown_port(self):
         payload = dict(port_id='unknown')
@@ -834,6 +986,34 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
         self.cache.assert_has_calls([mock.call.get_port_by_id('unknown')])
         self.assertEqual(self.call_driver.call_count, 0)
 
+    def test_port_update_end_delayed_reload(self):
+        cfg.CONF.set_override('port_reload_delay', 0.5)
+        self.cache.get_network_by_id.return_value = fake_network
+        with mock.patch.object(dhcp_agent.eventlet,
+                               'spawn_after') as spawn_after:
+            for port in (fake_port1, fake_port2, fake_port1):
+                self.cache.get_port_by_id.return_value = port
+                self.dhcp.port_update_end(None, dict(port=vars(port)))
+            spawn_after.assert_called_once_with(
+                0.5, self.dhcp._reload_pending_port_allocations,
+                fake_network.id)
+        self.assertFalse(self.call_driver.called)
+
+        self.dhcp._reload_pending_port_allocations(fake_network.id)
+        self.assertEqual(self.call_driver.call_count, 1)
+        args, kwargs = self.call_driver.call_args
+        self.assertEqual(('reload_allocations', fake_network), args)
+        self.assertEqual(set([fake_port1.id, fake_port2.id]),
+                         set(kwargs['port_ids']))
+        self.assertEqual({}, self.dhcp.pending_port_reloads)
+
+    def test_delayed_reload_of_disabled_network(self):
+        self.dhcp.pending_port_reloads[fake_network.id] = set([fake_port1.id])
+        self.cache.get_network_by_id.return_value = None
+        self.dhcp._reload_pending_port_allocations(fake_network.id)
+        self.assertFalse(self.call_driver.called)
+        self.assertEqual({}, self.dhcp.pending_port_reloads)
+
 
 class TestDhcpPluginApiProxy(base.BaseTestCase):
     def setUp(self):
@@ -878,6 +1058,20 @@ class TestDhcpPluginApiProxy(base.BaseTestCase):
         self.proxy.get_active_networks_info()
         self.make_msg.assert_called_once_with('get_active_networks_info',
                                               host='foo')
+        self.assertIsNone(self.call.call_args[1]['version'])
+
+    def test_get_active_networks_info_for_networks(self):
+        self.proxy.get_active_networks_info(['a', 'b'])
+        self.make_msg.assert_called_once_with('get_active_networks_info',
+                                              host='foo',
+                                              network_ids=['a', 'b'])
+        self.assertEqual('1.2', self.call.call_args[1]['version'])
+
+    def test_get_active_networks_info_page(self):
+        self.proxy.get_active_networks_info(limit=10, marker='a')
+        self.make_msg.assert_called_once_with('get_active_networks_info',
+                                              host='foo', limit=10,
+                                              marker='a')
 
     def test_create_dhcp_port(self):
         port_body = (
@@ -978,6 +1172,40 @@ class TestNetworkCache(base.BaseTestCase):
         self.assertEqual(len(nc.subnet_lookup), 0)
         self.assertEqual(len(nc.port_lookup), 0)
 
+    def _copy_network(self, network, ports):
+        return dhcp.NetModel(True, dict(id=network.id,
+                                        tenant_id=network.tenant_id,
+                                        admin_state_up=True,
+                                        subnets=[fake_subnet2, fake_subnet1],
+                                        ports=ports))
+
+    def test_is_network_unchanged(self):
+        nc = dhcp_agent.NetworkCache()
+        self.assertFalse(nc.is_network_unchanged(fake_network))
+        nc.put(fake_network)
+        # The order of the subnets does not matter
+        self.assertTrue(nc.is_network_unchanged(
+            self._copy_network(fake_network, [fake_port1])))
+        self.assertFalse(nc.is_network_unchanged(
+            self._copy_network(fake_network, [fake_port1, fake_port2])))
+
+    def test_is_network_unchanged_after_port_update(self):
+        nc = dhcp_agent.NetworkCache()
+        nc.put(self._copy_network(fake_network, [fake_port1]))
+        self.assertTrue(nc.is_network_unchanged(fake_network))
+        nc.put_port(fake_port2)
+        self.assertFalse(nc.is_network_unchanged(fake_network))
+        self.assertTrue(nc.is_network_unchanged(
+            self._copy_network(fake_network, [fake_port2, fake_port1])))
+
+    def test_is_network_unchanged_when_outdated(self):
+        nc = dhcp_agent.NetworkCache()
+        nc.put(fake_network)
+        nc.mark_outdated(fake_network.id)
+        self.assertFalse(nc.is_network_unchanged(fake_network))
+        nc.clear_outdated(fake_network.id)
+        self.assertTrue(nc.is_network_unchanged(fake_network))
+
     def test_get_network_by_id(self):
         nc = dhcp_agent.NetworkCache()
         nc.put(fake_network)
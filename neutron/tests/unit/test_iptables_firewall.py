@@ -1134,3 +1134,49 @@ class IptablesFirewallTestCase(base.BaseTestCase):
                  call.add_rule('ofake_dev', '-j $sg-fallback'),
                  call.add_rule('sg-chain', '-j ACCEPT')]
         self.v4filter_inst.assert_has_calls(calls)
+
+
+class IptablesFirewallIpsetTestCase(IptablesFirewallTestCase):
+    def setUp(self):
+        cfg.CONF.set_override('enable_ipset', True, 'SECURITYGROUP')
+        super(IptablesFirewallIpsetTestCase, self).setUp()
+        self.port = self._fake_port()
+        self.port['security_group_rules'] = [
+            {'ethertype': 'IPv4', 'direction': 'ingress',
+             'remote_group_id': 'fake_sgid'}]
+        self.firewall.update_security_group_members(
+            'fake_sgid', {'IPv4': ['10.0.0.2'], 'IPv6': []})
+
+    def _ipset_restore_call(self, lines):
+        return call(['ipset', 'restore', '-exist'],
+                    process_input='\n'.join(lines) + '\n',
+                    root_helper=mock.ANY)
+
+    def test_remote_group_rule_matches_set(self):
+        self.firewall.prepare_port_filter(self.port)
+        self.v4filter_inst.add_rule.assert_any_call(
+            'ifake_dev', '-m set --match-set IPv4fake_sgid src -j RETURN')
+        self.utils_exec.assert_has_calls([self._ipset_restore_call(
+            ['create IPv4fake_sgid hash:net family inet -exist',
+             'flush IPv4fake_sgid',
+             'add IPv4fake_sgid 10.0.0.2/32 -exist'])])
+
+    def test_members_updated_in_place(self):
+        self.firewall.prepare_port_filter(self.port)
+        self.utils_exec.reset_mock()
+        self.iptables_inst.reset_mock()
+        self.firewall.update_security_group_members(
+            'fake_sgid', {'IPv4': ['10.0.0.3'], 'IPv6': []})
+        self.utils_exec.assert_called_once_with(
+            ['ipset', 'restore', '-exist'],
+            process_input=('add IPv4fake_sgid 10.0.0.3/32 -exist\n'
+                           'del IPv4fake_sgid 10.0.0.2/32 -exist\n'),
+            root_helper=mock.ANY)
+        self.assertFalse(self.iptables_inst.apply.called)
+
+    def test_unused_set_destroyed(self):
+        self.firewall.prepare_port_filter(self.port)
+        self.firewall.remove_port_filter(self.port)
+        self.utils_exec.assert_called_with(
+            ['ipset', 'destroy', 'IPv4fake_sgid'], root_helper=mock.ANY)
+        self.assertEqual({}, self.firewall.sg_members)
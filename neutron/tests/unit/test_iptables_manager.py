@@ -617,3 +617,126 @@ class IptablesManagerStateLessTestCase(base.BaseTestCase):
 
     def test_nat_not_found(self):
         self.assertNotIn('nat', self.iptables.ipv4)
+
+
+class IptablesManagerIncrementalTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(IptablesManagerIncrementalTestCase, self).setUp()
+        self.root_helper = 'sudo'
+        self.config(iptables_incremental_apply=True)
+        self.iptables = (iptables_manager.
+                         IptablesManager(root_helper=self.root_helper))
+        self.execute = mock.patch.object(self.iptables, "execute").start()
+        self.execute.return_value = ''
+        self.addCleanup(mock.patch.stopall)
+        # The first apply is always a full one
+        self.iptables.apply()
+        self.execute.reset_mock()
+
+    def _restore_call(self, process_input):
+        return mock.call(['iptables-restore', '--noflush'],
+                         process_input=process_input,
+                         root_helper=self.root_helper)
+
+    def test_first_apply_is_full(self):
+        self.execute.reset_mock()
+        iptables = iptables_manager.IptablesManager(
+            _execute=self.execute, root_helper=self.root_helper)
+        iptables.apply()
+        self.assertEqual(['iptables-save', '-c'],
+                         self.execute.call_args_list[0][0][0])
+
+    def test_add_rule_applies_modified_chain(self):
+        self.iptables.ipv4['filter'].add_rule('INPUT', '-s 1.2.3.4 -j DROP')
+        self.iptables.apply()
+
+        self.execute.assert_called_once_with(
+            ['iptables-restore', '--noflush'],
+            process_input=('*filter\n'
+                           ':%(bn)s-INPUT - [0:0]\n'
+                           '-A %(bn)s-INPUT -s 1.2.3.4 -j DROP\n'
+                           'COMMIT\n' % IPTABLES_ARG),
+            root_helper=self.root_helper)
+
+    def test_add_and_remove_chain(self):
+        self.iptables.ipv4['filter'].add_chain('filter')
+        self.iptables.ipv4['filter'].add_rule('INPUT', '-j $filter')
+        self.iptables.apply()
+        self.iptables.ipv4['filter'].remove_chain('filter')
+        self.iptables.apply()
+
+        self.assertEqual([
+            self._restore_call('*filter\n'
+                               ':%(bn)s-INPUT - [0:0]\n'
+                               ':%(bn)s-filter - [0:0]\n'
+                               '-A %(bn)s-INPUT -j %(bn)s-filter\n'
+                               'COMMIT\n' % IPTABLES_ARG),
+            self._restore_call('*filter\n'
+                               ':%(bn)s-INPUT - [0:0]\n'
+                               ':%(bn)s-filter - [0:0]\n'
+                               '-X %(bn)s-filter\n'
+                               'COMMIT\n' % IPTABLES_ARG)],
+            self.execute.call_args_list)
+
+    def test_no_change_does_nothing(self):
+        self.iptables.apply()
+        self.assertFalse(self.execute.called)
+
+    def test_unwrapped_change_applies_full(self):
+        self.iptables.ipv4['filter'].add_rule('INPUT', '-j DROP', wrap=False)
+        self.iptables.apply()
+        self.assertEqual(['iptables-save', '-c'],
+                         self.execute.call_args_list[0][0][0])
+
+    def test_full_apply_interval_elapsed(self):
+        self.config(iptables_full_apply_interval=10)
+        self.iptables._last_full_apply -= 11
+        self.iptables.ipv4['filter'].add_rule('INPUT', '-j DROP')
+        self.iptables.apply()
+        self.assertEqual(['iptables-save', '-c'],
+                         self.execute.call_args_list[0][0][0])
+
+    def test_failed_incremental_apply_falls_back_to_full(self):
+        self.execute.side_effect = [RuntimeError(), '', '']
+        self.iptables.ipv4['filter'].add_rule('INPUT', '-j DROP')
+        self.iptables.apply()
+        self.assertEqual(['iptables-save', '-c'],
+                         self.execute.call_args_list[1][0][0])
+        self.assertEqual(
+            ['-A %(bn)s-INPUT -j DROP' % IPTABLES_ARG],
+            self.iptables.ipv4['filter'].applied_rules['INPUT'])
+
+    def test_chains_rebuilt_with_same_rules_not_applied(self):
+        table = self.iptables.ipv4['filter']
+        table.add_chain('sg-chain')
+        table.add_rule('sg-chain', '-j ACCEPT')
+        table.add_rule('INPUT', '-j $sg-chain')
+        self.iptables.apply()
+        self.execute.reset_mock()
+        table.remove_chain('sg-chain')
+        table.add_chain('sg-chain')
+        table.add_rule('sg-chain', '-j ACCEPT')
+        table.add_rule('INPUT', '-j $sg-chain')
+        self.iptables.apply()
+        self.assertFalse(self.execute.called)
+
+    def test_only_changed_chain_applied(self):
+        table = self.iptables.ipv4['filter']
+        table.add_chain('sg-chain')
+        table.add_rule('sg-chain', '-j ACCEPT')
+        table.add_rule('INPUT', '-j $sg-chain')
+        self.iptables.apply()
+        self.execute.reset_mock()
+        table.remove_chain('sg-chain')
+        table.add_chain('sg-chain')
+        table.add_rule('sg-chain', '-j DROP')
+        table.add_rule('INPUT', '-j $sg-chain')
+        self.iptables.apply()
+        self.execute.assert_called_once_with(
+            ['iptables-restore', '--noflush'],
+            process_input=('*filter\n'
+                           ':%(bn)s-sg-chain - [0:0]\n'
+                           '-A %(bn)s-sg-chain -j DROP\n'
+                           'COMMIT\n' % IPTABLES_ARG),
+            root_helper=self.root_helper)
@@ -353,6 +353,10 @@ class TestBasicRouterOperations(base.BaseTestCase):
             else:
                 self.assertIn(r.rule, expected_rules)
 
+    def _process_router_updates(self, agent):
+        while len(agent._queue):
+            agent._process_router_update()
+
     def _prepare_router_data(self, enable_snat=None, num_internal_ports=1):
         router_id = _uuid()
         ex_gw_port = {'id': _uuid(),
@@ -799,6 +803,7 @@ class TestBasicRouterOperations(base.BaseTestCase):
              'admin_state_up': False,
              'external_gateway_info': {}}]
         agent._process_routers(routers)
+        self.assertEqual(0, len(agent._queue))
         self.assertNotIn(routers[0]['id'], agent.router_info)
 
     def test_router_deleted(self):
@@ -842,6 +847,126 @@ class TestBasicRouterOperations(base.BaseTestCase):
         agent.router_deleted(None, router['id'])
         agent._process_router_delete()
         self.assertFalse(list(agent.removed_routers))
+        self._process_router_updates(agent)
+        self.assertNotIn(router['id'], agent.router_info)
+
+    def test_process_routers_removes_incompatible_router(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        self.plugin_api.get_external_network_id.return_value = None
+        router = {'id': _uuid(),
+                  'routes': [],
+                  'admin_state_up': True,
+                  'external_gateway_info': {}}
+        agent._process_routers([router])
+        # The router is disabled before its update is processed
+        agent._process_routers([dict(router, admin_state_up=False)])
+        self._process_router_updates(agent)
+        self.assertNotIn(router['id'], agent.router_info)
+
+    def test_process_router_update_failure_sets_fullsync(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        agent.fullsync = False
+        router = {'id': _uuid(), 'routes': [], 'admin_state_up': True,
+                  'external_gateway_info': {}}
+        agent._queue.add(l3_agent.RouterUpdate(router['id'],
+                                               l3_agent.PRIORITY_RPC,
+                                               router=router))
+        agent._sync_revision = 5
+        with mock.patch.object(agent, '_process_updated_router',
+                               side_effect=RuntimeError):
+            agent._process_router_update()
+        self.assertTrue(agent.fullsync)
+        self.assertIsNone(agent._sync_revision)
+        self.assertEqual(set(), agent._queue.router_ids())
+        self.assertEqual(1, agent.router_processing_stats['count'])
+
+    def _sync_router(self, router_id):
+        return {'id': router_id, 'routes': [], 'admin_state_up': True,
+                'external_gateway_info': {}}
+
+    def test_sync_routers_task_by_page(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        self.plugin_api.get_external_network_id.return_value = None
+        stale_router = self._sync_router('r0')
+        agent._queue.add(l3_agent.RouterUpdate('r0', l3_agent.PRIORITY_RPC,
+                                               router=stale_router))
+        routers = [self._sync_router(router_id)
+                   for router_id in ('r1', 'r2', 'r3')]
+        self.plugin_api.get_routers_page.side_effect = [
+            {'routers': routers[:2], 'router_ids': ['r1', 'r2'],
+             'next_marker': 'r2', 'revision': 5,
+             'hosted_router_ids': ['r1', 'r2', 'r3']},
+            {'routers': routers[2:], 'router_ids': ['r3'],
+             'next_marker': None, 'revision': 6}]
+
+        agent._sync_routers_task(agent.context)
+
+        self.assertFalse(agent.fullsync)
+        self.assertEqual(5, agent._sync_revision)
+        self.assertEqual(
+            [mock.call(agent.context, 64, marker=None, since_revision=None,
+                       router_ids=None),
+             mock.call(agent.context, 64, marker='r2', since_revision=None,
+                       router_ids=None)],
+            self.plugin_api.get_routers_page.call_args_list)
+        updates = agent._queue._updates
+        self.assertEqual(set(['r0', 'r1', 'r2', 'r3']), set(updates))
+        self.assertEqual(l3_agent.DELETE_ROUTER, updates['r0'].action)
+        self.assertEqual(l3_agent.UPDATE_ROUTER, updates['r3'].action)
+
+    def test_sync_routers_task_since_revision(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        self.plugin_api.get_external_network_id.return_value = None
+        agent._sync_revision = 5
+        agent._queue.add(l3_agent.RouterUpdate(
+            'r1', l3_agent.PRIORITY_RPC, router=self._sync_router('r1')))
+        # r1 has been disabled since the revision 5
+        self.plugin_api.get_routers_page.return_value = {
+            'routers': [], 'router_ids': ['r1'], 'next_marker': None,
+            'revision': 7, 'hosted_router_ids': ['r1']}
+
+        agent._sync_routers_task(agent.context)
+
+        self.plugin_api.get_routers_page.assert_called_once_with(
+            agent.context, 64, marker=None, since_revision=5,
+            router_ids=None)
+        self.assertEqual(7, agent._sync_revision)
+        self.assertEqual(l3_agent.DELETE_ROUTER,
+                         agent._queue._updates['r1'].action)
+
+    def test_sync_routers_task_without_pages_support(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        self.plugin_api.get_external_network_id.return_value = None
+        self.plugin_api.get_routers_page.return_value = [
+            self._sync_router('r1')]
+
+        agent._sync_routers_task(agent.context)
+
+        self.assertFalse(agent.fullsync)
+        self.assertIsNone(agent._sync_revision)
+        self.assertEqual(set(['r1']), agent._queue.router_ids())
+
+    def test_sync_routers_task_failure_keeps_revision(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        agent._sync_revision = 5
+        self.plugin_api.get_routers_page.side_effect = RuntimeError
+
+        agent._sync_routers_task(agent.context)
+
+        self.assertTrue(agent.fullsync)
+        self.assertEqual(5, agent._sync_revision)
+
+    def test_sync_routers_task_without_pages(self):
+        self.conf.set_override('sync_routers_page_size', 0)
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        self.plugin_api.get_external_network_id.return_value = None
+        self.plugin_api.get_routers.return_value = [self._sync_router('r1')]
+
+        agent._sync_routers_task(agent.context)
+
+        self.assertFalse(agent.fullsync)
+        self.assertFalse(self.plugin_api.get_routers_page.called)
+        self.assertEqual(set(['r1']), agent._queue.router_ids())
 
     def test_destroy_router_namespace_skips_ns_removal(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
@@ -917,6 +1042,7 @@ class TestBasicRouterOperations(base.BaseTestCase):
              'external_gateway_info': {'network_id': 'aaa'}}]
 
         agent._process_routers(routers)
+        self._process_router_updates(agent)
         self.assertIn(routers[0]['id'], agent.router_info)
 
     def test_process_routers_with_no_ext_net_in_conf_and_two_net_plugin(self):
@@ -953,6 +1079,7 @@ class TestBasicRouterOperations(base.BaseTestCase):
         agent.router_info = {}
         self.conf.set_override('gateway_external_network_id', 'aaa')
         agent._process_routers(routers)
+        self._process_router_updates(agent)
         self.assertIn(routers[0]['id'], agent.router_info)
         self.assertNotIn(routers[1]['id'], agent.router_info)
 
@@ -973,6 +1100,7 @@ class TestBasicRouterOperations(base.BaseTestCase):
         agent.router_info = {}
         self.conf.set_override('external_network_bridge', '')
         agent._process_routers(routers)
+        self._process_router_updates(agent)
         self.assertIn(routers[0]['id'], agent.router_info)
         self.assertIn(routers[1]['id'], agent.router_info)
 
@@ -1138,3 +1266,44 @@ class TestL3AgentEventHandler(base.BaseTestCase):
                 ])
         finally:
             self.external_process_p.start()
+
+
+class TestRouterUpdateQueue(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestRouterUpdateQueue, self).setUp()
+        self.queue = l3_agent.RouterUpdateQueue()
+
+    def _add(self, router_id, priority, action=l3_agent.UPDATE_ROUTER):
+        self.queue.add(l3_agent.RouterUpdate(router_id, priority, action))
+
+    def test_rpc_updates_before_sync_updates(self):
+        self._add('r1', l3_agent.PRIORITY_SYNC_ROUTERS_TASK)
+        self._add('r2', l3_agent.PRIORITY_SYNC_ROUTERS_TASK)
+        self._add('r3', l3_agent.PRIORITY_RPC)
+        self.assertEqual(['r3', 'r1', 'r2'],
+                         [self.queue.get().router_id for i in range(3)])
+
+    def test_updates_of_a_router_are_merged(self):
+        self._add('r1', l3_agent.PRIORITY_SYNC_ROUTERS_TASK)
+        self._add('r2', l3_agent.PRIORITY_SYNC_ROUTERS_TASK)
+        self._add('r2', l3_agent.PRIORITY_RPC, l3_agent.DELETE_ROUTER)
+        self._add('r1', l3_agent.PRIORITY_SYNC_ROUTERS_TASK)
+        self.assertEqual(2, len(self.queue))
+
+        update = self.queue.get()
+        self.assertEqual(('r2', l3_agent.PRIORITY_RPC, l3_agent.DELETE_ROUTER),
+                         (update.router_id, update.priority, update.action))
+        self.assertEqual('r1', self.queue.get().router_id)
+        self.assertEqual(0, len(self.queue))
+
+    def test_busy_router_is_not_handed_out(self):
+        self._add('r1', l3_agent.PRIORITY_RPC)
+        self.assertEqual('r1', self.queue.get().router_id)
+        self._add('r1', l3_agent.PRIORITY_RPC)
+        self._add('r2', l3_agent.PRIORITY_SYNC_ROUTERS_TASK)
+        self.assertEqual(set(['r1', 'r2']), self.queue.router_ids())
+
+        self.assertEqual('r2', self.queue.get().router_id)
+        self.queue.done('r1')
+        self.assertEqual('r1', self.queue.get().router_id)
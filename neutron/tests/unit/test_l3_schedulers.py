@@ -16,6 +16,7 @@
 # @author: Sylvain Afchain, eNovance SAS
 # @author: Emilien Macchi, eNovance SAS
 
+import collections
 import contextlib
 import uuid
 
@@ -204,3 +205,65 @@ class L3AgentLeastRoutersSchedulerTestCase(L3SchedulerTestCase):
                         agent_id3 = agents[0]['id']
 
                         self.assertNotEqual(agent_id1, agent_id3)
+
+
+class L3AgentLeastLoadedSchedulerTestCase(L3SchedulerTestCase):
+    def setUp(self):
+        cfg.CONF.set_override('router_scheduler_driver',
+                              'neutron.scheduler.l3_agent_scheduler.'
+                              'LeastLoadedScheduler')
+
+        super(L3AgentLeastLoadedSchedulerTestCase, self).setUp()
+
+    def _get_router_counts(self, router_ids):
+        agents = self.get_l3_agents_hosting_routers(
+            self.adminContext, router_ids, admin_state_up=True)
+        return collections.Counter(agent['id'] for agent in agents)
+
+    def test_schedule_routers_balances_load(self):
+        with contextlib.nested(self.router(name='r1'),
+                               self.router(name='r2'),
+                               self.router(name='r3'),
+                               self.router(name='r4')) as routers:
+            router_ids = [r['router']['id'] for r in routers]
+            self.plugin.schedule_routers(self.adminContext, router_ids)
+            counts = self._get_router_counts(router_ids)
+            self.assertEqual([2, 2], sorted(counts.values()))
+
+    def test_schedule_routers_skips_hosted_routers(self):
+        with contextlib.nested(self.router(name='r1'),
+                               self.router(name='r2')) as routers:
+            router_ids = [r['router']['id'] for r in routers]
+            self.plugin.schedule_routers(self.adminContext, router_ids)
+            chosen_agents = self.plugin.schedule_routers(self.adminContext,
+                                                         router_ids)
+            self.assertEqual([], chosen_agents)
+
+    def test_auto_schedule_routers_skips_hosted_routers(self):
+        with contextlib.nested(self.router(name='r1'),
+                               self.router(name='r2')) as routers:
+            router_ids = [r['router']['id'] for r in routers]
+            self.plugin.schedule_routers(self.adminContext, router_ids[:1])
+            with mock.patch.object(
+                self.plugin, 'get_l3_agents_hosting_routers') as hosting:
+                self.assertTrue(self.plugin.auto_schedule_routers(
+                    self.adminContext, HOST, router_ids))
+                self.assertFalse(hosting.called)
+            counts = self._get_router_counts(router_ids)
+            self.assertEqual(2, sum(counts.values()))
+            agents = self.get_l3_agents_hosting_routers(
+                self.adminContext, router_ids[1:], admin_state_up=True)
+            self.assertEqual([HOST], [agent['host'] for agent in agents])
+            counts = self._get_router_counts(router_ids)
+            self.assertEqual(2, sum(counts.values()))
+
+    def test_schedule_routers_with_disabled_agent(self):
+        self._set_l3_agent_admin_state(self.adminContext,
+                                       self.agent_id1, False)
+        with contextlib.nested(self.router(name='r1'),
+                               self.router(name='r2')) as routers:
+            router_ids = [r['router']['id'] for r in routers]
+            self.plugin.schedule_routers(self.adminContext, router_ids)
+            counts = self._get_router_counts(router_ids)
+            self.assertEqual([2], counts.values())
+            self.assertNotIn(self.agent_id1, counts)
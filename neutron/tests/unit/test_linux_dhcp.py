@@ -15,6 +15,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
 import os
 
 import mock
@@ -1101,6 +1102,72 @@ tag:tag1,249,%s,%s""".lstrip() % (fake_v6,
         dnsmasq._release_lease.assert_has_calls([mock.call(mac2, ip2)],
                                                 any_order=True)
 
+    def test_output_hosts_file_changed_ports(self):
+        network = FakeDualNetwork()
+        dm = dhcp.Dnsmasq(self.conf, network, version=float(2.59))
+        with mock.patch.object(dm, 'get_conf_file_name') as conf_fn:
+            conf_fn.return_value = '/foo/host'
+            dm._output_hosts_file()
+            network.ports = [FakePort1(), FakePort3(), FakeRouterPort()]
+            with mock.patch.object(dm, '_format_host_entries') as fmt:
+                dm._output_hosts_file(port_ids=[FakePort2.id])
+                self.assertFalse(fmt.called)
+
+        exp_host_data = ('00:00:80:aa:bb:cc,host-192-168-0-2.openstacklocal,'
+                         '192.168.0.2\n'
+                         '00:00:0f:aa:bb:cc,host-192-168-0-3.openstacklocal,'
+                         '192.168.0.3\n'
+                         '00:00:0f:aa:bb:cc,host-fdca-3ba5-a17a-4ba3--3.'
+                         'openstacklocal,[fdca:3ba5:a17a:4ba3::3]\n'
+                         '00:00:0f:rr:rr:rr,host-192-168-0-1.openstacklocal,'
+                         '192.168.0.1\n')
+        self.safe.assert_called_with('/foo/host', exp_host_data)
+
+    def test_port_entries_kept_with_network(self):
+        network = FakeDualNetwork()
+        dm = dhcp.Dnsmasq(self.conf, network, version=float(2.59))
+        with mock.patch.object(dm, 'get_conf_file_name'):
+            dm._output_hosts_file()
+        self.assertIs(dm._port_entries_cache, dhcp.Dnsmasq(
+            self.conf, network, version=float(2.59))._port_entries_cache)
+        self.assertIsNone(dhcp.Dnsmasq(
+            self.conf, FakeDualNetwork(),
+            version=float(2.59))._get_cached_port_entries('host'))
+
+    def test_release_unused_leases_changed_ports(self):
+        network = FakeDualNetwork()
+        dnsmasq = dhcp.Dnsmasq(self.conf, network, version=float(2.59))
+        with mock.patch.object(dnsmasq, 'get_conf_file_name'):
+            dnsmasq._output_hosts_file()
+        dnsmasq._read_hosts_file_leases = mock.Mock()
+        dnsmasq._release_lease = mock.Mock()
+        network.ports = [FakePort2(), FakePort3(), FakeRouterPort()]
+
+        dnsmasq._release_unused_leases(port_ids=[FakePort1.id])
+
+        self.assertFalse(dnsmasq._read_hosts_file_leases.called)
+        dnsmasq._release_lease.assert_called_once_with('00:00:80:aa:bb:cc',
+                                                       '192.168.0.2')
+
+    def test_output_opts_file_changed_ports(self):
+        network = FakeV4NetworkPxe2Ports()
+        dm = dhcp.Dnsmasq(self.conf, network, version=float(2.59))
+        with contextlib.nested(
+            mock.patch.object(dm, 'get_conf_file_name'),
+            mock.patch.object(dm, '_make_subnet_interface_ip_map')
+        ) as (conf_fn, ip_map):
+            conf_fn.return_value = '/foo/opts'
+            ip_map.return_value = {}
+            dm._output_opts_file()
+            expected = self.safe.call_args[0][1]
+            with mock.patch.object(dm, '_get_subnet_options') as subnet_opts:
+                dm._output_opts_file(port_ids=[network.ports[0].id])
+                self.assertFalse(subnet_opts.called)
+            self.safe.assert_called_with('/foo/opts', expected)
+
+            dm._output_opts_file(port_ids=[FakeRouterPort.id])
+            self.assertEqual(2, ip_map.call_count)
+
     def test_read_hosts_file_leases(self):
         filename = '/path/to/file'
         with mock.patch('os.path.exists') as mock_exists:
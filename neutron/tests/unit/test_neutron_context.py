@@ -135,3 +135,37 @@ class TestNeutronContext(base.BaseTestCase):
         ctx_admin = context.get_admin_context()
         self.assertEqual(req_id_before, local.store.context.request_id)
         self.assertNotEqual(req_id_before, ctx_admin.request_id)
+
+    def test_reader_session_without_slave_reads(self):
+        ctx = context.Context('user_id', 'tenant_id')
+        self.assertIs(ctx.reader_session, ctx.session)
+        self.db_api_session.assert_called_once_with()
+
+    def test_reader_session_with_slave_reads(self):
+        ctx = context.Context('user_id', 'tenant_id')
+        ctx.allow_slave_reads()
+        reader_session = ctx.reader_session
+        self.db_api_session.assert_called_once_with(slave=True)
+        self.assertIs(reader_session, ctx.reader_session)
+
+    def test_reader_session_after_write(self):
+        self.db_api_session.side_effect = lambda **kwargs: mock.Mock()
+        ctx = context.Context('user_id', 'tenant_id')
+        with mock.patch('neutron.db.api.watch_writes') as watch_writes:
+            ctx.allow_slave_reads()
+            session = ctx.session
+            session.transaction = None
+            watch_writes.assert_called_once_with(session,
+                                                 ctx._stop_slave_reads)
+            self.assertIsNot(ctx.reader_session, session)
+            watch_writes.call_args[0][1]()
+            self.assertIs(ctx.reader_session, session)
+
+    def test_reader_session_in_transaction(self):
+        self.db_api_session.side_effect = lambda **kwargs: mock.Mock()
+        ctx = context.Context('user_id', 'tenant_id')
+        with mock.patch('neutron.db.api.watch_writes'):
+            ctx.allow_slave_reads()
+            session = ctx.session
+        self.assertIsNotNone(session.transaction)
+        self.assertIs(ctx.reader_session, session)
@@ -15,6 +15,7 @@
 
 """Test of Policy Engine For Neutron"""
 
+import contextlib
 import json
 import urllib2
 
@@ -459,6 +460,85 @@ class NeutronPolicyTestCase(base.BaseTestCase):
             result = policy.enforce(self.context, action, target)
             self.assertTrue(result)
 
+    def test_build_match_rule_cached(self):
+        action = "create_network"
+        rule = policy._build_match_rule(action, {'tenant_id': 'fake'})
+        self.assertIs(rule, policy._build_match_rule(action,
+                                                     {'tenant_id': 'other'}))
+        shared_rule = policy._build_match_rule(
+            action, {'tenant_id': 'fake', 'shared': True})
+        self.assertIsNot(rule, shared_rule)
+        self.assertIs(shared_rule, policy._build_match_rule(
+            action, {'tenant_id': 'other', 'shared': True}))
+        self.assertEqual({'hits': 2, 'misses': 2, 'size': 2},
+                         policy.get_match_rule_cache_stats())
+
+    def test_build_match_rule_cached_sub_attributes(self):
+        action = "create_something"
+        rule = policy._build_match_rule(
+            action, {'tenant_id': 'fake', 'attr': {'sub_attr_1': 'x'}})
+        self.assertIsNot(rule, policy._build_match_rule(
+            action, {'tenant_id': 'fake', 'attr': {'sub_attr_2': 'x'}}))
+        self.assertIs(rule, policy._build_match_rule(
+            action, {'tenant_id': 'fake', 'attr': {'sub_attr_1': 'y'}}))
+
+    def test_match_rule_cache_cleared_on_reload(self):
+        policy._build_match_rule("create_network", {'tenant_id': 'fake'})
+        policy._set_rules(json.dumps({'create_network': '@'}))
+        self.assertFalse(policy._MATCH_RULE_CACHE)
+        self.assertFalse(policy._POLICY_ATTRIBUTES)
+        self.assertEqual({'hits': 0, 'misses': 0, 'size': 0},
+                         policy.get_match_rule_cache_stats())
+
+    def test_policy_attributes_recomputed_when_extended(self):
+        action = "create_network"
+        target = {'tenant_id': 'fake', 'new_attr': 'x'}
+        rule = policy._build_match_rule(action, target)
+        self.assertNotIn('new_attr', str(rule))
+        attr_map = attributes.RESOURCE_ATTRIBUTE_MAP['networks']
+        attr_map['new_attr'] = {'allow_post': True, 'default': None,
+                                'enforce_policy': True}
+        self.addCleanup(attr_map.pop, 'new_attr')
+        rule = policy._build_match_rule(action, target)
+        self.assertIn('create_network:new_attr', str(rule))
+
+    def test_check_list_parent_resource(self):
+        self.rules['get_port'] = common_policy.parse_rule(
+            "rule:admin_or_owner or rule:admin_or_network_owner")
+        targets = [{'tenant_id': 'other', 'network_id': 'net1'},
+                   {'tenant_id': 'fake', 'network_id': 'net2'},
+                   {'tenant_id': 'other', 'network_id': 'net2'},
+                   {'tenant_id': 'other', 'network_id': 'net3'}]
+        plugin = manager.NeutronManager.get_instance().plugin
+        with contextlib.nested(
+            mock.patch.object(plugin, 'get_networks',
+                              return_value=[{'id': 'net1',
+                                             'tenant_id': 'fake'},
+                                            {'id': 'net2',
+                                             'tenant_id': 'other'},
+                                            {'id': 'net3',
+                                             'tenant_id': 'other'}]),
+            mock.patch.object(plugin, 'get_network')
+        ) as (get_networks, get_network):
+            result = policy.check_list(self.context, 'get_port', targets)
+            self.assertEqual([targets[0], targets[1]], result)
+            self.assertEqual(1, get_networks.call_count)
+            filters = get_networks.call_args[1]['filters']
+            self.assertEqual(set(['net1', 'net2', 'net3']),
+                             set(filters['id']))
+            self.assertFalse(get_network.called)
+
+    def test_check_list_parent_resource_admin(self):
+        self.rules['get_port'] = common_policy.parse_rule(
+            "rule:admin_or_network_owner")
+        admin_context = context.get_admin_context()
+        targets = [{'tenant_id': 'other', 'network_id': 'net1'}]
+        plugin = manager.NeutronManager.get_instance().plugin
+        with mock.patch.object(plugin, 'get_networks') as get_networks:
+            result = policy.check_list(admin_context, 'get_port', targets)
+            self.assertEqual(targets, result)
+            self.assertFalse(get_networks.called)
+
     def test_tenant_id_check_no_target_field_raises(self):
         # Try and add a bad rule
         self.assertRaises(
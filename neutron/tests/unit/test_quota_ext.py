@@ -28,7 +28,9 @@ from neutron.common import config
 from neutron.common import exceptions
 from neutron import context
 from neutron.db import api as db
+from neutron.db import models_v2
 from neutron.db import quota_db
+from neutron.openstack.common import timeutils
 from neutron import quota
 from neutron.tests import base
 from neutron.tests.unit import test_api_v2
@@ -407,6 +409,97 @@ class TestDbQuotaDriver(base.BaseTestCase):
                                                       target_tenant)
 
 
+class TestTrackingDbQuotaDriver(base.BaseTestCase):
+    """Test for neutron.db.quota_db.TrackingDbQuotaDriver."""
+
+    def setUp(self):
+        super(TestTrackingDbQuotaDriver, self).setUp()
+        db.configure_db()
+        self.addCleanup(db.clear_db)
+        self.driver = quota_db.TrackingDbQuotaDriver()
+        self.ctx = context.get_admin_context()
+        self.resources = {'network': quota.CountableResource(
+            'network', self._count_networks, 'quota_network')}
+
+    def _count_networks(self, context, tenant_id):
+        return context.session.query(models_v2.Network).filter_by(
+            tenant_id=tenant_id).count()
+
+    def _create_network(self, tenant_id='foo'):
+        network = models_v2.Network(tenant_id=tenant_id, name='net',
+                                    status='ACTIVE', admin_state_up=True,
+                                    shared=False)
+        with self.ctx.session.begin():
+            self.ctx.session.add(network)
+        return network
+
+    def _get_usage(self, tenant_id='foo'):
+        self.ctx.session.expire_all()
+        return self.ctx.session.query(quota_db.QuotaUsage).filter_by(
+            tenant_id=tenant_id, resource='network').one()
+
+    def _make_reservation(self, delta=1, tenant_id='foo'):
+        return self.driver.make_reservation(self.ctx, tenant_id,
+                                            self.resources,
+                                            {'network': delta}, tenant_id)
+
+    def test_make_reservation_counts_usage(self):
+        self._create_network()
+        self._create_network()
+        reservation = self._make_reservation()
+        usage = self._get_usage()
+        self.assertEqual((2, 1), (usage.in_use, usage.reserved))
+        self.driver.commit_reservation(self.ctx, reservation)
+        self.assertEqual(0, self._get_usage().reserved)
+
+    def test_usage_tracks_creations_and_deletions(self):
+        self.driver.cancel_reservation(self.ctx, self._make_reservation())
+        network = self._create_network()
+        self._create_network(tenant_id='bar')
+        self.assertEqual(1, self._get_usage().in_use)
+        with self.ctx.session.begin():
+            self.ctx.session.delete(network)
+        self.assertEqual(0, self._get_usage().in_use)
+
+    def test_make_reservation_over_quota(self):
+        cfg.CONF.set_override('quota_network', 2, group='QUOTAS')
+        self._create_network()
+        self._make_reservation()
+        self.assertRaises(exceptions.OverQuota, self._make_reservation)
+
+    def test_make_reservation_recounts_drifted_usage(self):
+        cfg.CONF.set_override('quota_network', 2, group='QUOTAS')
+        self._create_network()
+        self.driver.cancel_reservation(self.ctx, self._make_reservation())
+        with self.ctx.session.begin():
+            self._get_usage().in_use = 2
+        self._make_reservation()
+        self.assertEqual(1, self._get_usage().in_use)
+
+    def test_bulk_delete_marks_usage_dirty(self):
+        self._create_network()
+        self.driver.cancel_reservation(self.ctx, self._make_reservation())
+        with self.ctx.session.begin():
+            self.ctx.session.query(models_v2.Network).filter_by(
+                tenant_id='foo').delete(synchronize_session=False)
+        self.assertTrue(self._get_usage().dirty)
+        self._make_reservation()
+        self.assertEqual(0, self._get_usage().in_use)
+
+    def test_expired_reservations_released(self):
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        reservation = self._make_reservation()
+        timeutils.advance_time_seconds(
+            cfg.CONF.QUOTAS.reservation_expiration + 1)
+        self._make_reservation()
+        self.assertEqual(1, self._get_usage().reserved)
+        # Releasing an expired reservation never makes reserved negative
+        self.driver.commit_reservation(self.ctx, reservation)
+        self.driver.commit_reservation(self.ctx, reservation)
+        self.assertEqual(0, self._get_usage().reserved)
+
+
 class TestQuotaDriverLoad(base.BaseTestCase):
     def setUp(self):
         super(TestQuotaDriverLoad, self).setUp()
@@ -434,3 +527,18 @@ class TestQuotaDriverLoad(base.BaseTestCase):
     def test_quota_conf_driver(self):
         self._test_quota_driver('neutron.quota.ConfDriver',
                                 'ConfDriver', True)
+
+    def _test_track_resources(self, cfg_driver):
+        cfg.CONF.set_override('quota_driver', cfg_driver, group='QUOTAS')
+        with mock.patch.object(quota_db, '_track_resources') as track:
+            quota.QUOTAS.track_resources()
+        self.assertIsNone(quota.QUOTAS._driver)
+        return track.called
+
+    def test_track_resources_without_driver_loaded(self):
+        self.assertTrue(self._test_track_resources(
+            'neutron.db.quota_db.TrackingDbQuotaDriver'))
+
+    def test_track_resources_driver_not_tracking(self):
+        self.assertFalse(self._test_track_resources(
+            'neutron.db.quota_db.DbQuotaDriver'))
@@ -34,6 +34,7 @@ from neutron.db import securitygroups_rpc_base as sg_db_rpc
 from neutron.extensions import allowedaddresspairs as addr_pair
 from neutron.extensions import securitygroup as ext_sg
 from neutron.manager import NeutronManager
+from neutron.openstack.common.rpc import common as rpc_common
 from neutron.openstack.common.rpc import proxy
 from neutron.tests import base
 from neutron.tests.unit import test_extension_security_group as test_sg
@@ -56,6 +57,19 @@ class SGServerRpcCallBackMixinTestCase(test_sg.SecurityGroupDBTestCase):
         super(SGServerRpcCallBackMixinTestCase, self).setUp(plugin)
         self.rpc = FakeSGCallback()
 
+    def test_security_group_syncs_allow_slave_reads(self):
+        self.rpc.devices = {}
+        ctx = context.get_admin_context()
+        for method, kwargs in (
+                ('security_group_rules_for_devices', {'devices': []}),
+                ('security_group_info_for_devices', {'devices': []}),
+                ('security_group_members', {'security_groups': []}),
+                ('security_group_member_updates',
+                 {'sg_member_revisions': {}})):
+            with mock.patch.object(ctx, 'allow_slave_reads') as slave_reads:
+                getattr(self.rpc, method)(ctx, **kwargs)
+                slave_reads.assert_called_once_with()
+
     def test_security_group_rules_for_devices_ipv4_ingress(self):
         fake_prefix = test_fw.FAKE_PREFIX[const.IPv4]
         with self.network() as n:
@@ -286,6 +300,76 @@ class SGServerRpcCallBackMixinTestCase(test_sg.SecurityGroupDBTestCase):
                 self._delete('ports', port_id1)
                 self._delete('ports', port_id2)
 
+    def test_security_group_info_for_devices_source_group(self):
+
+        with self.network() as n:
+            with nested(self.subnet(n),
+                        self.security_group(),
+                        self.security_group()) as (subnet_v4,
+                                                   sg1,
+                                                   sg2):
+                sg1_id = sg1['security_group']['id']
+                sg2_id = sg2['security_group']['id']
+                rule1 = self._build_security_group_rule(
+                    sg1_id,
+                    'ingress', const.PROTO_NAME_TCP, '24',
+                    '25', remote_group_id=sg2['security_group']['id'])
+                rules = {
+                    'security_group_rules': [rule1['security_group_rule']]}
+                res = self._create_security_group_rule(self.fmt, rules)
+                self.deserialize(self.fmt, res)
+                self.assertEqual(res.status_int, webob.exc.HTTPCreated.code)
+
+                res1 = self._create_port(
+                    self.fmt, n['network']['id'],
+                    security_groups=[sg1_id])
+                ports_rest1 = self.deserialize(self.fmt, res1)
+                port_id1 = ports_rest1['port']['id']
+                self.rpc.devices = {port_id1: ports_rest1['port']}
+                devices = [port_id1, 'no_exist_device']
+
+                res2 = self._create_port(
+                    self.fmt, n['network']['id'],
+                    security_groups=[sg2_id])
+                ports_rest2 = self.deserialize(self.fmt, res2)
+                port_id2 = ports_rest2['port']['id']
+                ctx = context.get_admin_context()
+                info = self.rpc.security_group_info_for_devices(
+                    ctx, devices=devices)
+                port_rpc = info['devices'][port_id1]
+                expected = {'direction': u'ingress',
+                            'protocol': const.PROTO_NAME_TCP,
+                            'ethertype': const.IPv4,
+                            'port_range_max': 25, 'port_range_min': 24,
+                            'remote_group_id': sg2_id,
+                            'security_group_id': sg1_id}
+                self.assertIn(expected, port_rpc['security_group_rules'])
+                self.assertEqual([sg2_id],
+                                 port_rpc['security_group_source_groups'])
+                self.assertEqual({sg2_id: {const.IPv4: ['10.0.0.3/32'],
+                                           const.IPv6: []}},
+                                 info['sg_member_ips'])
+                self.assertEqual(info['sg_member_ips'],
+                                 self.rpc.security_group_members(
+                                     ctx, security_groups=[sg2_id]))
+                revision = info['sg_member_revisions'][sg2_id]
+                self.assertEqual(
+                    sg_db_rpc.get_member_revision(
+                        info['sg_member_ips'][sg2_id]), revision)
+                self.rpc.devices = {
+                    port_id1: self._show('ports', port_id1)['port']}
+                info = self.rpc.security_group_info_for_devices(
+                    ctx, devices=devices,
+                    sg_member_revisions={sg2_id: revision})
+                self.assertEqual({}, info['sg_member_ips'])
+                self.assertEqual({}, info['sg_member_revisions'])
+                updates = self.rpc.security_group_member_updates(
+                    ctx, sg_member_revisions={sg2_id: 'stale'})
+                self.assertEqual({sg2_id: revision},
+                                 updates['sg_member_revisions'])
+                self._delete('ports', port_id1)
+                self._delete('ports', port_id2)
+
     def test_security_group_rules_for_devices_ipv6_ingress(self):
         fake_prefix = test_fw.FAKE_PREFIX[const.IPv6]
         with self.network() as n:
@@ -594,6 +678,154 @@ class SecurityGroupAgentRpcTestCase(base.BaseTestCase):
         self.firewall.assert_has_calls([])
 
 
+class SecurityGroupAgentRpcWithIpsetTestCase(SecurityGroupAgentRpcTestCase):
+    def setUp(self, defer_refresh_firewall=False):
+        super(SecurityGroupAgentRpcWithIpsetTestCase, self).setUp(
+            defer_refresh_firewall=defer_refresh_firewall)
+        self.firewall.expand_remote_groups = False
+        self.member_ips = {const.IPv4: ['10.0.0.3/32'], const.IPv6: []}
+        self.agent.plugin_rpc.security_group_info_for_devices.return_value = {
+            'devices': self.firewall.ports,
+            'sg_member_ips': {'fake_sgid2': self.member_ips},
+            'sg_member_revisions': {'fake_sgid2': 'rev1'}}
+        self.agent.plugin_rpc.security_group_member_updates.return_value = {
+            'sg_member_ips': {'fake_sgid2': self.member_ips},
+            'sg_member_revisions': {'fake_sgid2': 'rev2'}}
+
+    def test_prepare_devices_filter_updates_members(self):
+        self.agent.prepare_devices_filter(['fake_device'])
+        self.firewall.assert_has_calls([
+            call.update_security_group_members('fake_sgid2',
+                                               self.member_ips),
+            call.defer_apply(),
+            call.prepare_port_filter(self.fake_device)])
+        self.assertFalse(
+            self.agent.plugin_rpc.security_group_rules_for_devices.called)
+
+    def test_refresh_firewall(self):
+        self.agent.refresh_firewall()
+        calls = [call.update_security_group_members('fake_sgid2',
+                                                    self.member_ips),
+                 call.defer_apply(),
+                 call.update_port_filter(self.fake_device)]
+        self.firewall.assert_has_calls(calls)
+
+    def test_refresh_firewall_devices(self):
+        self.agent.refresh_firewall(['fake_device'])
+        self.agent.plugin_rpc.security_group_info_for_devices.\
+            assert_called_once_with(None, ['fake_device'],
+                                    sg_member_revisions={})
+        self.assertEqual({'fake_sgid2': 'rev1'},
+                         self.agent.sg_member_revisions)
+
+    def test_refresh_firewall_sends_member_revisions(self):
+        self.agent.sg_member_revisions = {'fake_sgid2': 'rev1',
+                                          'fake_sgid3': 'rev1'}
+        self.agent.plugin_rpc.security_group_info_for_devices.return_value = {
+            'devices': self.firewall.ports,
+            'sg_member_ips': {},
+            'sg_member_revisions': {}}
+        self.agent.refresh_firewall(['fake_device'])
+        # fake_sgid3 is no longer used by the filtered ports
+        self.agent.plugin_rpc.security_group_info_for_devices.\
+            assert_called_once_with(None, ['fake_device'],
+                                    sg_member_revisions={'fake_sgid2': 'rev1'})
+        self.assertFalse(self.firewall.update_security_group_members.called)
+        self.assertEqual({'fake_sgid2': 'rev1'},
+                         self.agent.sg_member_revisions)
+
+    def test_refresh_firewall_unsupported_by_server(self):
+        rpc = self.agent.plugin_rpc
+        rpc.security_group_info_for_devices.side_effect = (
+            rpc_common.RemoteError('UnsupportedRpcVersion'))
+        self.agent.refresh_firewall(['fake_device'])
+        rpc.security_group_rules_for_devices.assert_called_once_with(
+            None, ['fake_device'])
+        self.firewall.update_port_filter.assert_called_once_with(
+            self.fake_device)
+        self.assertTrue(self.firewall.expand_remote_groups)
+        self.agent.refresh_firewall(['fake_device'])
+        self.assertEqual(1, rpc.security_group_info_for_devices.call_count)
+
+    def test_refresh_firewall_raises_remote_errors(self):
+        rpc = self.agent.plugin_rpc
+        rpc.security_group_info_for_devices.side_effect = (
+            rpc_common.RemoteError('DBError'))
+        self.assertRaises(rpc_common.RemoteError,
+                          self.agent.refresh_firewall, ['fake_device'])
+        self.assertFalse(rpc.security_group_rules_for_devices.called)
+        self.assertFalse(self.firewall.expand_remote_groups)
+
+    def test_security_groups_member_updated_unsupported_by_server(self):
+        self.agent.refresh_firewall = mock.Mock()
+        self.agent.plugin_rpc.security_group_member_updates.side_effect = (
+            rpc_common.UnsupportedRpcVersion(version='1.2'))
+        self.agent.security_groups_member_updated(['fake_sgid2'])
+        self.assertTrue(self.firewall.expand_remote_groups)
+        self.agent.refresh_firewall.assert_called_once_with(['fake_device'])
+
+    def test_security_groups_member_updated(self):
+        self.agent.refresh_firewall = mock.Mock()
+        self.agent.sg_member_revisions = {'fake_sgid2': 'rev1'}
+        self.agent.security_groups_member_updated(['fake_sgid2', 'fake_sgid3'])
+        self.agent.plugin_rpc.security_group_member_updates.\
+            assert_called_once_with(None, {'fake_sgid2': 'rev1'})
+        self.firewall.update_security_group_members.assert_called_once_with(
+            'fake_sgid2', self.member_ips)
+        self.assertEqual({'fake_sgid2': 'rev2'},
+                         self.agent.sg_member_revisions)
+        self.assertFalse(self.agent.refresh_firewall.called)
+
+    def test_security_groups_member_updated_unchanged(self):
+        self.agent.plugin_rpc.security_group_member_updates.return_value = {
+            'sg_member_ips': {}, 'sg_member_revisions': {}}
+        self.agent.sg_member_revisions = {'fake_sgid2': 'rev1'}
+        self.agent.security_groups_member_updated(['fake_sgid2'])
+        self.assertFalse(self.firewall.update_security_group_members.called)
+        self.assertEqual({'fake_sgid2': 'rev1'},
+                         self.agent.sg_member_revisions)
+
+    def test_security_groups_member_updated_deferred(self):
+        self.agent.defer_refresh_firewall = True
+        self.agent.refresh_firewall = mock.Mock()
+        self.agent.security_groups_member_updated(['fake_sgid2'])
+        self.assertFalse(self.firewall.update_security_group_members.called)
+        self.assertTrue(self.agent.firewall_refresh_needed())
+        self.agent.setup_port_filters(set(), set())
+        self.firewall.update_security_group_members.assert_called_once_with(
+            'fake_sgid2', self.member_ips)
+        self.assertFalse(self.agent.refresh_firewall.called)
+
+    def test_security_groups_member_updated_deferred_twice(self):
+        self.agent.defer_refresh_firewall = True
+        self.agent.sg_member_revisions = {'fake_sgid2': 'rev1'}
+        self.agent.security_groups_member_updated(['fake_sgid2'])
+        self.agent.setup_port_filters(set(), set())
+        self.assertEqual({'fake_sgid2': 'rev2'},
+                         self.agent.sg_member_revisions)
+        self.agent.plugin_rpc.security_group_member_updates.return_value = {
+            'sg_member_ips': {}, 'sg_member_revisions': {}}
+        self.agent.security_groups_member_updated(['fake_sgid2'])
+        self.agent.setup_port_filters(set(), set())
+        self.agent.plugin_rpc.security_group_member_updates.assert_has_calls(
+            [call(None, {'fake_sgid2': 'rev1'}),
+             call(None, {'fake_sgid2': 'rev2'})])
+        self.firewall.update_security_group_members.assert_called_once_with(
+            'fake_sgid2', self.member_ips)
+        self.assertEqual({'fake_sgid2': 'rev2'},
+                         self.agent.sg_member_revisions)
+
+    def test_refresh_firewall_without_member_revisions(self):
+        self.agent.sg_member_revisions = {'fake_sgid2': 'rev1'}
+        self.agent.plugin_rpc.security_group_info_for_devices.return_value = {
+            'devices': self.firewall.ports,
+            'sg_member_ips': {'fake_sgid2': self.member_ips}}
+        self.agent.refresh_firewall(['fake_device'])
+        self.firewall.update_security_group_members.assert_called_once_with(
+            'fake_sgid2', self.member_ips)
+        self.assertEqual({}, self.agent.sg_member_revisions)
+
+
 class SecurityGroupAgentRpcWithDeferredRefreshTestCase(
     SecurityGroupAgentRpcTestCase):
 
@@ -819,6 +1051,42 @@ class SecurityGroupServerRpcApiTestCase(base.BaseTestCase):
              topic='fake_topic')])
 
 
+    def test_security_group_info_for_devices(self):
+        self.rpc.security_group_info_for_devices(None, ['fake_device'])
+        self.rpc.call.assert_has_calls(
+            [call(None,
+             {'args':
+                 {'devices': ['fake_device'],
+                  'sg_member_revisions': None},
+              'method': 'security_group_info_for_devices',
+              'namespace': None},
+             version=sg_rpc.SG_RPC_MEMBERS_VERSION,
+             topic='fake_topic')])
+
+    def test_security_group_members(self):
+        self.rpc.security_group_members(None, ['fake_sgid'])
+        self.rpc.call.assert_has_calls(
+            [call(None,
+             {'args':
+                 {'security_groups': ['fake_sgid']},
+              'method': 'security_group_members',
+              'namespace': None},
+             version=sg_rpc.SG_RPC_MEMBERS_VERSION,
+             topic='fake_topic')])
+
+
+    def test_security_group_member_updates(self):
+        self.rpc.security_group_member_updates(None, {'fake_sgid': 'rev'})
+        self.rpc.call.assert_has_calls(
+            [call(None,
+             {'args':
+                 {'sg_member_revisions': {'fake_sgid': 'rev'}},
+              'method': 'security_group_member_updates',
+              'namespace': None},
+             version=sg_rpc.SG_RPC_MEMBERS_VERSION,
+             topic='fake_topic')])
+
+
 class FakeSGNotifierAPI(proxy.RpcProxy,
                         sg_rpc.SecurityGroupAgentRpcApiMixin):
     pass
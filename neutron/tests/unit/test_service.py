@@ -0,0 +1,70 @@
+# Copyright 2014 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from oslo.config import cfg
+
+from neutron import service
+from neutron.tests import base
+
+
+class TestServeRpc(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestServeRpc, self).setUp()
+        self.plugin = mock.Mock()
+        self.plugin.rpc_workers_supported.return_value = True
+        mock.patch('neutron.manager.NeutronManager.get_plugin',
+                   return_value=self.plugin).start()
+        mock.patch.object(service.session, 'get_engine').start()
+        self.addCleanup(mock.patch.stopall)
+        self.addCleanup(cfg.CONF.reset)
+
+    def test_plugin_without_rpc_listener(self):
+        self.plugin.rpc_workers_supported.return_value = False
+        cfg.CONF.set_override('rpc_workers', 2)
+        with mock.patch.object(service.common_service,
+                               'ProcessLauncher') as launcher:
+            self.assertIsNone(service.serve_rpc())
+        self.assertFalse(launcher.called)
+        self.assertFalse(self.plugin.start_rpc_listener.called)
+
+    def test_in_process(self):
+        rpc = service.serve_rpc()
+        self.assertIsInstance(rpc, service.RpcWorker)
+        self.plugin.start_rpc_listener.assert_called_once_with()
+
+    def test_workers(self):
+        cfg.CONF.set_override('rpc_workers', 2)
+        with mock.patch.object(service.common_service,
+                               'ProcessLauncher') as launcher:
+            rpc = service.serve_rpc()
+        self.assertEqual(launcher.return_value, rpc)
+        worker = launcher.return_value.launch_service.call_args[0][0]
+        self.assertIsInstance(worker, service.RpcWorker)
+        launcher.return_value.launch_service.assert_called_once_with(
+            worker, workers=2)
+        self.assertFalse(self.plugin.start_rpc_listener.called)
+
+    def test_worker_restart(self):
+        worker = service.RpcWorker(self.plugin)
+        worker.start()
+        conn = self.plugin.start_rpc_listener.return_value
+        worker.stop()
+        worker.wait()
+        conn.close.assert_called_once_with()
+        worker.reset()
+        worker.start()
+        self.assertEqual(2, self.plugin.start_rpc_listener.call_count)